@@ -5,12 +5,13 @@ from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask import g, request
-from .extensions import db
+from .extensions import db, db_routing_ext, redis_ext, sql_stats_ext, metrics_ext, profiling_ext, compression_ext
 from .api import register_blueprints
 from .commands import register_commands
 from .logging_config import configure_logging
 from .celery_utils import celery_init_app
 from .config import config
+from .db_routing import configure_database
 from app.schemas.base import BaseResponseSchema
 
 def create_app(config_name=None, test_config=None):
@@ -33,12 +34,13 @@ def create_app(config_name=None, test_config=None):
     app.config['BASE_RESPONSE_SCHEMA'] = BaseResponseSchema
     app.config['BASE_RESPONSE_DATA_KEY'] = 'data'
 
-    # 1.2 Celery Configuration
+    # 1.2 Celery Configuration (连接数/超时与共享 Redis 客户端同一组配置)
     app.config.update(
         CELERY={
             'broker_url': app.config.get('REDIS_URL', 'redis://redis:6379/0'),
             'result_backend': app.config.get('REDIS_URL', 'redis://redis:6379/0'),
             'task_ignore_result': True,
+            **redis_ext.celery_options(app.config),
         }
     )
 
@@ -75,9 +77,26 @@ def create_app(config_name=None, test_config=None):
     # 2. CORS
     CORS(app, supports_credentials=True)
 
-    # 3. Database
+    # 2.1 JSON 响应压缩 (after_request 按注册逆序执行，最先注册保证在其他钩子之后压缩)
+    compression_ext.init_app(app)
+
+    # 3. Database (连接池/语句超时按进程类型配置，可选只读副本)
+    configure_database(app)
     db.init_app(app)
     Migrate(app, db)
+    db_routing_ext.init_app(app)
+
+    # 3.1 Redis (每进程一个连接池，app.extensions['redis'])
+    redis_ext.init_app(app)
+
+    # 3.2 请求级 SQL 统计 / N+1 检测
+    sql_stats_ext.init_app(app)
+
+    # 3.3 Prometheus 指标 (/metrics)
+    metrics_ext.init_app(app)
+
+    # 3.4 按需采样分析 (X-Profile: 1)
+    profiling_ext.init_app(app)
 
     # 4. JWT
     jwt = JWTManager(app)
@@ -127,4 +146,9 @@ def create_app(config_name=None, test_config=None):
     def health():
         return {'status': 'healthy', 'timestamp': time.time()}
 
+    @app.get('/health/redis')
+    def health_redis():
+        managed = app.extensions['redis']
+        return {'healthy': managed.ping(), **managed.stats()}
+
     return app
@@ -4,10 +4,16 @@ from apiflask.views import MethodView
 from werkzeug.datastructures import FileStorage
 from app.services.serc.tax_refund_service import tax_refund_service
 from app.services.customs_service import customs_service
+from app.services.excel_export import xlsx_response
 from app.schemas.pagination import PaginationQuerySchema, make_pagination_schema
+from app.schemas.compiled import fast_response
 from app.decorators import permission_required
+from app.db_routing import EXPORT_STATEMENT_TIMEOUT_MS, read_replica, statement_timeout
 from app.security import auth
 import os
+import uuid
+from datetime import datetime
+from flask import current_app
 from . import customs_bp
 from app.models.customs.consignee import OverseasConsignee
 from app.models.customs.product import CustomsProduct
@@ -53,6 +59,7 @@ class DeclarationStatsAPI(MethodView):
     
     @customs_bp.doc(summary="获取报关单状态统计")
     @customs_bp.output(CustomsDeclarationStatsSchema(many=True))
+    @read_replica
     def get(self):
         return {'data': customs_service.get_declaration_stats()}
 
@@ -173,6 +180,8 @@ class CustomsDeclarationSchema(Schema):
     # 动态逻辑字段
     required_file_slots = List(String(), dump_only=True)
 
+DeclarationPaginationSchema = make_pagination_schema(CustomsDeclarationSchema)
+
 class DeclarationImportSchema(Schema):
     file = File(required=True)
     shipping_no = String(load_only=True)
@@ -180,6 +189,26 @@ class DeclarationImportSchema(Schema):
     logistics_provider = String()
     container_mode = String(load_only=True)
     export_date = Date()
+    skip_errors = Boolean(load_default=False, metadata={'description': '跳过错误行继续导入 (默认有错误时整单不导入)'})
+    background = Boolean(load_default=False, metadata={'description': '后台导入 (大文件自动后台)'})
+
+class ImportRowErrorSchema(Schema):
+    row = Integer(metadata={'description': 'Excel 行号'})
+    column = String()
+    value = String(allow_none=True)
+    message = String()
+
+class DeclarationImportResultSchema(Schema):
+    declaration_id = Integer(allow_none=True)
+    pre_entry_no = String(allow_none=True)
+    total_rows = Integer()
+    imported_rows = Integer()
+    error_count = Integer()
+    errors = List(Nested(ImportRowErrorSchema))
+    warnings = List(Nested(ImportRowErrorSchema))
+    fob_total = Decimal(as_string=True)
+    task_id = String(metadata={'description': '后台导入任务ID'})
+    state = String(metadata={'description': '后台任务状态 PENDING/STARTED/SUCCESS/FAILURE'})
 
 class GenerateContractsResponseSchema(Schema):
     contract_ids = List(Integer())
@@ -197,7 +226,8 @@ class DeclarationQuerySchema(PaginationQuerySchema):
 class DeclarationListAPI(MethodView):
     @customs_bp.doc(summary="获取报关单列表", description="支持按预录入编号降序排序，search_no参数支持模糊搜索多字段")
     @customs_bp.input(DeclarationQuerySchema, location='query', arg_name='query')
-    @customs_bp.output(make_pagination_schema(CustomsDeclarationSchema))
+    @customs_bp.output(DeclarationPaginationSchema)
+    @read_replica
     def get(self, query):
         pagination = customs_service.get_declarations(
             query['page'],
@@ -209,7 +239,7 @@ class DeclarationListAPI(MethodView):
                 'container_mode': query.get('container_mode')
             }
         )
-        return {'data': pagination}
+        return fast_response(DeclarationPaginationSchema, pagination)
 
     @customs_bp.doc(summary="创建报关单 (草稿)")
     @customs_bp.input(CustomsDeclarationSchema, arg_name='data')
@@ -220,38 +250,88 @@ class DeclarationListAPI(MethodView):
         current_user_id = get_jwt_identity()
         return {'data': customs_service.create_declaration(data, current_user_id)}
 
+@customs_bp.route('/declarations/export')
+class DeclarationExportAPI(MethodView):
+    decorators = [customs_bp.auth_required(auth)]
+
+    @customs_bp.doc(summary="导出报关单明细 (Excel)", description="按列表筛选条件流式导出，每行一条商品明细 (忽略分页参数)")
+    @customs_bp.input(DeclarationQuerySchema, location='query', arg_name='query')
+    @permission_required('customs:view')
+    @read_replica
+    @statement_timeout(EXPORT_STATEMENT_TIMEOUT_MS)
+    def get(self, query):
+        path = customs_service.export_declarations_excel(filters={
+            'status': query.get('status'),
+            'search_no': query.get('search_no'),
+            'pre_entry_no': query.get('pre_entry_no'),
+            'container_mode': query.get('container_mode')
+        })
+        if not path:
+            abort(404, message='No declarations found to export')
+        return xlsx_response(path, f'报关明细_{datetime.now().strftime("%Y%m%d%H%M")}.xlsx')
+
 @customs_bp.route('/declarations/import')
 class DeclarationImportAPI(MethodView):
     decorators = [customs_bp.auth_required(auth)]
     
-    @customs_bp.doc(summary="导入报关单/装箱单 (Excel)", description="上传Excel生成草稿报关单")
+    @customs_bp.doc(
+        summary="导入报关单/装箱单 (Excel)",
+        description="上传Excel生成草稿报关单，返回行级错误；大文件或 background=true 时转后台任务，返回 task_id"
+    )
     @customs_bp.input(DeclarationImportSchema, location='form', arg_name='data')
-    @customs_bp.output(CustomsDeclarationSchema, status_code=201)
+    @customs_bp.output(DeclarationImportResultSchema, status_code=201)
     @permission_required('customs:create')
     def post(self, data):
         from flask_jwt_extended import get_jwt_identity
         current_user_id = get_jwt_identity()
         
         f: FileStorage = data['file']
-        # Save temp file
-        temp_path = f"/tmp/{f.filename}"
-        if not os.path.exists('/tmp'):
-            os.makedirs('/tmp')
+        # 暂存文件 (随机文件名，后台导入时由 worker 读取后删除)
+        import_dir = current_app.config.get('CUSTOMS_IMPORT_DIR', '/tmp/customs_imports')
+        os.makedirs(import_dir, exist_ok=True)
+        ext = os.path.splitext(f.filename or '')[1] or '.xlsx'
+        temp_path = os.path.join(import_dir, f"{uuid.uuid4().hex}{ext}")
         f.save(temp_path)
         
+        source_data = {
+            'shipping_no': data.get('shipping_no'),
+            'logistics_provider': data.get('logistics_provider'),
+            'container_mode': data.get('container_mode'),
+            'export_date': data['export_date'].isoformat() if data.get('export_date') else None
+        }
+        
+        background = data.get('background') or \
+            os.path.getsize(temp_path) > current_app.config.get('CUSTOMS_IMPORT_ASYNC_BYTES', 1024 * 1024)
+        if background:
+            from app.tasks import import_declaration_task
+            task = import_declaration_task.delay(temp_path, source_data, current_user_id, data.get('skip_errors', False))
+            return {'data': {'task_id': task.id, 'state': 'PENDING'}}, 202
+
         try:
-            source_data = {
-                'shipping_no': data.get('shipping_no'),
-                'logistics_provider': data.get('logistics_provider'),
-                'container_mode': data.get('container_mode'),
-                'export_date': data.get('export_date')
-            }
-            decl = customs_service.import_declaration_from_excel(temp_path, source_data, current_user_id)
-            return {'data': decl}
+            return {'data': customs_service.import_declaration_from_excel(
+                temp_path, source_data, current_user_id, skip_errors=data.get('skip_errors', False)
+            )}
         finally:
             if os.path.exists(temp_path):
                 os.remove(temp_path)
 
+@customs_bp.route('/declarations/import/tasks/<task_id>')
+class DeclarationImportTaskAPI(MethodView):
+    decorators = [customs_bp.auth_required(auth)]
+
+    @customs_bp.doc(summary="查询后台导入结果", description="按 task_id 查询报关单后台导入状态与行级错误")
+    @customs_bp.output(DeclarationImportResultSchema)
+    @permission_required('customs:create')
+    def get(self, task_id):
+        celery_app = current_app.extensions['celery']
+        task = celery_app.AsyncResult(task_id)
+        payload = {'task_id': task_id, 'state': task.state}
+        if task.successful():
+            payload.update(task.result or {})
+        elif task.failed():
+            payload['errors'] = [{'row': 0, 'column': '', 'value': None, 'message': str(task.result)}]
+        return {'data': payload}
+
 @customs_bp.route('/declarations/<int:id>/generate-contracts')
 class DeclarationGenerateContractsAPI(MethodView):
     @customs_bp.doc(summary="生成交付合同", description="根据报关单明细按供应商拆分生成交付合同")
@@ -1,4 +1,5 @@
 """发货单采购明细API路由"""
+from flask import request
 from apiflask import APIBlueprint
 from apiflask.views import MethodView
 from flask_jwt_extended import get_jwt_identity
@@ -117,13 +118,23 @@ class ShipmentPurchaseItemRecalculateAPI(MethodView):
     
     @purchase_item_bp.doc(
         summary='重新计算商品明细',
-        description='基于采购明细重新计算商品明细（全量重算）'
+        description='基于采购明细重新计算商品明细（全量重算）。?dry_run=true 时只返回新增/更新/删除差异，不落库'
     )
     @permission_required('logistics:shipment:edit')
     def post(self, shipment_id: int):
         """重新计算商品明细"""
-        ShipmentPurchaseItemService.recalculate_all_items(shipment_id)
-        return {'message': '商品明细重新计算完成'}
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        diff = ShipmentPurchaseItemService.recalculate_all_items(shipment_id, dry_run=dry_run)
+        summary = {
+            'dry_run': dry_run,
+            'inserted': len(diff['insert']),
+            'updated': len(diff['update']),
+            'deleted': len(diff['delete']),
+            'unchanged': diff['unchanged'],
+        }
+        if dry_run:
+            return {'data': {**summary, 'diff': diff}}
+        return {'message': '商品明细重新计算完成', 'data': summary}
 
 
 class ShipmentValidateAPI(MethodView):
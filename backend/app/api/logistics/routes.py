@@ -3,6 +3,7 @@ from apiflask import APIBlueprint
 from apiflask.views import MethodView
 from flask_jwt_extended import get_jwt_identity
 from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 
 from app.security import auth
 from app.decorators import permission_required
@@ -12,12 +13,15 @@ from app.schemas.logistics.shipment import (
     ShipmentOrderUpdateSchema
 )
 from app.schemas.pagination import PaginationQuerySchema, PaginationSchema, make_pagination_schema
+from app.schemas.compiled import fast_response
 from app.services.logistics.shipment_service import ShipmentService
 from app.models.logistics.shipment import ShipmentOrder
 from app.extensions import db
 
 logistics_bp = APIBlueprint('logistics', __name__, url_prefix='/logistics', tag='物流管理')
 
+ShipmentPaginationSchema = make_pagination_schema(ShipmentOrderSchema)
+
 
 class ShipmentOrderListAPI(MethodView):
     """发货单列表API"""
@@ -25,13 +29,14 @@ class ShipmentOrderListAPI(MethodView):
     
     @logistics_bp.doc(summary='获取发货单列表', description='支持分页、搜索、状态过滤')
     @logistics_bp.input(PaginationQuerySchema, location='query', arg_name='pagination')
-    @logistics_bp.output(make_pagination_schema(ShipmentOrderSchema))
+    @logistics_bp.output(ShipmentPaginationSchema)
     def get(self, pagination):
         """获取发货单列表"""
         page = pagination['page']
         per_page = pagination['per_page']
         
-        query = ShipmentOrder.query
+        # 明细随列表一并输出，批量预加载避免逐单查询
+        query = ShipmentOrder.query.options(selectinload(ShipmentOrder.items))
         
         # 搜索过滤（发货单号、外部订单号、收货人）
         if pagination.get('q'):
@@ -65,14 +70,12 @@ class ShipmentOrderListAPI(MethodView):
         # 分页
         pagination_obj = query.paginate(page=page, per_page=per_page, error_out=False)
         
-        return {
-            'data': {
-                'items': pagination_obj.items,
-                'total': pagination_obj.total,
-                'page': page,
-                'per_page': per_page
-            }
-        }
+        return fast_response(ShipmentPaginationSchema, {
+            'items': pagination_obj.items,
+            'total': pagination_obj.total,
+            'page': page,
+            'per_page': per_page
+        })
     
     @logistics_bp.doc(summary='创建发货单', description='创建新的发货单')
     @logistics_bp.input(ShipmentOrderCreateSchema, arg_name='data')
@@ -5,6 +5,7 @@ from app.models.product import Category, AttributeDefinition, CategoryAttribute
 from app.schemas.product.category import CategoryTreeSchema, CategoryDetailSchema, AttributeDefinitionSchema, CategoryBaseSchema, CategoryAttributeMappingSchema, EffectiveAttributeSchema
 from app.security import auth
 from app.decorators import permission_required
+from app.http_cache import conditional
 from app.errors import BusinessError
 from app import codes
 from apiflask.fields import Boolean
@@ -16,6 +17,7 @@ category_bp = APIBlueprint('category', __name__, url_prefix='/categories', tag='
 @category_bp.auth_required(auth)
 @category_bp.doc(summary='获取分类树', description='获取完整的商品分类树结构（包含子分类）。')
 @category_bp.output(CategoryTreeSchema(many=True))
+@conditional('categories')
 def get_category_tree():
     """Get full category tree structure"""
     # Optimized: Fetch all and build tree in memory or use CTE if needed.
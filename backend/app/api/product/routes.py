@@ -1,13 +1,16 @@
 from apiflask import APIBlueprint
 from app.schemas.product.product import (
     ProductCreateSchema, ProductOutSchema, SkuSuffixSchema, ProductCreateResponseSchema,
-    SkuListResponseSchema, SkuDetailSchema
+    SkuListResponseSchema, SkuDetailSchema, SkuFacetResponseSchema
 )
 from app.schemas.pagination import make_pagination_schema, PaginationQuerySchema
+from app.schemas.compiled import fast_response
 from app.services.product_service import ProductService
+from app.services.product_facet_service import ProductFacetService
 from app.services.sku_generator import generate_sku
 from app.security import auth
 from app.decorators import permission_required
+from app.db_routing import read_replica
 # 暂时注释掉以避免循环导入
 # from app.tasks import send_email_task
 from app.extensions import db
@@ -17,6 +20,7 @@ from sqlalchemy import select
 # url_prefix is now /products (relative to api_v1)
 product_bp = APIBlueprint('product', __name__, url_prefix='/products', tag='Products')
 product_service = ProductService()
+facet_service = ProductFacetService(product_service)
 ProductPaginationSchema = make_pagination_schema(ProductOutSchema)
 
 @product_bp.post('')
@@ -71,28 +75,17 @@ def list_sku_suffixes():
     suffixes = db.session.scalars(select(SkuSuffix).order_by(SkuSuffix.code)).all()
     return {'data': suffixes}
 
-@product_bp.get('/variants')
-@product_bp.auth_required(auth)
-@product_bp.doc(
-    summary='获取SKU列表', 
-    description='获取所有SKU列表，支持多维度筛选（搜索、分类、品牌、车型、属性、库存、状态等）。'
-)
-@product_bp.input(PaginationQuerySchema, location='query', arg_name='pagination')
-@product_bp.output(SkuListResponseSchema)
-def list_skus(pagination):
-    """List all SKUs with filtering"""
-    from flask import request
-    
-    # 构建筛选条件
+def _parse_sku_filters(args):
+    """从查询参数构建 SKU 筛选条件"""
     filters = {}
     
     # 搜索关键词
-    q = request.args.get('q')
+    q = args.get('q')
     if q:
         filters['q'] = q
     
     # 分类筛选
-    category_id = request.args.get('category_id')
+    category_id = args.get('category_id')
     if category_id:
         try:
             filters['category_id'] = int(category_id)
@@ -100,33 +93,88 @@ def list_skus(pagination):
             pass
     
     # 品牌/车型筛选
-    brand = request.args.get('brand')
+    brand = args.get('brand')
     if brand:
         filters['brand'] = brand
     
-    model = request.args.get('model')
+    model = args.get('model')
     if model:
         filters['model'] = model
     
     # 状态筛选
-    is_active = request.args.get('is_active')
+    is_active = args.get('is_active')
     if is_active is not None:
         filters['is_active'] = is_active.lower() == 'true'
     
-    # 库存筛选 (TODO: 集成库存系统后实现)
-    # stock_min = request.args.get('stock_min')
-    # stock_max = request.args.get('stock_max')
-    
-    # 属性筛选 (TODO: 支持JSONB查询)
-    # 可以扩展为支持多个属性筛选
+    # 库存筛选 (按可用库存)
+    for key in ('stock_min', 'stock_max'):
+        value = args.get(key)
+        if value not in (None, ''):
+            try:
+                filters[key] = int(value)
+            except ValueError:
+                pass
+    
+    warning_status = args.get('warning_status')
+    if warning_status in ('normal', 'warning', 'danger'):
+        filters['warning_status'] = warning_status
+    
+    # 库存排序: sort=stock_quantity / -available_quantity / in_transit
+    sort = args.get('sort')
+    if sort and sort.lstrip('-') in ProductService.STOCK_SORT_FIELDS:
+        filters['sort'] = sort
+    
+    # 属性筛选: attr_<key>=<value>，如 attr_position=Left&attr_color=Chrome
+    attribute_filters = {
+        key[len('attr_'):]: value
+        for key, value in args.items()
+        if key.startswith('attr_') and value
+    }
+    if attribute_filters:
+        filters['attribute_filters'] = attribute_filters
+    
+    return filters
+
+@product_bp.get('/variants')
+@product_bp.auth_required(auth)
+@product_bp.doc(
+    summary='获取SKU列表', 
+    description='获取所有SKU列表，支持多维度筛选（搜索、分类、品牌、车型、属性、库存、状态等）。属性筛选使用 attr_<key>=<value>。'
+)
+@product_bp.input(PaginationQuerySchema, location='query', arg_name='pagination')
+@product_bp.output(SkuListResponseSchema)
+@read_replica
+def list_skus(pagination):
+    """List all SKUs with filtering"""
+    from flask import request
     
     result = product_service.list_skus(
         page=pagination['page'],
         per_page=pagination['per_page'],
-        filters=filters
+        filters=_parse_sku_filters(request.args)
     )
     
-    return {'data': result}
+    return fast_response(SkuListResponseSchema, result)
+
+@product_bp.get('/variants/facets')
+@product_bp.auth_required(auth)
+@product_bp.doc(
+    summary='SKU分面筛选',
+    description='返回与 SKU 列表相同的分页结果，并附带品牌、车型、分类及各规格属性的命中计数（单次聚合计算）。'
+)
+@product_bp.input(PaginationQuerySchema, location='query', arg_name='pagination')
+@product_bp.output(SkuFacetResponseSchema)
+@read_replica
+def list_skus_with_facets(pagination):
+    """List SKUs together with per-facet counts"""
+    from flask import request
+    
+    result = facet_service.list_skus_with_facets(
+        page=pagination['page'],
+        per_page=pagination['per_page'],
+        filters=_parse_sku_filters(request.args)
+    )
+    return fast_response(SkuFacetResponseSchema, result)
 
 @product_bp.get('/variants/<string:sku>')
 @product_bp.auth_required(auth)
@@ -194,25 +242,7 @@ def get_next_sku_serial():
     if not prefix:
         return {'data': '0001'}
     
-    # We don't have a public method in ProductService or sku_generator for just getting the next serial 
-    # without incrementing or race condition checks. 
-    # But checking app/services/sku_generator.py might reveal logic we can reuse or mimic.
-    
-    # For now, let's just return a placeholder or implement a simple check if possible.
-    # Actually, let's rely on sku_generator's internal logic if accessible, 
-    # or just return '????' to indicate it's generated on save.
-    # User asked for "getNextSkuSerialApi", implying they want to see "0615" or similar.
-    
-    # Let's try to query the DB for the max serial for this prefix.
-    # Assuming standard SKU format: Prefix + Serial + Suffix
-    # This is complex because of suffixes.
-    
-    # Implementation detail:
-    # If we look at `app/services/sku_generator.py`, it likely uses Redis or DB sequence.
-    # Let's just import and use it if it's safe (idempotent preview). 
-    # Usually `generate_sku` increments the counter. We don't want to increment on preview.
-    # So we should probably peek.
-    
+    # 只读预览计数器，不占号
     from app.services.sku_generator import get_next_serial_preview
     serial = get_next_serial_preview(prefix)
     return {'data': serial}
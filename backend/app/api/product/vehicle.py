@@ -1,27 +1,52 @@
 from apiflask import APIBlueprint, abort
+from flask import request
 from sqlalchemy import select
 from app.extensions import db
 from app.models.product import ProductVehicle
-from app.schemas.product.vehicle import ProductVehicleBaseSchema, ProductVehicleTreeSchema
+from app.schemas.product.vehicle import (
+    ProductVehicleBaseSchema, ProductVehicleTreeSchema,
+    VehicleSearchQuerySchema, VehicleSearchResultSchema, VehicleImportResultSchema
+)
+from app.services.vehicle_index import get_vehicle_index, import_vehicle_master_list
 from app.security import auth
 from app.decorators import permission_required
+from app.errors import BusinessError
+from app.http_cache import conditional
 
 # url_prefix is now /vehicles (relative to api_v1)
 vehicle_bp = APIBlueprint('vehicle', __name__, url_prefix='/vehicles', tag='Vehicles')
 
+
+def _current_index():
+    """带 ETag 的接口: 索引须与 ETag 所用资源版本一致 (版本号已在本请求内读取，不额外查询)"""
+    index = get_vehicle_index()
+    index.sync_version()
+    return index
+
+
 @vehicle_bp.get('/tree')
 @vehicle_bp.auth_required(auth)
 @vehicle_bp.doc(summary='获取车辆层级树', description='获取完整的车辆层级树 (Brand -> Model -> Year)。')
 @vehicle_bp.output(ProductVehicleTreeSchema(many=True))
+@conditional('vehicles')
 def get_vehicle_tree():
     """Get full vehicle tree structure"""
-    # Fetch roots (brands)
-    roots = db.session.scalars(
-        select(ProductVehicle)
-        .where(ProductVehicle.parent_id.is_(None))
-        .order_by(ProductVehicle.sort_order, ProductVehicle.name)
-    ).all()
-    return {'data': roots}
+    # 从内存索引构建，避免逐层懒加载 children
+    return {'data': _current_index().tree()}
+
+@vehicle_bp.get('/search')
+@vehicle_bp.auth_required(auth)
+@vehicle_bp.doc(summary='车型快速检索', description='按名称/缩写/编码前缀检索车型节点，返回扁平化路径 (用于适配车型录入 Typeahead)。')
+@vehicle_bp.input(VehicleSearchQuerySchema, location='query', arg_name='query')
+@vehicle_bp.output(VehicleSearchResultSchema(many=True))
+def search_vehicles(query):
+    """Prefix search over the cached vehicle index"""
+    return {'data': get_vehicle_index().search(
+        query['q'],
+        level_type=query.get('level_type'),
+        parent_id=query.get('parent_id'),
+        limit=query['limit']
+    )}
 
 # --- Lazy Loading Endpoints ---
 
@@ -29,40 +54,28 @@ def get_vehicle_tree():
 @vehicle_bp.auth_required(auth)
 @vehicle_bp.doc(summary='获取所有品牌', description='获取第一级车辆品牌列表。')
 @vehicle_bp.output(ProductVehicleBaseSchema(many=True))
+@conditional('vehicles')
 def get_vehicle_brands():
     """Get vehicle brands (Level 1)"""
-    brands = db.session.scalars(
-        select(ProductVehicle)
-        .where(ProductVehicle.level_type == 'make') # or parent_id is None
-        .order_by(ProductVehicle.sort_order, ProductVehicle.name)
-    ).all()
-    return {'data': brands}
+    return {'data': _current_index().by_level('make')}
 
 @vehicle_bp.get('/brands/<int:brand_id>/models')
 @vehicle_bp.auth_required(auth)
 @vehicle_bp.doc(summary='获取品牌下的车型', description='获取指定品牌下的车型列表。')
 @vehicle_bp.output(ProductVehicleBaseSchema(many=True))
+@conditional('vehicles')
 def get_vehicle_models(brand_id):
     """Get vehicle models (Level 2)"""
-    models = db.session.scalars(
-        select(ProductVehicle)
-        .where(ProductVehicle.parent_id == brand_id)
-        .order_by(ProductVehicle.sort_order, ProductVehicle.name)
-    ).all()
-    return {'data': models}
+    return {'data': _current_index().children(brand_id)}
 
 @vehicle_bp.get('/models/<int:model_id>/years')
 @vehicle_bp.auth_required(auth)
 @vehicle_bp.doc(summary='获取车型下的年份', description='获取指定车型下的年份列表。')
 @vehicle_bp.output(ProductVehicleBaseSchema(many=True))
+@conditional('vehicles')
 def get_vehicle_years(model_id):
     """Get vehicle years (Level 3)"""
-    years = db.session.scalars(
-        select(ProductVehicle)
-        .where(ProductVehicle.parent_id == model_id)
-        .order_by(ProductVehicle.sort_order, ProductVehicle.name)
-    ).all()
-    return {'data': years}
+    return {'data': _current_index().children(model_id)}
 
 @vehicle_bp.post('')
 @vehicle_bp.auth_required(auth)
@@ -83,8 +96,25 @@ def create_vehicle_node(data):
     node = ProductVehicle(**data)
     db.session.add(node)
     db.session.commit()
+    get_vehicle_index().add_node(node)
     return {'data': node}
 
+@vehicle_bp.post('/import')
+@vehicle_bp.auth_required(auth)
+@permission_required('vehicle:manage')
+@vehicle_bp.doc(summary='批量导入车型', description='上传 eBay Master Vehicle List (CSV/TSV，需包含 Make, Model, Year 列)，单次流式导入 Make -> Model -> Year 层级。')
+@vehicle_bp.output(VehicleImportResultSchema)
+def import_vehicles():
+    """Bulk import the eBay Master Vehicle List"""
+    file = request.files.get('file')
+    if not file:
+        raise BusinessError('请选择要上传的文件')
+    try:
+        stats = import_vehicle_master_list(file.stream)
+    except ValueError as e:
+        raise BusinessError(str(e))
+    return {'data': stats}
+
 @vehicle_bp.delete('/<int:node_id>')
 @vehicle_bp.auth_required(auth)
 @permission_required('vehicle:manage')
@@ -101,4 +131,5 @@ def delete_vehicle_node(node_id):
         
     db.session.delete(node)
     db.session.commit()
+    get_vehicle_index().remove_node(node_id)
     return {'code': 0, 'message': 'success', 'data': None}
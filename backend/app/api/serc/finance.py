@@ -1,7 +1,7 @@
 from apiflask import APIBlueprint
 from apiflask.views import MethodView
 from app.schemas.serc.finance import (
-    SOAGenerateSchema, SOAItemSchema, SOASearchSchema,
+    SOAGenerateSchema, SOAItemSchema, SOASearchSchema, SOAPreviewSchema,
     PaymentPoolItemSchema, PaymentCreateSchema, PaymentRequestSchema
 )
 from app.schemas.serc.common import PaymentTermSchema
@@ -41,6 +41,13 @@ class SOAGenerateAPI(MethodView):
         soa = finance_service.generate_soa(data['l1_ids'])
         return {'data': soa}
 
+class SOAPreviewAPI(MethodView):
+    @serc_finance_bp.input(SOAGenerateSchema)
+    @serc_finance_bp.output(SOAPreviewSchema)
+    def post(self, data):
+        """预览 L2 结算单开票明细 (支持跨供应商批量预览)"""
+        return finance_service.preview_soa(data['l1_ids'])
+
 class SOAConfirmAPI(MethodView):
     @serc_finance_bp.output(SOAItemSchema)
     def post(self, id):
@@ -91,6 +98,7 @@ class PaymentTermsAPI(MethodView):
 
 # Register Routes
 serc_finance_bp.add_url_rule('/soa', view_func=SOAListAPI.as_view('soa_list'))
+serc_finance_bp.add_url_rule('/soa/preview', view_func=SOAPreviewAPI.as_view('soa_preview'))
 serc_finance_bp.add_url_rule('/soa/generate', view_func=SOAGenerateAPI.as_view('soa_generate'))
 serc_finance_bp.add_url_rule('/soa/<int:id>/confirm', view_func=SOAConfirmAPI.as_view('soa_confirm'))
 serc_finance_bp.add_url_rule('/soa/<int:id>/approve', view_func=SOAApproveAPI.as_view('soa_approve'))
@@ -1,4 +1,5 @@
 """财务应付单API路由"""
+from flask import request
 from apiflask import APIBlueprint
 from apiflask.views import MethodView
 from flask_jwt_extended import get_jwt_identity
@@ -12,15 +13,31 @@ from app.schemas.serc.payable import (
     MarkPaidSchema,
     FinPayableDetailSchema,
     FinPaymentPoolSchema,
-    CreatePaymentPoolSchema
+    CreatePaymentPoolSchema,
+    BatchCreatePayableSchema,
+    BatchApprovalSchema,
+    BatchAddToPoolSchema,
+    BatchResultSchema,
+    SettlePoolResultSchema
 )
 from app.schemas.pagination import PaginationQuerySchema, make_pagination_schema
 from app.services.serc.payable_service import PayableService
 from app.models.serc.payable import FinPayable, FinPaymentPool
 from app.extensions import db
+from app.errors import BusinessError
 from sqlalchemy import or_
 
 
+def _batch_result(outcomes):
+    """批量操作结果汇总"""
+    success_count = sum(1 for o in outcomes if o['success'])
+    return {
+        'success_count': success_count,
+        'failed_count': len(outcomes) - success_count,
+        'results': outcomes
+    }
+
+
 payable_bp = APIBlueprint(
     'finance_payables',
     __name__,
@@ -117,7 +134,6 @@ class FinPayableItemAPI(MethodView):
     @permission_required('finance:payable:view')
     def get(self, payable_id):
         """获取应付单详情"""
-        from app.errors import BusinessError
         payable = PayableService.get_payable_by_id(payable_id)
         if not payable:
             raise BusinessError('应付单不存在', code=404)
@@ -188,7 +204,82 @@ class FinPayableMarkPaidAPI(MethodView):
         return {'data': payable}
 
 
+class FinPayableBatchCreateAPI(MethodView):
+    """批量创建应付单API"""
+    decorators = [payable_bp.auth_required(auth)]
+
+    @payable_bp.doc(
+        summary='批量创建应付单',
+        description='对账单/合同批量提交财务，单号批量预留、批量插入，返回逐行结果'
+    )
+    @payable_bp.input(BatchCreatePayableSchema, arg_name='data')
+    @payable_bp.output(BatchResultSchema)
+    @permission_required('finance:payable:create')
+    def post(self, data):
+        """批量创建应付单"""
+        user_id = get_jwt_identity()
+        outcomes = PayableService.batch_create_payables(data['items'], created_by=user_id)
+        return {'data': _batch_result(outcomes)}
+
+
+class FinPayableBatchApprovalAPI(MethodView):
+    """批量审批应付单API"""
+    decorators = [payable_bp.auth_required(auth)]
+
+    @payable_bp.doc(
+        summary='批量审批应付单',
+        description='批量批准/驳回待审批应付单，批准后可选择一并加入付款池，返回逐行结果'
+    )
+    @payable_bp.input(BatchApprovalSchema, arg_name='data')
+    @payable_bp.output(BatchResultSchema)
+    @permission_required('finance:payable:approve')
+    def post(self, data):
+        """批量审批应付单"""
+        user_id = get_jwt_identity()
+        outcomes = PayableService.batch_approve_payables(
+            payable_ids=data['payable_ids'],
+            action=data['action'],
+            approved_by=user_id,
+            rejection_reason=data.get('rejection_reason'),
+            add_to_pool=data.get('add_to_pool', False),
+            pool_id=data.get('pool_id')
+        )
+        return {'data': _batch_result(outcomes)}
+
+
+class FinPayableBatchAddToPoolAPI(MethodView):
+    """批量加入付款池API"""
+    decorators = [payable_bp.auth_required(auth)]
+
+    @payable_bp.doc(summary='批量加入付款池', description='将一组已批准的应付单加入指定付款池，返回逐行结果')
+    @payable_bp.input(BatchAddToPoolSchema, arg_name='data')
+    @payable_bp.output(BatchResultSchema)
+    @permission_required('finance:payable:manage')
+    def post(self, data):
+        """批量加入付款池"""
+        outcomes = PayableService.batch_add_to_pool(data['payable_ids'], data['pool_id'])
+        return {'data': _batch_result(outcomes)}
+
+
 # 注册应付单路由
+payable_bp.add_url_rule(
+    '/batch',
+    view_func=FinPayableBatchCreateAPI.as_view('payable_batch_create'),
+    methods=['POST']
+)
+
+payable_bp.add_url_rule(
+    '/batch-approve',
+    view_func=FinPayableBatchApprovalAPI.as_view('payable_batch_approve'),
+    methods=['POST']
+)
+
+payable_bp.add_url_rule(
+    '/batch-add-to-pool',
+    view_func=FinPayableBatchAddToPoolAPI.as_view('payable_batch_add_to_pool'),
+    methods=['POST']
+)
+
 payable_bp.add_url_rule(
     '',
     view_func=FinPayableListAPI.as_view('payable_list'),
@@ -284,6 +375,27 @@ class FinPaymentPoolListAPI(MethodView):
         pass
 
 
+class FinPaymentPoolSettleAPI(MethodView):
+    """付款池结算API"""
+    decorators = [payment_pool_bp.auth_required(auth)]
+
+    @payment_pool_bp.doc(
+        summary='按银行流水结算付款池',
+        description='上传银行流水 (CSV/XLSX，需包含 应付单号、金额 列，可选 付款时间)，单事务批量标记付款，返回逐行结果'
+    )
+    @payment_pool_bp.output(SettlePoolResultSchema)
+    @permission_required('finance:payable:pay')
+    def post(self, pool_id):
+        """按银行流水结算付款池"""
+        file = request.files.get('file')
+        if not file:
+            raise BusinessError('请选择要上传的银行流水文件')
+        rows = PayableService.parse_bank_statement(file.stream, file.filename or '')
+        result = PayableService.settle_pool(pool_id, rows, executed_by=get_jwt_identity())
+        result.update(_batch_result(result['results']))
+        return {'data': result}
+
+
 # 注册付款池路由
 payment_pool_bp.add_url_rule(
     '',
@@ -291,3 +403,9 @@ payment_pool_bp.add_url_rule(
     methods=['GET', 'POST']
 )
 
+payment_pool_bp.add_url_rule(
+    '/<int:pool_id>/settle',
+    view_func=FinPaymentPoolSettleAPI.as_view('pool_settle'),
+    methods=['POST']
+)
+
@@ -1,5 +1,6 @@
 from apiflask import APIBlueprint, Schema
 from apiflask.fields import Integer, String, Decimal, List, Boolean, Nested, Date
+from apiflask.validators import Range
 from apiflask.views import MethodView
 from app.services.serc.tax_refund_service import tax_refund_service
 from app.services.serc.risk_control_service import risk_control_service
@@ -33,6 +34,21 @@ class CancelMatchResponseSchema(Schema):
     success = Boolean()
     message = String()
 
+class MatchMonthRequestSchema(Schema):
+    year = Integer(required=True, validate=Range(min=2000, max=2100))
+    month = Integer(required=True, validate=Range(min=1, max=12))
+    confirm = Boolean(load_default=False)
+
+class MatchMonthFailedSchema(Schema):
+    declaration_id = Integer()
+    results = List(Nested(MatchResultItemSchema))
+
+class MatchMonthResponseSchema(Schema):
+    total = Integer()
+    confirmed = List(Integer())
+    failed = List(Nested(MatchMonthFailedSchema))
+    match_count = Integer()
+
 class RiskCheckRequestSchema(Schema):
     fob_amount = Decimal(required=True)
     cost_amount = Decimal(required=True)
@@ -76,6 +92,15 @@ class TaxMatchCancelAPI(MethodView):
             return {'success': True, 'message': 'Match cancelled and invoices released'}
         return {'success': False, 'message': 'Failed to cancel match (invalid status)'}, 400
 
+@bp.route('/match-month')
+class TaxMatchMonthAPI(MethodView):
+    @bp.doc(summary="按月批量匹配", description="当月草稿报关单按日期先后依次匹配发票；confirm=true 时批量确认并占用发票额度")
+    @bp.input(MatchMonthRequestSchema, arg_name='data')
+    @bp.output(MatchMonthResponseSchema)
+    def post(self, data):
+        """按月批量匹配报关单与发票"""
+        return tax_refund_service.match_month(data['year'], data['month'], confirm=data['confirm'])
+
 @bp.route('/check-risk')
 class RiskCheckAPI(MethodView):
     @bp.doc(summary="换汇成本风控检查", description="计算换汇成本，返回是否阻断及原因")
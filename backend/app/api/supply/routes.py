@@ -2,7 +2,7 @@ from apiflask.views import MethodView
 from apiflask import HTTPError
 from flask import send_file
 from io import BytesIO
-import zipfile
+import os
 from app.schemas.serc.supply import (
     DeliveryContractCreateSchema, 
     DeliveryContractDetailSchema, 
@@ -10,11 +10,9 @@ from app.schemas.serc.supply import (
     DeliveryContractPaginationSchema
 )
 from app.services.serc.supply_service import supply_service
-from app.services.serc.pdf_service import pdf_service
+from app.services.serc.pdf_service import pdf_service, OUTPUT_ZIP, OUTPUT_MERGED
 from app.services.serc.excel_service import excel_service
-from app.models.supply import ScmDeliveryContract, ScmDeliveryContractItem
-from app.models.purchase.supplier import SysSupplier
-from app.extensions import db
+from app.services.excel_export import xlsx_response
 from . import supply_bp
 
 from datetime import datetime
@@ -53,71 +51,83 @@ class DeliveryContractListAPI(MethodView):
 def print_contracts():
     """
     批量打印合同
-    Payload: { "ids": [1, 2, 3] }
+    Payload: { "ids": [1, 2, 3], "output": "zip" | "merged", "background": false }
+    单个分组直接返回 PDF；分组数超过 PDF_ASYNC_GROUPS 或 background=true 时转后台任务，返回 task_id
     """
-    from flask import request
+    from flask import request, current_app
     data = request.get_json()
     ids = data.get('ids', [])
     if not ids:
         raise HTTPError(400, message='No IDs provided')
+    output = data.get('output') or OUTPUT_ZIP
+    if output not in (OUTPUT_ZIP, OUTPUT_MERGED):
+        raise HTTPError(400, message=f'Unsupported output: {output}')
 
-    # 1. 查询合同数据并按供应商分组
-    contracts = db.session.query(ScmDeliveryContract).options(
-        db.joinedload(ScmDeliveryContract.supplier),
-        db.joinedload(ScmDeliveryContract.company),
-        db.selectinload(ScmDeliveryContract.items).joinedload(ScmDeliveryContractItem.product),
-        db.joinedload(ScmDeliveryContract.source_doc)
-    ).filter(ScmDeliveryContract.id.in_(ids)).all()
-    
-    if not contracts:
+    # 1. 查询合同数据并按 (采购主体, 供应商) 分组
+    groups = pdf_service.build_print_groups(ids)
+    if not groups:
          raise HTTPError(404, message='No contracts found')
 
-    grouped = {}
-    for c in contracts:
-        s_name = c.supplier.name
-        # 获取采购主体简称或名称，如果为空则显示"未指定主体"
-        comp_name = c.company.short_name if c.company and c.company.short_name else (c.company.legal_name if c.company else "未指定主体")
-        
-        # 组合键
-        key = (comp_name, s_name)
-        
-        if key not in grouped:
-            grouped[key] = []
-        grouped[key].append(c)
-
-    # 获取当前日期字符串，用于文件名
-    date_str = datetime.now().strftime('%Y%m%d')
-
-    # 2. 生成 PDF 服务
-    if len(grouped) == 1:
-        (comp_name, s_name) = list(grouped.keys())[0]
-        c_list = grouped[(comp_name, s_name)]
-        filename = f'{comp_name}_{s_name}_采购合同_{date_str}_{len(c_list)}份.pdf'
-        
-        pdf_bytes = pdf_service.generate_supplier_contract_pdf(s_name, c_list)
+    # 2. 单组直接返回 PDF
+    if len(groups) == 1:
+        group = groups[0]
+        pdf_bytes = pdf_service.generate_supplier_contract_pdf(group.supplier_name, group.contracts)
         return send_file(
             BytesIO(pdf_bytes),
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=filename
+            download_name=group.filename
         )
 
-    # 3. 多组数据，打包 ZIP
-    memory_file = BytesIO()
-    zip_filename = f'批量采购合同_{date_str}_共{len(contracts)}份.zip'
-    
-    with zipfile.ZipFile(memory_file, 'w') as zf:
-        for (comp_name, s_name), c_list in grouped.items():
-            pdf_bytes = pdf_service.generate_supplier_contract_pdf(s_name, c_list)
-            inner_filename = f'{comp_name}_{s_name}_采购合同_{date_str}_{len(c_list)}份.pdf'
-            zf.writestr(inner_filename, pdf_bytes)
-    
-    memory_file.seek(0)
+    # 3. 大批量转后台 (按分组上报进度)
+    if data.get('background') or len(groups) > current_app.config.get('PDF_ASYNC_GROUPS', 20):
+        from app.tasks import render_contract_pdfs_task
+        task = render_contract_pdfs_task.delay(ids, output)
+        return {'data': {'task_id': task.id, 'state': 'PENDING', 'total': len(groups)}}, 202
+
+    # 4. 多组：小进程池并行渲染 (Web 进程内，数量受 PDF_WEB_RENDER_WORKERS 限制)，打包 ZIP 或合并为一个 PDF
+    buffer = BytesIO()
+    pdf_service.render_batch(groups, buffer, output=output,
+                             max_workers=current_app.config.get('PDF_WEB_RENDER_WORKERS', 1))
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        mimetype='application/zip' if output == OUTPUT_ZIP else 'application/pdf',
+        as_attachment=True,
+        download_name=pdf_service.batch_filename(groups, output)
+    )
+
+@supply_bp.get('/contracts/print/tasks/<task_id>')
+def print_contracts_task(task_id):
+    """查询后台批量打印进度: state / done / total"""
+    from flask import current_app
+    task = current_app.extensions['celery'].AsyncResult(task_id)
+    payload = {'task_id': task_id, 'state': task.state}
+    if task.state == 'PROGRESS':
+        payload.update(task.info or {})
+    elif task.successful():
+        result = task.result or {}
+        payload.update(done=result.get('total'), total=result.get('total'), filename=result.get('filename'))
+    elif task.failed():
+        payload['error'] = str(task.result)
+    return {'data': payload}
+
+@supply_bp.get('/contracts/print/tasks/<task_id>/download')
+def download_printed_contracts(task_id):
+    """下载后台批量打印结果"""
+    from flask import current_app
+    task = current_app.extensions['celery'].AsyncResult(task_id)
+    if not task.successful():
+        raise HTTPError(409, message=f'Task not finished: {task.state}')
+    result = task.result or {}
+    path = result.get('path')
+    if not path or not os.path.exists(path):
+        raise HTTPError(404, message='Print result expired')
     return send_file(
-        memory_file,
-        mimetype='application/zip',
+        path,
+        mimetype='application/zip' if path.endswith('.zip') else 'application/pdf',
         as_attachment=True,
-        download_name=zip_filename
+        download_name=result.get('filename')
     )
 
 @supply_bp.post('/contracts/export')
@@ -129,54 +139,16 @@ def export_contracts():
     from flask import request
     data = request.get_json() or {}
     
-    ids = data.get('ids', [])
-    
-    # Base query with eager loading
-    query = db.session.query(ScmDeliveryContract).options(
-        db.joinedload(ScmDeliveryContract.supplier).joinedload(SysSupplier.payment_term),
-        db.joinedload(ScmDeliveryContract.company),
-        db.joinedload(ScmDeliveryContract.payment_term), 
-        db.selectinload(ScmDeliveryContract.items).joinedload(ScmDeliveryContractItem.product),
-        db.joinedload(ScmDeliveryContract.source_doc)
-    )
-    
-    if ids:
-        query = query.filter(ScmDeliveryContract.id.in_(ids))
-    else:
-        # Apply filters if no specific IDs provided (Export All based on search)
-        if data.get('q'):
-            keyword = f"%{data['q']}%"
-            query = query.join(ScmDeliveryContract.supplier).filter(
-                db.or_(
-                    ScmDeliveryContract.contract_no.ilike(keyword),
-                    SysSupplier.name.ilike(keyword)
-                )
-            )
-        
-        if data.get('supplier_id'):
-            query = query.filter(ScmDeliveryContract.supplier_id == data['supplier_id'])
-            
-        if data.get('company_id'):
-            query = query.filter(ScmDeliveryContract.company_id == data['company_id'])
-            
-        if data.get('status'):
-            query = query.filter(ScmDeliveryContract.status == data['status'])
-
-    contracts = query.all()
+    # 合同 x 明细 扁平行，服务端游标分批读取，流式写入 write_only 工作簿
+    stmt = excel_service.contract_export_statement(ids=data.get('ids', []), filters=data)
+    path = excel_service.generate_contracts_excel(stmt)
     
-    if not contracts:
+    if not path:
         raise HTTPError(404, message='No contracts found to export')
-
-    excel_file = excel_service.generate_contracts_excel(contracts)
     
     filename = f'采购合同报表_{datetime.now().strftime("%Y%m%d%H%M")}.xlsx'
     
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    return xlsx_response(path, filename)
 
 # 注册路由
 supply_bp.add_url_rule('/contracts', view_func=DeliveryContractListAPI.as_view('contract_list'))
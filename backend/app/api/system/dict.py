@@ -5,6 +5,7 @@ from sqlalchemy import select
 from app.extensions import db
 from app.models.system import SysDict
 from app.security import auth
+from app.http_cache import conditional
 
 # Blueprint
 system_bp = APIBlueprint('system', __name__, url_prefix='/system', tag='System')
@@ -35,6 +36,7 @@ class DictListAPI(MethodView):
     
     @system_bp.doc(summary='获取字典列表')
     @system_bp.output(DictSchema(many=True))
+    @conditional('dicts')
     def get(self):
         """List all dictionaries"""
         dicts = db.session.scalars(select(SysDict).order_by(SysDict.code)).all()
@@ -92,6 +94,7 @@ class DictItemListAPI(MethodView):
     
     @system_bp.doc(summary='获取字典项列表')
     @system_bp.output(DictItemSchema(many=True))
+    @conditional('dicts')
     def get(self, dict_code):
         """Get items for a specific dictionary code"""
         # Find dict by code first
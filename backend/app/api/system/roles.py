@@ -7,6 +7,7 @@ from app.schemas.system import (
 )
 from app.services.system_service import SystemService
 from app.security import auth
+from app.http_cache import conditional
 from . import system_bp
 
 service = SystemService()
@@ -87,6 +88,7 @@ class PermissionListAPI(MethodView):
     
     @system_bp.doc(summary='获取所有权限', description='获取系统所有可用的权限列表')
     @system_bp.output(PermissionOutSchema(many=True))
+    @conditional('permissions')
     def get(self):
         return {'data': service.list_permissions()}
 
@@ -95,6 +97,7 @@ class PermissionTreeAPI(MethodView):
     
     @system_bp.doc(summary='获取权限树', description='获取结构化的权限树，用于前端角色管理界面的权限勾选表格。')
     @system_bp.output(PermissionModuleSchema(many=True))
+    @conditional('permissions')
     def get(self):
         return service.get_permission_tree()
 
@@ -1,13 +1,18 @@
-from apiflask import APIBlueprint
+from datetime import datetime
+from apiflask import APIBlueprint, HTTPError
 from apiflask.views import MethodView
 from app.schemas.warehouse import (
     StockSchema, StockQuerySchema, StockAdjustSchema,
     StockMovementSchema, StockMovementQuerySchema
 )
 from app.schemas.pagination import make_pagination_schema, PaginationQuerySchema
+from app.schemas.compiled import fast_response, schema_columns
+from app.models.warehouse import WarehouseStock, WarehouseStockMovement
 from app.services.warehouse import StockService
+from app.services.excel_export import xlsx_response
 from app.security import auth
 from app.decorators import permission_required
+from app.db_routing import EXPORT_STATEMENT_TIMEOUT_MS, read_replica, statement_timeout
 from flask_jwt_extended import get_jwt_identity
 
 # 库存管理Blueprint
@@ -19,6 +24,9 @@ stock_service = StockService()
 # 创建分页Schema
 StockPaginationSchema = make_pagination_schema(StockSchema)
 StockMovementPaginationSchema = make_pagination_schema(StockMovementSchema)
+# 列表按 schema 字段直接查列，跳过 ORM 实例化
+STOCK_LIST_COLUMNS = schema_columns(StockSchema, WarehouseStock)
+STOCK_MOVEMENT_LIST_COLUMNS = schema_columns(StockMovementSchema, WarehouseStockMovement)
 
 
 class StockListAPI(MethodView):
@@ -29,6 +37,7 @@ class StockListAPI(MethodView):
     @stock_bp.input(StockQuerySchema, location='query', arg_name='query_data')
     @stock_bp.output(StockPaginationSchema)
     @permission_required('stock:view')
+    @read_replica
     def get(self, query_data):
         """获取库存列表"""
         result = stock_service.get_stock_list(
@@ -38,9 +47,10 @@ class StockListAPI(MethodView):
             warehouse_id=query_data.get('warehouse_id'),
             batch_no=query_data.get('batch_no'),
             min_quantity=query_data.get('min_quantity'),
-            max_quantity=query_data.get('max_quantity')
+            max_quantity=query_data.get('max_quantity'),
+            columns=STOCK_LIST_COLUMNS
         )
-        return {'data': result}
+        return fast_response(StockPaginationSchema, result)
 
 
 class StockItemAPI(MethodView):
@@ -79,11 +89,58 @@ class StockMovementListAPI(MethodView):
     @stock_bp.input(StockMovementQuerySchema, location='query', arg_name='query_data')
     @stock_bp.output(StockMovementPaginationSchema)
     @permission_required('stock:view')
+    @read_replica
     def get(self, query_data):
         """获取库存流水"""
-        result = stock_service.get_movements(
+        result = stock_service.get_movement_list(
             page=query_data.get('page', 1),
             per_page=query_data.get('per_page', 50),
+            sku=query_data.get('sku'),
+            warehouse_id=query_data.get('warehouse_id'),
+            order_type=query_data.get('order_type'),
+            order_no=query_data.get('order_no'),
+            start_date=query_data.get('start_date'),
+            end_date=query_data.get('end_date'),
+            columns=STOCK_MOVEMENT_LIST_COLUMNS
+        )
+        return fast_response(StockMovementPaginationSchema, result)
+
+
+class StockExportAPI(MethodView):
+    """库存导出API"""
+    decorators = [stock_bp.auth_required(auth)]
+    
+    @stock_bp.doc(summary='导出库存', description='按列表筛选条件流式导出库存 Excel (忽略分页参数)')
+    @stock_bp.input(StockQuerySchema, location='query', arg_name='query_data')
+    @permission_required('stock:view')
+    @read_replica
+    @statement_timeout(EXPORT_STATEMENT_TIMEOUT_MS)
+    def get(self, query_data):
+        """导出库存"""
+        path = stock_service.export_stock_excel(
+            sku=query_data.get('sku'),
+            warehouse_id=query_data.get('warehouse_id'),
+            batch_no=query_data.get('batch_no'),
+            min_quantity=query_data.get('min_quantity'),
+            max_quantity=query_data.get('max_quantity')
+        )
+        if not path:
+            raise HTTPError(404, message='No stock found to export')
+        return xlsx_response(path, f'库存报表_{datetime.now().strftime("%Y%m%d%H%M")}.xlsx')
+
+
+class StockMovementExportAPI(MethodView):
+    """库存流水导出API"""
+    decorators = [stock_bp.auth_required(auth)]
+    
+    @stock_bp.doc(summary='导出库存流水', description='按流水筛选条件流式导出 Excel (忽略分页参数)')
+    @stock_bp.input(StockMovementQuerySchema, location='query', arg_name='query_data')
+    @permission_required('stock:view')
+    @read_replica
+    @statement_timeout(EXPORT_STATEMENT_TIMEOUT_MS)
+    def get(self, query_data):
+        """导出库存流水"""
+        path = stock_service.export_movement_excel(
             sku=query_data.get('sku'),
             warehouse_id=query_data.get('warehouse_id'),
             order_type=query_data.get('order_type'),
@@ -91,7 +148,9 @@ class StockMovementListAPI(MethodView):
             start_date=query_data.get('start_date'),
             end_date=query_data.get('end_date')
         )
-        return {'data': result}
+        if not path:
+            raise HTTPError(404, message='No stock movements found to export')
+        return xlsx_response(path, f'库存流水_{datetime.now().strftime("%Y%m%d%H%M")}.xlsx')
 
 
 class StockSummaryAPI(MethodView):
@@ -101,6 +160,7 @@ class StockSummaryAPI(MethodView):
     @stock_bp.doc(summary='获取库存汇总', description='获取库存汇总统计信息')
     @stock_bp.output(StockSchema)
     @permission_required('stock:view')
+    @read_replica
     def get(self):
         """获取库存汇总"""
         result = stock_service.get_stock_summary()
@@ -140,6 +200,8 @@ stock_bp.add_url_rule('', view_func=StockListAPI.as_view('stock_list'))
 stock_bp.add_url_rule('/<string:sku>/warehouses/<int:warehouse_id>', view_func=StockItemAPI.as_view('stock_item'))
 stock_bp.add_url_rule('/adjust', view_func=StockAdjustAPI.as_view('stock_adjust'))
 stock_bp.add_url_rule('/movements', view_func=StockMovementListAPI.as_view('stock_movement_list'))
+stock_bp.add_url_rule('/export', view_func=StockExportAPI.as_view('stock_export'))
+stock_bp.add_url_rule('/movements/export', view_func=StockMovementExportAPI.as_view('stock_movement_export'))
 stock_bp.add_url_rule('/summary', view_func=StockSummaryAPI.as_view('stock_summary'))
 stock_bp.add_url_rule('/<string:sku>/warehouses/<int:warehouse_id>/allocate', view_func=StockAllocateAPI.as_view('stock_allocate'))
 stock_bp.add_url_rule('/<string:sku>/warehouses/<int:warehouse_id>/release', view_func=StockReleaseAPI.as_view('stock_release'))
@@ -17,6 +17,8 @@ def register_commands(app: Flask):
     from .lingxing import lingxing
     from .shipment import shipment
     from .logistics import logistics
+    from .profile import profile_cli
+    from .bench import bench_cli
     
     # 2. 注册 Command Groups (带前缀)
     app.cli.add_command(user_cli)
@@ -30,6 +32,8 @@ def register_commands(app: Flask):
     app.cli.add_command(lingxing)
     app.cli.add_command(shipment)
     app.cli.add_command(logistics)
+    app.cli.add_command(profile_cli)
+    app.cli.add_command(bench_cli)
     
     # 3. 注册 Top-Level Commands (无前缀，为了方便使用)
     # flask init-dev
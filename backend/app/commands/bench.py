@@ -0,0 +1,302 @@
+import csv
+import io
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, select, text
+from app.extensions import db
+from app.models.product import Category, Product, ProductVariant
+from app.models.warehouse import Warehouse, WarehouseStock, WarehouseStockMovement
+from app.models.customs import CustomsDeclaration, CustomsDeclarationItem
+from app.models.serc.tax import TaxInvoice, TaxInvoiceItem
+from app.models.serc.foundation import SysCompany
+from app.models.logistics.shipment import ShipmentOrder, ShipmentOrderItem
+from app.services.product_search_service import ProductSearchService
+
+bench_cli = AppGroup('bench', help='性能基准数据')
+
+# 数据量级: large 对应生产规模 (20 万 SKU / 500 万库存流水 / 5 万报关单)
+SCALES = {
+    'ci': {'skus': 500, 'warehouses': 6, 'movements': 5_000, 'declarations': 50},
+    'small': {'skus': 10_000, 'warehouses': 8, 'movements': 200_000, 'declarations': 2_000},
+    'medium': {'skus': 50_000, 'warehouses': 12, 'movements': 1_000_000, 'declarations': 10_000},
+    'large': {'skus': 200_000, 'warehouses': 20, 'movements': 5_000_000, 'declarations': 50_000},
+}
+BATCH_SIZE = 10_000
+
+# 分类树: 3 级，叶子类目挂商品
+CATEGORY_BRANCHES = (6, 5, 4)
+PART_NAMES = ['前大灯', '尾灯', '雾灯', '后视镜', '保险杠', '中网', '叶子板', '引擎盖', '散热器', '刹车片']
+MAKES = ['TOYOTA', 'HONDA', 'FORD', 'CHEVROLET', 'NISSAN', 'BMW', 'AUDI', 'KIA']
+ORDER_TYPES = ['inbound', 'outbound', 'transfer', 'adjustment']
+
+
+def _next_id(model) -> int:
+    return db.session.scalar(select(func.coalesce(func.max(model.id), 0))) + 1
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def bulk_insert(model, rows, batch_size: int = BATCH_SIZE) -> int:
+    """
+    批量写入 (行需显式带 id)
+
+    PostgreSQL 走 COPY FROM STDIN (CSV)，其他数据库退化为 executemany；
+    写完后把主键序列推进到 max(id)，之后 ORM 正常插入不会冲突。
+    """
+    table = model.__table__
+    is_pg = db.engine.dialect.name == 'postgresql'
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal total
+        if not batch:
+            return
+        if is_pg:
+            columns = list(batch[0].keys())
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow([_csv_value(row[c]) for c in columns])
+            buffer.seek(0)
+            cursor = db.session.connection().connection.cursor()
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        else:
+            db.session.execute(insert(table), batch)
+        total += len(batch)
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if is_pg:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+        ))
+    return total
+
+
+def _categories(start_id: int):
+    """3 级分类树，返回 (行列表, 叶子类目 id 列表)"""
+    rows, leaves = [], []
+    next_id = start_id
+
+    def add(parent_id, level, index, is_leaf):
+        nonlocal next_id
+        row_id = next_id
+        next_id += 1
+        rows.append({
+            'id': row_id, 'parent_id': parent_id, 'name': f'基准类目{row_id}', 'code': f'B{row_id}',
+            'level': level, 'is_leaf': is_leaf, 'sort_order': index, 'business_type': 'vehicle', 'is_active': True,
+        })
+        if is_leaf:
+            leaves.append(row_id)
+        return row_id
+
+    for i in range(CATEGORY_BRANCHES[0]):
+        l1 = add(None, 1, i, False)
+        for j in range(CATEGORY_BRANCHES[1]):
+            l2 = add(l1, 2, j, False)
+            for k in range(CATEGORY_BRANCHES[2]):
+                add(l2, 3, k, True)
+    return rows, leaves
+
+
+def seed_benchmark_data(scale: str = 'ci', seed: int = 42, echo=lambda msg: None) -> dict:
+    """
+    生成基准数据 (可重复: 同一 seed 生成同样的数据分布)
+
+    商品 -> SKU (每 SPU 2 个) -> 搜索文档 -> 库存 (每 SKU 约 2 个仓) -> 库存流水 -> 报关单 (每单 5 项) + 对应进项发票
+    -> 发货单 (每单 5 项明细，数量与报关单相同)
+    """
+    cfg = SCALES[scale]
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    counts = {}
+
+    def step(name, model, rows):
+        started = time.perf_counter()
+        counts[name] = bulk_insert(model, rows)
+        echo(f'  {name}: {counts[name]:,} 行 ({time.perf_counter() - started:.1f}s)')
+
+    # 1. 分类
+    category_rows, leaves = _categories(_next_id(Category))
+    step('categories', Category, category_rows)
+
+    # 2. SPU / SKU
+    product_start, variant_start = _next_id(Product), _next_id(ProductVariant)
+    spu_count = max(cfg['skus'] // 2, 1)
+    step('products', Product, (
+        {
+            'id': product_start + i, 'spu_code': f'BK-SPU-{product_start + i}',
+            'name': f'{rng.choice(MAKES)} {rng.choice(PART_NAMES)} {2005 + i % 20}',
+            'category_id': rng.choice(leaves), 'brand': rng.choice(MAKES),
+            'spu_coding_metadata': {}, 'attributes': {}, 'is_active': True,
+        }
+        for i in range(spu_count)
+    ))
+    skus = [f'BK{variant_start + i:08d}' for i in range(cfg['skus'])]
+    step('product_variants', ProductVariant, (
+        {
+            'id': variant_start + i, 'product_id': product_start + i // 2, 'sku': sku,
+            'feature_code': f'BK-{i // 2}-{"LR"[i % 2]}', 'specs': {}, 'quality_type': 'Aftermarket',
+            'is_active': True, 'safety_stock': rng.randint(0, 50),
+            'price': Decimal(rng.randint(1000, 50000)) / 100, 'cost_price': Decimal(rng.randint(500, 20000)) / 100,
+            'declared_name': PART_NAMES[i % len(PART_NAMES)], 'declared_unit': '个',
+        }
+        for i, sku in enumerate(skus)
+    ))
+    # 批量写入绕过了增量维护，list_skus?q= 的基准需要搜索文档
+    started = time.perf_counter()
+    counts['search_documents'] = ProductSearchService.reindex_batches(range(product_start, product_start + spu_count))
+    echo(f"  search_documents: {counts['search_documents']:,} 行 ({time.perf_counter() - started:.1f}s)")
+
+    # 3. 仓库 (约 1/4 为第三方仓) 与库存余额
+    warehouse_start = _next_id(Warehouse)
+    warehouse_ids = [warehouse_start + i for i in range(cfg['warehouses'])]
+    step('warehouses', Warehouse, (
+        {
+            'id': wid, 'code': f'BK-WH-{wid}', 'name': f'基准仓库{wid}', 'category': 'physical',
+            'location_type': 'overseas' if i % 2 else 'domestic',
+            'ownership_type': 'third_party' if i % 4 == 3 else 'self',
+            'status': 'active', 'business_type': 'standard', 'currency': 'USD', 'timezone': 'UTC',
+            'created_at': now, 'updated_at': now,
+        }
+        for i, wid in enumerate(warehouse_ids)
+    ))
+
+    def stock_rows():
+        row_id = _next_id(WarehouseStock)
+        for sku in skus:
+            for wid in rng.sample(warehouse_ids, 2):
+                physical = rng.randint(0, 500)
+                allocated = rng.randint(0, physical)
+                yield {
+                    'id': row_id, 'sku': sku, 'warehouse_id': wid, 'physical_quantity': physical,
+                    'available_quantity': physical - allocated, 'allocated_quantity': allocated,
+                    'in_transit_quantity': rng.randint(0, 100), 'damaged_quantity': 0, 'version': 0,
+                }
+                row_id += 1
+    step('stocks', WarehouseStock, stock_rows())
+
+    def movement_rows():
+        row_id = _next_id(WarehouseStockMovement)
+        for i in range(cfg['movements']):
+            order_type = rng.choice(ORDER_TYPES)
+            biz_time = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            yield {
+                'id': row_id + i, 'sku': rng.choice(skus), 'warehouse_id': rng.choice(warehouse_ids),
+                'order_type': order_type, 'order_no': f'BK-MV-{(row_id + i) // 5}',
+                'biz_time': biz_time, 'quantity_delta': rng.randint(1, 50) * (-1 if order_type == 'outbound' else 1),
+                'unit_cost': Decimal(rng.randint(500, 20000)) / 100, 'currency': 'CNY',
+                'exchange_rate': Decimal('1.0000'), 'created_at': biz_time, 'status': 'confirmed',
+            }
+    step('stock_movements', WarehouseStockMovement, movement_rows())
+
+    # 4. 报关单 + 明细，及可完整匹配的进项发票
+    decl_start, item_start = _next_id(CustomsDeclaration), _next_id(CustomsDeclarationItem)
+    invoice_start, invoice_item_start = _next_id(TaxInvoice), _next_id(TaxInvoiceItem)
+    declarations, items, invoices, invoice_items = [], [], [], []
+    for d in range(cfg['declarations']):
+        decl_id, invoice_id = decl_start + d, invoice_start + d
+        fob_total = Decimal(0)
+        for n in range(5):
+            index = rng.randrange(len(skus))
+            qty = Decimal(rng.randint(10, 200))
+            price = Decimal(rng.randint(200, 5000)) / 100
+            fob_total += qty * price
+            item_id = item_start + d * 5 + n
+            name = PART_NAMES[index % len(PART_NAMES)]
+            items.append({
+                'id': item_id, 'declaration_id': decl_id, 'product_id': product_start + index // 2,
+                'item_no': n + 1, 'sku': skus[index], 'product_name_spec': name, 'qty': qty, 'unit': '个',
+                'usd_unit_price': price, 'usd_total': qty * price,
+            })
+            invoice_items.append({
+                'id': invoice_item_start + d * 5 + n, 'invoice_id': invoice_id, 'name': name, 'unit': '个',
+                'qty': qty, 'price': price * 7, 'total': qty * price * 7, 'remaining_qty': qty,
+            })
+        declarations.append({
+            'id': decl_id, 'pre_entry_no': f'BK-PRE-{decl_id}', 'status': 'draft',
+            'export_date': date.today() - timedelta(days=rng.randint(0, 365)), 'destination_country': 'US',
+            'fob_total': fob_total, 'currency': 'USD', 'exchange_rate': Decimal('7.1000'),
+            'source_type': 'manual', 'container_mode': 'FCL', 'version': 1, 'is_locked': False,
+        })
+        invoices.append({
+            'id': invoice_id, 'invoice_code': '4400000000', 'invoice_no': f'BK-INV-{invoice_id}',
+            'amount_total': fob_total * 7, 'tax_amount': fob_total * 7 * Decimal('0.13'), 'status': 'free',
+        })
+    step('customs_declarations', CustomsDeclaration, declarations)
+    step('customs_declaration_items', CustomsDeclarationItem, items)
+    step('tax_invoices', TaxInvoice, invoices)
+    step('tax_invoice_items', TaxInvoiceItem, invoice_items)
+
+    # 5. 发货单 + 明细 (COPY 不走 ORM 默认值，非空列需显式给出)
+    company = SysCompany(legal_name=f'基准发货公司{_next_id(SysCompany)}')
+    db.session.add(company)
+    db.session.flush()
+    shipment_start, shipment_item_start = _next_id(ShipmentOrder), _next_id(ShipmentOrderItem)
+    shipments, shipment_items = [], []
+    for i in range(cfg['declarations']):
+        shipment_id = shipment_start + i
+        shipments.append({
+            'id': shipment_id, 'shipment_no': f'BK-SH-{shipment_id}', 'source': 'manual',
+            'status': rng.choice(['draft', 'shipped', 'completed']), 'shipper_company_id': company.id,
+            'consignee_name': f'Consignee {i % 50}', 'consignee_country': 'US',
+            'destination_warehouse_id': rng.choice(warehouse_ids), 'shipping_method': rng.choice(['sea', 'air']),
+            'estimated_ship_date': date.today() + timedelta(days=rng.randint(0, 60)),
+            'total_packages': rng.randint(1, 40), 'total_gross_weight': Decimal(rng.randint(100, 90000)) / 100,
+            'currency': 'USD', 'freight_cost': Decimal(rng.randint(1000, 200000)) / 100,
+            'is_factory_direct': False, 'is_declared': False, 'is_contracted': False,
+            'created_at': now - timedelta(minutes=i),
+        })
+        for n in range(5):
+            index = rng.randrange(len(skus))
+            qty = Decimal(rng.randint(10, 200))
+            price = Decimal(rng.randint(200, 5000)) / 100
+            shipment_items.append({
+                'id': shipment_item_start + i * 5 + n, 'shipment_id': shipment_id,
+                'product_id': product_start + index // 2, 'sku': skus[index],
+                'product_name': PART_NAMES[index % len(PART_NAMES)], 'quantity': qty, 'unit': 'PCS',
+                'unit_price': price, 'total_price': qty * price,
+            })
+    step('shipment_orders', ShipmentOrder, shipments)
+    step('shipment_order_items', ShipmentOrderItem, shipment_items)
+
+    db.session.commit()
+    return counts
+
+
+@bench_cli.command('seed')
+@click.option('--scale', default='small', type=click.Choice(list(SCALES)), help='数据量级 (large 为生产规模)')
+@click.option('--seed', default=42, show_default=True, help='随机种子 (相同种子数据分布一致)')
+def seed_cmd(scale, seed):
+    """【性能基准】批量生成大规模数据 (PostgreSQL 使用 COPY)"""
+    cfg = SCALES[scale]
+    click.secho(
+        f"🛠️  生成基准数据 ({scale}: {cfg['skus']:,} SKU / {cfg['movements']:,} 库存流水 / "
+        f"{cfg['declarations']:,} 报关单)...", fg='green', bold=True
+    )
+    started = time.perf_counter()
+    try:
+        seed_benchmark_data(scale, seed, echo=click.echo)
+    except Exception as e:
+        db.session.rollback()
+        click.secho(f'\n❌ 生成过程中发生错误: {e}', fg='red')
+        raise
+    click.secho(f'\n✨ 基准数据生成完成 ({time.perf_counter() - started:.1f}s)', fg='green')
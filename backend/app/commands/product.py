@@ -647,6 +647,7 @@ def seed_products_cmd(count, clear):
     
     # 模拟的外部参考码品牌
     ref_brands = ['Toyota', 'Honda', 'BMW', 'Bosch', 'Valeo', 'Denso', 'TRW']
+    seeded_ids = []
     
     for i in range(count):
         cat = random.choice(leaf_categories)
@@ -724,6 +725,7 @@ def seed_products_cmd(count, clear):
         )
         db.session.add(spu)
         db.session.flush() # Get SPU ID
+        seeded_ids.append(spu.id)
         
         # --- 3. Generate Variants (Dual Track) ---
         # Variants: Left/Right (Position) or Colors
@@ -775,7 +777,11 @@ def seed_products_cmd(count, clear):
             click.echo(f"已生成 {i+1}/{count} SPU...")
 
     db.session.commit()
-    click.echo(f"✅ 成功生成 {count} 条 SPU 数据及其关联数据 (双轨制)！")
+
+    # 造数未经 ProductService，单独重建搜索文档 (否则 list_skus?q= 搜不到)
+    from app.services.product_search_service import ProductSearchService
+    indexed = ProductSearchService.reindex_batches(seeded_ids)
+    click.echo(f"✅ 成功生成 {count} 条 SPU 数据及其关联数据 (双轨制)！搜索文档 {indexed} 条")
 
 @click.command('check-db')
 def check_db_cmd():
@@ -789,7 +795,55 @@ def check_db_cmd():
         roots = db.session.query(ProductVehicle).filter(ProductVehicle.parent_id.is_(None)).all()
         click.echo(f"Root nodes: {[r.name for r in roots]}")
 
+@click.command('import-vehicles')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=2000, show_default=True, help='每批 flush 的新节点数')
+def import_vehicles_cmd(path, batch_size):
+    """流式导入 eBay Master Vehicle List (CSV/TSV: Make, Model, Year)"""
+    from app.services.vehicle_index import import_vehicle_master_list
+
+    with open(path, 'rb') as f:
+        stats = import_vehicle_master_list(f, batch_size=batch_size)
+    click.echo(
+        f"✅ 导入完成: {stats['rows']} 行, 新增 make={stats['make']}, model={stats['model']}, "
+        f"year={stats['year']}, 跳过 {stats['skipped']} 行"
+    )
+
+@click.command('reindex-search')
+@click.option('--batch-size', default=500, show_default=True, help='每批重建的 SPU 数')
+def reindex_search_cmd(batch_size):
+    """全量重建商品搜索文档 (product_search_documents)"""
+    from app.services.product_search_service import ProductSearchService
+
+    total = ProductSearchService.reindex_all(batch_size=batch_size)
+    click.echo(f"✅ 搜索索引重建完成: {total} 条文档")
+
+@click.command('ensure-facet-indexes')
+def ensure_facet_indexes_cmd():
+    """为 SKU 作用域规格属性创建 specs 表达式索引 (PostgreSQL)"""
+    from app.services.product_facet_service import ProductFacetService
+
+    created = ProductFacetService.ensure_spec_indexes()
+    click.echo(f"✅ 已确保 {len(created)} 个规格索引: {', '.join(created) or '-'}")
+
+@click.command('seed-sku-serials')
+@click.option('--prefix', default=None, help='仅修复指定前缀')
+@click.option('--width', default=5, show_default=True, help='流水号位数 (配合 --prefix)')
+def seed_sku_serials_cmd(prefix, width):
+    """按现有 SKU 播种/修复 SKU 流水号计数器"""
+    from app.services.sku_generator import seed_serial_counters
+
+    targets = [(prefix, width)] if prefix else None
+    result = seed_serial_counters(targets)
+    for p, w, last_value in result:
+        click.echo(f"  {p} ({w}位): {last_value}")
+    click.echo(f"✅ 已修复 {len(result)} 个流水号计数器")
+
 product_cli.add_command(seed_vehicles_cmd)
+product_cli.add_command(import_vehicles_cmd)
+product_cli.add_command(reindex_search_cmd)
+product_cli.add_command(ensure_facet_indexes_cmd)
+product_cli.add_command(seed_sku_serials_cmd)
 product_cli.add_command(seed_categories_cmd)
 product_cli.add_command(fix_categories_cmd)
 product_cli.add_command(seed_products_cmd)
@@ -0,0 +1,149 @@
+import os
+import statistics
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.profiling import get_profile_store, measure_startup, strip_line_numbers
+
+profile_cli = AppGroup('profile', help='请求采样分析 (collapsed stacks)')
+
+
+def _select(store, path=None, endpoint=None, since=None, limit=None):
+    items = store.list()
+    if path:
+        items = [m for m in items if path in m.get('path', '')]
+    if endpoint:
+        items = [m for m in items if m.get('endpoint') == endpoint]
+    if since:
+        items = [m for m in items if m.get('created_at', '') >= since]
+    return items[:limit] if limit else items
+
+
+@profile_cli.command('list')
+@click.option('--path', default=None, help='按路径包含匹配')
+@click.option('--endpoint', default=None, help='按 endpoint 精确匹配')
+@click.option('--since', default=None, help='起始时间 (ISO 格式，如 2024-01-01T08:00)')
+@click.option('--limit', default=50, show_default=True)
+def list_cmd(path, endpoint, since, limit):
+    """列出已采集的请求 (按时间倒序)"""
+    items = _select(get_profile_store(current_app), path, endpoint, since, limit)
+    if not items:
+        click.echo('暂无采样记录')
+        return
+    for m in items:
+        click.echo(
+            f"{m['id']}  {m['created_at']}  {m['method']:<6} {m['path']}  "
+            f"{m['status']}  {m['duration_ms']}ms  {m['samples']} samples"
+        )
+
+
+@profile_cli.command('show')
+@click.argument('profile_id')
+@click.option('--top', default=20, show_default=True, help='输出自身耗时最高的 N 个函数')
+def show_cmd(profile_id, top):
+    """按叶子函数 (自身耗时) 汇总单个请求"""
+    store = get_profile_store(current_app)
+    try:
+        stacks = strip_line_numbers(store.load(profile_id))
+    except FileNotFoundError:
+        raise click.ClickException(f'采样 {profile_id} 不存在')
+    total = sum(stacks.values()) or 1
+    leaves = {}
+    for stack, count in stacks.items():
+        leaf = stack.rsplit(';', 1)[-1]
+        leaves[leaf] = leaves.get(leaf, 0) + count
+    for leaf, count in sorted(leaves.items(), key=lambda x: -x[1])[:top]:
+        click.echo(f"{count * 100 / total:6.1f}%  {count:>6}  {leaf}")
+
+
+@profile_cli.command('aggregate')
+@click.argument('profile_ids', nargs=-1)
+@click.option('--path', default=None, help='按路径包含匹配')
+@click.option('--endpoint', default=None, help='按 endpoint 精确匹配')
+@click.option('--since', default=None, help='起始时间 (ISO 格式)')
+@click.option('--keep-lines', is_flag=True, help='保留行号 (默认按函数合并)')
+@click.option('-o', '--output', default=None, help='输出文件，默认输出到终端')
+def aggregate_cmd(profile_ids, path, endpoint, since, keep_lines, output):
+    """
+    合并多个请求的 collapsed stacks，可直接交给 flamegraph.pl / speedscope
+
+        flask profile aggregate --endpoint customs.declaration_import -o import.folded
+        flamegraph.pl import.folded > import.svg
+    """
+    store = get_profile_store(current_app)
+    ids = list(profile_ids) or [m['id'] for m in _select(store, path, endpoint, since)]
+    if not ids:
+        raise click.ClickException('没有匹配的采样记录')
+    try:
+        stacks = store.aggregate(ids)
+    except FileNotFoundError as e:
+        raise click.ClickException(f'采样文件不存在: {e.filename}')
+    if not keep_lines:
+        stacks = strip_line_numbers(stacks)
+    lines = [f'{stack} {count}' for stack, count in stacks.most_common()]
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        click.echo(f'已合并 {len(ids)} 个采样 ({sum(stacks.values())} samples) -> {output}')
+    else:
+        click.echo('\n'.join(lines))
+
+
+@profile_cli.command('clean')
+@click.option('--before', default=None, help='删除该时间之前的采样 (ISO 格式)，默认全部')
+def clean_cmd(before):
+    """删除采样文件"""
+    store = get_profile_store(current_app)
+    items = [m for m in store.list() if not before or m.get('created_at', '') < before]
+    for m in items:
+        store.remove(m['id'])
+    click.echo(f'已删除 {len(items)} 个采样')
+
+
+# 各进程类型启动时的环境变量
+STARTUP_PROCESS_ENV = {
+    'web': {'APP_PROCESS_TYPE': 'web', 'LOAD_API_BLUEPRINTS': 'true'},
+    'celery': {'APP_PROCESS_TYPE': 'celery', 'LOAD_API_BLUEPRINTS': 'auto'},
+    'cli': {'APP_PROCESS_TYPE': 'cli', 'LOAD_API_BLUEPRINTS': 'false'},
+}
+
+
+@profile_cli.command('startup')
+@click.option('--process', 'process_type', type=click.Choice(list(STARTUP_PROCESS_ENV)), default='web',
+              show_default=True, help='按该进程类型启动 (cli 为不注册路由的 flask 子命令)')
+@click.option('--repeat', default=3, show_default=True, help='重复次数，取中位数')
+@click.option('--top', default=20, show_default=True, help='输出累计导入耗时最高的 N 个模块')
+@click.option('--target', type=float, default=None, help='冷启动目标 (秒)，默认 STARTUP_TARGET_SECONDS')
+def startup_cmd(process_type, repeat, top, target):
+    """
+    测量 create_app() 冷启动耗时与导入耗时 (python -X importtime)
+
+    超过目标或启动时导入了重量级依赖 (pandas / weasyprint / openpyxl ...) 时以非零状态退出，可用于 CI。
+    """
+    cwd = os.path.dirname(current_app.root_path)
+    env = STARTUP_PROCESS_ENV[process_type]
+    try:
+        runs = [measure_startup(env=env, cwd=cwd) for _ in range(max(repeat, 1))]
+        detail = measure_startup(env=env, cwd=cwd, importtime=True)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    timings = sorted(run['seconds'] for run in runs)
+    imports = detail['imports']
+    click.echo(f"create_app() [{process_type}]  median {statistics.median(timings):.2f}s  "
+               f"min {timings[0]:.2f}s  max {timings[-1]:.2f}s  ({len(imports)} modules)")
+    click.echo(f"{'cumulative':>12}{'self':>10}  module")
+    top_level = [item for item in imports if item['depth'] == 0]
+    for item in sorted(top_level, key=lambda x: -x['cumulative_us'])[:top]:
+        click.echo(f"{item['cumulative_us'] / 1000:>10.1f}ms{item['self_us'] / 1000:>8.1f}ms  {item['module']}")
+
+    problems = []
+    heavy = detail['heavy']
+    if heavy:
+        problems.append(f"启动时导入了重量级依赖: {', '.join(heavy)}")
+    target = target if target is not None else current_app.config.get('STARTUP_TARGET_SECONDS', {}).get(process_type)
+    if target and statistics.median(timings) > target:
+        problems.append(f'冷启动 {statistics.median(timings):.2f}s 超过目标 {target:.2f}s')
+    if problems:
+        raise click.ClickException('; '.join(problems))
+    click.echo('OK' + (f' (目标 {target:.2f}s)' if target else ''))
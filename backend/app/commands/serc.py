@@ -193,6 +193,15 @@ def seed_invoices_cmd(count, clear):
     click.echo(f"✅ 成功生成 {count} 条进项发票数据")
 
 
+@click.command('repair-invoice-remaining')
+def repair_invoice_remaining_cmd():
+    """按匹配记录修复发票明细剩余数量 (remaining_qty) 及发票状态"""
+    from app.services.serc.tax_refund_service import tax_refund_service
+
+    fixed = tax_refund_service.repair_remaining_qty()
+    click.echo(f"✅ 已修复 {fixed} 条发票明细剩余数量")
+
 serc_cli.add_command(seed_soas_cmd)
 serc_cli.add_command(seed_pool_cmd)
 serc_cli.add_command(seed_invoices_cmd)
+serc_cli.add_command(repair_invoice_remaining_cmd)
@@ -611,7 +611,51 @@ def seed_hscodes_cmd(clear):
     click.echo("✅ HS Code 模拟数据生成完成！")
 
 # 注册到 Group
+@click.command('audit-sequences')
+@click.option('--date', 'date_str', default=None, help='审计日期 YYYYMMDD，默认今天')
+def audit_sequences_cmd(date_str):
+    """业务单号断号/重号审计 (应付单/物流对账单/发货单)"""
+    from datetime import datetime
+    from app.models.serc.payable import FinPayable
+    from app.models.logistics.logistics_statement import LogisticsStatement
+    from app.models.logistics.shipment import ShipmentOrder
+    from app.services.sequence_service import SequenceService
+
+    day = date_str or datetime.now().strftime('%Y%m%d')
+    targets = [
+        ('应付单', FinPayable.payable_no, f"AP{day}"),
+        ('物流对账单', LogisticsStatement.statement_no, f"LS{day}"),
+        ('发货单', ShipmentOrder.shipment_no, f"SH-{day}-"),
+    ]
+    for label, column, prefix in targets:
+        result = SequenceService.audit(column, prefix)
+        status = '⚠️' if result['duplicates'] or result['behind'] else '✅'
+        click.echo(
+            f"{status} {label} {prefix}: 共 {result['count']} 条, 最大 {result['max']}, "
+            f"计数器 {result['counter']}, 断号 {len(result['gaps'])}, 重号 {len(result['duplicates'])}"
+        )
+        if result['duplicates']:
+            click.echo(f"    重号: {', '.join(result['duplicates'])}")
+        if result['behind']:
+            click.echo("    计数器落后于现有单号，下次取号会重号，请检查")
+
+@click.command('bump-resource')
+@click.argument('names', nargs=-1)
+def bump_resource_cmd(names):
+    """递增资源版本，使条件请求缓存失效 (绕过 ORM 直接改库后使用，不带参数时递增全部资源)"""
+    from app.http_cache import RESOURCE_TABLES, bump_resource_versions, resource_versions
+
+    unknown = [name for name in names if name not in RESOURCE_TABLES]
+    if unknown:
+        raise click.BadParameter(f"未知资源: {', '.join(unknown)} (可选: {', '.join(RESOURCE_TABLES)})")
+    names = list(names or RESOURCE_TABLES)
+    bump_resource_versions(names)
+    db.session.commit()
+    for name, version in resource_versions(names).items():
+        click.echo(f"✅ {name}: {version}")
+
 system_cli.add_command(seed_system_dicts_cmd)
 system_cli.add_command(seed_companies_cmd)
 system_cli.add_command(seed_hscodes_cmd)
-
+system_cli.add_command(audit_sequences_cmd)
+system_cli.add_command(bump_resource_cmd)
@@ -0,0 +1,62 @@
+"""
+JSON 响应压缩 (按请求的 Accept-Encoding 协商 br / gzip)
+
+- 只压缩 200 的 application/json 且长度 >= COMPRESS_MIN_SIZE 的响应；
+  流式 / 文件下载 (direct_passthrough)、已带 Content-Encoding 的响应不处理
+- brotli 为可选依赖，未安装时只协商 gzip
+- 始终加 Vary: Accept-Encoding，避免中间缓存把压缩体返回给不支持的客户端
+- 前置 Nginx 已开启 gzip 时可设 COMPRESS_ENABLED=false 关闭
+"""
+import gzip
+from flask import Flask, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 为可选依赖
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json',)
+
+
+def _encode(body: bytes, encoding: str, config) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=config.get('COMPRESS_BR_LEVEL', 4))
+    return gzip.compress(body, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0)
+
+
+def negotiate_encoding(accept_encodings) -> str:
+    """按客户端 q 值选择编码 (br 优先于同等权重的 gzip)，不支持时返回空串"""
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = '', 0
+    for encoding in supported:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionExtension:
+    """Flask 扩展: compression_ext.init_app(app)，在 after_request 中压缩响应体"""
+
+    def init_app(self, app: Flask):
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+        @app.after_request
+        def compress_response(response):
+            if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+                return response
+            response.vary.add('Accept-Encoding')
+            if (response.status_code != 200 or response.direct_passthrough
+                    or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+                return response
+            encoding = negotiate_encoding(request.accept_encodings)
+            if not encoding:
+                return response
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            response.set_data(_encode(body, encoding, app.config))
+            response.headers['Content-Encoding'] = encoding
+            return response
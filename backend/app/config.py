@@ -4,6 +4,13 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # 共享 Redis 连接池 (app.extensions['redis'])
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '50'))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '2'))
+    REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', '1'))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', '30'))
+    REDIS_BREAKER_THRESHOLD = int(os.getenv('REDIS_BREAKER_THRESHOLD', '5'))
+    REDIS_BREAKER_COOLDOWN = float(os.getenv('REDIS_BREAKER_COOLDOWN', '30'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Celery Defaults
@@ -31,8 +38,113 @@ class Config:
     LINGXING_TIMEOUT = int(os.getenv('LINGXING_TIMEOUT', '30'))
     LINGXING_MAX_RETRIES = int(os.getenv('LINGXING_MAX_RETRIES', '3'))
 
+    # === 车型索引缓存 (秒) ===
+    VEHICLE_INDEX_TTL = int(os.getenv('VEHICLE_INDEX_TTL', '300'))
+
+    # === SKU 流水号分配 (db: 计数器表行锁自增; redis: INCRBY 快速路径，失败回退 db) ===
+    SKU_SERIAL_BACKEND = os.getenv('SKU_SERIAL_BACKEND', 'db')
+
+    # === 业务单号 (db: 计数器表原子自增; redis: INCRBY 快速路径并同步推进计数器表，失败回退 db) ===
+    SEQUENCE_BACKEND = os.getenv('SEQUENCE_BACKEND', 'db')
+    # 每进程预分配号段大小，>1 时批量取号 (会产生空号)
+    SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '1'))
+
+    # === 报关单 Excel 导入 ===
+    # 上传文件暂存目录 (后台导入时需 Web 与 Celery worker 共享)
+    CUSTOMS_IMPORT_DIR = os.getenv('CUSTOMS_IMPORT_DIR', '/tmp/customs_imports')
+    # 超过该大小 (字节) 的文件自动转后台任务导入
+    CUSTOMS_IMPORT_ASYNC_BYTES = int(os.getenv('CUSTOMS_IMPORT_ASYNC_BYTES', str(1024 * 1024)))
+
+    # === 合同批量打印 (PDF) ===
+    # 后台任务的渲染进程数 (WeasyPrint 为 CPU 密集型，默认取 CPU 核数；1 表示不启用进程池)
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(os.cpu_count() or 1)))
+    # Web 请求内同步打印的渲染进程数 (每个 gunicorn worker 各自创建，保持很小；1 表示串行)
+    PDF_WEB_RENDER_WORKERS = int(os.getenv('PDF_WEB_RENDER_WORKERS', '2'))
+    # 后台打印结果目录 (需 Web 与 Celery worker 共享)
+    PDF_EXPORT_DIR = os.getenv('PDF_EXPORT_DIR', '/tmp/contract_pdfs')
+    # 分组 (主体+供应商) 数超过该值时转后台任务
+    PDF_ASYNC_GROUPS = int(os.getenv('PDF_ASYNC_GROUPS', '20'))
+
+    # === 请求级 SQL 统计 / N+1 检测 ===
+    SQL_STATS_ENABLED = os.getenv('SQL_STATS_ENABLED', 'true').lower() == 'true'
+    # 同一归一化语句在一个请求内执行超过该次数即视为疑似 N+1
+    SQL_NPLUS1_THRESHOLD = int(os.getenv('SQL_NPLUS1_THRESHOLD', '5'))
+    # 响应头输出 X-SQL-* (仅开发调试)
+    SQL_STATS_HEADERS = os.getenv('SQL_STATS_HEADERS', 'false').lower() == 'true'
+    # 语句数达到该值时即使无 N+1 也记录日志
+    SQL_STATS_LOG_MIN_QUERIES = int(os.getenv('SQL_STATS_LOG_MIN_QUERIES', '50'))
+
+    # === Prometheus 指标 (/metrics) ===
+    # 多进程部署需设置环境变量 PROMETHEUS_MULTIPROC_DIR (见 gunicorn.conf.py)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # 非空时 /metrics 需携带 Authorization: Bearer <token>
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # 需要上报长度的 Celery 队列 (逗号分隔，Redis broker)
+    METRICS_CELERY_QUEUES = os.getenv('METRICS_CELERY_QUEUES', 'celery')
+
+    # === 按需采样分析 (flask profile list/aggregate) ===
+    # 开启后管理员可通过 X-Profile: 1 请求头或 ?__profile=1 对单个请求采样
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+    # 随机采样比例 (0~1，0 表示仅按需)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    # 采样间隔 (秒)
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+    # collapsed stacks 保存目录，默认 backend/logs/profiles
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+    # === 启动 (flask profile startup) ===
+    # 是否注册 API 蓝图: auto 时 Celery 进程与不需要路由表的 flask 子命令跳过路由模块导入
+    LOAD_API_BLUEPRINTS = os.getenv('LOAD_API_BLUEPRINTS', 'auto')
+    # 各进程类型 create_app() 冷启动目标 (秒)
+    STARTUP_TARGET_SECONDS = {
+        'web': float(os.getenv('STARTUP_TARGET_WEB', '2.5')),
+        'celery': float(os.getenv('STARTUP_TARGET_CELERY', '2.0')),
+        'cli': float(os.getenv('STARTUP_TARGET_CLI', '2.0')),
+    }
+
+    # === 数据库连接池 / 语句超时 / 只读副本 ===
+    # 进程类型 (web / celery / cli)，未设置时按启动命令识别；仅 PostgreSQL 生效
+    APP_PROCESS_TYPE = os.getenv('APP_PROCESS_TYPE')
+    DB_POOL_OPTIONS = {
+        'web': {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+        'celery': {
+            'pool_size': int(os.getenv('CELERY_DB_POOL_SIZE', '2')),
+            'max_overflow': int(os.getenv('CELERY_DB_MAX_OVERFLOW', '4')),
+            'pool_timeout': int(os.getenv('CELERY_DB_POOL_TIMEOUT', '30')),
+        },
+    }
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = True
+    # 默认语句超时 (毫秒，0 表示不限)，接口可用 @statement_timeout(ms) 覆盖
+    DB_STATEMENT_TIMEOUT = {
+        'web': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000')),
+        'celery': int(os.getenv('CELERY_DB_STATEMENT_TIMEOUT_MS', '600000')),
+        # flask 子命令 (迁移、重建索引、造数) 可能远超接口时限，默认不限
+        'cli': int(os.getenv('CLI_DB_STATEMENT_TIMEOUT_MS', '0')),
+    }
+    # 只读副本 (为空则全部走主库)；@read_replica 标记的接口读查询走副本
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    # 用户写入后 N 秒内的读请求仍走主库 (读己之写)
+    DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+    # === 条件请求 (ETag) / 响应压缩 ===
+    # 字典、类目树、车型树、权限树等接口按资源版本返回弱 ETag，If-None-Match 命中返回 304
+    HTTP_ETAG_ENABLED = os.getenv('HTTP_ETAG_ENABLED', 'true').lower() == 'true'
+    # 参与 ETag 计算的发布标识 (建议设为部署版本/提交号，接口结构变化后旧缓存失效)
+    HTTP_ETAG_SALT = os.getenv('HTTP_ETAG_SALT', os.getenv('APP_RELEASE', ''))
+    # JSON 响应按 Accept-Encoding 协商 br / gzip (前置 Nginx 已压缩时可关闭)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', '4'))
+
 class DevelopmentConfig(Config):
     DEBUG = True
+    SQL_STATS_HEADERS = os.getenv('SQL_STATS_HEADERS', 'true').lower() == 'true'
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     
     # 开发环境：使用 /serc_files/dev 目录
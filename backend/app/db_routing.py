@@ -0,0 +1,300 @@
+"""
+数据库引擎调优与读写路由
+
+- 连接池按进程类型 (web / celery / cli) 分别配置 pool_size / max_overflow / pool_timeout，
+  统一开启 pre_ping、recycle，PostgreSQL 连接附带 application_name 与默认 statement_timeout
+  (flask 子命令如 db upgrade、reindex-search 为 cli，默认不限时)
+- 接口级语句超时: @statement_timeout(ms)，在事务开始时 SET LOCAL statement_timeout
+- 只读副本: 配置 DATABASE_REPLICA_URL 后，标记 @read_replica 的列表/报表接口读查询走副本，
+  写入 (flush / INSERT / UPDATE / DELETE) 始终走主库
+- 读己之写: 请求内发生写入后，本请求后续查询回主库；该用户在 DB_REPLICA_STICKY_SECONDS 内的
+  读请求也不走副本 (Redis 记录，Redis 不可用时退化为进程内记录)
+
+Celery 任务 / 脚本中可用 using_replica()、using_statement_timeout(ms) 上下文管理器。
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from flask import Flask, current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+REPLICA_EXTENSION = 'db_replica'
+STICKY_KEY = 'db:sticky:{}'
+# 导出类接口的语句超时 (毫秒)
+EXPORT_STATEMENT_TIMEOUT_MS = 120000
+
+_use_replica: ContextVar[bool] = ContextVar('db_use_replica', default=False)
+_statement_timeout: ContextVar[Optional[int]] = ContextVar('db_statement_timeout', default=None)
+
+# Redis 不可用时的进程内读己之写记录 {用户标识: 过期时间}
+_local_sticky = {}
+_local_sticky_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# 引擎参数
+# ---------------------------------------------------------------------------
+
+def detect_process_type(argv=None) -> str:
+    """
+    APP_PROCESS_TYPE 优先，否则按启动命令识别:
+    celery worker/beat 为 celery，flask run 以外的 flask 子命令为 cli，其余为 web
+    """
+    explicit = os.getenv('APP_PROCESS_TYPE')
+    if explicit:
+        return explicit
+    from app.api import _flask_command
+
+    argv = sys.argv if argv is None else argv
+    if 'celery' in os.path.basename(argv[0] if argv else ''):
+        return 'celery'
+    command = _flask_command(argv)
+    return 'cli' if command and command != 'run' else 'web'
+
+
+def build_engine_options(uri: str, config, process_type: str) -> dict:
+    """按进程类型生成 SQLALCHEMY_ENGINE_OPTIONS (非 PostgreSQL 保持 SQLAlchemy 默认)"""
+    if make_url(uri).get_backend_name() != 'postgresql':
+        return {}
+    pools = config.get('DB_POOL_OPTIONS') or {}
+    options = {
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        **pools.get(process_type, pools.get('web', {})),
+    }
+    timeouts = config.get('DB_STATEMENT_TIMEOUT') or {}
+    timeout = timeouts.get(process_type, timeouts.get('web', 0))
+    connect_args = {'application_name': f'is-admin-{process_type}'}
+    if timeout:
+        connect_args['options'] = f'-c statement_timeout={int(timeout)}'
+    options['connect_args'] = connect_args
+    return options
+
+
+def configure_database(app: Flask):
+    """生成主库引擎参数，须在 db.init_app 之前调用；显式配置的 SQLALCHEMY_ENGINE_OPTIONS 优先"""
+    process_type = app.config.get('APP_PROCESS_TYPE') or detect_process_type()
+    app.config['APP_PROCESS_TYPE'] = process_type
+
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if uri:
+        options = build_engine_options(uri, app.config, process_type)
+        options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def create_replica_engine(app: Flask) -> Optional[Engine]:
+    """
+    副本引擎 (app.extensions['db_replica'])。
+    不注册为 SQLALCHEMY_BINDS：否则 db.create_all / drop_all 与迁移会把副本当作独立库处理。
+    """
+    url = app.config.get('DATABASE_REPLICA_URL')
+    if not url:
+        return None
+    options = build_engine_options(url, app.config, app.config.get('APP_PROCESS_TYPE') or detect_process_type())
+    sa_url = make_url(url)
+    if sa_url.get_backend_name() == 'sqlite' and sa_url.database in (None, '', ':memory:'):
+        options.update(poolclass=StaticPool, connect_args={'check_same_thread': False})
+    return create_engine(sa_url, **options)
+
+
+def get_replica_engine() -> Optional[Engine]:
+    return current_app.extensions.get(REPLICA_EXTENSION) if has_app_context() else None
+
+
+# ---------------------------------------------------------------------------
+# 路由 Session
+# ---------------------------------------------------------------------------
+
+class RoutingSession(Session):
+    """读查询在允许时路由到副本，写入与写入之后的查询始终走主库"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._replica_allowed(clause):
+            replica = get_replica_engine()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_allowed(self, clause) -> bool:
+        if not _use_replica.get() or self._flushing or self.info.get('wrote'):
+            return False
+        if isinstance(clause, UpdateBase):
+            return False
+        return not (has_request_context() and g.get('db_wrote'))
+
+
+def _mark_written(session):
+    session.info['wrote'] = True
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        _mark_written(session)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _on_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_written(orm_execute_state.session)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        _mark_sticky()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('wrote', None)
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _set_statement_timeout(session, transaction, connection):
+    timeout = _statement_timeout.get()
+    if timeout is not None and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+# ---------------------------------------------------------------------------
+# 读己之写
+# ---------------------------------------------------------------------------
+
+def _sticky_identity() -> Optional[str]:
+    # before_request 阶段 Token 尚未校验，需在此可选校验，保证写入/读取两侧取到同一身份
+    try:
+        from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return str(identity) if identity is not None else request.remote_addr
+
+
+def _mark_sticky():
+    seconds = current_app.config.get('DB_REPLICA_STICKY_SECONDS', 5)
+    identity = _sticky_identity()
+    if not seconds or not identity or get_replica_engine() is None:
+        return
+    from app.redis_client import get_redis
+    client = get_redis()
+    if client is not None:
+        try:
+            client.set(STICKY_KEY.format(identity), 1, ex=seconds)
+            return
+        except Exception as e:
+            logger.warning(f"Failed to record replica stickiness: {e}")
+    with _local_sticky_lock:
+        _local_sticky[identity] = time.monotonic() + seconds
+
+
+def _is_sticky() -> bool:
+    identity = _sticky_identity()
+    if not identity:
+        return False
+    from app.redis_client import get_redis
+    client = get_redis()
+    if client is not None:
+        try:
+            return bool(client.exists(STICKY_KEY.format(identity)))
+        except Exception as e:
+            logger.warning(f"Failed to read replica stickiness: {e}")
+    with _local_sticky_lock:
+        expires = _local_sticky.get(identity)
+        if expires is not None and expires < time.monotonic():
+            _local_sticky.pop(identity, None)
+            expires = None
+    return expires is not None
+
+
+# ---------------------------------------------------------------------------
+# 接口声明 / 上下文管理器
+# ---------------------------------------------------------------------------
+
+def read_replica(func):
+    """标记只读接口: 读查询可走副本 (须放在其他路由装饰器之下，紧贴函数定义)"""
+    func._db_read_replica = True
+    return func
+
+
+def statement_timeout(ms: int):
+    """接口级语句超时 (毫秒)，覆盖进程默认值"""
+    def decorator(func):
+        func._db_statement_timeout = ms
+        return func
+    return decorator
+
+
+@contextmanager
+def using_replica() -> Iterator[None]:
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def using_statement_timeout(ms: int) -> Iterator[None]:
+    """在该范围内开始的事务使用指定语句超时 (已开始的事务不受影响)"""
+    token = _statement_timeout.set(ms)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+
+def _view_option(name: str):
+    """取当前请求对应视图函数 (MethodView 取对应 HTTP 方法) 上的标记"""
+    view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+    if view is None:
+        return None
+    view_class = getattr(view, 'view_class', None)
+    if view_class is not None:
+        view = getattr(view_class, request.method.lower(), None)
+    return getattr(view, name, None)
+
+
+class DBRoutingExtension:
+    """Flask 扩展: db_routing_ext.init_app(app)，按视图标记设置本次请求的副本路由与语句超时"""
+
+    def init_app(self, app: Flask):
+        replica = create_replica_engine(app)
+        if replica is not None:
+            app.extensions[REPLICA_EXTENSION] = replica
+        has_replica = replica is not None
+
+        @app.before_request
+        def apply_db_options():
+            timeout = _view_option('_db_statement_timeout')
+            if timeout is not None:
+                g.db_timeout_token = _statement_timeout.set(timeout)
+            if has_replica and _view_option('_db_read_replica') and not _is_sticky():
+                g.db_replica_token = _use_replica.set(True)
+
+        @app.teardown_request
+        def reset_db_options(exc=None):
+            for name, var, default in (('db_timeout_token', _statement_timeout, None),
+                                       ('db_replica_token', _use_replica, False)):
+                token = g.pop(name, None)
+                if token is not None:
+                    try:
+                        var.reset(token)
+                    except ValueError:
+                        # 不同上下文中创建的 token (如流式响应)，直接恢复默认
+                        var.set(default)
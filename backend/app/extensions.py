@@ -4,5 +4,31 @@ from sqlalchemy.orm import DeclarativeBase
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+from app.db_routing import RoutingSession, DBRoutingExtension
 
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+db_routing_ext = DBRoutingExtension()
+
+from app.redis_client import RedisExtension
+
+redis_ext = RedisExtension()
+
+
+from app.sql_stats import SQLStatsExtension
+
+sql_stats_ext = SQLStatsExtension()
+
+from app.metrics import MetricsExtension
+
+metrics_ext = MetricsExtension()
+
+from app.profiling import ProfilingExtension
+
+profiling_ext = ProfilingExtension()
+
+from app.compression import CompressionExtension
+
+compression_ext = CompressionExtension()
+
+# 资源版本监听: 写入字典/类目/车型/权限时递增版本 (条件请求 ETag)
+from app import http_cache  # noqa: E402,F401
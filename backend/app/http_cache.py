@@ -0,0 +1,150 @@
+"""
+读多写少接口的条件请求 (ETag / If-None-Match -> 304)
+
+- 每类资源一个版本号，存放在 sys_sequences 计数器表 (键 resource:<名称>)，多进程共享
+- 写入时自动递增: Session flush 或 ORM 批量 INSERT/UPDATE/DELETE 涉及 RESOURCE_TABLES 中的表，
+  在同一事务内递增对应资源版本 (回滚则一起回滚)；绕过 ORM 的写入 (原始 SQL、外部脚本)
+  需调用 bump_resource_versions()，或执行 flask system bump-resource <名称>
+- 接口用 @conditional('dicts') 声明依赖的资源 (须放在 @output 之下，紧贴函数定义，
+  认证仍先于 304 判断)；ETag 由版本号拼出，不对响应体做哈希，命中时不查询也不序列化
+- 使用弱 ETag: 同一版本的 gzip / br / 未压缩响应语义相同，可互相校验
+"""
+import hashlib
+from functools import wraps
+from typing import Dict, Iterable, Optional
+from flask import Response, after_this_request, current_app, g, has_request_context, request
+from sqlalchemy import event, select
+from app.db_routing import RoutingSession
+
+# 资源 -> 决定其内容的表
+RESOURCE_TABLES = {
+    'dicts': ('sys_dictionaries',),
+    'categories': ('categories',),
+    'vehicles': ('product_vehicles',),
+    'permissions': ('permissions',),
+}
+RESOURCE_KEY = 'resource:{}'
+
+_table_resources: Dict[str, set] = {}
+for _resource, _tables in RESOURCE_TABLES.items():
+    for _table in _tables:
+        _table_resources.setdefault(_table, set()).add(_resource)
+
+
+# ---------------------------------------------------------------------------
+# 版本号
+# ---------------------------------------------------------------------------
+
+def resource_versions(resources: Iterable[str]) -> Dict[str, int]:
+    """读取资源版本 (请求内缓存，一次查询)；从未写入过的资源为 0"""
+    from app.extensions import db
+    from app.models.system import SysSequence
+
+    cache = g.setdefault('resource_versions', {}) if has_request_context() else {}
+    missing = [name for name in resources if name not in cache]
+    if missing:
+        rows = db.session.execute(
+            select(SysSequence.key, SysSequence.last_value)
+            .where(SysSequence.key.in_([RESOURCE_KEY.format(name) for name in missing]))
+        ).all()
+        found = {key: value for key, value in rows}
+        for name in missing:
+            cache[name] = found.get(RESOURCE_KEY.format(name), 0)
+    return {name: cache[name] for name in resources}
+
+
+def bump_resource_versions(resources: Iterable[str], connection=None):
+    """递增资源版本；connection 为空时使用当前会话 (随会话事务提交)"""
+    from app.extensions import db
+    from app.services.sequence_service import SequenceService
+
+    conn = connection if connection is not None else db.session
+    for name in sorted(set(resources)):
+        SequenceService._increment(conn, RESOURCE_KEY.format(name), 1, None)
+    if has_request_context():
+        g.pop('resource_versions', None)
+
+
+def _resources_for(tables: Iterable[str]) -> set:
+    resources = set()
+    for table in tables:
+        resources |= _table_resources.get(table, set())
+    return resources
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    tables = {getattr(type(obj), '__tablename__', None) for obj in (*session.new, *session.deleted)}
+    for obj in session.dirty:
+        # 只对资源表的对象检查是否真的有列变化 (批量导入时 dirty 可能很大)
+        table = getattr(type(obj), '__tablename__', None)
+        if table in _table_resources and table not in tables \
+                and session.is_modified(obj, include_collections=False):
+            tables.add(table)
+    resources = _resources_for(tables)
+    if resources:
+        bump_resource_versions(resources, session.connection())
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _bump_on_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    resources = _resources_for([mapper.local_table.name]) if mapper is not None else set()
+    if resources:
+        bump_resource_versions(resources, orm_execute_state.session.connection())
+
+
+# ---------------------------------------------------------------------------
+# ETag
+# ---------------------------------------------------------------------------
+
+def resource_etag(resources: Iterable[str]) -> Optional[str]:
+    """由资源版本拼出的 ETag 值 (不含 W/ 与引号)；HTTP_ETAG_ENABLED 关闭时返回 None"""
+    if not current_app.config.get('HTTP_ETAG_ENABLED', True):
+        return None
+    versions = resource_versions(resources)
+    # 发布版本参与计算: 接口结构变化但数据未变时也不会命中旧缓存
+    salt = f"{current_app.config.get('HTTP_ETAG_SALT') or ''}:{getattr(current_app, 'version', '')}"
+    prefix = hashlib.sha1(salt.encode()).hexdigest()[:8]
+    return prefix + '-' + '.'.join(f'{name}{versions[name]}' for name in versions)
+
+
+def _cache_headers(response: Response, etag: str) -> Response:
+    response.set_etag(etag, weak=True)
+    # 每次都需向服务端校验 (no-cache)，且只允许浏览器缓存 (private，响应依赖登录身份)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def conditional(*resources: str):
+    """
+    条件 GET: If-None-Match 命中当前 ETag 时直接返回 304，不执行视图
+
+        @bp.output(CategoryTreeSchema(many=True))
+        @conditional('categories')
+        def get_category_tree(): ...
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(*args, **kwargs)
+            etag = resource_etag(resources)
+            if etag is None:
+                return func(*args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                return _cache_headers(Response(status=304), etag)
+
+            @after_this_request
+            def add_etag(response):
+                if response.status_code == 200:
+                    _cache_headers(response, etag)
+                return response
+
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
@@ -1,8 +1,38 @@
+import atexit
+import copy
 import logging
 import logging.config
+import logging.handlers
 import os
 import json
+import queue
+import re
+import threading
+import uuid
+from contextvars import ContextVar
 from datetime import datetime
+from typing import List, Optional
+
+# 当前请求 ID (请求开始时设置，日志记录时由 RequestIdFilter 注入)
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+REQUEST_ID_HEADER = 'X-Request-ID'
+# 客户端传入的请求 ID 会回传响应头、写入每条日志和采样文件名，只接受有界的安全字符
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """将上下文中的请求 ID 写入 record.request_id (已显式传入 extra 的不覆盖)"""
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            request_id = request_id_var.get()
+            if request_id:
+                record.request_id = request_id
+        return True
+
 
 class JSONFormatter(logging.Formatter):
     """JSON 格式化器，用于结构化日志输出"""
@@ -24,8 +54,14 @@ class JSONFormatter(logging.Formatter):
             log_record['request_id'] = record.request_id
         if hasattr(record, 'ip_address'):
             log_record['ip_address'] = record.ip_address
+        if hasattr(record, 'sql'):
+            log_record['path'] = getattr(record, 'path', None)
+            log_record['sql'] = record.sql
         if record.exc_info:
             log_record['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # 经队列转发的记录异常已提前格式化为 exc_text
+            log_record['exception'] = record.exc_text
             
         return json.dumps(log_record, ensure_ascii=False)
 
@@ -33,13 +69,21 @@ class JSONFormatter(logging.Formatter):
 class AliyunSLSHandler(logging.Handler):
     """
     阿里云日志服务 Handler（预留接口）
-    
+
+    记录先缓存在内存中，满 batch_size 条或距上次发送超过 flush_interval 秒时批量 put_logs，
+    避免每条日志一次网络请求。异步日志开启时 emit 运行在 QueueListener 线程。
+
     使用前需要安装: pip install aliyun-log-python-sdk
     """
-    def __init__(self, endpoint, access_key_id, access_key_secret, project, logstore):
+    def __init__(self, endpoint, access_key_id, access_key_secret, project, logstore,
+                 batch_size=200, flush_interval=2.0):
         super().__init__()
         self.enabled = False
-        
+        self.batch_size = int(batch_size)
+        self.flush_interval = float(flush_interval)
+        self.buffer = []
+        self._stop = threading.Event()
+
         try:
             from aliyun.log import LogClient
             self.client = LogClient(endpoint, access_key_id, access_key_secret)
@@ -50,11 +94,19 @@ class AliyunSLSHandler(logging.Handler):
             print("Warning: aliyun-log-python-sdk not installed. SLS handler disabled.")
         except Exception as e:
             print(f"Warning: Failed to initialize Aliyun SLS Handler: {e}")
-    
+
+        if self.enabled:
+            # 空闲时也按 flush_interval 发送残留日志
+            threading.Thread(target=self._flush_periodically, name='sls-log-flusher', daemon=True).start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
     def emit(self, record):
         if not self.enabled:
             return
-            
+
         try:
             from aliyun.log import LogItem
             log_item = LogItem()
@@ -66,9 +118,130 @@ class AliyunSLSHandler(logging.Handler):
                 ('function', record.funcName),
                 ('logger', record.name)
             ])
-            self.client.put_logs(self.project, self.logstore, [log_item])
-        except Exception as e:
+        except Exception:
             self.handleError(record)
+            return
+
+        self.acquire()
+        try:
+            self.buffer.append(log_item)
+            full = len(self.buffer) >= self.batch_size
+        finally:
+            self.release()
+        if full:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            items, self.buffer = self.buffer, []
+        finally:
+            self.release()
+        if not items:
+            return
+        try:
+            from aliyun.log import PutLogsRequest
+            self.client.put_logs(PutLogsRequest(self.project, self.logstore, '', '', items))
+        except Exception as e:
+            print(f"Warning: Failed to send {len(items)} logs to Aliyun SLS: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        super().close()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    有界队列 Handler: 队列满时丢弃记录并计数，不阻塞业务线程
+
+    ERROR 及以上级别最多等待 block_timeout 秒再丢弃。
+    """
+    def __init__(self, target_name: str, maxsize: int = 10000, block_timeout: float = 0.1):
+        super().__init__(queue.Queue(maxsize))
+        self.target_name = target_name
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 在调用线程中合并 msg/args、格式化异常；JSON 序列化与 I/O 留给监听线程
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            from app.metrics import LOG_RECORDS_DROPPED
+            LOG_RECORDS_DROPPED.labels(self.target_name).inc()
+
+
+# 当前进程中运行的 (队列 Handler, QueueListener)
+_pipelines: List[tuple] = []
+
+
+def _install_queue_pipeline(logging_config: dict, maxsize: int):
+    """
+    将各 logger 上的 Handler 替换为对应的 DroppingQueueHandler，
+    每个目标 Handler 一个有界队列 + QueueListener 线程 (磁盘慢或 SLS 慢互不影响)
+    """
+    loggers = [logging.getLogger()] + [logging.getLogger(name) for name in logging_config['loggers']]
+    proxies = {}
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            if handler not in proxies:
+                proxy = DroppingQueueHandler(handler.get_name() or type(handler).__name__, maxsize=maxsize)
+                proxy.setLevel(handler.level)
+                proxy.addFilter(RequestIdFilter())
+                listener = logging.handlers.QueueListener(proxy.queue, handler, respect_handler_level=True)
+                listener.start()
+                proxies[handler] = proxy
+                _pipelines.append((proxy, listener))
+            logger.removeHandler(handler)
+            logger.addHandler(proxies[handler])
+
+
+def _stop_queue_pipeline():
+    """停止监听线程并写完队列中剩余记录"""
+    while _pipelines:
+        proxy, listener = _pipelines.pop()
+        for logger in [logging.getLogger()] + list(logging.root.manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger) and proxy in logger.handlers:
+                logger.removeHandler(proxy)
+        try:
+            listener.stop()
+        except Exception:
+            pass
+        for handler in listener.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                # 进程退出时 stream 可能已被关闭
+                pass
+
+
+def _restart_queue_pipeline_after_fork():
+    """fork 后监听线程不存在于子进程 (gunicorn --preload / Celery prefork)，换新队列并重启"""
+    for proxy, listener in _pipelines:
+        proxy.queue = listener.queue = queue.Queue(proxy.queue.maxsize)
+        listener._thread = None
+        listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_queue_pipeline_after_fork)
+atexit.register(_stop_queue_pipeline)
 
 
 def get_logging_config(app):
@@ -79,6 +252,7 @@ def get_logging_config(app):
     - FLASK_ENV: development / production / staging
     - LOG_LEVEL: DEBUG / INFO / WARNING / ERROR
     - ENABLE_ALIYUN_SLS: true / false
+    - ALIYUN_SLS_BATCH_SIZE / ALIYUN_SLS_FLUSH_INTERVAL: SLS 批量发送条数 / 最长间隔 (秒)
     """
     # Ensure logs directory exists
     log_dir = os.path.join(app.root_path, '..', 'logs')
@@ -94,6 +268,11 @@ def get_logging_config(app):
     logging_config = {
         'version': 1,
         'disable_existing_loggers': False,
+        'filters': {
+            'request_id': {
+                '()': RequestIdFilter,
+            },
+        },
         'formatters': {
             'default': {
                 'format': '[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
@@ -215,6 +394,8 @@ def get_logging_config(app):
                     'access_key_secret': sls_access_key_secret,
                     'project': sls_project,
                     'logstore': sls_logstore,
+                    'batch_size': int(os.getenv('ALIYUN_SLS_BATCH_SIZE', '200')),
+                    'flush_interval': float(os.getenv('ALIYUN_SLS_FLUSH_INTERVAL', '2')),
                     'level': 'INFO',
                     'formatter': 'json',
                 }
@@ -258,11 +439,53 @@ def get_logging_config(app):
     return logging_config
 
 
+def init_request_id(app):
+    """请求 ID: 取请求头 X-Request-ID (网关/前端传入，格式不合法时忽略) 或生成，写入日志上下文并回传响应头"""
+    from flask import g, request
+
+    @app.before_request
+    def bind_request_id():
+        request_id = request.headers.get(REQUEST_ID_HEADER)
+        if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        g.request_id = request_id
+        g.request_id_token = request_id_var.set(request_id)
+
+    @app.after_request
+    def send_request_id(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    @app.teardown_request
+    def unbind_request_id(exc=None):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            try:
+                request_id_var.reset(token)
+            except ValueError:
+                request_id_var.set(None)
+
+
 def configure_logging(app):
-    """配置日志系统"""
+    """
+    配置日志系统
+
+    环境变量:
+    - LOG_ASYNC: 默认 true，Handler 经有界队列交给后台线程写出 (QueueHandler/QueueListener)，
+      请求线程不再做 JSON 序列化与磁盘/网络 I/O
+    - LOG_QUEUE_SIZE: 每个 Handler 的队列长度，满时丢弃并计入 log_records_dropped_total
+    """
+    _stop_queue_pipeline()
     logging_config = get_logging_config(app)
+    for handler in logging_config['handlers'].values():
+        handler.setdefault('filters', []).append('request_id')
     logging.config.dictConfig(logging_config)
-    
+
+    if os.getenv('LOG_ASYNC', 'true').lower() == 'true':
+        _install_queue_pipeline(logging_config, int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+
+    init_request_id(app)
+
     env = os.getenv('FLASK_ENV', 'development')
     app.logger.info(f'Logging configured successfully for {env} environment')
-
@@ -0,0 +1,275 @@
+"""
+Prometheus 指标 (/metrics)
+
+- API: 按 blueprint / URL 规则统计请求耗时直方图
+- 数据库连接池: 借出次数、当前借出数、溢出数、等待连接耗时
+- Celery: 任务耗时 (按任务名/结果状态)、队列长度 (抓取时从 Redis broker 读取)
+- 外部调用: SynologyClient / LingxingService 的调用耗时与错误数
+- 日志: 异步日志队列满时丢弃的记录数
+
+多进程 gunicorn: 启动前设置 PROMETHEUS_MULTIPROC_DIR 为各 worker 共享的空目录，
+/metrics 经 MultiProcessCollector 汇总所有进程；worker 退出时由 gunicorn.conf.py 的
+child_exit 调用 mark_process_dead。Celery worker 需挂载同一目录才会出现在汇总中。
+
+prometheus_client 为可选依赖，未安装时埋点均为空操作，/metrics 返回 503。
+"""
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from flask import Flask, Response, current_app, g, request
+from sqlalchemy import event
+
+# 多进程模式下 prometheus_client 导入时即按该目录写入数据 (Celery/CLI 等非 gunicorn 进程也需目录存在)
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+    )
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # pragma: no cover - prometheus_client 为可选依赖
+    CollectorRegistry = Counter = Gauge = Histogram = REGISTRY = None
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 180, 600, 1800)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+class _NoopMetric:
+    """prometheus_client 未安装时的占位，接口与指标对象一致"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(factory, *args, **kwargs):
+    return factory(*args, **kwargs) if factory else _NoopMetric()
+
+
+HTTP_REQUEST_DURATION = _metric(
+    Histogram, 'http_request_duration_seconds', 'API 请求耗时',
+    ['method', 'blueprint', 'rule', 'status'], buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKOUTS = _metric(Counter, 'db_pool_checkouts_total', '连接池借出次数')
+DB_POOL_CHECKED_OUT = _metric(
+    Gauge, 'db_pool_checked_out', '当前借出的连接数', **({'multiprocess_mode': 'livesum'} if Gauge else {})
+)
+DB_POOL_OVERFLOW = _metric(
+    Gauge, 'db_pool_overflow', '当前溢出连接数 (超出 pool_size 部分)', **({'multiprocess_mode': 'livesum'} if Gauge else {})
+)
+DB_POOL_WAIT = _metric(Histogram, 'db_pool_wait_seconds', '等待获取连接耗时', buckets=POOL_WAIT_BUCKETS)
+CELERY_TASK_DURATION = _metric(
+    Histogram, 'celery_task_duration_seconds', 'Celery 任务耗时', ['task', 'state'], buckets=TASK_BUCKETS
+)
+EXTERNAL_REQUEST_DURATION = _metric(
+    Histogram, 'external_request_duration_seconds', '外部服务调用耗时',
+    ['service', 'operation'], buckets=LATENCY_BUCKETS
+)
+EXTERNAL_REQUEST_ERRORS = _metric(
+    Counter, 'external_request_errors_total', '外部服务调用错误数', ['service', 'operation', 'error']
+)
+LOG_RECORDS_DROPPED = _metric(
+    Counter, 'log_records_dropped_total', '日志队列已满被丢弃的记录数', ['handler']
+)
+
+
+# ---------------------------------------------------------------------------
+# 外部调用
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def external_call(service: str, operation: str) -> Iterator[None]:
+    """记录一次外部调用的耗时，异常按异常类型计入错误数后原样抛出"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        EXTERNAL_REQUEST_ERRORS.labels(service, operation, type(e).__name__).inc()
+        raise
+    finally:
+        EXTERNAL_REQUEST_DURATION.labels(service, operation).observe(time.perf_counter() - start)
+
+
+def record_external_error(service: str, operation: str, error: str):
+    """记录未以异常形式出现的失败 (如接口返回业务错误码)"""
+    EXTERNAL_REQUEST_ERRORS.labels(service, operation, error).inc()
+
+
+def track_external(service: str, operation: Optional[str] = None):
+    """方法装饰器版 external_call，operation 默认取函数名"""
+    def decorator(func):
+        op = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with external_call(service, op):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# 数据库连接池
+# ---------------------------------------------------------------------------
+
+def instrument_engine(engine):
+    """连接池事件 + 等待耗时 (包装 pool._do_get；engine.dispose 重建连接池后需重新调用)"""
+    pool = engine.pool
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        DB_POOL_CHECKED_OUT.inc()
+        if hasattr(pool, 'overflow'):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+        if hasattr(pool, 'overflow'):
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    do_get = getattr(pool, '_do_get', None)
+    if do_get is not None and not getattr(do_get, '_metrics_wrapped', False):
+        @functools.wraps(do_get)
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                DB_POOL_WAIT.observe(time.perf_counter() - start)
+        timed_do_get._metrics_wrapped = True
+        pool._do_get = timed_do_get
+
+
+# ---------------------------------------------------------------------------
+# Celery
+# ---------------------------------------------------------------------------
+
+_task_started = {}
+_celery_connected = False
+
+
+def _connect_celery_signals():
+    global _celery_connected
+    if _celery_connected:
+        return
+    from celery.signals import task_prerun, task_postrun
+
+    @task_prerun.connect(weak=False)
+    def on_task_prerun(task_id=None, **kwargs):
+        _task_started[task_id] = time.perf_counter()
+
+    @task_postrun.connect(weak=False)
+    def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+        start = _task_started.pop(task_id, None)
+        if start is not None and task is not None:
+            CELERY_TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - start)
+
+    _celery_connected = True
+
+
+def celery_queue_lengths(queues: List[str]) -> dict:
+    """从 Redis broker 读取各队列待处理任务数 (Redis 不可用时返回空)"""
+    from app.redis_client import get_redis
+    client = get_redis()
+    if client is None:
+        return {}
+    lengths = {}
+    for queue in queues:
+        try:
+            lengths[queue] = client.llen(queue)
+        except Exception as e:
+            logger.warning(f"Failed to read celery queue length for {queue}: {e}")
+    return lengths
+
+
+class _QueueLengthCollector:
+    """抓取时一次性输出队列长度 (非进程内累计指标，不写入多进程目录)"""
+
+    def __init__(self, lengths: dict):
+        self.lengths = lengths
+
+    def collect(self):
+        family = GaugeMetricFamily('celery_queue_length', 'Celery 队列待处理任务数', labels=['queue'])
+        for queue, length in self.lengths.items():
+            family.add_metric([queue], length)
+        yield family
+
+
+# ---------------------------------------------------------------------------
+# /metrics
+# ---------------------------------------------------------------------------
+
+def render_metrics() -> bytes:
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        output = generate_latest(registry)
+    else:
+        output = generate_latest(REGISTRY)
+
+    queues = [q.strip() for q in current_app.config.get('METRICS_CELERY_QUEUES', 'celery').split(',') if q.strip()]
+    if queues:
+        queue_registry = CollectorRegistry()
+        queue_registry.register(_QueueLengthCollector(celery_queue_lengths(queues)))
+        output += generate_latest(queue_registry)
+    return output
+
+
+class MetricsExtension:
+    """Flask 扩展: metrics_ext.init_app(app)，须在 db.init_app 之后调用"""
+
+    def init_app(self, app: Flask):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        from app.extensions import db
+        with app.app_context():
+            for engine in db.engines.values():
+                instrument_engine(engine)
+        _connect_celery_signals()
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            start = g.pop('metrics_start', None)
+            if start is not None and request.path != '/metrics':
+                rule = request.url_rule.rule if request.url_rule else 'unmatched'
+                HTTP_REQUEST_DURATION.labels(
+                    request.method, request.blueprint or '', rule, str(response.status_code)
+                ).observe(time.perf_counter() - start)
+            return response
+
+        @app.get('/metrics')
+        @app.doc(hide=True)
+        def metrics():
+            token = current_app.config.get('METRICS_TOKEN')
+            if token and request.headers.get('Authorization') != f'Bearer {token}':
+                return Response('forbidden\n', status=403, mimetype='text/plain')
+            if REGISTRY is None:
+                return Response('prometheus_client not installed\n', status=503, mimetype='text/plain')
+            return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
@@ -9,7 +9,7 @@ from .serc import SysCompany, SysHSCode
 from .purchase import SysSupplier
 from .supply import ScmSourceDoc, ScmDeliveryContract, ScmDeliveryContractItem
 from .serc import SysPaymentTerm
-from .system import SysDict
+from .system import SysDict, SysSequence
 from .customs import CustomsDeclaration, CustomsDeclarationItem
 
 # 导入仓库管理相关模型
@@ -22,4 +22,9 @@ from .warehouse import (
 # 导入发货单驱动的双轨制合同系统模型
 from .logistics import ShipmentOrder, ShipmentOrderItem, ShipmentSource, ShipmentStatus
 from .supply.supply_contract import ScmSupplyContract, ScmSupplyContractItem
-from .finance import SupplierTaxInvoice
\ No newline at end of file
+from .finance import SupplierTaxInvoice
+
+# 以下模型此前仅由路由模块间接导入；未注册 API 蓝图的进程 (Celery / CLI) 与迁移也需完整的元数据
+from .customs.audit_log import CustomsDeclarationAuditLog
+from .field_permission import FieldPermissionMeta, RoleFieldPermission
+from .logistics.logistics_statement import LogisticsStatement, LogisticsPayment
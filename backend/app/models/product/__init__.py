@@ -4,3 +4,5 @@ from .item import (
     Product, ProductVariant, ProductReferenceCode, ProductFitment, 
     SkuSuffix, SysTaxCategory, sku_suffix_categories
 )
+from .search import ProductSearchDocument
+from .serial import SkuSerialCounter
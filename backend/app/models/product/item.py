@@ -112,6 +112,7 @@ class ProductVariant(db.Model):
     specs: Mapped[Dict[str, Any]] = mapped_column(JSONB, default={}, comment="Variant specific specs e.g. {color: red}")
     quality_type: Mapped[str] = mapped_column(String(20), default="Aftermarket", comment="OEM, Aftermarket, Refurbished")
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    safety_stock: Mapped[int] = mapped_column(Integer, default=0, server_default='0', comment="安全库存 (驱动补货预警)")
     
     # Identification (Additional)
     barcode: Mapped[Optional[str]] = mapped_column(String(50), index=True, comment="EAN/UPC")
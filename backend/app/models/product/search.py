@@ -0,0 +1,43 @@
+from typing import Optional
+from sqlalchemy import String, Integer, ForeignKey, Text, DateTime, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.extensions import db
+
+
+class ProductSearchDocument(db.Model):
+    """
+    商品搜索文档 (每个 SKU 一行，无 SKU 的 SPU 以 variant_id=NULL 占一行)
+
+    反范式存储 SPU 名称/编码、SKU 短码/特征码及 OE 等参考编码，
+    替代 products/product_variants/product_reference_codes 三表 outer join + DISTINCT 的模糊搜索。
+    PostgreSQL 下 search_text 建 pg_trgm GIN 索引，使 LIKE '%q%' 走索引。
+    由 ProductSearchService.reindex_products 在商品/SKU/参考编码变更时增量维护。
+    """
+    __tablename__ = "product_search_documents"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    variant_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("product_variants.id", ondelete="CASCADE"), unique=True, comment="SKU ID (SPU 无 SKU 时为空)"
+    )
+
+    # 排序用的精确匹配键 (均为小写)
+    sku: Mapped[Optional[str]] = mapped_column(String(50), index=True, comment="SKU短码 (小写)")
+    feature_code: Mapped[Optional[str]] = mapped_column(String(200), comment="SKU特征码 (小写)")
+    spu_code: Mapped[str] = mapped_column(String(100), nullable=False, comment="SPU特征码 (小写)")
+    ref_codes: Mapped[Optional[str]] = mapped_column(Text, comment="参考编码，空格分隔且首尾带空格，含去符号形式")
+
+    # 检索全文 (小写，含去符号的编码形式)
+    search_text: Mapped[str] = mapped_column(Text, nullable=False)
+
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index(
+            'idx_psd_search_text_trgm', 'search_text',
+            postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ProductSearchDocument product={self.product_id} variant={self.variant_id}>"
@@ -0,0 +1,24 @@
+from sqlalchemy import String, Integer, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.extensions import db
+
+
+class SkuSerialCounter(db.Model):
+    """
+    SKU 流水号计数器 (按 前缀 + 流水号位数 分桶)
+
+    last_value 为该前缀已分配出去的最大流水号。
+    分配时以单条 UPDATE ... RETURNING 原子自增 (行锁串行化同前缀的并发创建)，
+    替代 "按前缀正则扫描 SKU 取最大值再 +1" 的做法。
+    首次使用某前缀时从现有 SKU 扫描一次作为种子，之后不再扫描；
+    可用 `flask product seed-sku-serials` 按现有 SKU 修复。
+    """
+    __tablename__ = "sku_serial_counters"
+
+    prefix: Mapped[str] = mapped_column(String(32), primary_key=True, comment="SKU 前缀 (如 类目码+品牌码)")
+    width: Mapped[int] = mapped_column(Integer, primary_key=True, comment="流水号位数")
+    last_value: Mapped[int] = mapped_column(Integer, default=0, nullable=False, comment="已分配的最大流水号")
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SkuSerialCounter {self.prefix}/{self.width}={self.last_value}>"
@@ -38,6 +38,7 @@ class TaxInvoiceStatus(str, Enum):
 
 class CustomsStatus(str, Enum):
     DRAFT = "draft"                 # 草稿 (可随意改)
+    PRE_DECLARED = "pre_declared"   # 预申报 (已匹配发票，额度已占用)
     PENDING_REVIEW = "pending"      # 待审核 (锁定)
     DECLARED = "declared"           # 已申报 (锁定，等待海关结果)
     CLEARED = "cleared"             # 已放行 (可生成交付合同)
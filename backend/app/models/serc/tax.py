@@ -1,6 +1,6 @@
 from typing import Optional, List
 from decimal import Decimal
-from sqlalchemy import String, Integer, ForeignKey, DECIMAL, DateTime, func, Boolean
+from sqlalchemy import String, Integer, ForeignKey, DECIMAL, DateTime, func, Boolean, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.extensions import db
 from .enums import TaxInvoiceStatus
@@ -42,6 +42,9 @@ class TaxInvoice(db.Model):
     soa: Mapped["FinPurchaseSOA"] = relationship("FinPurchaseSOA")
     items: Mapped[List["TaxInvoiceItem"]] = relationship("TaxInvoiceItem", back_populates="invoice")
 
+def _default_remaining_qty(context):
+    return context.get_current_parameters().get('qty')
+
 class TaxInvoiceItem(db.Model):
     __tablename__ = "tax_invoice_items"
 
@@ -54,8 +57,17 @@ class TaxInvoiceItem(db.Model):
     price: Mapped[Decimal] = mapped_column(DECIMAL(18, 4))  # 含税单价
     total: Mapped[Decimal] = mapped_column(DECIMAL(18, 2))
     
+    # 剩余可匹配数量 = qty - SUM(TaxRefundMatch.matched_qty)
+    # 由 TaxRefundService 在确认/解除匹配时同事务维护，`flask serc repair-invoice-remaining` 修复
+    remaining_qty: Mapped[Decimal] = mapped_column(DECIMAL(12, 4), default=_default_remaining_qty, comment='剩余可匹配数量')
+    
     invoice: Mapped["TaxInvoice"] = relationship("TaxInvoice", back_populates="items")
 
+    __table_args__ = (
+        # 候选发票查找: 仅索引仍有余量的明细
+        Index('idx_tax_invoice_items_available', 'name', 'id', postgresql_where=text('remaining_qty > 0')),
+    )
+
 class TaxRefundMatch(db.Model):
     """
     关联匹配表 (表D)
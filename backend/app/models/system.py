@@ -1,5 +1,5 @@
 from typing import Optional, List
-from sqlalchemy import String, Integer, ForeignKey, Boolean
+from sqlalchemy import String, Integer, BigInteger, ForeignKey, Boolean, DateTime, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.extensions import db
@@ -22,3 +22,17 @@ class SysDict(db.Model):
         return f"<SysDict {self.code}>"
 
 
+class SysSequence(db.Model):
+    """
+    业务单号计数器 (每个 key 一行，如 'AP20260109'、'seq:L1:SZ:2601')
+
+    由 SequenceService 以 UPDATE ... RETURNING 原子自增，替代按单号 LIKE 扫描取最大值
+    """
+    __tablename__ = 'sys_sequences'
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True, comment="计数器键")
+    last_value: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False, comment="已分配的最大序号")
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<SysSequence {self.key}={self.last_value}>"
@@ -0,0 +1,258 @@
+"""
+按需采样分析 (线上请求)
+
+触发方式 (PROFILE_ENABLED=true 时生效):
+- 管理员请求携带请求头 X-Profile: 1 或查询参数 __profile=1
+- 按 PROFILE_SAMPLE_RATE 概率随机采样 (默认 0，不采样)
+
+实现为纯 Python 采样器: 后台线程每 PROFILE_INTERVAL 秒读取一次请求线程的调用栈
+(sys._current_frames)，请求本身不插桩，开销与采样频率成正比。
+结果按请求 ID 保存为 flamegraph.pl / speedscope 可直接读取的 collapsed stacks，
+另存一份 JSON 元数据；`flask profile list/show/aggregate/clean` 查看与汇总。
+
+注意: 进程池 (如合同 PDF 批量渲染) 中的子进程不在采样范围内。
+
+启动耗时: `flask profile startup` 在子进程中以 python -X importtime 执行 create_app()，
+输出冷启动耗时、累计导入耗时最高的模块，并检查重量级依赖是否在启动时被导入。
+"""
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask import Flask, g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_ARG = '__profile'
+# 采样栈最大深度，超出部分截断 (防止递归过深时单行过长)
+MAX_STACK_DEPTH = 200
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f'{module}:{code.co_name}:{frame.f_lineno}'
+
+
+class SamplingProfiler:
+    """对单个线程定时采样调用栈，结果为 {collapsed_stack: count}"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+                self.samples += 1
+
+
+class ProfileStore:
+    """按请求 ID 保存/读取采样结果: <id>.collapsed + <id>.json"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def save(self, profile_id: str, stacks: Counter, meta: Dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{profile_id}.collapsed')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return path
+
+    def list(self) -> List[Dict]:
+        """所有采样的元数据，按时间倒序"""
+        if not os.path.isdir(self.directory):
+            return []
+        items = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    items.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(items, key=lambda m: m.get('created_at', ''), reverse=True)
+
+    def load(self, profile_id: str) -> Counter:
+        stacks = Counter()
+        with open(os.path.join(self.directory, f'{profile_id}.collapsed'), encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack:
+                    stacks[stack] += int(count)
+        return stacks
+
+    def aggregate(self, profile_ids: List[str]) -> Counter:
+        total = Counter()
+        for profile_id in profile_ids:
+            total.update(self.load(profile_id))
+        return total
+
+    def remove(self, profile_id: str):
+        for ext in ('.collapsed', '.json'):
+            path = os.path.join(self.directory, f'{profile_id}{ext}')
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def strip_line_numbers(stacks: Counter) -> Counter:
+    """去掉帧中的行号，按函数汇总 (跨请求聚合时更易读)"""
+    merged = Counter()
+    for stack, count in stacks.items():
+        merged[';'.join(frame.rsplit(':', 1)[0] for frame in stack.split(';'))] += count
+    return merged
+
+
+def get_profile_store(app: Flask) -> ProfileStore:
+    return ProfileStore(app.config.get('PROFILE_DIR') or os.path.join(app.root_path, '..', 'logs', 'profiles'))
+
+
+def _is_admin_request() -> bool:
+    from flask_jwt_extended import get_jwt, verify_jwt_in_request
+    try:
+        verify_jwt_in_request(optional=True)
+        return 'admin' in get_jwt().get('roles', [])
+    except Exception:
+        return False
+
+
+class ProfilingExtension:
+    """Flask 扩展: profiling_ext.init_app(app)"""
+
+    def init_app(self, app: Flask):
+        if not app.config.get('PROFILE_ENABLED', False):
+            return
+        store = get_profile_store(app)
+        sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE', 0))
+        interval = float(app.config.get('PROFILE_INTERVAL', 0.005))
+
+        @app.before_request
+        def start_profiler():
+            requested = request.headers.get(PROFILE_HEADER) == '1' or request.args.get(PROFILE_QUERY_ARG) == '1'
+            if requested and not _is_admin_request():
+                requested = False
+            if not requested and not (sample_rate and random.random() < sample_rate):
+                return
+            g.profile_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{g.get('request_id') or uuid.uuid4().hex[:12]}"
+            g.profile_started = time.perf_counter()
+            g.profiler = SamplingProfiler(interval=interval).start()
+
+        @app.after_request
+        def save_profile(response):
+            profiler = g.pop('profiler', None)
+            if profiler is None:
+                return response
+            stacks = profiler.stop()
+            meta = {
+                'id': g.profile_id,
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.profile_started) * 1000, 2),
+                'samples': profiler.samples,
+                'interval': interval,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            try:
+                store.save(g.profile_id, stacks, meta)
+                response.headers['X-Profile-Id'] = g.profile_id
+            except OSError as e:
+                logger.warning(f"Failed to save profile {g.profile_id}: {e}")
+            return response
+
+        @app.teardown_request
+        def stop_profiler(exc=None):
+            # 请求异常未走到 after_request 时确保采样线程退出
+            profiler = g.pop('profiler', None)
+            if profiler is not None:
+                profiler.stop()
+
+
+# 应在首次使用时才导入的重量级依赖
+HEAVY_MODULES = ('pandas', 'numpy', 'weasyprint', 'openpyxl', 'pypdf', 'PIL')
+
+STARTUP_SCRIPT = (
+    "import sys, time; started = time.perf_counter(); "
+    "from app import create_app; create_app(); "
+    "print('STARTUP_SECONDS', time.perf_counter() - started); "
+    "print('STARTUP_HEAVY', ','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """解析 -X importtime 输出: [{'module', 'self_us', 'cumulative_us', 'depth'}]"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            imports.append({
+                'module': name.strip(),
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return imports
+
+
+def measure_startup(env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+                    importtime: bool = False) -> Dict:
+    """
+    在新的解释器中执行 create_app()，返回 {'seconds', 'heavy', 'imports'}。
+    importtime 本身有明显开销，计时与导入明细应分开测量。
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+    result = subprocess.run(
+        command + ['-c', STARTUP_SCRIPT.format(heavy=HEAVY_MODULES)],
+        cwd=cwd, env={**os.environ, **(env or {})}, capture_output=True, text=True,
+    )
+    measured = {'seconds': None, 'heavy': [], 'imports': parse_importtime(result.stderr) if importtime else []}
+    for line in result.stdout.splitlines():
+        if line.startswith('STARTUP_SECONDS '):
+            measured['seconds'] = float(line.split()[1])
+        elif line.startswith('STARTUP_HEAVY '):
+            measured['heavy'] = [m for m in line.split(' ', 1)[1].split(',') if m]
+    if measured['seconds'] is None:
+        raise RuntimeError(f'create_app() failed:\n{result.stderr[-2000:]}')
+    return measured
@@ -0,0 +1,211 @@
+"""
+共享 Redis 客户端扩展
+
+每个进程一个连接池 (按 REDIS_URL 配置)，注册为 app.extensions['redis']。
+- 连接/读写超时、空闲连接健康检查 (health_check_interval)
+- 熔断器: 连续失败达到阈值后在冷却期内直接返回 None，调用方走各自的降级逻辑，
+  避免 Redis 故障时每次请求都等待超时
+- stats() 暴露连接池与熔断器指标
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+from flask import Flask, current_app
+
+try:
+    from redis import Redis, ConnectionPool
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+except ImportError:  # pragma: no cover - redis 为可选依赖
+    Redis = ConnectionPool = None
+    RedisConnectionError = RedisTimeoutError = Exception
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    简单熔断器
+    closed -> (连续失败 >= threshold) -> open -> (冷却 cooldown 秒) -> half_open -> 成功则 closed
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.open_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self) -> bool:
+        return self.state != 'open'
+
+    def record_success(self):
+        if self.failures or self.opened_at is not None:
+            with self._lock:
+                if self.opened_at is not None:
+                    logger.info("Redis circuit breaker closed")
+                self.failures = 0
+                self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # half_open 状态下试探失败，重新计时
+            if self.failures >= self.threshold and (self.opened_at is None or self.state == 'half_open'):
+                self.opened_at = time.monotonic()
+                self.open_count += 1
+                logger.warning(f"Redis circuit breaker opened after {self.failures} failures")
+
+
+if Redis is not None:
+    class _BreakerRedis(Redis):
+        """命令执行结果回报给熔断器的 Redis 客户端"""
+
+        def __init__(self, breaker: CircuitBreaker, **kwargs):
+            super().__init__(**kwargs)
+            self._breaker = breaker
+
+        def execute_command(self, *args, **options):
+            try:
+                result = super().execute_command(*args, **options)
+            except (RedisConnectionError, RedisTimeoutError):
+                self._breaker.record_failure()
+                raise
+            self._breaker.record_success()
+            return result
+
+
+class ManagedRedis:
+    """单个应用的 Redis 连接池 + 熔断器"""
+
+    def __init__(self, url: Optional[str], max_connections: int = 50, socket_timeout: float = 2.0,
+                 connect_timeout: float = 1.0, health_check_interval: int = 30,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 30.0):
+        self.url = url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self.health_check_interval = health_check_interval
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._pool = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url) and Redis is not None
+
+    @property
+    def pool(self):
+        """懒创建连接池 (redis-py 在 fork 后会按 pid 自动重建连接)"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool.from_url(
+                        self.url,
+                        max_connections=self.max_connections,
+                        socket_timeout=self.socket_timeout,
+                        socket_connect_timeout=self.connect_timeout,
+                        health_check_interval=self.health_check_interval,
+                        decode_responses=True,
+                    )
+        return self._pool
+
+    def get_client(self) -> Optional['Redis']:
+        """获取共享客户端；未配置或熔断打开时返回 None"""
+        if not self.enabled or not self.breaker.allow():
+            return None
+        if self._client is None:
+            self._client = _BreakerRedis(self.breaker, connection_pool=self.pool)
+        return self._client
+
+    def ping(self) -> bool:
+        client = self.get_client()
+        if client is None:
+            return False
+        try:
+            return bool(client.ping())
+        except Exception as e:
+            logger.warning(f"Redis ping failed: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池与熔断器指标"""
+        pool = self._pool
+        return {
+            'enabled': self.enabled,
+            'url': _mask_url(self.url),
+            'max_connections': self.max_connections,
+            'created_connections': getattr(pool, '_created_connections', 0) if pool else 0,
+            'in_use_connections': len(getattr(pool, '_in_use_connections', ())) if pool else 0,
+            'idle_connections': len(getattr(pool, '_available_connections', ())) if pool else 0,
+            'breaker_state': self.breaker.state,
+            'breaker_failures': self.breaker.failures,
+            'breaker_open_count': self.breaker.open_count,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.disconnect()
+
+
+def _mask_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return url
+    parts = urlsplit(url)
+    if parts.password:
+        netloc = parts.netloc.replace(f":{parts.password}@", ":***@")
+        return urlunsplit(parts._replace(netloc=netloc))
+    return url
+
+
+class RedisExtension:
+    """Flask 扩展: redis_ext.init_app(app) -> app.extensions['redis']"""
+
+    def init_app(self, app: Flask):
+        config = app.config
+        app.extensions['redis'] = ManagedRedis(
+            config.get('REDIS_URL'),
+            max_connections=config.get('REDIS_MAX_CONNECTIONS', 50),
+            socket_timeout=config.get('REDIS_SOCKET_TIMEOUT', 2.0),
+            connect_timeout=config.get('REDIS_CONNECT_TIMEOUT', 1.0),
+            health_check_interval=config.get('REDIS_HEALTH_CHECK_INTERVAL', 30),
+            breaker_threshold=config.get('REDIS_BREAKER_THRESHOLD', 5),
+            breaker_cooldown=config.get('REDIS_BREAKER_COOLDOWN', 30.0),
+        )
+
+    @staticmethod
+    def celery_options(config) -> Dict[str, Any]:
+        """
+        Celery 使用 kombu 自己的连接池，无法共享 redis-py 连接池；
+        这里以同一组配置约束其连接数、超时与健康检查
+        """
+        transport = {
+            'socket_timeout': config.get('REDIS_SOCKET_TIMEOUT', 2.0),
+            'socket_connect_timeout': config.get('REDIS_CONNECT_TIMEOUT', 1.0),
+            'health_check_interval': config.get('REDIS_HEALTH_CHECK_INTERVAL', 30),
+        }
+        return {
+            'broker_pool_limit': config.get('REDIS_MAX_CONNECTIONS', 50),
+            'broker_transport_options': transport,
+            'redis_max_connections': config.get('REDIS_MAX_CONNECTIONS', 50),
+            'redis_socket_timeout': transport['socket_timeout'],
+            'redis_socket_connect_timeout': transport['socket_connect_timeout'],
+            'redis_backend_health_check_interval': transport['health_check_interval'],
+        }
+
+
+def get_redis() -> Optional['Redis']:
+    """获取当前应用的共享 Redis 客户端 (未配置/熔断时为 None)"""
+    managed = current_app.extensions.get('redis')
+    return managed.get_client() if managed else None
@@ -53,6 +53,9 @@ class ProductVariantSchema(FieldPermissionMixin, Schema):
     # Physical
     weight = DecimalField()
     
+    # Inventory
+    safety_stock = Integer(metadata={'description': '安全库存'})
+    
     # Compliance
     hs_code_id = Integer()
     declared_name = String()
@@ -83,6 +86,7 @@ class SkuListItemSchema(Schema):
     model = String(metadata={'description': '车型'})
     attributes_display = String(metadata={'description': '属性组合显示'})
     stock_quantity = Integer(metadata={'description': '当前库存'})
+    available_quantity = Integer(metadata={'description': '可用库存'})
     safety_stock = Integer(metadata={'description': '安全库存'})
     in_transit = Integer(metadata={'description': '在途数量'})
     warning_status = String(metadata={'description': '预警状态: normal/warning/danger'})
@@ -99,6 +103,22 @@ class SkuListResponseSchema(Schema):
     per_page = Integer()
     pages = Integer()
 
+class SkuFacetValueSchema(Schema):
+    """分面取值计数"""
+    value = String(metadata={'description': '筛选值 (作为对应查询参数的值)'})
+    label = String(metadata={'description': '显示名称'})
+    count = Integer(metadata={'description': '命中SKU数'})
+
+class SkuFacetSchema(Schema):
+    """分面维度"""
+    key = String(metadata={'description': '查询参数名: brand/model/category_id/attr_<key>'})
+    label = String(metadata={'description': '维度名称'})
+    values = List(Nested(SkuFacetValueSchema))
+
+class SkuFacetResponseSchema(SkuListResponseSchema):
+    """SKU分面筛选响应Schema"""
+    facets = List(Nested(SkuFacetSchema))
+
 class SkuCodingRulesSchema(Schema):
     """SKU编码规则Schema"""
     category_code = String(metadata={'description': '类目码(3位)'})
@@ -152,6 +172,7 @@ class SkuDetailSchema(Schema):
     reference_codes = List(Nested(SkuReferenceCodeSchema), metadata={'description': '参考编码'})
     fitments = List(Nested(SkuFitmentSchema), metadata={'description': '适配车型'})
     stock_quantity = Integer(metadata={'description': '当前库存'})
+    available_quantity = Integer(metadata={'description': '可用库存'})
     safety_stock = Integer(metadata={'description': '安全库存'})
     in_transit = Integer(metadata={'description': '在途数量'})
     warning_status = String(metadata={'description': '预警状态: normal/warning/danger'})
@@ -16,3 +16,23 @@ class ProductVehicleBaseSchema(Schema):
 
 class ProductVehicleTreeSchema(ProductVehicleBaseSchema):
     children = List(Nested(lambda: ProductVehicleTreeSchema()))
+
+class VehicleSearchQuerySchema(Schema):
+    q = String(required=True, metadata={'description': '关键词 (名称/缩写/编码前缀，空格分隔多级，如 "chev sil 2010")'})
+    level_type = String(load_default=None, metadata={'description': '限定层级: make, model, year'})
+    parent_id = Integer(load_default=None, metadata={'description': '限定在某节点之下检索'})
+    limit = Integer(load_default=20)
+
+class VehicleSearchResultSchema(ProductVehicleBaseSchema):
+    path = String(metadata={'description': '完整路径 (Chevrolet > Silverado > 2010)'})
+    path_ids = List(Integer())
+    path_abbreviation = String(metadata={'description': '路径缩写 (CHE-SIL-10)'})
+    depth = Integer()
+
+class VehicleImportResultSchema(Schema):
+    rows = Integer()
+    skipped = Integer()
+    make = Integer()
+    model = Integer()
+    year = Integer()
+    created = Integer()
@@ -1,5 +1,5 @@
 from apiflask import Schema
-from apiflask.fields import Integer, String, Decimal, List, Date, Nested
+from apiflask.fields import Integer, String, Decimal, List, Date, Nested, Boolean
 from marshmallow import validate
 
 # --- L2 SOA Schemas ---
@@ -8,6 +8,34 @@ class SOAGenerateSchema(Schema):
     # 提交 L1 ID 列表生成 L2
     l1_ids = List(Integer(), required=True, validate=validate.Length(min=1), metadata={'description': 'L1合同ID列表'})
 
+class SOAPreviewLineSchema(Schema):
+    invoice_name = String()
+    invoice_unit = String()
+    specs = String()
+    quantity = Decimal()
+    price_unit = Decimal()
+    amount = Decimal()
+    tax_rate = Decimal()
+    tax_code = String()
+    skus = List(String())
+
+class SOAPreviewSupplierSchema(Schema):
+    supplier_id = Integer()
+    supplier_name = String()
+    l1_contract_ids = List(Integer())
+    l1_total_amount = Decimal(places=2)
+    preview_total_amount = Decimal(places=2)
+    diff = Decimal(places=2)
+    is_balanced = Boolean()
+    items = List(Nested(SOAPreviewLineSchema))
+    warnings = List(String())
+
+class SOAPreviewSchema(Schema):
+    # 按供应商分组的开票明细预览 (可跨供应商，用于月度采购对账)
+    contract_count = Integer()
+    total_amount = Decimal(places=2)
+    suppliers = List(Nested(SOAPreviewSupplierSchema))
+
 class SOADetailItemSchema(Schema):
     id = Integer()
     l1_contract_id = Integer()
@@ -1,7 +1,7 @@
 """
 财务应付单相关 Schema
 """
-from marshmallow import Schema, fields, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, ValidationError
 from datetime import date
 from app.schemas.system import UserSimpleSchema
 
@@ -116,6 +116,61 @@ class MarkPaidSchema(Schema):
     payment_voucher_id = fields.Integer(metadata={'description': '付款凭证ID'})
 
 
+class BatchCreatePayableSchema(Schema):
+    """批量创建应付单 Schema"""
+    items = fields.List(
+        fields.Nested(CreatePayableSchema),
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+        metadata={'description': '应付单列表'}
+    )
+
+
+class BatchApprovalSchema(ApprovalSchema):
+    """批量审批应付单 Schema"""
+    payable_ids = fields.List(
+        fields.Integer(),
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+        metadata={'description': '应付单ID列表'}
+    )
+
+
+class BatchAddToPoolSchema(AddToPoolSchema):
+    """批量加入付款池 Schema"""
+    payable_ids = fields.List(
+        fields.Integer(),
+        required=True,
+        validate=validate.Length(min=1, max=1000),
+        metadata={'description': '应付单ID列表'}
+    )
+
+
+class BatchOutcomeSchema(Schema):
+    """批量操作逐行结果"""
+    index = fields.Integer(metadata={'description': '请求中的行序号 (从0开始)'})
+    success = fields.Boolean()
+    payable_id = fields.Integer(allow_none=True)
+    payable_no = fields.String(allow_none=True)
+    amount = fields.Decimal(as_string=True, allow_none=True, metadata={'description': '本行付款金额 (结算)'})
+    error = fields.String(allow_none=True)
+
+
+class BatchResultSchema(Schema):
+    """批量操作结果"""
+    success_count = fields.Integer()
+    failed_count = fields.Integer()
+    results = fields.List(fields.Nested(BatchOutcomeSchema))
+
+
+class SettlePoolResultSchema(BatchResultSchema):
+    """付款池结算结果"""
+    pool_id = fields.Integer()
+    pool_status = fields.String()
+    paid_count = fields.Integer(metadata={'description': '本次付款的应付单数'})
+    paid_amount = fields.Decimal(as_string=True)
+
+
 class FinPaymentPoolSchema(Schema):
     """付款池 Schema"""
     id = fields.Integer(dump_only=True)
@@ -1,8 +1,9 @@
 import logging
 from typing import Dict, Optional, List, Any
-from sqlalchemy import select, func
+from sqlalchemy import select
 from app.extensions import db
 from app.models.product import Category, ProductVariant, ProductVehicle, AttributeDefinition
+from app.services.sku_generator import allocate_skus, peek_next_serial
 
 logger = logging.getLogger(__name__)
 
@@ -162,32 +163,18 @@ class CodeBuilderService:
         生成 SKU 短码 (物流码)
         策略: CategoryCode(3) + Sequence(5) + Suffix(2)
         """
+        return CodeBuilderService.generate_sku_short_codes(category_id, [suffix])[0]
+
+    @staticmethod
+    def generate_sku_short_codes(category_id: int, suffixes: List[Optional[str]]) -> List[str]:
+        """
+        批量生成 SKU 短码，一次预留 len(suffixes) 个流水号 (多 SKU 商品)
+        流水号由计数器原子分配，见 app.services.sku_generator
+        """
         category = db.session.get(Category, category_id)
-        cat_code = category.code or "999"
-        
-        prefix = cat_code
-        # 查找最大流水号 (建议生产环境换 Redis)
-        last_sku = db.session.execute(
-            select(ProductVariant.sku)
-            .where(ProductVariant.sku.like(f"{prefix}%"))
-            .order_by(func.length(ProductVariant.sku).desc(), ProductVariant.sku.desc())
-            .limit(1)
-        ).scalar_one_or_none()
-        
-        next_seq = 1
-        if last_sku:
-            try:
-                # 假设格式: 188 00521 ...
-                num_part = last_sku[len(prefix):len(prefix)+5]
-                if num_part.isdigit():
-                    next_seq = int(num_part) + 1
-            except:
-                pass
-                
-        seq_str = f"{next_seq:05d}"
-        clean_suffix = (suffix or "").upper().strip()[:3]
-        
-        return f"{prefix}{seq_str}{clean_suffix}"
+        prefix = category.code or "999"
+        clean_suffixes = [(suffix or "").upper().strip()[:3] for suffix in suffixes]
+        return allocate_skus(prefix, clean_suffixes, width=5)
 
     @staticmethod
     def preview_product_codes(category_id: int, spu_metadata: Dict[str, Any], variants_specs: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -318,21 +305,8 @@ class CodeBuilderService:
                 except:
                     pass
         else:
-            # New SPU: Find next available serial globally for this prefix
-            last_sku = db.session.execute(
-                select(ProductVariant.sku)
-                .where(ProductVariant.sku.like(f"{prefix}%"))
-                .order_by(func.length(ProductVariant.sku).desc(), ProductVariant.sku.desc())
-                .limit(1)
-            ).scalar_one_or_none()
-            
-            if last_sku:
-                try:
-                    num_part = last_sku[len(prefix):len(prefix)+2] 
-                    if num_part.isdigit():
-                        start_serial = int(num_part) + 1
-                except:
-                    pass
+            # New SPU: Peek next serial for this prefix (read-only, 不占号)
+            start_serial = peek_next_serial(prefix, width=2)
                 
         # Assign serials to groups
         group_serials = {}
@@ -0,0 +1,221 @@
+"""
+报关单/装箱单 Excel 导入
+
+- 列校验与类型转换全部为 pandas 向量化操作，不逐行 iterrows
+- SKU -> 产品/报关品类、供应商名称 -> 供应商 各一次批量查询
+- 行级错误以结构化结果返回 (行号/列/原值/原因)，默认有错误时不落库
+- 明细由 CustomsService.create_declaration 批量 INSERT
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from sqlalchemy import select, func
+from app.extensions import db
+from app.models.product import ProductVariant
+from app.models.customs.product import CustomsProduct
+from app.models.purchase.supplier import SysSupplier
+from app.errors import BusinessError
+
+# Excel 表头 -> 字段
+COLUMN_MAP = {
+    'SKU': 'sku',
+    'Quantity': 'qty',
+    'Price(USD)': 'usd_unit_price',
+    'Unit': 'unit',
+    'Supplier': 'supplier',
+    'BoxNo': 'box_no',
+    'NetWeight': 'net_weight',
+    'GrossWeight': 'gross_weight',
+}
+REQUIRED_COLUMNS = ['SKU', 'Quantity']
+
+# 行错误上限，超过后不再逐条列出
+MAX_REPORTED_ERRORS = 500
+
+
+@dataclass
+class DeclarationImportResult:
+    """导入结果"""
+    total_rows: int = 0
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    warnings: List[Dict[str, Any]] = field(default_factory=list)
+    error_count: int = 0
+    fob_total: Decimal = Decimal('0')
+
+    def add_errors(self, rows: pd.DataFrame, column: str, message: str, target: str = 'errors'):
+        """批量登记某一列校验失败的行"""
+        if rows.empty:
+            return
+        bucket = getattr(self, target)
+        if target == 'errors':
+            self.error_count += len(rows)
+        room = MAX_REPORTED_ERRORS - len(bucket)
+        for row_no, value in zip(rows['row'].head(max(room, 0)), rows[column].head(max(room, 0))):
+            bucket.append({
+                'row': int(row_no),
+                'column': column,
+                'value': None if pd.isna(value) else str(value),
+                'message': message,
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_rows': self.total_rows,
+            'imported_rows': len(self.items),
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'fob_total': self.fob_total,
+        }
+
+
+def read_declaration_excel(file_path: str) -> pd.DataFrame:
+    """读取 Excel，SKU/箱号按文本读取 (避免 00123 变成 123)"""
+    try:
+        return pd.read_excel(file_path, dtype={'SKU': str, 'BoxNo': str})
+    except Exception as e:
+        raise BusinessError(f"Failed to read Excel: {str(e)}", 400)
+
+
+def parse_declaration_frame(df: pd.DataFrame) -> DeclarationImportResult:
+    """
+    校验并转换装箱单数据
+
+    Returns:
+        DeclarationImportResult (items 为可直接批量插入的明细，不含 declaration_id)
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise BusinessError(f"Missing columns: {missing}", 400)
+
+    df = df.rename(columns=COLUMN_MAP)
+    for col in COLUMN_MAP.values():
+        if col not in df.columns:
+            df[col] = None
+    # 整行为空的行 (Excel 尾部格式残留) 直接忽略
+    df = df.dropna(how='all', subset=list(COLUMN_MAP.values()))
+    # Excel 行号 = 数据序号 + 表头行
+    df = df.assign(row=df.index + 2).reset_index(drop=True)
+
+    result = DeclarationImportResult(total_rows=len(df))
+    if df.empty:
+        return result
+
+    # 1. 类型转换 (向量化)
+    df['sku'] = df['sku'].astype('string').str.strip()
+    df['qty_num'] = pd.to_numeric(df['qty'], errors='coerce')
+    df['price_num'] = pd.to_numeric(df['usd_unit_price'], errors='coerce')
+    df['net_num'] = pd.to_numeric(df['net_weight'], errors='coerce')
+    df['gross_num'] = pd.to_numeric(df['gross_weight'], errors='coerce')
+    df['unit'] = df['unit'].astype('string').str.strip().replace('', pd.NA).fillna('PCS')
+    df['box_no'] = df['box_no'].astype('string').str.strip().replace('', pd.NA)
+    df['supplier'] = df['supplier'].astype('string').str.strip().replace('', pd.NA)
+
+    # 2. 列校验
+    bad = pd.Series(False, index=df.index)
+
+    missing_sku = df['sku'].isna() | (df['sku'] == '')
+    result.add_errors(df[missing_sku], 'sku', 'SKU 不能为空')
+    bad |= missing_sku
+
+    bad_qty = df['qty_num'].isna() | (df['qty_num'] <= 0)
+    result.add_errors(df[bad_qty], 'qty', '数量必须为大于0的数字')
+    bad |= bad_qty
+
+    price_given = df['usd_unit_price'].notna()
+    bad_price = price_given & (df['price_num'].isna() | (df['price_num'] < 0))
+    result.add_errors(df[bad_price], 'usd_unit_price', '单价必须为非负数字')
+    bad |= bad_price
+
+    for raw, num, label in (('net_weight', 'net_num', '净重'), ('gross_weight', 'gross_num', '毛重')):
+        bad_weight = df[raw].notna() & (df[num].isna() | (df[num] < 0))
+        result.add_errors(df[bad_weight], raw, f'{label}必须为非负数字')
+        bad |= bad_weight
+
+    # 3. SKU -> 产品/报关品类 (一次查询)
+    skus = df.loc[~missing_sku, 'sku'].unique().tolist()
+    products = _lookup_skus(skus)
+    resolved = df['sku'].map(products)
+    unknown_sku = ~missing_sku & resolved.isna()
+    result.add_errors(df[unknown_sku], 'sku', 'SKU 不存在')
+    bad |= unknown_sku
+
+    # 4. 供应商名称 -> ID (一次查询)，未匹配的供应商仅提示
+    supplier_names = df['supplier'].dropna().unique().tolist()
+    supplier_map = _lookup_suppliers(supplier_names)
+    df['supplier_id'] = df['supplier'].map(supplier_map)
+    unknown_supplier = df['supplier'].notna() & df['supplier_id'].isna()
+    result.add_errors(df[unknown_supplier], 'supplier', '供应商不存在，明细将不关联供应商', target='warnings')
+
+    # 5. 组装明细 (只处理通过校验的行)
+    good = df[~bad]
+    if good.empty:
+        return result
+
+    price = good['price_num'].fillna(0)
+    totals = (good['qty_num'] * price).round(2)
+    result.fob_total = Decimal(str(round(float(totals.sum()), 2)))
+
+    out = good.assign(price=price, total=totals).merge(
+        pd.DataFrame(list(products.values())), on='sku', how='left'
+    )
+    out = out.astype(object).where(out.notna(), None)
+    for rec in out.to_dict('records'):
+        result.items.append({
+            'product_id': int(rec['product_id']),
+            'hs_code': rec['hs_code'],
+            'product_name_spec': rec['name_cn'],
+            'product_name_en_spec': rec['name_en'],
+            'supplier_id': int(rec['supplier_id']) if rec['supplier_id'] is not None else None,
+            'sku': rec['sku'],
+            'qty': _decimal(rec['qty_num'], 4),
+            'unit': rec['unit'],
+            'usd_unit_price': _decimal(rec['price'], 4),
+            'usd_total': _decimal(rec['total'], 2),
+            'box_no': rec['box_no'],
+            'net_weight': _decimal(rec['net_num'], 4) if rec['net_num'] is not None else None,
+            'gross_weight': _decimal(rec['gross_num'], 4) if rec['gross_num'] is not None else None,
+        })
+    return result
+
+
+def _decimal(value, places: int) -> Decimal:
+    return Decimal(str(round(float(value), places)))
+
+
+def _lookup_skus(skus: List[str]) -> Dict[str, Dict[str, Any]]:
+    """SKU -> {product_id, hs_code, name_cn, name_en}，一次查询"""
+    if not skus:
+        return {}
+    stmt = (
+        select(
+            ProductVariant.sku,
+            ProductVariant.product_id,
+            CustomsProduct.hs_code,
+            func.coalesce(ProductVariant.customs_name_cn, CustomsProduct.name, ProductVariant.declared_name)
+            .label('name_cn'),
+            ProductVariant.customs_name_en.label('name_en'),
+        )
+        .outerjoin(CustomsProduct, CustomsProduct.id == ProductVariant.customs_product_id)
+        .where(ProductVariant.sku.in_(skus))
+    )
+    return {
+        row.sku: {
+            'sku': row.sku,
+            'product_id': row.product_id,
+            'hs_code': row.hs_code,
+            'name_cn': row.name_cn,
+            'name_en': row.name_en,
+        }
+        for row in db.session.execute(stmt)
+    }
+
+
+def _lookup_suppliers(names: List[str]) -> Dict[str, int]:
+    """供应商名称 -> ID，一次查询"""
+    if not names:
+        return {}
+    rows = db.session.execute(select(SysSupplier.name, SysSupplier.id).where(SysSupplier.name.in_(names)))
+    return {name: id_ for name, id_ in rows}
@@ -1,9 +1,9 @@
 """
 报关单PDF生成服务
 使用 WeasyPrint 从HTML生成PDF文档（更好的中文支持）
+WeasyPrint 导入较慢 (加载 Pango/Cairo)，在生成时才导入
 """
 from io import BytesIO
-from weasyprint import HTML, CSS
 from datetime import datetime
 from typing import List
 import logging
@@ -23,6 +23,8 @@ def generate_declaration_pdf(declaration, includes: List[str], current_user=None
     Returns:
         BytesIO: PDF文件流
     """
+    from weasyprint import HTML, CSS
+
     # 生成HTML内容
     html_content = _build_html_content(declaration, includes, current_user)
     
@@ -1517,6 +1519,7 @@ def generate_archived_files_pdf(declaration, current_user=None) -> BytesIO:
         BytesIO: 合并后的PDF文件流
     """
     from pypdf import PdfWriter, PdfReader
+    from weasyprint import HTML, CSS
     import os
     
     try:
@@ -1,5 +1,5 @@
 from typing import List, Dict, Optional
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, desc, func, insert
 from app.extensions import db
 from app.models.customs import CustomsDeclaration, CustomsDeclarationItem, CustomsAttachment
 from app.models.serc.enums import CustomsStatus, ContractStatus
@@ -12,49 +12,104 @@ from app.services.synology_client import SynologyClient
 from app.services.serc.common import generate_seq_no
 from app.services.customs.status_manager import DeclarationStatusManager, StatusTransitionValidator
 from app.services.customs.audit_service import audit_service
-import pandas as pd
+from app.services.excel_export import ExcelColumn, StreamingWorkbook, iter_rows, write_rows
 import datetime
 from datetime import datetime as dt
 import logging
 
 logger = logging.getLogger(__name__)
 
+DECLARATION_EXPORT_COLUMNS = [
+    ExcelColumn('预录入编号', 20),
+    ExcelColumn('报关单号', 20),
+    ExcelColumn('出口日期', 12, 'date'),
+    ExcelColumn('状态', 12),
+    ExcelColumn('提运单号', 18),
+    ExcelColumn('运抵国', 12),
+    ExcelColumn('项号', 6, 'integer'),
+    ExcelColumn('SKU', 20),
+    ExcelColumn('商品编号', 14),
+    ExcelColumn('商品名称', 30),
+    ExcelColumn('数量', 10, 'number'),
+    ExcelColumn('单位', 8),
+    ExcelColumn('单价', 12, 'number'),
+    ExcelColumn('总价', 14, 'money'),
+    ExcelColumn('币制', 8),
+    ExcelColumn('箱号', 10),
+    ExcelColumn('净重(KG)', 10, 'number'),
+    ExcelColumn('毛重(KG)', 10, 'number'),
+    ExcelColumn('供应商', 24),
+]
+
 class CustomsService:
     def get_declarations(self, page: int, per_page: int, filters: Dict = None):
         stmt = select(CustomsDeclaration).options(
             db.selectinload(CustomsDeclaration.internal_shipper)
         ).order_by(desc(CustomsDeclaration.pre_entry_no))
         
-        # Apply filters
-        if filters:
-            if filters.get('status') and filters['status'] != 'all':
-                status_val = filters['status']
-                if ',' in status_val:
-                    status_list = [s.strip() for s in status_val.split(',') if s.strip()]
-                    stmt = stmt.filter(CustomsDeclaration.status.in_(status_list))
-                else:
-                    stmt = stmt.filter(CustomsDeclaration.status == status_val)
-            
-            # 编号搜索：支持多字段模糊搜索 (pre_entry_no, customs_no)
-            if filters.get('search_no'):
-                search_term = f"%{filters['search_no']}%"
-                stmt = stmt.filter(
-                    db.or_(
-                        CustomsDeclaration.pre_entry_no.ilike(search_term),
-                        CustomsDeclaration.customs_no.ilike(search_term)
-                    )
-                )
-            
-            # 独立的预录入编号搜索
-            if filters.get('pre_entry_no'):
-                stmt = stmt.filter(CustomsDeclaration.pre_entry_no.ilike(f"%{filters['pre_entry_no']}%"))
-            
-            if filters.get('container_mode'):
-                stmt = stmt.filter(CustomsDeclaration.container_mode == filters['container_mode'])
+        stmt = self._filter_declarations(stmt, filters)
 
         pagination = db.paginate(stmt, page=page, per_page=per_page)
         return pagination
 
+    @staticmethod
+    def _filter_declarations(stmt, filters: Dict = None):
+        """报关单列表/导出共用的筛选条件"""
+        if not filters:
+            return stmt
+        if filters.get('status') and filters['status'] != 'all':
+            status_val = filters['status']
+            if ',' in status_val:
+                status_list = [s.strip() for s in status_val.split(',') if s.strip()]
+                stmt = stmt.filter(CustomsDeclaration.status.in_(status_list))
+            else:
+                stmt = stmt.filter(CustomsDeclaration.status == status_val)
+        
+        # 编号搜索：支持多字段模糊搜索 (pre_entry_no, customs_no)
+        if filters.get('search_no'):
+            search_term = f"%{filters['search_no']}%"
+            stmt = stmt.filter(
+                db.or_(
+                    CustomsDeclaration.pre_entry_no.ilike(search_term),
+                    CustomsDeclaration.customs_no.ilike(search_term)
+                )
+            )
+        
+        # 独立的预录入编号搜索
+        if filters.get('pre_entry_no'):
+            stmt = stmt.filter(CustomsDeclaration.pre_entry_no.ilike(f"%{filters['pre_entry_no']}%"))
+        
+        if filters.get('container_mode'):
+            stmt = stmt.filter(CustomsDeclaration.container_mode == filters['container_mode'])
+        return stmt
+
+    def export_declarations_excel(self, filters: Dict = None) -> Optional[str]:
+        """
+        流式导出报关单明细 (筛选条件同 get_declarations)，每行一条商品明细
+
+        Returns:
+            临时 xlsx 文件路径；无数据时返回 None
+        """
+        D, Item = CustomsDeclaration, CustomsDeclarationItem
+        stmt = (
+            select(
+                D.pre_entry_no, D.customs_no, D.export_date, D.status,
+                D.bill_of_lading_no, D.destination_country,
+                Item.item_no, Item.sku, Item.hs_code, Item.product_name_spec,
+                Item.qty, Item.unit, Item.usd_unit_price, Item.usd_total, Item.currency,
+                Item.box_no, Item.net_weight, Item.gross_weight,
+                SysSupplier.name.label('supplier_name'),
+            )
+            .join(Item, Item.declaration_id == D.id)
+            .outerjoin(SysSupplier, SysSupplier.id == Item.supplier_id)
+            .order_by(desc(D.pre_entry_no), D.id, Item.item_no)
+        )
+        stmt = self._filter_declarations(stmt, filters)
+
+        workbook = StreamingWorkbook()
+        sheet = write_rows(workbook, '报关明细', DECLARATION_EXPORT_COLUMNS, iter_rows(stmt))
+        return workbook.save() if sheet else None
+
     def get_declaration_stats(self) -> List[Dict]:
         """
         获取各状态报关单数量统计
@@ -162,28 +217,40 @@ class CustomsService:
             'source_type': data.get('source_type', 'manual')
         })
 
-        # Create Items
-        for item_data in data.get('items', []):
-            item = CustomsDeclarationItem(
-                declaration_id=decl.id,
-                product_id=item_data['product_id'],
-                supplier_id=item_data.get('supplier_id'),
-                sku=item_data.get('sku'),
-                qty=item_data['qty'],
-                unit=item_data['unit'],
-                usd_unit_price=item_data['usd_unit_price'],
-                usd_total=item_data['usd_total'],
-                
-                # Packing Info
-                box_no=item_data.get('box_no'),
-                net_weight=item_data.get('net_weight'),
-                gross_weight=item_data.get('gross_weight')
-            )
-            db.session.add(item)
+        # Create Items (批量 INSERT)
+        self._insert_items(decl.id, data.get('items', []))
         
         db.session.commit()
         return decl
 
+    @staticmethod
+    def _insert_items(declaration_id: int, items: List[Dict]) -> None:
+        """批量插入报关单明细，未指定项号时按顺序编号"""
+        if not items:
+            return
+        rows = []
+        for idx, item_data in enumerate(items, start=1):
+            rows.append({
+                'declaration_id': declaration_id,
+                'item_no': item_data.get('item_no') or idx,
+                'product_id': item_data['product_id'],
+                'supplier_id': item_data.get('supplier_id'),
+                'sku': item_data.get('sku'),
+                'hs_code': item_data.get('hs_code'),
+                'product_name_spec': item_data.get('product_name_spec'),
+                'product_name_en_spec': item_data.get('product_name_en_spec'),
+                'qty': item_data['qty'],
+                'unit': item_data['unit'],
+                'usd_unit_price': item_data['usd_unit_price'],
+                'usd_total': item_data['usd_total'],
+                
+                # Packing Info
+                'box_no': item_data.get('box_no'),
+                'net_weight': item_data.get('net_weight'),
+                'gross_weight': item_data.get('gross_weight')
+            })
+        db.session.execute(insert(CustomsDeclarationItem), rows)
+
     def change_status(self, id: int, new_status: str, reason: Optional[str] = None) -> CustomsDeclaration:
         """
         改变报关单状态（带流转控制）
@@ -312,71 +379,56 @@ class CustomsService:
         db.session.commit()
         return decl
 
-    def import_declaration_from_excel(self, file_path: str, source_data: dict = None, created_by: int = None) -> CustomsDeclaration:
+    def import_declaration_from_excel(self, file_path: str, source_data: dict = None, created_by: int = None,
+                                      skip_errors: bool = False) -> Dict:
         """
         从 Excel 导入报关/装箱单
+
+        Args:
+            file_path: Excel 文件路径
+            source_data: 表头信息 (提单号/物流商/装箱模式/出口日期)
+            created_by: 创建人
+            skip_errors: 存在行错误时是否跳过错误行继续导入 (默认整单不导入)
+
+        Returns:
+            {
+                'declaration_id': int | None, 'pre_entry_no': str | None,
+                'total_rows', 'imported_rows', 'error_count', 'errors', 'warnings', 'fob_total'
+            }
         """
-        try:
-            df = pd.read_excel(file_path)
-        except Exception as e:
-            raise BusinessError(f"Failed to read Excel: {str(e)}", 400)
-            
-        # Basic Validation
-        required_cols = ['SKU', 'Quantity']
-        missing = [c for c in required_cols if c not in df.columns]
-        if missing:
-            raise BusinessError(f"Missing columns: {missing}", 400)
-            
-        items_data = []
-        fob_total = 0
-        
-        # Determine Supplier (Name -> ID)
-        supplier_map = {}
-        if 'Supplier' in df.columns:
-            supplier_names = df['Supplier'].dropna().unique().tolist()
-            suppliers = db.session.query(SysSupplier).filter(SysSupplier.name.in_(supplier_names)).all()
-            supplier_map = {s.name: s.id for s in suppliers}
+        from app.services.customs.declaration_import import read_declaration_excel, parse_declaration_frame
+
+        result = parse_declaration_frame(read_declaration_excel(file_path))
+        summary = result.to_dict()
+        summary.update({'declaration_id': None, 'pre_entry_no': None})
+
+        if (result.error_count and not skip_errors) or not result.items:
+            if not result.error_count:
+                raise BusinessError("Excel 中没有可导入的明细", 400)
+            summary['imported_rows'] = 0
+            return summary
 
-        for _, row in df.iterrows():
-            sku = str(row['SKU']).strip()
-            qty = float(row['Quantity'])
-            price = float(row.get('Price(USD)', 0))
-            
-            # Placeholder resolution (Product ID = 1 if not found)
-            product_id = 1 
-            
-            supplier_name = row.get('Supplier')
-            supplier_id = supplier_map.get(supplier_name)
-            
-            items_data.append({
-                'product_id': product_id,
-                'supplier_id': supplier_id,
-                'sku': sku,
-                'qty': qty,
-                'unit': row.get('Unit', 'PCS'),
-                'usd_unit_price': price,
-                'usd_total': qty * price,
-                'box_no': str(row.get('BoxNo', '')),
-                'net_weight': row.get('NetWeight'),
-                'gross_weight': row.get('GrossWeight')
-            })
-            fob_total += qty * price
-            
         if not source_data:
             source_data = {}
+        export_date = source_data.get('export_date')
+        if isinstance(export_date, str):
+            # 后台任务经 JSON 传参，日期为 ISO 字符串
+            export_date = datetime.date.fromisoformat(export_date)
             
         decl_data = {
-            'export_date': source_data.get('export_date'),
+            'export_date': export_date,
             'bill_of_lading_no': source_data.get('shipping_no'),
             'logistics_provider': source_data.get('logistics_provider'),
             'container_mode': source_data.get('container_mode'),
             'source_type': 'excel_import',
             'source_file_url': file_path,
-            'fob_total': fob_total,
-            'items': items_data
+            'fob_total': result.fob_total,
+            'items': result.items
         }
         
-        return self.create_declaration(decl_data, created_by)
+        decl = self.create_declaration(decl_data, created_by)
+        summary.update({'declaration_id': decl.id, 'pre_entry_no': decl.pre_entry_no})
+        return summary
 
     def generate_contracts_from_declaration(self, declaration_id: int) -> List[int]:
         """
@@ -0,0 +1,186 @@
+"""
+流式 Excel 导出
+
+- openpyxl write_only 模式：行写入即落盘，内存占用与导出行数无关
+- 命名样式 (NamedStyle) 在工作簿上注册一次，单元格只引用样式名
+- 行数据由生成器提供，配合 yield_per 服务端游标逐批读取
+- 生成的 xlsx 分块下发 (chunked)，发送完毕后删除临时文件
+
+注意：write_only 模式不支持合并单元格/冻结窗格，合同级字段按行重复输出
+openpyxl 在首次导出时才导入 (路由模块会导入本模块，避免拖慢启动)
+"""
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, Sequence
+from urllib.parse import quote
+from flask import Response
+from app.extensions import db
+
+if TYPE_CHECKING:
+    from openpyxl.styles import NamedStyle
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 服务端游标每批读取行数
+YIELD_PER = 1000
+# 响应分块大小
+CHUNK_SIZE = 64 * 1024
+
+INVALID_SHEET_CHARS = ':\\/?*[]'
+
+
+@dataclass(frozen=True)
+class ExcelColumn:
+    """导出列定义 (style 为已注册的命名样式名)"""
+    title: str
+    width: float = 15
+    style: str = 'text'
+
+
+def _named_styles() -> List['NamedStyle']:
+    from openpyxl.styles import NamedStyle, Font, Alignment, PatternFill, Border, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal='center', vertical='center')
+
+    header = NamedStyle(name='header')
+    header.font = Font(bold=True, color='FFFFFF')
+    header.fill = PatternFill('solid', fgColor='4F81BD')
+    header.alignment = center
+    header.border = border
+
+    text = NamedStyle(name='text', alignment=center, border=border)
+    money = NamedStyle(name='money', number_format='#,##0.00', border=border)
+    number = NamedStyle(name='number', number_format='#,##0.####', border=border)
+    integer = NamedStyle(name='integer', number_format='#,##0', border=border)
+    date = NamedStyle(name='date', number_format='yyyy-mm-dd', alignment=center, border=border)
+    datetime_ = NamedStyle(name='datetime', number_format='yyyy-mm-dd hh:mm:ss', alignment=center, border=border)
+
+    title = NamedStyle(name='title', font=Font(bold=True))
+    total = NamedStyle(name='total', font=Font(bold=True), number_format='#,##0.00')
+    return [header, text, money, number, integer, date, datetime_, title, total]
+
+
+class SheetWriter:
+    """单个工作表的追加写入器"""
+
+    def __init__(self, ws, columns: Sequence[ExcelColumn]):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        self.ws = ws
+        self._cell = WriteOnlyCell
+        self.columns = list(columns)
+        self.row_count = 0
+        # write_only 模式下列宽必须在写第一行之前设置
+        for idx, col in enumerate(self.columns, 1):
+            ws.column_dimensions[get_column_letter(idx)].width = col.width
+        self._write([col.title for col in self.columns], ['header'] * len(self.columns))
+
+    def append(self, values: Sequence[Any]):
+        """按列定义的样式写入一行数据"""
+        self._write(values, [col.style for col in self.columns])
+        self.row_count += 1
+
+    def append_raw(self, values: Sequence[Any], styles: Optional[Sequence[Optional[str]]] = None):
+        """写入汇总/备注等不套用列样式的行"""
+        self._write(values, styles or [None] * len(values))
+
+    def _write(self, values, styles):
+        cells = []
+        for value, style in zip(values, styles):
+            cell = self._cell(self.ws, value=value)
+            if style:
+                cell.style = style
+            cells.append(cell)
+        self.ws.append(cells)
+
+
+class StreamingWorkbook:
+    """write_only 工作簿封装，工作表须顺序写完"""
+
+    def __init__(self):
+        from openpyxl import Workbook
+
+        self.wb = Workbook(write_only=True)
+        for style in _named_styles():
+            self.wb.add_named_style(style)
+        self._titles = set()
+        self.sheet_count = 0
+
+    def add_sheet(self, title: str, columns: Sequence[ExcelColumn]) -> SheetWriter:
+        ws = self.wb.create_sheet(title=self._safe_title(title))
+        self.sheet_count += 1
+        return SheetWriter(ws, columns)
+
+    def _safe_title(self, title: str) -> str:
+        base = ''.join(c for c in (title or 'Sheet') if c not in INVALID_SHEET_CHARS)[:30] or 'Sheet'
+        candidate, n = base, 1
+        while candidate in self._titles:
+            n += 1
+            suffix = f'_{n}'
+            candidate = base[:30 - len(suffix)] + suffix
+        self._titles.add(candidate)
+        return candidate
+
+    def save(self) -> str:
+        """保存到临时文件并返回路径 (由调用方或 xlsx_response 负责删除)"""
+        fd, path = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+        os.close(fd)
+        try:
+            self.wb.save(path)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+
+def iter_rows(stmt, yield_per: int = YIELD_PER) -> Iterator:
+    """以服务端游标分批读取查询结果"""
+    result = db.session.execute(stmt.execution_options(yield_per=yield_per))
+    try:
+        for row in result:
+            yield row
+    finally:
+        result.close()
+
+
+def write_rows(workbook: StreamingWorkbook, title: str, columns: Sequence[ExcelColumn],
+               rows: Iterable[Sequence[Any]]) -> Optional[SheetWriter]:
+    """单工作表导出：逐行写入生成器产出的数据；无数据时不建表并返回 None"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None
+    sheet = workbook.add_sheet(title, columns)
+    sheet.append(first)
+    for values in rows:
+        sheet.append(values)
+    return sheet
+
+
+def iter_file(path: str, chunk_size: int = CHUNK_SIZE, remove: bool = True) -> Iterator[bytes]:
+    """分块读取文件，读取完毕 (或客户端断开) 后删除"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if remove and os.path.exists(path):
+            os.remove(path)
+
+
+def xlsx_response(path: str, filename: str) -> Response:
+    """分块下发已生成的 xlsx 临时文件"""
+    size = os.path.getsize(path)
+    response = Response(iter_file(path), mimetype=XLSX_MIMETYPE, direct_passthrough=True)
+    response.headers['Content-Length'] = str(size)
+    response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    # 未开始迭代就断开时生成器的 finally 不会执行，兜底删除
+    response.call_on_close(lambda: os.path.exists(path) and os.remove(path))
+    return response
@@ -14,6 +14,7 @@ import requests
 from flask import current_app
 
 from app.errors import BusinessError
+from app.metrics import external_call, record_external_error
 
 logger = logging.getLogger(__name__)
 
@@ -121,15 +122,16 @@ class LingxingService:
             try:
                 logger.info(f'调用领星API: {endpoint}, 尝试次数: {retry_count + 1}/{max_retries}')
                 
-                response = requests.post(
-                    url,
-                    json=data,
-                    headers=headers,
-                    timeout=request_timeout
-                )
-                
-                # 解析响应
-                result = response.json()
+                with external_call('lingxing', endpoint):
+                    response = requests.post(
+                        url,
+                        json=data,
+                        headers=headers,
+                        timeout=request_timeout
+                    )
+                    
+                    # 解析响应
+                    result = response.json()
                 
                 # 检查业务状态码
                 if result.get('code') == 0:
@@ -138,6 +140,7 @@ class LingxingService:
                 
                 # 系统异常（5000）可以重试
                 elif result.get('code') == 5000:
+                    record_external_error('lingxing', endpoint, 'system_error')
                     logger.warning(f'领星API系统异常，准备重试: {result.get("message")}')
                     retry_count += 1
                     if retry_count < max_retries:
@@ -150,6 +153,7 @@ class LingxingService:
                 else:
                     error_code = result.get('code')
                     error_msg = result.get('message', '未知错误')
+                    record_external_error('lingxing', endpoint, 'api_error')
                     logger.error(f'领星API业务错误: code={error_code}, message={error_msg}')
                     raise BusinessError(
                         f'领星API错误: {error_msg}',
@@ -5,10 +5,10 @@
 2. 商品明细通过采购明细自动汇总生成
 3. 数据一致性验证
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Any
 from decimal import Decimal
-from collections import Counter
-from sqlalchemy import func
+from sqlalchemy import func, select, insert, update, delete, bindparam, and_, inspect as sa_inspect
+from sqlalchemy.orm import aliased
 from flask_jwt_extended import get_jwt_identity
 
 from app.extensions import db
@@ -169,109 +169,219 @@ class ShipmentPurchaseItemService:
             # 不分组，返回对象列表（让Schema自己序列化）
             return query.all()
     
+    # 商品明细中由采购明细汇总得出的字段 (其余字段如 HS 编码、FNSKU 由其他流程维护，同步时保留)
+    SYNC_FIELDS = ('product_id', 'product_name', 'quantity', 'unit', 'supplier_id', 'supplier_name')
+
     @staticmethod
-    def recalculate_all_items(shipment_id: int) -> None:
+    def recalculate_all_items(shipment_id: int, dry_run: bool = False) -> Dict[str, Any]:
         """
         重新计算整个发货单的商品明细（全量重算）
         
         场景：数据修复、批量导入后
+        dry_run=True 时只返回差异，不落库
+
+        Returns:
+            差异摘要，见 sync_items
         """
-        # 获取所有采购明细的SKU列表
-        skus = db.session.query(
-            ShipmentPurchaseItem.sku
-        ).filter_by(
-            shipment_order_id=shipment_id
-        ).distinct().all()
-        
-        # 清空现有商品明细
-        ShipmentOrderItem.query.filter_by(
-            shipment_id=shipment_id
-        ).delete()
-        
-        # 逐个SKU重新计算
-        for (sku,) in skus:
-            ShipmentPurchaseItemService._update_item_for_sku(shipment_id, sku)
-        
-        db.session.commit()
+        diff = ShipmentPurchaseItemService.sync_items(shipment_id, dry_run=dry_run)
+        if not dry_run:
+            db.session.commit()
+        return diff
     
     @staticmethod
     def _update_item_for_sku(shipment_id: int, sku: str) -> None:
+        """重新计算单个SKU的商品明细（采购明细增删改后调用）"""
+        ShipmentPurchaseItemService.sync_items(shipment_id, skus=[sku])
+
+    @staticmethod
+    def compute_target_items(shipment_id: int, skus: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
         """
-        重新计算单个SKU的商品明细（核心算法）
-        
-        算法逻辑：
-        1. 查询该SKU的所有采购明细
-        2. 汇总数量
-        3. 计算加权平均单价（已废弃，商品明细不再存储价格）
-        4. 确定主供应商（数量最多的）
-        5. 更新或创建商品明细
+        一次分组查询计算每个SKU的目标商品明细（核心算法）
+
+        1. 按 SKU 汇总采购数量
+        2. 按 (SKU, 供应商) 汇总数量，窗口函数取数量最多的为主供应商
+           (数量相同时取最早录入的供应商，与逐条累计的结果一致)
+        3. 商品名称/单位/产品取该 SKU 最早的一条采购明细
+
+        Returns:
+            {sku: {'product_id', 'product_name', 'quantity', 'unit', 'supplier_id', 'supplier_name'}}
         """
-        # 1. 查询该SKU的所有采购明细
-        purchase_items = ShipmentPurchaseItem.query.filter_by(
-            shipment_order_id=shipment_id,
-            sku=sku
-        ).all()
-        
-        if not purchase_items:
-            # 如果没有采购明细了，删除商品明细
-            ShipmentOrderItem.query.filter_by(
-                shipment_id=shipment_id,
-                sku=sku
-            ).delete()
-            return
-        
-        # 2. 汇总数据
-        total_quantity = sum(item.quantity for item in purchase_items)
-        
-        # 3. 确定主供应商（数量最多的）和供应商名称
-        supplier_quantities = Counter()
-        supplier_names = {}
-        for item in purchase_items:
-            if item.supplier_id:
-                supplier_quantities[item.supplier_id] += item.quantity
-                supplier_names[item.supplier_id] = item.supplier_name
-        
-        main_supplier_id = supplier_quantities.most_common(1)[0][0] if supplier_quantities else None
-        main_supplier_name = supplier_names.get(main_supplier_id) if main_supplier_id else None
-        
-        # 4. 获取第一个采购明细的商品信息
-        first_item = purchase_items[0]
-        product_variant = first_item.product_variant
-        
-        # 5. 更新或创建商品明细
-        shipment_item = ShipmentOrderItem.query.filter_by(
-            shipment_id=shipment_id,
-            sku=sku
-        ).first()
-        
-        if shipment_item:
-            # 更新现有商品明细
-            shipment_item.quantity = total_quantity
-            shipment_item.supplier_id = main_supplier_id
-            shipment_item.supplier_name = main_supplier_name
-            shipment_item.product_name = first_item.product_name
-            shipment_item.unit = first_item.unit
-            # 价格字段不再更新，保持为None或原值
-        else:
-            # 创建新的商品明细
-            shipment_item = ShipmentOrderItem(
-                shipment_id=shipment_id,
-                product_id=product_variant.product_id if product_variant else None,
-                sku=sku,
-                product_name=first_item.product_name,
-                quantity=total_quantity,
-                unit=first_item.unit,
-                supplier_id=main_supplier_id,
-                supplier_name=main_supplier_name,
-                # 价格字段设置为None（不再使用）
-                unit_price=None,
-                total_price=None,
-                tax_rate=None,
-                tax_amount=None,
-                unit_price_with_tax=None,
-                total_price_with_tax=None,
+        spi = ShipmentPurchaseItem
+        conditions = [spi.shipment_order_id == shipment_id]
+        if skus is not None:
+            conditions.append(spi.sku.in_(list(skus)))
+
+        sku_totals = (
+            select(
+                spi.sku.label('sku'),
+                func.sum(spi.quantity).label('quantity'),
+                func.min(spi.id).label('first_id'),
+            )
+            .where(*conditions)
+            .group_by(spi.sku)
+            .subquery('sku_totals')
+        )
+
+        supplier_ranked = (
+            select(
+                spi.sku.label('sku'),
+                spi.supplier_id.label('supplier_id'),
+                func.max(spi.supplier_name).label('supplier_name'),
+                func.row_number().over(
+                    partition_by=spi.sku,
+                    order_by=(func.sum(spi.quantity).desc(), func.min(spi.id))
+                ).label('rank'),
+            )
+            .where(*conditions, spi.supplier_id.isnot(None))
+            .group_by(spi.sku, spi.supplier_id)
+            .subquery('supplier_ranked')
+        )
+
+        first = aliased(spi, name='first_item')
+        stmt = (
+            select(
+                sku_totals.c.sku,
+                sku_totals.c.quantity,
+                first.product_name,
+                first.unit,
+                ProductVariant.product_id,
+                supplier_ranked.c.supplier_id,
+                supplier_ranked.c.supplier_name,
+            )
+            .join(first, first.id == sku_totals.c.first_id)
+            .outerjoin(ProductVariant, ProductVariant.id == first.product_variant_id)
+            .outerjoin(supplier_ranked, and_(
+                supplier_ranked.c.sku == sku_totals.c.sku,
+                supplier_ranked.c.rank == 1
+            ))
+        )
+
+        return {
+            row.sku: {
+                'product_id': row.product_id,
+                'product_name': row.product_name,
+                'quantity': Decimal(row.quantity or 0),
+                'unit': row.unit,
+                'supplier_id': row.supplier_id,
+                'supplier_name': row.supplier_name,
+            }
+            for row in db.session.execute(stmt)
+        }
+
+    @staticmethod
+    def sync_items(shipment_id: int, skus: Optional[Iterable[str]] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        按采购明细同步商品明细：批量插入新增SKU、批量更新变化行、批量删除已无采购明细的SKU
+
+        与原先"清空后逐个重建"不同，已存在的商品明细只更新汇总字段，
+        HS 编码、FNSKU、仓库配对数量等其他流程维护的字段得以保留；
+        同一SKU存在重复商品明细时保留最早一条。
+
+        Args:
+            shipment_id: 发货单ID
+            skus: 仅同步这些SKU（None 为全量）
+            dry_run: 只计算差异，不落库
+
+        Returns:
+            {
+                'insert': [{'sku', ...目标字段}],
+                'update': [{'id', 'sku', 'changes': {字段: [旧值, 新值]}}],
+                'delete': [{'id', 'sku', 'quantity'}],
+                'unchanged': int
+            }
+        """
+        if skus is not None:
+            skus = list(dict.fromkeys(skus))
+            if not skus:
+                return {'insert': [], 'update': [], 'delete': [], 'unchanged': 0}
+
+        targets = ShipmentPurchaseItemService.compute_target_items(shipment_id, skus)
+
+        soi = ShipmentOrderItem
+        existing_stmt = (
+            select(soi.id, soi.sku, *[getattr(soi, f) for f in ShipmentPurchaseItemService.SYNC_FIELDS if f != 'sku'])
+            .where(soi.shipment_id == shipment_id)
+            .order_by(soi.id)
+        )
+        if skus is not None:
+            existing_stmt = existing_stmt.where(soi.sku.in_(skus))
+
+        diff = {'insert': [], 'update': [], 'delete': [], 'unchanged': 0}
+        seen = set()
+        for row in db.session.execute(existing_stmt):
+            target = targets.get(row.sku)
+            if target is None or row.sku in seen:
+                diff['delete'].append({'id': row.id, 'sku': row.sku, 'quantity': row.quantity})
+                continue
+            seen.add(row.sku)
+            changes = {}
+            for field in ShipmentPurchaseItemService.SYNC_FIELDS:
+                old, new = getattr(row, field), target[field]
+                if field == 'quantity':
+                    if Decimal(old or 0) != new:
+                        changes[field] = [old, new]
+                elif field == 'product_id':
+                    # 产品ID仅在新建时确定，已有明细不覆盖
+                    continue
+                elif old != new:
+                    changes[field] = [old, new]
+            if changes:
+                diff['update'].append({'id': row.id, 'sku': row.sku, 'changes': changes})
+            else:
+                diff['unchanged'] += 1
+
+        for sku, target in targets.items():
+            if sku not in seen:
+                diff['insert'].append({'sku': sku, **target})
+
+        if not dry_run:
+            ShipmentPurchaseItemService._apply_diff(shipment_id, diff, targets)
+        return diff
+
+    @staticmethod
+    def _apply_diff(shipment_id: int, diff: Dict[str, Any], targets: Dict[str, Dict[str, Any]]) -> None:
+        """按差异批量落库：DELETE ... IN、executemany UPDATE、批量 INSERT"""
+        if diff['delete']:
+            db.session.execute(
+                delete(ShipmentOrderItem)
+                .where(ShipmentOrderItem.id.in_([d['id'] for d in diff['delete']]))
+                .execution_options(synchronize_session=False)
+            )
+
+        if diff['update']:
+            # 变化行统一写入目标值 (未变化字段目标值与原值相同)，一次 executemany
+            table = ShipmentOrderItem.__table__
+            fields = [f for f in ShipmentPurchaseItemService.SYNC_FIELDS if f != 'product_id']
+            db.session.connection().execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(
+                    {f: bindparam(f'b_{f}') for f in fields}
+                ),
+                [
+                    {'b_id': entry['id'], **{f'b_{f}': targets[entry['sku']][f] for f in fields}}
+                    for entry in diff['update']
+                ]
             )
-            db.session.add(shipment_item)
+
+        if diff['insert']:
+            db.session.execute(insert(ShipmentOrderItem), [
+                {
+                    'shipment_id': shipment_id,
+                    'sku': entry['sku'],
+                    'product_id': entry['product_id'],
+                    'product_name': entry['product_name'],
+                    'quantity': entry['quantity'],
+                    'unit': entry['unit'],
+                    'supplier_id': entry['supplier_id'],
+                    'supplier_name': entry['supplier_name'],
+                }
+                for entry in diff['insert']
+            ])
+
+        # 批量语句绕过了会话，已加载的商品明细需要重新读取。
+        # 只读已加载的状态 (state.dict)：已过期对象访问属性会触发刷新，行已删除时抛 ObjectDeletedError
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, ShipmentOrderItem) and sa_inspect(obj).dict.get('shipment_id') == shipment_id:
+                db.session.expire(obj)
     
     @staticmethod
     def _group_by_supplier(purchase_items: List[ShipmentPurchaseItem]) -> List[Dict]:
@@ -374,14 +484,14 @@ class ShipmentPurchaseItemService:
         if item_count == 0:
             errors.append('商品明细未生成，请先添加采购明细')
         
-        # 检查数量一致性
+        # 检查数量一致性 (采购数量一次分组汇总)
+        purchase_totals = dict(db.session.execute(
+            select(ShipmentPurchaseItem.sku, func.sum(ShipmentPurchaseItem.quantity))
+            .where(ShipmentPurchaseItem.shipment_order_id == shipment_id)
+            .group_by(ShipmentPurchaseItem.sku)
+        ).all())
         for item in ShipmentOrderItem.query.filter_by(shipment_id=shipment_id).all():
-            purchase_total = db.session.query(
-                func.sum(ShipmentPurchaseItem.quantity)
-            ).filter_by(
-                shipment_order_id=shipment_id,
-                sku=item.sku
-            ).scalar() or 0
+            purchase_total = purchase_totals.get(item.sku) or 0
             
             if purchase_total != item.quantity:
                 errors.append(
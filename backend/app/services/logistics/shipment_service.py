@@ -17,6 +17,7 @@ from sqlalchemy.orm import selectinload
 from app.extensions import db
 from app.models.logistics.shipment import ShipmentOrder, ShipmentOrderItem, ShipmentStatus
 from app.errors import BusinessError
+from app.services.sequence_service import SequenceService
 
 logger = logging.getLogger(__name__)
 
@@ -33,23 +34,7 @@ class ShipmentService:
         例如: SH-20251218-0001
         """
         today = datetime.now().strftime('%Y%m%d')
-        prefix = f"SH-{today}"
-        
-        # 查询今天已有的最大流水号
-        stmt = select(ShipmentOrder).where(
-            ShipmentOrder.shipment_no.like(f"{prefix}%")
-        ).order_by(ShipmentOrder.shipment_no.desc())
-        
-        last_shipment = db.session.execute(stmt).scalars().first()
-        
-        if last_shipment:
-            # 提取流水号部分并加1
-            last_no = last_shipment.shipment_no.split('-')[-1]
-            next_no = int(last_no) + 1
-        else:
-            next_no = 1
-        
-        shipment_no = f"{prefix}-{next_no:04d}"
+        shipment_no = SequenceService.next_no(f"SH-{today}-", column=ShipmentOrder.shipment_no)
         logger.info(f'生成发货单号: {shipment_no}')
         
         return shipment_no
@@ -12,6 +12,7 @@ from app.models.logistics.logistics_statement import LogisticsStatement, Stateme
 from app.models.logistics.shipment_logistics_service import ShipmentLogisticsService, ServiceStatus
 from app.models.logistics.logistics_provider import LogisticsProvider
 from app.errors import BusinessError
+from app.services.sequence_service import SequenceService
 
 
 class StatementService:
@@ -21,20 +22,7 @@ class StatementService:
     def generate_statement_no() -> str:
         """生成对账单号: LS + YYYYMMDD + 4位流水号"""
         today = datetime.now().strftime('%Y%m%d')
-        prefix = f"LS{today}"
-        
-        # 查询今日最大流水号
-        stmt = select(LogisticsStatement).where(
-            LogisticsStatement.statement_no.like(f"{prefix}%")
-        ).order_by(LogisticsStatement.statement_no.desc())
-        latest = db.session.execute(stmt).scalars().first()
-        
-        if latest:
-            seq = int(latest.statement_no[-4:]) + 1
-        else:
-            seq = 1
-        
-        return f"{prefix}{seq:04d}"
+        return SequenceService.next_no(f"LS{today}", column=LogisticsStatement.statement_no)
     
     @staticmethod
     def create_draft_statement(data: Dict[str, Any], created_by: int) -> LogisticsStatement:
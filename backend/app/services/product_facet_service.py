@@ -0,0 +1,145 @@
+import re
+import logging
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, func, literal, cast, String, union_all, text
+from app.extensions import db
+from app.models.product import Product, ProductVariant, Category, AttributeDefinition, CategoryAttribute
+from app.services.product_service import ProductService
+
+logger = logging.getLogger(__name__)
+
+
+class ProductFacetService:
+    """
+    SKU 分面筛选 (Faceted Search)
+
+    - 结果与 ProductService.list_skus 完全一致，额外返回各维度的命中计数
+    - 计数在一条 SQL 中完成: 先把筛选后的 SKU 投影为 CTE (仅取分面列)，
+      再对每个分面 GROUP BY 后 UNION ALL，基础表只扫描一次
+    - 分面维度: 品牌、车型、分类，以及 AttributeDefinition 中配置为 SKU 作用域的规格属性
+    - 计数基于当前全部筛选条件 (合取语义)
+    """
+
+    BASE_FACETS = ('brand', 'model', 'category')
+    MAX_VALUES_PER_FACET = 50
+
+    def __init__(self, product_service: Optional[ProductService] = None):
+        self.product_service = product_service or ProductService()
+
+    @staticmethod
+    def spec_attributes(category_id: Optional[int] = None) -> List[AttributeDefinition]:
+        """获取参与分面的规格属性 (SKU 作用域)"""
+        stmt = (
+            select(AttributeDefinition)
+            .join(CategoryAttribute, CategoryAttribute.attribute_id == AttributeDefinition.id)
+            .where(CategoryAttribute.attribute_scope == 'sku')
+            .order_by(AttributeDefinition.code_weight, AttributeDefinition.key_name)
+            .distinct()
+        )
+        if category_id:
+            stmt = stmt.where(CategoryAttribute.category_id == category_id)
+        return db.session.scalars(stmt).all()
+
+    def facet_counts(self, filters: Dict[str, Any] = None, spec_keys: List[str] = None) -> List[Dict[str, Any]]:
+        """单次聚合计算所有分面计数"""
+        filters = filters or {}
+        attributes = self.spec_attributes(filters.get('category_id'))
+        if spec_keys is not None:
+            attributes = [a for a in attributes if a.key_name in spec_keys]
+
+        columns = [
+            Product.brand.label('brand'),
+            Product.spu_coding_metadata['model'].astext.label('model'),
+            cast(Product.category_id, String).label('category'),
+        ]
+        spec_columns = {}
+        for i, attr in enumerate(attributes):
+            label = f'spec_{i}'
+            spec_columns[label] = attr
+            columns.append(ProductVariant.specs[attr.key_name].astext.label(label))
+
+        base = select(*columns).select_from(ProductVariant).join(
+            Product, ProductVariant.product_id == Product.id
+        )
+        base, _ = self.product_service._apply_sku_filters(base, filters)
+        base, _ = self.product_service._apply_stock_filters(base, filters)
+        filtered = base.cte('filtered_skus')
+
+        facet_names = list(self.BASE_FACETS) + list(spec_columns)
+        parts = [
+            select(
+                literal(name).label('facet'),
+                filtered.c[name].label('value'),
+                func.count().label('count')
+            )
+            .where(filtered.c[name].isnot(None))
+            .group_by(filtered.c[name])
+            for name in facet_names
+        ]
+        rows = db.session.execute(union_all(*parts)).all()
+
+        buckets: Dict[str, List[Dict[str, Any]]] = {name: [] for name in facet_names}
+        for row in rows:
+            if row.value == '':
+                continue
+            buckets[row.facet].append({'value': row.value, 'label': row.value, 'count': row.count})
+
+        # 分类显示名称 (一次查询)
+        category_ids = [int(b['value']) for b in buckets['category']]
+        if category_ids:
+            names = dict(db.session.execute(
+                select(Category.id, Category.name).where(Category.id.in_(category_ids))
+            ).all())
+            for bucket in buckets['category']:
+                bucket['label'] = names.get(int(bucket['value']), bucket['value'])
+
+        facets = [
+            {'key': 'brand', 'label': '品牌', 'values': buckets['brand']},
+            {'key': 'model', 'label': '车型', 'values': buckets['model']},
+            {'key': 'category_id', 'label': '分类', 'values': buckets['category']},
+        ]
+        for label, attr in spec_columns.items():
+            facets.append({'key': f'attr_{attr.key_name}', 'label': attr.label, 'values': buckets[label]})
+
+        for facet in facets:
+            facet['values'].sort(key=lambda b: (-b['count'], str(b['label'])))
+            del facet['values'][self.MAX_VALUES_PER_FACET:]
+        return facets
+
+    def list_skus_with_facets(self, page: int = 1, per_page: int = 20,
+                              filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """SKU 列表 + 分面计数"""
+        result = self.product_service.list_skus(page=page, per_page=per_page, filters=filters)
+        result['facets'] = self.facet_counts(filters)
+        return result
+
+    @staticmethod
+    def ensure_spec_indexes(concurrently: bool = True) -> List[str]:
+        """
+        为已配置的 SKU 规格属性创建 specs ->> key 表达式索引 (仅 PostgreSQL)
+        属性定义在运行时新增，因此不放在迁移中，由命令按需补齐
+        """
+        if db.engine.dialect.name != 'postgresql':
+            return []
+
+        keys = db.session.scalars(
+            select(AttributeDefinition.key_name)
+            .join(CategoryAttribute, CategoryAttribute.attribute_id == AttributeDefinition.id)
+            .where(CategoryAttribute.attribute_scope == 'sku')
+            .distinct()
+        ).all()
+        db.session.commit()
+
+        created = []
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for key in keys:
+                safe_key = re.sub(r'[^0-9a-z_]', '_', key.lower())
+                index_name = f'idx_pv_spec_{safe_key}'[:63]
+                literal_key = key.replace("'", "''")
+                conn.execute(text(
+                    f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name} "
+                    f"ON product_variants ((specs ->> '{literal_key}'))"
+                ))
+                created.append(index_name)
+        logger.info(f"Ensured spec facet indexes: {created}")
+        return created
@@ -0,0 +1,169 @@
+import re
+import logging
+from typing import Iterable, List, Dict, Any, Optional
+from sqlalchemy import select, delete, insert, case, or_, func
+from sqlalchemy.orm import selectinload
+from app.extensions import db
+from app.models.product import Product, ProductSearchDocument
+
+logger = logging.getLogger(__name__)
+
+
+class ProductSearchService:
+    """
+    商品搜索子系统
+
+    - 每个 SKU 一份反范式搜索文档 (product_search_documents)
+    - 检索: search_text LIKE '%q%' (PostgreSQL 下由 pg_trgm GIN 索引支撑)，
+      同时匹配去除分隔符的编码形式 (如 "15-1234" 可用 "151234" 搜到)
+    - 排序: SKU 精确命中 > OE/参考编码精确命中 > 编码前缀命中 > 其他
+    - 维护: 商品/SKU/参考编码写入后调用 reindex_products 增量重建 (不提交事务，由调用方提交)
+    """
+
+    RANK_EXACT_SKU = 0
+    RANK_EXACT_REF_CODE = 1
+    RANK_CODE_PREFIX = 2
+    RANK_OTHER = 3
+
+    @staticmethod
+    def normalize(text: Optional[str]) -> str:
+        return (text or '').strip().lower()
+
+    @staticmethod
+    def compact(text: Optional[str]) -> str:
+        """去除空格/横杠等分隔符 (OE 号常见多种写法)"""
+        return re.sub(r'[^0-9a-z]', '', (text or '').lower())
+
+    # ------------------------------------------------------------------
+    # 索引维护
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build_documents(cls, product: Product) -> List[Dict[str, Any]]:
+        """构建单个 SPU 的搜索文档 (每个 SKU 一条，无 SKU 时一条)"""
+        refs = [rc.code for rc in product.reference_codes if rc.code]
+        ref_codes = None
+        if refs:
+            ref_codes = ' ' + ' '.join(f"{cls.normalize(c)} {cls.compact(c)}" for c in refs) + ' '
+
+        variants = product.variants or [None]
+        documents = []
+        for variant in variants:
+            codes = [product.spu_code] + refs
+            if variant is not None:
+                codes = [variant.sku, variant.feature_code] + codes
+            codes = [c for c in codes if c]
+
+            search_text = ' '.join(
+                [cls.normalize(c) for c in codes] + [cls.normalize(product.name)] + [cls.compact(c) for c in codes]
+            )
+            documents.append({
+                'product_id': product.id,
+                'variant_id': variant.id if variant is not None else None,
+                'sku': cls.normalize(variant.sku) if variant is not None else None,
+                'feature_code': cls.normalize(variant.feature_code) if variant is not None else None,
+                'spu_code': cls.normalize(product.spu_code),
+                'ref_codes': ref_codes,
+                'search_text': search_text,
+            })
+        return documents
+
+    @classmethod
+    def reindex_products(cls, product_ids: Iterable[int]) -> int:
+        """增量重建指定 SPU 的搜索文档 (delete + bulk insert)"""
+        ids = {pid for pid in product_ids if pid}
+        if not ids:
+            return 0
+
+        db.session.flush()
+        db.session.execute(delete(ProductSearchDocument).where(ProductSearchDocument.product_id.in_(ids)))
+
+        products = db.session.scalars(
+            select(Product)
+            .options(selectinload(Product.variants), selectinload(Product.reference_codes))
+            .where(Product.id.in_(ids))
+            .execution_options(populate_existing=True)
+        ).all()
+
+        rows = []
+        for product in products:
+            rows.extend(cls.build_documents(product))
+        if rows:
+            db.session.execute(insert(ProductSearchDocument), rows)
+        return len(rows)
+
+    @classmethod
+    def reindex_batches(cls, product_ids: Iterable[int], batch_size: int = 500) -> int:
+        """按批重建指定 SPU 并逐批提交 (批量造数/导入绕过 ProductService 时调用)"""
+        ids = list(product_ids)
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            total += cls.reindex_products(ids[start:start + batch_size])
+            db.session.commit()
+            db.session.expunge_all()
+        return total
+
+    @classmethod
+    def reindex_all(cls, batch_size: int = 500) -> int:
+        """全量重建 (按 SPU ID 分批，每批提交)"""
+        db.session.execute(delete(ProductSearchDocument))
+        db.session.commit()
+
+        total = 0
+        last_id = 0
+        while True:
+            ids = db.session.scalars(
+                select(Product.id).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            total += cls.reindex_products(ids)
+            db.session.commit()
+            db.session.expunge_all()
+            last_id = ids[-1]
+
+        logger.info(f"Product search index rebuilt: {total} documents")
+        return total
+
+    # ------------------------------------------------------------------
+    # 查询构造
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def match_condition(cls, q: str):
+        """搜索条件 (作用于 ProductSearchDocument)"""
+        q_norm = cls.normalize(q)
+        q_compact = cls.compact(q)
+        conditions = [ProductSearchDocument.search_text.contains(q_norm, autoescape=True)]
+        if q_compact and q_compact != q_norm:
+            conditions.append(ProductSearchDocument.search_text.contains(q_compact, autoescape=True))
+        return or_(*conditions)
+
+    @classmethod
+    def rank_expression(cls, q: str):
+        """相关度排序表达式 (越小越靠前)"""
+        q_norm = cls.normalize(q)
+        q_compact = cls.compact(q) or q_norm
+        doc = ProductSearchDocument
+        return case(
+            (doc.sku == q_norm, cls.RANK_EXACT_SKU),
+            (doc.ref_codes.contains(f' {q_norm} ', autoescape=True), cls.RANK_EXACT_REF_CODE),
+            (doc.ref_codes.contains(f' {q_compact} ', autoescape=True), cls.RANK_EXACT_REF_CODE),
+            (doc.sku.startswith(q_norm, autoescape=True), cls.RANK_CODE_PREFIX),
+            (doc.feature_code.startswith(q_norm, autoescape=True), cls.RANK_CODE_PREFIX),
+            (doc.spu_code.startswith(q_norm, autoescape=True), cls.RANK_CODE_PREFIX),
+            else_=cls.RANK_OTHER
+        )
+
+    @classmethod
+    def product_rank_subquery(cls, q: str):
+        """命中的 SPU 及其最佳排名 (每个 SPU 一行，无需 DISTINCT)"""
+        return (
+            select(
+                ProductSearchDocument.product_id.label('product_id'),
+                func.min(cls.rank_expression(q)).label('rank')
+            )
+            .where(cls.match_condition(q))
+            .group_by(ProductSearchDocument.product_id)
+            .subquery('product_search_rank')
+        )
@@ -1,9 +1,13 @@
 from typing import List, Dict, Any
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select, or_, and_, func, case
 from sqlalchemy.orm import selectinload
 from app.extensions import db
-from app.models.product import Product, ProductVariant, ProductReferenceCode, ProductFitment, Category
+from app.models.product import (
+    Product, ProductVariant, ProductReferenceCode, ProductFitment, Category, ProductSearchDocument
+)
 from app.services.code_builder import CodeBuilderService
+from app.services.product_search_service import ProductSearchService
+from app.services.warehouse.stock_service import StockService
 from app.errors import BusinessError
 import logging
 
@@ -15,6 +19,16 @@ class ProductService:
     Integrated with CodeBuilderService for dual-track coding system.
     """
 
+    # SKU 列表支持的库存排序字段 -> 汇总子查询列
+    STOCK_SORT_FIELDS = {
+        'stock_quantity': 'physical_quantity',
+        'available_quantity': 'available_quantity',
+        'in_transit': 'in_transit_quantity',
+    }
+
+    def __init__(self):
+        self.stock_service = StockService()
+
     def create_product(self, data: dict) -> Product:
         """
         创建产品 (SPU + Variants)
@@ -102,6 +116,20 @@ class ProductService:
         new_variants_skus = []
         existing_variants_skus = []
         
+        # 未指定 SKU 的规格一次性批量预留流水号
+        pending_variants = [v for v in data.get('variants', []) if not v.get('sku')]
+        generated_skus = iter([])
+        if pending_variants:
+            try:
+                generated_skus = iter(CodeBuilderService.generate_sku_short_codes(
+                    category_id, [v.get('suffix_code') for v in pending_variants]
+                ))
+            except BusinessError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to generate SKU short code: {e}")
+                raise BusinessError("Failed to generate SKU short code")
+        
         for v_data in data.get('variants', []):
             specs = v_data.get('specs', {})
             
@@ -111,16 +139,8 @@ class ProductService:
                 feature_code = CodeBuilderService.generate_sku_feature_code(spu.spu_code, specs, category_id=category_id)
             
             # B. 生成/确定 SKU 短码 (用于扫码)
-            sku = v_data.get('sku')
-            suffix_code = v_data.get('suffix_code') # 允许前端显式传后缀
-            
-            if not sku:
-                # New variant generation
-                try:
-                    sku = CodeBuilderService.generate_sku_short_code(category_id, suffix_code)
-                except Exception as e:
-                    logger.error(f"Failed to generate SKU short code: {e}")
-                    raise BusinessError("Failed to generate SKU short code")
+            # 允许前端显式传后缀 (suffix_code)，已在上方批量生成
+            sku = v_data.get('sku') or next(generated_skus)
 
             # Check if variant exists (by SKU)
             existing_variant = db.session.scalar(select(ProductVariant).filter_by(sku=sku))
@@ -188,8 +208,10 @@ class ProductService:
                     fitment_type=fit_data.get('fitment_type')
                 )
                 db.session.add(fitment)
-            
+
         try:
+            # 5. 增量重建搜索文档 (会触发 flush，需在异常处理范围内)
+            ProductSearchService.reindex_products([spu.id])
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -226,16 +248,15 @@ class ProductService:
         )
         
         # Filtering
+        # Search in SPU name, SPU code, Variant SKU, Feature Code, Reference Code
+        # 走搜索文档 (trigram 索引)，每个 SPU 一行，无需 outer join + DISTINCT
+        rank = None
         if q:
-            # Search in SPU name, SPU code, Variant SKU, Reference Code, OR JSON Metadata
-            # Note: JSON searching syntax depends on DB (PG uses ->>)
-            stmt = stmt.outerjoin(ProductVariant).outerjoin(ProductReferenceCode).where(
-                (Product.name.ilike(f"%{q}%")) | 
-                (Product.spu_code.ilike(f"%{q}%")) |
-                (ProductVariant.sku.ilike(f"%{q}%")) |
-                (ProductVariant.feature_code.ilike(f"%{q}%")) | # Search by feature code
-                (ProductReferenceCode.code.ilike(f"%{q}%"))
-            ).distinct()
+            rank_sq = ProductSearchService.product_rank_subquery(q)
+            stmt = stmt.join(rank_sq, rank_sq.c.product_id == Product.id)
+            rank = rank_sq.c.rank
+            # 精确命中 (SKU / OE 号) 优先
+            stmt = stmt.order_by(rank.asc())
             
         # Sorting
         if sort:
@@ -268,6 +289,9 @@ class ProductService:
         # Update variants? 
         # Update fitments?
         # 暂略，需根据具体前端交互设计实现
+
+        if 'name' in data:
+            ProductSearchService.reindex_products([product.id])
         
         db.session.commit()
         return product
@@ -285,8 +309,10 @@ class ProductService:
                 - brand: 品牌
                 - model: 车型
                 - attribute_filters: 属性筛选 {key: value}
-                - stock_min: 最小库存
-                - stock_max: 最大库存
+                - stock_min: 最小可用库存
+                - stock_max: 最大可用库存
+                - warning_status: 预警状态 normal/warning/danger
+                - sort: 库存排序 stock_quantity/available_quantity/in_transit (前缀 - 表示倒序)
                 - is_active: 是否启用
         """
         # 基础查询：关联Product和Category
@@ -299,47 +325,22 @@ class ProductService:
         )
         
         # 应用筛选条件
-        if filters:
-            # 搜索关键词
-            if filters.get('q'):
-                q = f"%{filters['q']}%"
-                stmt = stmt.where(
-                    or_(
-                        ProductVariant.sku.ilike(q),
-                        ProductVariant.feature_code.ilike(q),
-                        Product.name.ilike(q),
-                        Product.spu_code.ilike(q)
-                    )
-                )
-            
-            # 分类筛选
-            if filters.get('category_id'):
-                stmt = stmt.where(Product.category_id == filters['category_id'])
-            
-            # 品牌/车型筛选
-            if filters.get('brand'):
-                stmt = stmt.where(Product.brand == filters['brand'])
-            if filters.get('model'):
-                stmt = stmt.where(Product.spu_coding_metadata['model'].astext == filters['model'])
-            
-            # 状态筛选
-            if 'is_active' in filters:
-                stmt = stmt.where(ProductVariant.is_active == filters['is_active'])
-            
-            # 属性筛选 (JSONB字段查询)
-            if filters.get('attribute_filters'):
-                for key, value in filters['attribute_filters'].items():
-                    # 查询 specs JSONB字段中的属性
-                    stmt = stmt.where(
-                        ProductVariant.specs[key].astext == str(value)
-                    )
-        
-        # 排序：默认按创建时间倒序
+        stmt, rank = self._apply_sku_filters(stmt, filters)
+        stmt, stock_order = self._apply_stock_filters(stmt, filters)
+        
+        # 排序：库存排序 > 搜索精确命中优先 > 按创建时间倒序
+        if stock_order is not None:
+            stmt = stmt.order_by(stock_order)
+        if rank is not None:
+            stmt = stmt.order_by(rank.asc())
         stmt = stmt.order_by(ProductVariant.created_at.desc())
         
         # 分页查询
         pagination = db.paginate(stmt, page=page, per_page=per_page)
         
+        # 本页 SKU 库存汇总 (一次分组查询)
+        stock_levels = self.stock_service.get_sku_stock_levels([v.sku for v in pagination.items])
+        
         # 转换结果格式
         items = []
         for variant in pagination.items:
@@ -364,10 +365,7 @@ class ProductService:
                 'brand': product.brand,
                 'model': product.spu_coding_metadata.get('model') if product.spu_coding_metadata else None,
                 'attributes_display': ', '.join(attributes_display) if attributes_display else '-',
-                'stock_quantity': 0,  # TODO: 集成库存系统后填充
-                'safety_stock': 0,    # TODO: 集成库存系统后填充
-                'in_transit': 0,      # TODO: 集成库存系统后填充
-                'warning_status': 'normal',  # TODO: 根据库存计算
+                **self._stock_fields(variant, stock_levels.get(variant.sku)),
                 'quality_type': variant.quality_type,
                 'is_active': variant.is_active,
                 'created_at': variant.created_at, # Schema handles ISO serialization
@@ -383,6 +381,123 @@ class ProductService:
             'pages': pagination.pages
         }
 
+    def _apply_sku_filters(self, stmt, filters: Dict[str, Any] = None):
+        """
+        应用 SKU 列表筛选条件 (stmt 需已 join Product)
+        返回 (stmt, rank)，rank 为搜索相关度排序表达式 (无搜索时为 None)
+        """
+        rank = None
+        if not filters:
+            return stmt, rank
+
+        # 搜索关键词 (SKU编码、特征码、产品名称、SPU编码、OE/参考编码)
+        if filters.get('q'):
+            stmt = stmt.join(
+                ProductSearchDocument, ProductSearchDocument.variant_id == ProductVariant.id
+            ).where(ProductSearchService.match_condition(filters['q']))
+            rank = ProductSearchService.rank_expression(filters['q'])
+        
+        # 分类筛选
+        if filters.get('category_id'):
+            stmt = stmt.where(Product.category_id == filters['category_id'])
+        
+        # 品牌/车型筛选
+        if filters.get('brand'):
+            stmt = stmt.where(Product.brand == filters['brand'])
+        if filters.get('model'):
+            stmt = stmt.where(Product.spu_coding_metadata['model'].astext == filters['model'])
+        
+        # 状态筛选
+        if 'is_active' in filters:
+            stmt = stmt.where(ProductVariant.is_active == filters['is_active'])
+        
+        # 属性筛选 (JSONB字段查询，命中 specs ->> key 表达式索引)
+        if filters.get('attribute_filters'):
+            for key, value in filters['attribute_filters'].items():
+                stmt = stmt.where(
+                    ProductVariant.specs[key].astext == str(value)
+                )
+
+        return stmt, rank
+
+    def _apply_stock_filters(self, stmt, filters: Dict[str, Any] = None):
+        """
+        库存筛选/排序：仅在需要时 outer join 按 SKU 分组的库存汇总子查询
+        返回 (stmt, stock_order)
+        """
+        if not filters:
+            return stmt, None
+
+        sort = filters.get('sort') or ''
+        sort_field = sort.lstrip('-')
+        needs_stock = (
+            filters.get('stock_min') is not None
+            or filters.get('stock_max') is not None
+            or filters.get('warning_status')
+            or sort_field in self.STOCK_SORT_FIELDS
+        )
+        if not needs_stock:
+            return stmt, None
+
+        stock_sq = self.stock_service.sku_stock_subquery()
+        stmt = stmt.outerjoin(stock_sq, stock_sq.c.sku == ProductVariant.sku)
+        available = func.coalesce(stock_sq.c.available_quantity, 0)
+        in_transit = func.coalesce(stock_sq.c.in_transit_quantity, 0)
+
+        if filters.get('stock_min') is not None:
+            stmt = stmt.where(available >= filters['stock_min'])
+        if filters.get('stock_max') is not None:
+            stmt = stmt.where(available <= filters['stock_max'])
+        if filters.get('warning_status'):
+            stmt = stmt.where(
+                self._warning_status_expr(available, in_transit, ProductVariant.safety_stock) == filters['warning_status']
+            )
+
+        stock_order = None
+        if sort_field in self.STOCK_SORT_FIELDS:
+            col = func.coalesce(stock_sq.c[self.STOCK_SORT_FIELDS[sort_field]], 0)
+            stock_order = col.desc() if sort.startswith('-') else col.asc()
+        return stmt, stock_order
+
+    @staticmethod
+    def _warning_status(available: int, in_transit: int, safety_stock: int) -> str:
+        """
+        补货预警状态
+        - normal: 未设置安全库存，或可用库存 >= 安全库存
+        - warning: 可用库存低于安全库存，但加上在途可以覆盖
+        - danger: 可用 + 在途仍低于安全库存，需要补货
+        """
+        if not safety_stock or available >= safety_stock:
+            return 'normal'
+        if available + in_transit >= safety_stock:
+            return 'warning'
+        return 'danger'
+
+    @staticmethod
+    def _warning_status_expr(available, in_transit, safety_stock):
+        """_warning_status 的 SQL 版本，用于按预警状态筛选"""
+        safety = func.coalesce(safety_stock, 0)
+        return case(
+            (safety <= 0, 'normal'),
+            (available >= safety, 'normal'),
+            (available + in_transit >= safety, 'warning'),
+            else_='danger'
+        )
+
+    def _stock_fields(self, variant: ProductVariant, level: Dict[str, int] = None) -> Dict[str, Any]:
+        """组装 SKU 库存相关字段"""
+        level = level or {}
+        available = level.get('available_quantity', 0)
+        in_transit = level.get('in_transit_quantity', 0)
+        safety_stock = variant.safety_stock or 0
+        return {
+            'stock_quantity': level.get('physical_quantity', 0),
+            'available_quantity': available,
+            'safety_stock': safety_stock,
+            'in_transit': in_transit,
+            'warning_status': self._warning_status(available, in_transit, safety_stock),
+        }
+
     def get_sku_detail(self, sku: str) -> Dict[str, Any]:
         """
         获取SKU详情
@@ -464,10 +579,7 @@ class ProductService:
             'coding_rules': coding_rules,
             'reference_codes': reference_codes,
             'fitments': fitments,
-            'stock_quantity': 0,  # TODO: 集成库存系统后填充
-            'safety_stock': 0,    # TODO: 集成库存系统后填充
-            'in_transit': 0,      # TODO: 集成库存系统后填充
-            'warning_status': 'normal',  # TODO: 根据库存计算
+            **self._stock_fields(variant, self.stock_service.get_sku_stock_levels([variant.sku]).get(variant.sku)),
             'quality_type': variant.quality_type,
             'is_active': variant.is_active,
             'created_at': variant.created_at, # Schema handles ISO serialization
@@ -529,7 +641,7 @@ class ProductService:
             'price', 'cost_price', 'net_weight', 'gross_weight',
             'pack_length', 'pack_width', 'pack_height',
             'hs_code_id', 'declared_name', 'declared_unit',
-            'quality_type', 'is_active', 'barcode', 'image'
+            'quality_type', 'is_active', 'barcode', 'image', 'safety_stock'
         ]
         
         for field in updatable_fields:
@@ -558,7 +670,9 @@ class ProductService:
         # if variant.has_inventory or variant.has_orders:
         #     raise BusinessError('Cannot delete SKU with inventory or orders', 400)
         
+        product_id = variant.product_id
         db.session.delete(variant)
+        ProductSearchService.reindex_products([product_id])
         db.session.commit()
 
     def toggle_sku_status(self, sku: str) -> Dict[str, Any]:
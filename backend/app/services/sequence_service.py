@@ -0,0 +1,245 @@
+import re
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Any
+from flask import current_app
+from sqlalchemy import select, update, func
+from app.extensions import db
+from app.models.system import SysSequence
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceService:
+    """
+    统一业务单号服务
+
+    - 权威数据在 sys_sequences 计数器表: 单条 UPDATE ... RETURNING 原子自增，
+      不再按单号 LIKE 扫描取最大值，也不会出现随机数兜底造成的重号
+    - 计数器首次出现时通过 seed 回调 (通常为扫描现有单号) 播种一次
+    - SEQUENCE_BLOCK_SIZE > 1 时按进程预分配号段 (独立短事务提交)，
+      批量导入时每 N 个号才访问一次数据库；代价是进程退出会留下空号
+    - SEQUENCE_BACKEND = 'redis' 时优先走 Redis INCRBY，失败回退数据库；
+      每次分配后数据库计数器同步推进到 Redis 的值 (独立短事务)，回退时不会重号
+    - audit() 检查单号的断号与重号
+    """
+
+    _lock = threading.Lock()
+
+    # ==================== 分配 ====================
+
+    @classmethod
+    def next_value(cls, key: str, seed: Optional[Callable[[], int]] = None) -> int:
+        """分配下一个序号"""
+        return cls.reserve(key, 1, seed)[0]
+
+    @classmethod
+    def reserve(cls, key: str, count: int = 1, seed: Optional[Callable[[], int]] = None) -> List[int]:
+        """
+        分配 count 个序号 (批量导入一次预留)
+
+        Args:
+            key: 计数器键
+            count: 数量
+            seed: 计数器不存在时返回当前已用最大序号的回调
+        """
+        if count <= 0:
+            return []
+
+        if current_app.config.get('SEQUENCE_BACKEND', 'db') == 'redis':
+            values = cls._reserve_redis(key, count, seed)
+            if values is not None:
+                cls._advance_autonomous(key, values[-1])
+                return values
+            # Redis 不可用: 数据库计数器可能落后于 Redis，先按现有单号修复再分配
+            cls.repair(key, seed)
+
+        block_size = current_app.config.get('SEQUENCE_BLOCK_SIZE', 1)
+        if block_size and block_size > 1:
+            return cls._reserve_from_block(key, count, seed, block_size)
+
+        end = cls._increment(db.session, key, count, seed)
+        return list(range(end - count + 1, end + 1))
+
+    @classmethod
+    def next_no(cls, prefix: str, width: int = 4, column=None, key: Optional[str] = None) -> str:
+        """
+        生成 {prefix}{width 位序号} 格式的单号
+
+        Args:
+            prefix: 单号前缀 (含日期)，如 'AP20260109'
+            width: 序号位数
+            column: 单号所在列，用于计数器首次播种
+            key: 计数器键，默认与 prefix 相同
+        """
+        seed = (lambda: cls.scan_max(column, prefix, width)) if column is not None else None
+        value = cls.next_value(key or prefix, seed)
+        return f"{prefix}{value:0{width}d}"
+
+    @staticmethod
+    def scan_max(column, prefix: str, width: int = 4) -> int:
+        """扫描现有单号中 prefix 下的最大序号 (仅用于播种/修复)"""
+        latest = db.session.scalar(
+            select(func.max(column)).where(
+                column.startswith(prefix, autoescape=True),
+                func.length(column) == len(prefix) + width
+            )
+        )
+        tail = latest[-width:] if latest else ''
+        return int(tail) if tail.isdigit() else 0
+
+    @staticmethod
+    def _increment(conn, key: str, count: int, seed: Optional[Callable[[], int]]) -> int:
+        """计数器原子自增，返回分配后的 last_value (conn 为会话或连接)"""
+        end = conn.execute(
+            update(SysSequence)
+            .where(SysSequence.key == key)
+            .values(last_value=SysSequence.last_value + count, updated_at=func.now())
+            .returning(SysSequence.last_value)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if end is not None:
+            return end
+
+        bind = conn.get_bind() if hasattr(conn, 'get_bind') else conn
+        if bind.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        start = seed() if seed else 0
+        stmt = insert(SysSequence).values(key=key, last_value=start + count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'last_value': SysSequence.last_value + count, 'updated_at': func.now()}
+        ).returning(SysSequence.last_value)
+        return conn.execute(stmt).scalar_one()
+
+    @classmethod
+    def _reserve_from_block(cls, key: str, count: int, seed, block_size: int) -> List[int]:
+        """从本进程预分配号段中取号，号段耗尽时再向数据库申请"""
+        blocks: Dict[str, List[int]] = current_app.extensions.setdefault('sequence_blocks', {})
+        values: List[int] = []
+        with cls._lock:
+            while len(values) < count:
+                block = blocks.get(key)
+                if not block or block[0] > block[1]:
+                    size = max(block_size, count - len(values))
+                    end = cls._increment_autonomous(key, size, seed)
+                    block = blocks[key] = [end - size + 1, end]
+                take = min(count - len(values), block[1] - block[0] + 1)
+                values.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return values
+
+    @classmethod
+    def _increment_autonomous(cls, key: str, count: int, seed) -> int:
+        """
+        号段申请在独立事务中立即提交，不随业务事务回滚，也不持有行锁等待业务提交
+        SQLite (测试环境单连接) 沿用当前会话
+        """
+        if db.engine.dialect.name == 'sqlite':
+            return cls._increment(db.session, key, count, seed)
+        with db.engine.begin() as conn:
+            return cls._increment(conn, key, count, seed)
+
+    @staticmethod
+    def _advance(conn, key: str, value: int) -> None:
+        """计数器推进到 value (只前进不后退，单条 UPSERT 原子完成)"""
+        bind = conn.get_bind() if hasattr(conn, 'get_bind') else conn
+        if bind.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(SysSequence).values(key=key, last_value=value)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'last_value': value, 'updated_at': func.now()},
+            where=SysSequence.last_value < value
+        ))
+
+    @classmethod
+    def _advance_autonomous(cls, key: str, value: int) -> None:
+        """
+        Redis 分配后推进数据库计数器: 独立事务立即提交，不随业务事务回滚 (空号可接受)，
+        也不在业务事务中持有计数器行锁；SQLite (测试环境单连接) 沿用当前会话
+        """
+        if db.engine.dialect.name == 'sqlite':
+            cls._advance(db.session, key, value)
+            return
+        with db.engine.begin() as conn:
+            cls._advance(conn, key, value)
+
+    @staticmethod
+    def _reserve_redis(key: str, count: int, seed) -> Optional[List[int]]:
+        """Redis INCRBY 快速路径，key 不存在时以数据库计数器/现有单号播种；失败返回 None"""
+        from app.redis_client import get_redis
+        try:
+            client = get_redis()
+            if not client:
+                return None
+            redis_key = f"sequence:{key}"
+            if not client.exists(redis_key):
+                counter = db.session.get(SysSequence, key)
+                start = max(counter.last_value if counter else 0, seed() if seed else 0)
+                client.set(redis_key, start, nx=True)
+            end = int(client.incrby(redis_key, count))
+            return list(range(end - count + 1, end + 1))
+        except Exception as e:
+            logger.warning(f"Redis sequence {key} failed, falling back to DB: {e}")
+            return None
+
+    @staticmethod
+    def repair(key: str, seed: Optional[Callable[[], int]] = None) -> int:
+        """按现有单号修复计数器: last_value = max(当前值, seed())，只前进不后退"""
+        scanned = seed() if seed else 0
+        counter = db.session.get(SysSequence, key)
+        if counter is None:
+            counter = SysSequence(key=key, last_value=scanned)
+            db.session.add(counter)
+        elif scanned > counter.last_value:
+            counter.last_value = scanned
+        db.session.flush()
+        return counter.last_value
+
+    # ==================== 审计 ====================
+
+    @staticmethod
+    def audit(column, prefix: str, width: int = 4, key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        单号断号/重号审计
+
+        Returns:
+            {
+                'prefix': str, 'count': int, 'max': int, 'counter': int | None,
+                'duplicates': [单号], 'gaps': [缺失序号], 'behind': 计数器是否落后于现有单号
+            }
+        """
+        numbers = db.session.scalars(
+            select(column).where(column.startswith(prefix, autoescape=True))
+        ).all()
+
+        pattern = re.compile(rf"^{re.escape(prefix)}(\d{{{width}}})$")
+        seen: Dict[int, int] = {}
+        duplicates = []
+        for number in numbers:
+            match = pattern.match(number or '')
+            if not match:
+                continue
+            value = int(match.group(1))
+            seen[value] = seen.get(value, 0) + 1
+            if seen[value] == 2:
+                duplicates.append(number)
+
+        max_value = max(seen) if seen else 0
+        counter = db.session.get(SysSequence, key or prefix)
+        return {
+            'prefix': prefix,
+            'count': sum(seen.values()),
+            'max': max_value,
+            'counter': counter.last_value if counter else None,
+            'duplicates': sorted(duplicates),
+            'gaps': [v for v in range(1, max_value + 1) if v not in seen],
+            'behind': bool(counter) and counter.last_value < max_value,
+        }
@@ -1,25 +1,18 @@
-import time
-import random
 from datetime import datetime
-from flask import current_app
-# 尝试导入 Redis，如果未安装则回退
-try:
-    from redis import Redis
-except ImportError:
-    Redis = None
+from app.redis_client import get_redis
 
 def get_redis_client():
-    """获取 Redis 客户端 (懒加载)"""
-    # 假设使用 Flask-Redis 或直接从 config 获取 URL
-    # 这里简化处理，尝试从 current_app extensions 获取，或者创建新的
-    if hasattr(current_app, 'extensions') and 'redis' in current_app.extensions:
-        return current_app.extensions['redis']
-    
-    # Fallback: Create standard client if REDIS_URL exists
-    redis_url = current_app.config.get('REDIS_URL') or 'redis://redis:6379/0'
-    if Redis:
-        return Redis.from_url(redis_url, decode_responses=True)
-    return None
+    """获取共享 Redis 客户端 (app.extensions['redis'] 连接池；未配置或熔断时为 None)"""
+    return get_redis()
+
+def _legacy_redis_value(seq_key: str) -> int:
+    """读取旧版 Redis INCR 计数器的当前值 (不可用时为 0)"""
+    try:
+        redis_client = get_redis_client()
+        value = redis_client.get(seq_key) if redis_client else None
+        return int(value) if value else 0
+    except Exception:
+        return 0
 
 def generate_seq_no(prefix: str, company_code: str = None) -> str:
     """
@@ -37,25 +30,10 @@ def generate_seq_no(prefix: str, company_code: str = None) -> str:
     comp_key = company_code if company_code else "GLOBAL"
     seq_key = f"seq:{prefix}:{comp_key}:{yymm}"
     
-    redis_client = get_redis_client()
-    
-    if redis_client:
-        try:
-            # Redis Incr (Atomic)
-            seq_num = redis_client.incr(seq_key)
-            # 设置过期时间 (比如 2 个月后过期，节省空间，只要保证当月不过期即可)
-            if seq_num == 1:
-                redis_client.expire(seq_key, 60 * 60 * 24 * 60)
-        except Exception as e:
-            # Redis 失败降级
-            # 仅记录一次警告或调试日志，避免刷屏
-            current_app.logger.warning(f"Redis sequence generation failed (using fallback): {str(e)}")
-            seq_num = random.randint(1000, 9999) 
-    else:
-        # 无 Redis 时的降级策略 (开发环境)
-        # 使用微秒级时间戳模拟递增，或者随机数
-        # 注意：这种方式在高并发下无法保证连续且唯一
-        seq_num = random.randint(1, 9999)
+    # 统一走 SequenceService (数据库计数器原子自增，可选 Redis 快速路径)
+    # 计数器首次出现时沿用旧 Redis key 的当前值，保证切换当月不重号
+    from app.services.sequence_service import SequenceService
+    seq_num = SequenceService.next_value(seq_key, seed=lambda: _legacy_redis_value(seq_key))
 
     # 格式化流水号 (4位，不足补0)
     seq_str = f"{seq_num:04d}"
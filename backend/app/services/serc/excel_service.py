@@ -1,178 +1,140 @@
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+from typing import Dict, List, Optional
+from sqlalchemy import select, func, or_
+from app.models.supply import ScmDeliveryContract, ScmDeliveryContractItem
+from app.models.purchase.supplier import SysSupplier
+from app.models.serc.foundation import SysCompany
+from app.models.serc.finance import SysPaymentTerm
+from app.models.product import Product, ProductVariant
+from app.services.excel_export import ExcelColumn, StreamingWorkbook, iter_rows
+
+CONTRACT_COLUMNS = [
+    ExcelColumn("供应商", 30),
+    ExcelColumn("合同编号", 22),
+    ExcelColumn("创建日期", 12, 'date'),
+    ExcelColumn("业务状态", 12),
+    ExcelColumn("SKU", 20),
+    ExcelColumn("产品名称", 30),
+    ExcelColumn("数量", 10, 'number'),
+    ExcelColumn("单价", 12, 'money'),
+    ExcelColumn("行总价", 14, 'money'),
+    ExcelColumn("合同总额", 14, 'money'),
+    ExcelColumn("已付金额", 14, 'money'),
+    ExcelColumn("未付余额", 14, 'money'),
+    ExcelColumn("付款条款", 20),
+]
+
 
 class ExcelService:
-    def generate_contracts_excel(self, contracts):
-        wb = Workbook()
-        # Remove default sheet
-        default_ws = wb.active
-        wb.remove(default_ws)
-        
-        # Group by Company -> Supplier
-        # Sort contracts by Company first to ensure consistent grouping order
-        contracts.sort(key=lambda x: (x.company.short_name if x.company and x.company.short_name else "Unknown"))
-        
-        grouped = {}
-        for c in contracts:
-            comp_name = c.company.short_name if c.company and c.company.short_name else (c.company.legal_name if c.company else "Unknown")
-            if comp_name not in grouped:
-                grouped[comp_name] = []
-            grouped[comp_name].append(c)
-            
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill("solid", fgColor="4F81BD")
-        border = Border(left=Side(style='thin'), 
-                        right=Side(style='thin'), 
-                        top=Side(style='thin'), 
-                        bottom=Side(style='thin'))
-        center_align = Alignment(horizontal='center', vertical='center')
-        
-        # Updated Headers
-        headers = ["供应商", "合同编号", "创建日期", "业务状态", "SKU", "产品名称", "数量", "单价", "行总价", "合同总额", "已付金额", "未付余额", "付款条款"]
-        
-        for comp_name, comp_contracts in grouped.items():
-            # Sheet name limit 31 chars, avoid invalid chars
-            safe_sheet_name = "".join([c for c in comp_name if c not in ":\\/?*[]"])[:30]
-            ws = wb.create_sheet(title=safe_sheet_name) 
-            
-            # Write Header
-            ws.append(headers)
-            for col_num, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_num)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = center_align
-                cell.border = border
-            
-            # Sort contracts by Supplier -> Date
-            comp_contracts.sort(key=lambda x: (x.supplier.name, x.created_at))
-            
-            current_row = 2
-            currency_summary = {} # {'CNY': 0, 'USD': 0}
-            
-            for contract in comp_contracts:
-                # Accumulate Summary
-                curr = contract.currency or 'CNY'
-                if curr not in currency_summary:
-                    currency_summary[curr] = 0
-                currency_summary[curr] += float(contract.total_amount)
+    def contract_export_statement(self, ids: Optional[List[int]] = None, filters: Optional[Dict] = None):
+        """
+        合同导出查询：合同 x 明细 扁平行，按 公司 -> 供应商 -> 创建时间 排序
+        SKU 取产品首个变体 (Product 本身无 SKU)
+        """
+        C, Item = ScmDeliveryContract, ScmDeliveryContractItem
+        company_name = func.coalesce(SysCompany.short_name, SysCompany.legal_name, 'Unknown')
+        sku = (
+            select(func.min(ProductVariant.sku))
+            .where(ProductVariant.product_id == Product.id)
+            .correlate(Product)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                company_name.label('company_name'),
+                C.id, C.contract_no, C.created_at, C.status, C.currency,
+                C.total_amount, C.paid_amount, C.supplier_snapshot, C.payment_terms,
+                SysSupplier.name.label('supplier_name'),
+                SysPaymentTerm.name.label('term_name'),
+                Item.id.label('item_id'),
+                sku.label('sku'),
+                Product.name.label('product_name'),
+                Item.confirmed_qty, Item.unit_price, Item.total_price,
+            )
+            .join(SysSupplier, SysSupplier.id == C.supplier_id)
+            .outerjoin(SysCompany, SysCompany.id == C.company_id)
+            .outerjoin(SysPaymentTerm, SysPaymentTerm.id == C.payment_term_id)
+            .outerjoin(Item, Item.l1_contract_id == C.id)
+            .outerjoin(Product, Product.id == Item.product_id)
+            .order_by(company_name, SysSupplier.name, C.created_at, C.id, Item.id)
+        )
+
+        filters = filters or {}
+        if ids:
+            return stmt.where(C.id.in_(ids))
+        if filters.get('q'):
+            keyword = f"%{filters['q']}%"
+            stmt = stmt.where(or_(C.contract_no.ilike(keyword), SysSupplier.name.ilike(keyword)))
+        if filters.get('supplier_id'):
+            stmt = stmt.where(C.supplier_id == filters['supplier_id'])
+        if filters.get('company_id'):
+            stmt = stmt.where(C.company_id == filters['company_id'])
+        if filters.get('status'):
+            stmt = stmt.where(C.status == filters['status'])
+        return stmt
 
-                items = contract.items
-                # Snapshot Logic for Supplier Name
-                supplier_name = contract.supplier.name
-                if contract.supplier_snapshot and isinstance(contract.supplier_snapshot, dict) and 'name' in contract.supplier_snapshot:
-                    # Use snapshot name, maybe append a marker or just use it
-                    supplier_name = contract.supplier_snapshot['name']
+    def generate_contracts_excel(self, stmt) -> Optional[str]:
+        """
+        流式生成合同报表，每个公司一个工作表，底部附币种资金汇总
 
-                # Financials
-                paid_amt = float(contract.paid_amount)
-                unpaid_amt = float(contract.total_amount) - paid_amt
+        Returns:
+            临时 xlsx 文件路径；无数据时返回 None
+        """
+        workbook = StreamingWorkbook()
+        sheet = None
+        current_company = None
+        current_contract = None
+        currency_summary = {}
 
-                # Smart resolve payment term name
-                term_name = ""
-                if contract.supplier_snapshot and isinstance(contract.supplier_snapshot, dict) and 'payment_terms' in contract.supplier_snapshot:
-                     term_name = contract.supplier_snapshot['payment_terms']
-                elif contract.payment_term:
-                    term_name = contract.payment_term.name
-                elif contract.payment_terms:
-                    term_name = contract.payment_terms
+        for row in iter_rows(stmt):
+            if row.company_name != current_company:
+                self._append_currency_summary(sheet, currency_summary)
+                sheet = workbook.add_sheet(row.company_name, CONTRACT_COLUMNS)
+                current_company = row.company_name
+                currency_summary = {}
 
-                if not items:
-                    # Handle empty contract
-                    row_data = [
-                        supplier_name,
-                        contract.contract_no,
-                        contract.created_at.strftime('%Y-%m-%d'),
-                        contract.status,
-                        "", "", 0, 0, 0,
-                        float(contract.total_amount),
-                        paid_amt,
-                        unpaid_amt,
-                        term_name
-                    ]
-                    ws.append(row_data)
-                    for col_num in range(1, len(headers) + 1):
-                        cell = ws.cell(row=current_row, column=col_num)
-                        cell.border = border
-                        cell.alignment = center_align
-                    current_row += 1
-                    continue
-                    
-                start_row = current_row
-                
-                for item in items:
-                    row_data = [
-                        supplier_name,
-                        contract.contract_no,
-                        contract.created_at.strftime('%Y-%m-%d'),
-                        contract.status,
-                        item.product.sku if item.product else "",
-                        item.product.name if item.product else "",
-                        float(item.confirmed_qty),
-                        float(item.unit_price),
-                        float(item.total_price),
-                        float(contract.total_amount),
-                        paid_amt,
-                        unpaid_amt,
-                        term_name
-                    ]
-                    
-                    ws.append(row_data)
-                    
-                    # Style each cell
-                    for col_num in range(1, len(headers) + 1):
-                        cell = ws.cell(row=current_row, column=col_num)
-                        cell.border = border
-                        if col_num in [7, 8, 9, 10, 11, 12]: # Numeric columns
-                             cell.number_format = '#,##0.00'
-                        else:
-                             cell.alignment = center_align
+            total = float(row.total_amount or 0)
+            paid = float(row.paid_amount or 0)
+            if row.id != current_contract:
+                current_contract = row.id
+                curr = row.currency or 'CNY'
+                currency_summary[curr] = currency_summary.get(curr, 0) + total
 
-                    current_row += 1
-                
-                end_row = current_row - 1
-                
-                # Merge cells for contract-level info
-                if end_row > start_row:
-                    # Merge Supplier, Contract No, Date, Status, Total Amount, Paid, Unpaid, Terms
-                    # Cols: 1, 2, 3, 4, 10, 11, 12, 13
-                    merge_cols = [1, 2, 3, 4, 10, 11, 12, 13]
-                    for col in merge_cols:
-                        ws.merge_cells(start_row=start_row, end_row=end_row, start_column=col, end_column=col)
-                        # Re-apply alignment to top-left cell of merge range
-                        cell = ws.cell(row=start_row, column=col)
-                        cell.alignment = center_align
+            snapshot = row.supplier_snapshot if isinstance(row.supplier_snapshot, dict) else {}
+            supplier_name = snapshot.get('name') or row.supplier_name
+            if 'payment_terms' in snapshot:
+                term_name = snapshot['payment_terms']
+            else:
+                term_name = row.term_name or row.payment_terms or ""
 
-            # Auto-adjust column widths
-            for col in ws.columns:
-                max_length = 0
-                column = col[0].column_letter
-                for cell in col:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = (max_length + 2) * 1.2
-                ws.column_dimensions[column].width = min(adjusted_width, 50) 
+            has_item = row.item_id is not None
+            sheet.append([
+                supplier_name,
+                row.contract_no,
+                row.created_at,
+                row.status,
+                (row.sku or "") if has_item else "",
+                (row.product_name or "") if has_item else "",
+                float(row.confirmed_qty or 0),
+                float(row.unit_price or 0),
+                float(row.total_price or 0),
+                total,
+                paid,
+                total - paid,
+                term_name,
+            ])
 
-            # Append Summary
-            current_row += 2
-            ws.cell(row=current_row, column=1, value="资金汇总 (按币种)").font = Font(bold=True)
-            current_row += 1
-            
-            for curr, amt in currency_summary.items():
-                ws.cell(row=current_row, column=1, value=curr).alignment = center_align
-                ws.cell(row=current_row, column=2, value=amt).number_format = '#,##0.00'
-                ws.cell(row=current_row, column=2).font = Font(bold=True)
-                current_row += 1
+        if sheet is None:
+            return None
+        self._append_currency_summary(sheet, currency_summary)
+        return workbook.save()
 
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output
+    @staticmethod
+    def _append_currency_summary(sheet, currency_summary):
+        if sheet is None:
+            return
+        sheet.append_raw([])
+        sheet.append_raw(["资金汇总 (按币种)"], ['title'])
+        for curr, amt in currency_summary.items():
+            sheet.append_raw([curr, amt], ['text', 'total'])
 
 excel_service = ExcelService()
@@ -2,14 +2,24 @@ from decimal import Decimal
 from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
 from app.extensions import db
 from app.models.supply import ScmDeliveryContract, ScmDeliveryContractItem
 from app.models.serc.finance import FinSupplyContract, FinSupplyContractItem, FinPurchaseSOA, FinPurchaseSOADetail, FinPaymentPoolOld, SysPaymentTerm
 from app.models.purchase.supplier import SysSupplier
-from app.models.product import Product, SysTaxCategory
+from app.models.product import Product, ProductVariant
 from app.errors import BusinessError
 
+# IN 查询分批大小 (数百张合同的对账单预览)
+IN_CHUNK_SIZE = 500
+DEFAULT_TAX_RATE = Decimal('0.13')
+
+
+def _chunks(ids: List[int], size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
 class FinanceService:
     def preview_supply_contract_from_l1(self, l1_contract_id: int) -> Dict:
         """
@@ -25,8 +35,9 @@ class FinanceService:
         if not supplier:
             raise BusinessError("Supplier not found")
             
-        # 2. 聚合明细
-        aggregated_items = self._aggregate_items(l1_contract.items, supplier)
+        # 2. 聚合明细 (商品/税收分类批量预加载)
+        context = self._load_product_context({item.product_id for item in l1_contract.items})
+        aggregated_items = self._aggregate_items(l1_contract.items, supplier, context)
         
         # 3. 计算总额
         total_amount = sum(item['amount'] for item in aggregated_items)
@@ -135,6 +146,13 @@ class FinanceService:
         db.session.flush()
 
         # Create Details
+        fin_contracts = {}
+        for chunk in _chunks(l1_ids):
+            for fc in db.session.scalars(
+                select(FinSupplyContract).where(FinSupplyContract.l1_contract_id.in_(chunk))
+            ):
+                fin_contracts.setdefault(fc.l1_contract_id, fc)
+
         for c in contracts:
             detail = FinPurchaseSOADetail(
                 soa_id=soa.id,
@@ -144,7 +162,7 @@ class FinanceService:
             db.session.add(detail)
             
             # Update FinSupplyContract status if exists
-            fin_contract = db.session.query(FinSupplyContract).filter_by(l1_contract_id=c.id).first()
+            fin_contract = fin_contracts.get(c.id)
             if fin_contract:
                 fin_contract.status = 'soa_generated'
                 fin_contract.reconciled_amount = fin_contract.total_amount # Full reconcile
@@ -152,6 +170,73 @@ class FinanceService:
         db.session.commit()
         return soa
 
+    def preview_soa(self, l1_ids: List[int]) -> Dict:
+        """
+        预览 L2 结算单 / 月度采购对账 (不落库)
+        支持跨供应商的数百张 L1 合同: 合同、明细、供应商、商品、税收分类各一次批量查询，
+        按供应商分组后逐组聚合开票明细
+        """
+        if not l1_ids:
+            raise BusinessError("No contracts selected")
+
+        l1_ids = list(dict.fromkeys(l1_ids))
+        contracts: List[ScmDeliveryContract] = []
+        items_by_contract: Dict[int, List[ScmDeliveryContractItem]] = defaultdict(list)
+        for chunk in _chunks(l1_ids):
+            contracts.extend(db.session.scalars(
+                select(ScmDeliveryContract).where(ScmDeliveryContract.id.in_(chunk))
+            ))
+            for item in db.session.scalars(
+                select(ScmDeliveryContractItem).where(ScmDeliveryContractItem.l1_contract_id.in_(chunk))
+            ):
+                items_by_contract[item.l1_contract_id].append(item)
+
+        if len(contracts) != len(l1_ids):
+            raise BusinessError("Some contracts not found")
+
+        supplier_ids = list({c.supplier_id for c in contracts})
+        suppliers = {
+            s.id: s for s in db.session.scalars(select(SysSupplier).where(SysSupplier.id.in_(supplier_ids)))
+        }
+        context = self._load_product_context({
+            item.product_id for items in items_by_contract.values() for item in items
+        })
+
+        by_supplier: Dict[int, List[ScmDeliveryContract]] = defaultdict(list)
+        for c in sorted(contracts, key=lambda c: c.id):
+            by_supplier[c.supplier_id].append(c)
+
+        groups = []
+        for supplier_id, supplier_contracts in sorted(by_supplier.items()):
+            supplier = suppliers.get(supplier_id)
+            if not supplier:
+                raise BusinessError("Supplier not found")
+
+            l1_items = [item for c in supplier_contracts for item in items_by_contract[c.id]]
+            aggregated_items = self._aggregate_items(l1_items, supplier, context)
+            l1_total = sum((c.total_amount or Decimal(0) for c in supplier_contracts), Decimal(0))
+            preview_total = sum((item['amount'] for item in aggregated_items), Decimal(0))
+            diff = preview_total - l1_total
+            groups.append({
+                "supplier_id": supplier_id,
+                "supplier_name": supplier.name,
+                "l1_contract_ids": [c.id for c in supplier_contracts],
+                "l1_total_amount": l1_total,
+                "preview_total_amount": preview_total,
+                "diff": diff,
+                "is_balanced": abs(diff) <= Decimal('0.05'),
+                "items": aggregated_items,
+                "warnings": self._collect_warnings(aggregated_items)
+            })
+
+        return {
+            "data": {
+                "contract_count": len(contracts),
+                "total_amount": sum((g['l1_total_amount'] for g in groups), Decimal(0)),
+                "suppliers": groups
+            }
+        }
+
     def confirm_soa(self, soa_id: int) -> FinPurchaseSOA:
         """
         确认 SOA (供应商对账完成)
@@ -206,39 +291,79 @@ class FinanceService:
         db.session.commit()
         return soa
 
-    def _aggregate_items(self, l1_items: List[ScmDeliveryContractItem], supplier: SysSupplier) -> List[Dict]:
+    def _load_product_context(self, product_ids) -> Dict[int, Dict]:
+        """
+        批量加载聚合所需的商品信息 (替代逐行 db.session.get / 懒加载)
+
+        Returns:
+            {product_id: {'invoice_name', 'invoice_unit', 'sku'}}
+            开票品名/单位取首个 SKU 的申报品名/单位，缺省为 SPU 名称 / PCS
+        """
+        product_ids = [pid for pid in product_ids if pid is not None]
+        context: Dict[int, Dict] = {}
+        if not product_ids:
+            return context
+
+        for chunk in _chunks(product_ids):
+            for row in db.session.execute(select(Product.id, Product.name).where(Product.id.in_(chunk))):
+                context[row.id] = {'invoice_name': row.name, 'invoice_unit': 'PCS', 'sku': None}
+
+            variants = db.session.execute(
+                select(ProductVariant.product_id, ProductVariant.sku,
+                       ProductVariant.declared_name, ProductVariant.declared_unit)
+                .where(ProductVariant.product_id.in_(chunk))
+                .order_by(ProductVariant.product_id, ProductVariant.id)
+            )
+            for row in variants:
+                entry = context.get(row.product_id)
+                if entry is None or entry['sku'] is not None:
+                    continue
+                entry['sku'] = row.sku
+                if row.declared_name:
+                    entry['invoice_name'] = row.declared_name
+                if row.declared_unit:
+                    entry['invoice_unit'] = row.declared_unit
+        return context
+
+    def _aggregate_items(self, l1_items: List[ScmDeliveryContractItem], supplier: SysSupplier,
+                         context: Optional[Dict[int, Dict]] = None) -> List[Dict]:
         """
         核心聚合逻辑
-        Key = (invoice_name, invoice_unit, tax_rate, price_unit)
+        Key = (invoice_name, invoice_unit, tax_rate, tax_code)
+
+        context 为 _load_product_context 的结果；未传入时按明细批量加载
         """
+        if context is None:
+            context = self._load_product_context({item.product_id for item in l1_items})
+
         # 1. 预处理
         processed_items = []
         for item in l1_items:
-            product = item.product or db.session.get(Product, item.product_id)
-            
-            # A. 确定开票名称 (Priority: Product.declared_name > Product.name)
-            invoice_name = product.declared_name if product.declared_name else product.name
+            product = context.get(item.product_id)
+            if product is None:
+                raise BusinessError(f"Product {item.product_id} not found")
+
+            # A. 开票名称 (Priority: SKU.declared_name > Product.name)
+            invoice_name = product['invoice_name']
             
-            # B. 确定税率 (Priority: Supplier.default > TaxCategory.ref > 0.13)
+            # B. 确定税率 (Priority: Supplier.default > 0.13)
             if supplier.default_vat_rate is not None:
                 tax_rate = supplier.default_vat_rate
-            elif product.tax_category and product.tax_category.reference_rate:
-                tax_rate = product.tax_category.reference_rate
             else:
-                tax_rate = Decimal('0.13') # System default fallback
+                tax_rate = DEFAULT_TAX_RATE # System default fallback
                 
-            # C. 确定税收编码
-            tax_code = product.tax_category.code if product.tax_category else ""
+            # C. 税收编码: 商品尚未关联税收分类，留空并由 _collect_warnings 提示补录
+            tax_code = ""
             
             processed_items.append({
                 'invoice_name': invoice_name,
-                'invoice_unit': product.declared_unit or 'PCS', # Default unit
+                'invoice_unit': product['invoice_unit'],
                 'tax_rate': tax_rate,
                 'tax_code': tax_code,
-                'quantity': item.confirmed_qty,
-                'amount': item.total_price, # Use line total amount to avoid precision loss first
+                'quantity': item.confirmed_qty or Decimal(0),
+                'amount': item.total_price or Decimal(0), # Use line total amount to avoid precision loss first
                 # Store original for debugging
-                'original_sku': product.sku
+                'original_sku': product['sku']
             })
             
         # 2. 分组聚合
@@ -255,7 +380,8 @@ class FinanceService:
             
             groups[key]['quantity'] += p['quantity']
             groups[key]['amount'] += p['amount']
-            groups[key]['skus'].add(p['original_sku'])
+            if p['original_sku']:
+                groups[key]['skus'].add(p['original_sku'])
             
         # 3. 格式化输出
         results = []
@@ -276,7 +402,7 @@ class FinanceService:
                 'amount': amt,
                 'tax_rate': tax_rate,
                 'tax_code': tax_code,
-                'skus': list(val['skus'])
+                'skus': sorted(val['skus'])
             })
             
         return results
@@ -1,15 +1,42 @@
 """
 财务应付单服务层
 """
-from typing import List, Dict, Optional, Any
+import csv
+import io
+from typing import List, Dict, Optional, Any, IO
 from datetime import datetime, date
-from decimal import Decimal
-from sqlalchemy import select, and_, or_
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, and_, or_, insert, update, bindparam
 from sqlalchemy.orm import selectinload
 
 from app.extensions import db
 from app.models.serc.payable import FinPayable, FinPaymentPool, PayableStatus, PaymentPoolStatus
 from app.errors import BusinessError
+from app.services.sequence_service import SequenceService
+
+
+# 银行流水文件表头别名 -> 字段
+BANK_STATEMENT_COLUMNS = {
+    'payable_no': 'payable_no', '应付单号': 'payable_no', '摘要': 'payable_no',
+    'amount': 'amount', '金额': 'amount', '付款金额': 'amount', '交易金额': 'amount',
+    'paid_at': 'paid_at', '付款时间': 'paid_at', '交易时间': 'paid_at',
+}
+
+# 应付单必填字段
+REQUIRED_FIELDS = ['source_type', 'source_id', 'payee_type', 'payee_id', 'payee_name', 'payable_amount']
+
+
+def _outcome(index: int, payable: Optional[FinPayable] = None, error: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """批量操作的逐行结果"""
+    result = {
+        'index': index,
+        'success': error is None,
+        'payable_id': payable.id if payable else extra.pop('payable_id', None),
+        'payable_no': payable.payable_no if payable else extra.pop('payable_no', None),
+        'error': error,
+    }
+    result.update(extra)
+    return result
 
 
 class PayableService:
@@ -19,20 +46,7 @@ class PayableService:
     def generate_payable_no() -> str:
         """生成应付单号: AP + YYYYMMDD + 4位流水号"""
         today = datetime.now().strftime('%Y%m%d')
-        prefix = f"AP{today}"
-        
-        # 查询今日最大流水号
-        stmt = select(FinPayable).where(
-            FinPayable.payable_no.like(f"{prefix}%")
-        ).order_by(FinPayable.payable_no.desc())
-        latest = db.session.execute(stmt).scalars().first()
-        
-        if latest:
-            seq = int(latest.payable_no[-4:]) + 1
-        else:
-            seq = 1
-        
-        return f"{prefix}{seq:04d}"
+        return SequenceService.next_no(f"AP{today}", column=FinPayable.payable_no)
     
     @staticmethod
     def create_payable(data: Dict[str, Any], created_by: Optional[int] = None) -> FinPayable:
@@ -61,37 +75,14 @@ class PayableService:
         Returns:
             FinPayable: 创建的应付单
         """
-        # 校验必填字段
-        required_fields = ['source_type', 'source_id', 'payee_type', 'payee_id', 'payee_name', 'payable_amount']
-        for field in required_fields:
-            if field not in data:
-                raise BusinessError(f'缺少必填字段: {field}', code=400)
-        
-        # 校验金额
-        if data['payable_amount'] <= 0:
-            raise BusinessError('应付金额必须大于0', code=400)
+        error = PayableService._validate_payable_data(data)
+        if error:
+            raise BusinessError(error, code=400)
         
         # 创建应付单
-        payable = FinPayable(
-            payable_no=PayableService.generate_payable_no(),
-            source_type=data['source_type'],
-            source_id=data['source_id'],
-            source_no=data.get('source_no'),
-            payee_type=data['payee_type'],
-            payee_id=data['payee_id'],
-            payee_name=data['payee_name'],
-            bank_name=data.get('bank_name'),
-            bank_account=data.get('bank_account'),
-            bank_account_name=data.get('bank_account_name'),
-            payable_amount=data['payable_amount'],
-            paid_amount=Decimal('0'),
-            currency=data.get('currency', 'CNY'),
-            due_date=data.get('due_date'),
-            priority=data.get('priority', 3),
-            status=PayableStatus.PENDING.value,
-            notes=data.get('notes'),
-            created_by_id=created_by
-        )
+        payable = FinPayable(**PayableService._payable_values(
+            data, PayableService.generate_payable_no(), created_by
+        ))
         
         db.session.add(payable)
         db.session.commit()
@@ -99,6 +90,103 @@ class PayableService:
         
         return payable
     
+    @staticmethod
+    def _validate_payable_data(data: Dict[str, Any]) -> Optional[str]:
+        """校验应付单数据，返回错误信息 (通过时为 None)"""
+        for field in REQUIRED_FIELDS:
+            if field not in data:
+                return f'缺少必填字段: {field}'
+        if data['payable_amount'] is None or Decimal(str(data['payable_amount'])) <= 0:
+            return '应付金额必须大于0'
+        return None
+
+    @staticmethod
+    def _payable_values(data: Dict[str, Any], payable_no: str, created_by: Optional[int]) -> Dict[str, Any]:
+        """应付单字段值 (单条创建与批量插入共用)"""
+        return {
+            'payable_no': payable_no,
+            'source_type': data['source_type'],
+            'source_id': data['source_id'],
+            'source_no': data.get('source_no'),
+            'payee_type': data['payee_type'],
+            'payee_id': data['payee_id'],
+            'payee_name': data['payee_name'],
+            'bank_name': data.get('bank_name'),
+            'bank_account': data.get('bank_account'),
+            'bank_account_name': data.get('bank_account_name'),
+            'payable_amount': data['payable_amount'],
+            'paid_amount': Decimal('0'),
+            'currency': data.get('currency', 'CNY'),
+            'due_date': data.get('due_date'),
+            'priority': data.get('priority', 3),
+            'status': PayableStatus.PENDING.value,
+            'notes': data.get('notes'),
+            'created_by_id': created_by,
+        }
+
+    @staticmethod
+    def batch_create_payables(rows: List[Dict[str, Any]], created_by: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        批量创建应付单 (对账单/合同批量提交财务)
+
+        - 单号一次性从计数器预留，批量 INSERT
+        - 同一来源 (source_type + source_id) 已有未驳回/取消的应付单时该行失败
+        - 校验失败的行不影响其他行
+
+        Returns:
+            逐行结果 [{'index', 'success', 'payable_id', 'payable_no', 'error'}]
+        """
+        outcomes: Dict[int, Dict[str, Any]] = {}
+        valid = []
+        for index, data in enumerate(rows):
+            error = PayableService._validate_payable_data(data)
+            if error:
+                outcomes[index] = _outcome(index, error=error)
+            else:
+                valid.append((index, data))
+
+        # 来源查重: 一次查询现有应付单 + 批内重复
+        sources = {(data['source_type'], data['source_id']) for _, data in valid}
+        existing = set()
+        if sources:
+            existing = {
+                (row.source_type, row.source_id) for row in db.session.execute(
+                    select(FinPayable.source_type, FinPayable.source_id).where(
+                        FinPayable.source_id.in_({source_id for _, source_id in sources}),
+                        FinPayable.status.notin_([PayableStatus.REJECTED.value, PayableStatus.CANCELLED.value])
+                    )
+                )
+            }
+        to_insert = []
+        for index, data in valid:
+            key = (data['source_type'], data['source_id'])
+            if key in existing:
+                outcomes[index] = _outcome(index, error=f'来源单据已存在应付单: {data.get("source_no") or data["source_id"]}')
+                continue
+            existing.add(key)
+            to_insert.append((index, data))
+
+        if to_insert:
+            today = datetime.now().strftime('%Y%m%d')
+            prefix = f"AP{today}"
+            serials = SequenceService.reserve(
+                prefix, len(to_insert), seed=lambda: SequenceService.scan_max(FinPayable.payable_no, prefix, 4)
+            )
+            values = [
+                PayableService._payable_values(data, f"{prefix}{serial:04d}", created_by)
+                for (_, data), serial in zip(to_insert, serials)
+            ]
+            db.session.execute(insert(FinPayable), values)
+            ids = dict(db.session.execute(
+                select(FinPayable.payable_no, FinPayable.id)
+                .where(FinPayable.payable_no.in_([v['payable_no'] for v in values]))
+            ).all())
+            for (index, _), value in zip(to_insert, values):
+                outcomes[index] = _outcome(index, payable_id=ids.get(value['payable_no']), payable_no=value['payable_no'])
+
+        db.session.commit()
+        return [outcomes[i] for i in range(len(rows))]
+
     @staticmethod
     def approve_payable(
         payable_id: int,
@@ -172,6 +260,131 @@ class PayableService:
         
         return payable
     
+    @staticmethod
+    def batch_approve_payables(
+        payable_ids: List[int],
+        action: str,
+        approved_by: int,
+        rejection_reason: Optional[str] = None,
+        add_to_pool: bool = False,
+        pool_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量审批 (批准/驳回) 应付单，单事务批量 UPDATE
+
+        非待审批状态或不存在的应付单返回失败行，其余照常处理；
+        批准并加入付款池时按 batch_add_to_pool 的规则入池
+        """
+        if action not in ('approve', 'reject'):
+            raise BusinessError('无效的审批操作', code=400)
+        if action == 'reject' and not rejection_reason:
+            raise BusinessError('驳回时必须填写驳回原因', code=400)
+
+        # 先确定并校验目标付款池，再写入审批状态
+        to_pool = action == 'approve' and add_to_pool
+        pool = None
+        if to_pool and pool_id:
+            pool = db.session.get(FinPaymentPool, pool_id, with_for_update=True)
+            if not pool:
+                raise BusinessError('付款池不存在', code=404)
+            if pool.status not in [PaymentPoolStatus.DRAFT.value, PaymentPoolStatus.PENDING.value]:
+                raise BusinessError('该付款池已关闭，无法添加新的应付单', code=400)
+
+        payables = PayableService._lock_payables(payable_ids)
+        outcomes = []
+        accepted: List[FinPayable] = []
+        for index, payable_id in enumerate(payable_ids):
+            payable = payables.get(payable_id)
+            if not payable:
+                outcomes.append(_outcome(index, payable_id=payable_id, error='应付单不存在'))
+            elif payable.status != PayableStatus.PENDING.value:
+                outcomes.append(_outcome(index, payable, error='只有待审批的应付单才能审批'))
+            else:
+                outcomes.append(_outcome(index, payable))
+                accepted.append(payable)
+
+        if accepted:
+            if to_pool and pool is None:
+                pool = PayableService._get_or_create_default_pool()
+            values = {
+                'status': PayableStatus.APPROVED.value if action == 'approve' else PayableStatus.REJECTED.value,
+                'approved_by_id': approved_by,
+                'approved_at': datetime.now(),
+            }
+            if action == 'reject':
+                values['rejection_reason'] = rejection_reason
+            db.session.execute(
+                update(FinPayable)
+                .where(FinPayable.id.in_([p.id for p in accepted]))
+                .values(**values)
+                .execution_options(synchronize_session='fetch')
+            )
+
+            if action == 'reject':
+                PayableService._notify_logistics_rejections(
+                    [p for p in accepted if p.source_type == 'logistics']
+                )
+            elif to_pool:
+                PayableService._move_to_pool(accepted, pool)
+
+        db.session.commit()
+        return outcomes
+
+    @staticmethod
+    def batch_add_to_pool(payable_ids: List[int], pool_id: int) -> List[Dict[str, Any]]:
+        """批量将已批准的应付单加入付款池，付款池统计一次更新"""
+        pool = db.session.get(FinPaymentPool, pool_id, with_for_update=True)
+        if not pool:
+            raise BusinessError('付款池不存在', code=404)
+        if pool.status not in [PaymentPoolStatus.DRAFT.value, PaymentPoolStatus.PENDING.value]:
+            raise BusinessError('该付款池已关闭，无法添加新的应付单', code=400)
+
+        payables = PayableService._lock_payables(payable_ids)
+        outcomes = []
+        accepted: List[FinPayable] = []
+        for index, payable_id in enumerate(payable_ids):
+            payable = payables.get(payable_id)
+            if not payable:
+                outcomes.append(_outcome(index, payable_id=payable_id, error='应付单不存在'))
+            elif payable.status != PayableStatus.APPROVED.value:
+                outcomes.append(_outcome(index, payable, error='只有已批准的应付单才能加入付款池'))
+            else:
+                outcomes.append(_outcome(index, payable))
+                accepted.append(payable)
+
+        PayableService._move_to_pool(accepted, pool)
+        db.session.commit()
+        return outcomes
+
+    @staticmethod
+    def _lock_payables(payable_ids: List[int]) -> Dict[int, FinPayable]:
+        """按 ID 顺序加行锁批量加载应付单 (固定加锁顺序避免死锁)"""
+        if not payable_ids:
+            return {}
+        stmt = (
+            select(FinPayable)
+            .where(FinPayable.id.in_(set(payable_ids)))
+            .order_by(FinPayable.id)
+            .with_for_update()
+        )
+        return {p.id: p for p in db.session.scalars(stmt)}
+
+    @staticmethod
+    def _move_to_pool(payables: List[FinPayable], pool: FinPaymentPool) -> None:
+        """批量入池: 一条 UPDATE 应付单 + 一次累加付款池统计"""
+        if not payables:
+            return
+        db.session.execute(
+            update(FinPayable)
+            .where(FinPayable.id.in_([p.id for p in payables]))
+            .values(payment_pool_id=pool.id, status=PayableStatus.IN_POOL.value)
+            .execution_options(synchronize_session='fetch')
+        )
+        pool.total_amount = (pool.total_amount or Decimal('0')) + sum(
+            (p.payable_amount for p in payables), Decimal('0')
+        )
+        pool.total_count = (pool.total_count or 0) + len(payables)
+
     @staticmethod
     def _get_or_create_default_pool() -> FinPaymentPool:
         """获取或创建本月默认付款池"""
@@ -239,6 +452,27 @@ class PayableService:
             # 可以添加驳回记录到 notes
             statement.notes = (statement.notes or '') + f"\n[{datetime.now()}] 财务驳回: {payable.rejection_reason}"
     
+    @staticmethod
+    def _notify_logistics_rejections(payables: List[FinPayable]) -> None:
+        """批量通知物流模块应付单被驳回 (一次加载全部对账单)"""
+        from app.models.logistics.logistics_statement import LogisticsStatement, StatementStatus
+
+        if not payables:
+            return
+        statements = {
+            s.id: s for s in db.session.scalars(
+                select(LogisticsStatement).where(LogisticsStatement.id.in_({p.source_id for p in payables}))
+            )
+        }
+        now = datetime.now()
+        for payable in payables:
+            statement = statements.get(payable.source_id)
+            if statement:
+                statement.status = StatementStatus.CONFIRMED.value
+                statement.finance_payable_id = None
+                statement.submitted_to_finance_at = None
+                statement.notes = (statement.notes or '') + f"\n[{now}] 财务驳回: {payable.rejection_reason}"
+
     @staticmethod
     def get_payable_by_id(payable_id: int) -> Optional[FinPayable]:
         """获取应付单详情"""
@@ -348,3 +582,183 @@ class PayableService:
                 service.status = ServiceStatus.PAID.value
                 service.paid_at = payable.paid_at
 
+
+    @staticmethod
+    def _notify_logistics_paid_batch(payables: List[FinPayable]) -> None:
+        """批量通知物流模块应付单已付款 (一次加载对账单及其物流服务)"""
+        from app.models.logistics.logistics_statement import LogisticsStatement, StatementStatus
+        from app.models.logistics.shipment_logistics_service import ServiceStatus
+
+        if not payables:
+            return
+        paid_at = {p.source_id: p.paid_at for p in payables}
+        stmt = select(LogisticsStatement).where(
+            LogisticsStatement.id.in_(paid_at.keys())
+        ).options(
+            selectinload(LogisticsStatement.logistics_services)
+        )
+        for statement in db.session.scalars(stmt):
+            statement.status = StatementStatus.PAID.value
+            for service in statement.logistics_services:
+                service.status = ServiceStatus.PAID.value
+                service.paid_at = paid_at[statement.id]
+
+    # ==================== 付款池结算 ====================
+
+    @staticmethod
+    def parse_bank_statement(stream: IO, filename: str = '') -> List[Dict[str, Any]]:
+        """
+        解析银行流水文件 (CSV / XLSX)
+
+        需包含 应付单号(payable_no/摘要) 与 金额(amount) 列，付款时间(paid_at) 可选
+
+        Returns:
+            [{'payable_no': str, 'amount': str, 'paid_at': str | datetime | None}]
+        """
+        if filename.lower().endswith(('.xlsx', '.xlsm')):
+            from openpyxl import load_workbook
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+            try:
+                raw_rows = [list(r) for r in workbook.active.iter_rows(values_only=True)]
+            finally:
+                workbook.close()
+        else:
+            content = stream.read()
+            if isinstance(content, bytes):
+                content = content.decode('utf-8-sig')
+            raw_rows = list(csv.reader(io.StringIO(content)))
+
+        if not raw_rows:
+            raise BusinessError('银行流水文件为空', code=400)
+
+        header = [BANK_STATEMENT_COLUMNS.get(str(h or '').strip().lower()) for h in raw_rows[0]]
+        if 'payable_no' not in header or 'amount' not in header:
+            raise BusinessError('银行流水文件缺少 应付单号/金额 列', code=400)
+
+        rows = []
+        for raw in raw_rows[1:]:
+            row = {field: raw[i] for i, field in enumerate(header) if field and i < len(raw)}
+            if not any(v not in (None, '') for v in row.values()):
+                continue
+            row['payable_no'] = str(row.get('payable_no') or '').strip()
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def settle_pool(pool_id: int, rows: List[Dict[str, Any]],
+                    paid_at: Optional[datetime] = None, executed_by: Optional[int] = None) -> Dict[str, Any]:
+        """
+        按银行流水结算付款池 (单事务)
+
+        - 流水行按应付单号匹配池内应付单，金额累加到已付金额，支持部分付款
+        - 不在池内、金额非法或超付的行返回失败，其余行批量 UPDATE
+        - 池内应付单全部付清时付款池置为已完成
+
+        Returns:
+            {'pool_id', 'pool_status', 'paid_count', 'paid_amount', 'results': [逐行结果]}
+        """
+        pool = db.session.get(FinPaymentPool, pool_id, with_for_update=True)
+        if not pool:
+            raise BusinessError('付款池不存在', code=404)
+        if pool.status in [PaymentPoolStatus.COMPLETED.value, PaymentPoolStatus.CANCELLED.value]:
+            raise BusinessError('该付款池已结束，无法结算', code=400)
+
+        payables = {
+            p.payable_no: p for p in db.session.scalars(
+                select(FinPayable)
+                .where(FinPayable.payment_pool_id == pool.id)
+                .order_by(FinPayable.id)
+                .with_for_update()
+            )
+        }
+        default_paid_at = paid_at or datetime.now()
+
+        outcomes = []
+        pending: Dict[int, Dict[str, Any]] = {}
+        for index, row in enumerate(rows):
+            payable_no = (row.get('payable_no') or '').strip()
+            payable = payables.get(payable_no)
+            if not payable:
+                outcomes.append(_outcome(index, payable_no=payable_no, error='应付单不在该付款池中'))
+                continue
+            if payable.status not in [PayableStatus.IN_POOL.value, PayableStatus.APPROVED.value]:
+                outcomes.append(_outcome(index, payable, error='只有在付款池中或已批准的应付单才能付款'))
+                continue
+            try:
+                amount = Decimal(str(row.get('amount')).replace(',', '').strip())
+                if not amount.is_finite():
+                    raise InvalidOperation
+            except (InvalidOperation, AttributeError):
+                outcomes.append(_outcome(index, payable, error=f"金额格式错误: {row.get('amount')}"))
+                continue
+            if amount <= 0:
+                outcomes.append(_outcome(index, payable, error='付款金额必须大于0'))
+                continue
+
+            # 超付校验在登记之前: 全部流水行都被拒绝的应付单不能进入待更新列表
+            entry = pending.get(payable.id)
+            already_paid = entry['paid_amount'] if entry else (payable.paid_amount or Decimal('0'))
+            if already_paid + amount > payable.payable_amount:
+                outcomes.append(_outcome(index, payable, error='付款金额超过应付金额'))
+                continue
+            if entry is None:
+                entry = pending[payable.id] = {
+                    'payable': payable, 'paid_amount': already_paid, 'paid_at': default_paid_at
+                }
+            entry['paid_amount'] += amount
+            row_paid_at = row.get('paid_at')
+            if isinstance(row_paid_at, datetime):
+                entry['paid_at'] = row_paid_at
+            elif row_paid_at:
+                try:
+                    entry['paid_at'] = datetime.fromisoformat(str(row_paid_at).strip())
+                except ValueError:
+                    pass
+            outcomes.append(_outcome(index, payable, amount=amount))
+
+        if pending:
+            params = []
+            fully_paid = []
+            for entry in pending.values():
+                payable = entry['payable']
+                status = payable.status
+                if entry['paid_amount'] >= payable.payable_amount:
+                    status = PayableStatus.PAID.value
+                    fully_paid.append(payable)
+                params.append({
+                    'b_id': payable.id, 'b_paid_amount': entry['paid_amount'],
+                    'b_paid_at': entry['paid_at'], 'b_status': status,
+                })
+            table = FinPayable.__table__
+            db.session.connection().execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(
+                    paid_amount=bindparam('b_paid_amount'),
+                    paid_at=bindparam('b_paid_at'),
+                    status=bindparam('b_status'),
+                ),
+                params
+            )
+            for entry in pending.values():
+                db.session.expire(entry['payable'])
+
+            PayableService._notify_logistics_paid_batch(
+                [p for p in fully_paid if p.source_type == 'logistics']
+            )
+
+        if payables and all(p.status == PayableStatus.PAID.value for p in payables.values()):
+            pool.status = PaymentPoolStatus.COMPLETED.value
+            pool.executed_at = datetime.now()
+            if executed_by:
+                pool.executed_by_id = executed_by
+        elif pending and pool.status in [PaymentPoolStatus.DRAFT.value, PaymentPoolStatus.PENDING.value,
+                                         PaymentPoolStatus.APPROVED.value]:
+            pool.status = PaymentPoolStatus.PROCESSING.value
+
+        db.session.commit()
+        return {
+            'pool_id': pool.id,
+            'pool_status': pool.status,
+            'paid_count': len(pending),
+            'paid_amount': sum((o['amount'] for o in outcomes if o['success']), Decimal('0')),
+            'results': outcomes,
+        }
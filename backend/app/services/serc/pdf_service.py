@@ -1,19 +1,236 @@
-from flask import render_template
-from weasyprint import HTML
+"""
+交付合同 PDF 生成
+
+批量打印按 (采购主体, 供应商) 分组，每组 "模板渲染 + WeasyPrint 排版" 分发到进程池：
+- WeasyPrint 排版为 CPU 密集且持有 GIL，线程无法并行，只能多进程
+- 每个进程缓存编译后的模板与解析后的样式表，只解析一次
+- 主进程负责批量查询，把 ORM 对象转换为可 pickle 的快照后下发
+- Celery prefork 子进程是守护进程，标准库进程池无法在其中创建子进程，改用 billiard 进程池
+- WeasyPrint 在渲染进程首次使用时才导入，不拖慢 Web / Celery 启动
+"""
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from types import SimpleNamespace
+from typing import BinaryIO, Callable, List, Optional
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from app.extensions import db
+from app.models.supply import ScmDeliveryContract, ScmDeliveryContractItem
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'templates')
+CONTRACT_TEMPLATE = 'pdf/contract_batch.html'
+CONTRACT_STYLESHEET = 'pdf/contract_batch.css'
+
+OUTPUT_ZIP = 'zip'
+OUTPUT_MERGED = 'merged'
+
+# 进程级缓存 (模板/样式表)，每个进程首次渲染时构建
+_render_state = {}
+
+
+def _get_template():
+    if 'template' not in _render_state:
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+        _render_state['template'] = env.get_template(CONTRACT_TEMPLATE)
+    return _render_state['template']
+
+
+def _get_render_state():
+    if 'html' not in _render_state:
+        from weasyprint import HTML, CSS
+
+        _get_template()
+        _render_state['stylesheets'] = [CSS(filename=os.path.join(TEMPLATE_DIR, CONTRACT_STYLESHEET))]
+        _render_state['html'] = HTML
+    return _render_state
+
+
+def render_contract_html(supplier_name: str, contracts: List[SimpleNamespace]) -> str:
+    """渲染一组合同快照为 HTML (不依赖 WeasyPrint)"""
+    return _get_template().render(supplier_name=supplier_name, contracts=contracts)
+
+
+def render_contract_pdf(supplier_name: str, contracts: List[SimpleNamespace]) -> bytes:
+    """渲染一组合同快照为 PDF"""
+    state = _get_render_state()
+    html_content = render_contract_html(supplier_name, contracts)
+    return state['html'](string=html_content, base_url=TEMPLATE_DIR).write_pdf(stylesheets=state['stylesheets'])
+
+
+def _render_group(index: int, supplier_name: str, contracts: List[SimpleNamespace]):
+    """进程池任务入口 (须为模块级函数，参数均可 pickle)"""
+    return index, render_contract_pdf(supplier_name, contracts)
+
+
+def _render_group_args(args):
+    return _render_group(*args)
+
+
+class ContractPrintGroup(SimpleNamespace):
+    """一个打印分组：filename / supplier_name / contracts (快照)"""
+
 
 class PDFService:
+    def snapshot_contract(self, contract: ScmDeliveryContract) -> SimpleNamespace:
+        """
+        合同 -> 模板所需字段的纯数据快照 (可跨进程传递)
+        SKU / 申报单位取产品首个变体 (Product 本身没有这两个字段)
+        """
+        company = contract.company
+        supplier = contract.supplier
+        items = []
+        for item in contract.items:
+            product = item.product
+            variant = product.variants[0] if product and product.variants else None
+            items.append(SimpleNamespace(
+                product=SimpleNamespace(
+                    name=product.name if product else '',
+                    sku=variant.sku if variant else None,
+                    declared_unit=variant.declared_unit if variant else None,
+                ),
+                confirmed_qty=item.confirmed_qty,
+                unit_price=item.unit_price,
+                total_price=item.total_price,
+                notes=item.notes,
+            ))
+        return SimpleNamespace(
+            contract_no=contract.contract_no,
+            company=SimpleNamespace(
+                legal_name=company.legal_name,
+                registered_address=company.registered_address,
+                contact_person=company.contact_person,
+                contact_phone=company.contact_phone,
+            ) if company else None,
+            supplier=SimpleNamespace(
+                name=supplier.name,
+                primary_contact=supplier.primary_contact,
+                primary_phone=supplier.primary_phone,
+                payment_terms=supplier.payment_terms,
+            ),
+            source_doc=SimpleNamespace(event_date=contract.source_doc.event_date) if contract.source_doc else None,
+            delivery_date=contract.delivery_date,
+            delivery_address=contract.delivery_address,
+            notes=contract.notes,
+            currency=contract.currency,
+            total_amount=contract.total_amount,
+            items=items,
+        )
+
+    def build_print_groups(self, ids: List[int]) -> List[ContractPrintGroup]:
+        """批量加载合同并按 (采购主体, 供应商) 分组，保持首次出现顺序"""
+        contracts = db.session.query(ScmDeliveryContract).options(
+            db.joinedload(ScmDeliveryContract.supplier),
+            db.joinedload(ScmDeliveryContract.company),
+            db.selectinload(ScmDeliveryContract.items)
+            .joinedload(ScmDeliveryContractItem.product)
+            .selectinload(Product.variants),
+            db.joinedload(ScmDeliveryContract.source_doc)
+        ).filter(ScmDeliveryContract.id.in_(ids)).order_by(ScmDeliveryContract.id).all()
+
+        grouped = {}
+        for c in contracts:
+            # 获取采购主体简称或名称，如果为空则显示"未指定主体"
+            comp_name = c.company.short_name if c.company and c.company.short_name else (c.company.legal_name if c.company else "未指定主体")
+            grouped.setdefault((comp_name, c.supplier.name), []).append(self.snapshot_contract(c))
+
+        date_str = datetime.now().strftime('%Y%m%d')
+        return [
+            ContractPrintGroup(
+                filename=f'{comp_name}_{s_name}_采购合同_{date_str}_{len(c_list)}份.pdf',
+                supplier_name=s_name,
+                contracts=c_list,
+            )
+            for (comp_name, s_name), c_list in grouped.items()
+        ]
+
+    @staticmethod
+    def batch_filename(groups: List[ContractPrintGroup], output: str = OUTPUT_ZIP) -> str:
+        contract_count = sum(len(g.contracts) for g in groups)
+        ext = 'zip' if output == OUTPUT_ZIP else 'pdf'
+        return f'批量采购合同_{datetime.now().strftime("%Y%m%d")}_共{contract_count}份.{ext}'
+
     def generate_supplier_contract_pdf(self, supplier_name, contracts):
         """
         生成单个供应商的合同集合 PDF（每份合同一页，或连续打印）
+        contracts 可为 ORM 对象或 snapshot_contract 快照
         """
-        # 渲染 HTML 模板
-        html_content = render_template(
-            'pdf/contract_batch.html',
-            supplier_name=supplier_name,
-            contracts=contracts
-        )
-        # 转为 PDF 二进制
-        return HTML(string=html_content).write_pdf()
+        snapshots = [c if isinstance(c, SimpleNamespace) else self.snapshot_contract(c) for c in contracts]
+        return render_contract_pdf(supplier_name, snapshots)
 
-pdf_service = PDFService()
+    def render_batch(self, groups: List[ContractPrintGroup], out: BinaryIO, output: str = OUTPUT_ZIP,
+                     max_workers: int = 1, progress: Optional[Callable[[int, int], None]] = None):
+        """
+        批量渲染分组并写入 out
 
+        Args:
+            output: zip (每组一个 PDF 打包) / merged (按分组顺序合并为一个 PDF)
+            max_workers: 进程数，<=1 或仅一组时在当前进程渲染
+            progress: 每完成一组回调 progress(done, total)
+        """
+        if output not in (OUTPUT_ZIP, OUTPUT_MERGED):
+            raise ValueError(f'Unsupported output: {output}')
+
+        total = len(groups)
+        results = {}
+        zf = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) if output == OUTPUT_ZIP else None
+        try:
+            for done, (index, pdf_bytes) in enumerate(self._iter_rendered(groups, max_workers), 1):
+                if zf:
+                    zf.writestr(groups[index].filename, pdf_bytes)
+                else:
+                    results[index] = pdf_bytes
+                if progress:
+                    progress(done, total)
+        finally:
+            if zf:
+                zf.close()
+
+        if output == OUTPUT_MERGED:
+            self._merge_pdfs([results[i] for i in range(total)], out)
+
+    def _iter_rendered(self, groups, max_workers):
+        """按完成顺序产出 (分组序号, PDF 字节)"""
+        if max_workers <= 1 or len(groups) <= 1:
+            for index, group in enumerate(groups):
+                yield _render_group(index, group.supplier_name, group.contracts)
+            return
+
+        workers = min(max_workers, len(groups))
+        logger.info(f"Rendering {len(groups)} contract groups with {workers} processes")
+        tasks = [(index, group.supplier_name, group.contracts) for index, group in enumerate(groups)]
+        if multiprocessing.current_process().daemon:
+            # Celery prefork 子进程 (守护进程): billiard 进程池允许再创建子进程。
+            # 不设 initializer: 初始化失败时 billiard 会不断重建子进程而不报错，
+            # 改由首次渲染时初始化，异常随任务结果返回
+            from billiard.pool import Pool
+
+            pool = Pool(processes=workers)
+            try:
+                yield from pool.imap_unordered(_render_group_args, tasks)
+            finally:
+                pool.terminate()
+                pool.join()
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_get_render_state) as executor:
+            futures = [executor.submit(_render_group, *task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @staticmethod
+    def _merge_pdfs(pdfs: List[bytes], out: BinaryIO):
+        from io import BytesIO
+        from pypdf import PdfWriter
+        writer = PdfWriter()
+        for pdf_bytes in pdfs:
+            writer.append(BytesIO(pdf_bytes))
+        writer.write(out)
+        writer.close()
+
+pdf_service = PDFService()
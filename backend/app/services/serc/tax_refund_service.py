@@ -1,13 +1,173 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple
+from datetime import date
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import select, func, insert, delete, update, bindparam
 from app.extensions import db
 from app.models.serc.tax import TaxInvoiceItem, TaxInvoice, TaxRefundMatch
 from app.models.customs import CustomsDeclaration, CustomsDeclarationItem
 from app.models.serc.enums import TaxInvoiceStatus, CustomsStatus
-from app.models.product import Product
+from app.models.product import Product, ProductVariant
+
+EPSILON = Decimal('0.0001')
+
 
 class TaxRefundService:
+    """
+    退税 报关单-发票 匹配引擎 (Set-Based)
+
+    - 报关单明细、候选发票明细各一次查询加载；发票明细剩余数量物化在 remaining_qty，
+      候选查找走 (name) 部分索引，不再聚合匹配表
+    - 在内存中按发票创建时间 FIFO 分配，同一批次的多个报关单/明细共享剩余额度，不会重复占用
+    - 确认时先按 id 顺序锁定涉及的发票明细 (FOR UPDATE)，再重新规划并批量插入匹配记录
+    - 规则：同一个报关单项号必须一次性匹配满，不可拆分申报；报关单任一项失败则整单不占用额度
+    """
+
+    # ==================== 规划 ====================
+
+    def _load_declaration_items(self, declaration_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """一次查询加载报关单明细及申报品名 (SKU 申报品名优先，否则取 SPU 名称)"""
+        rows = db.session.execute(
+            select(
+                CustomsDeclarationItem.id,
+                CustomsDeclarationItem.declaration_id,
+                CustomsDeclarationItem.qty,
+                Product.id.label('product_id'),
+                func.coalesce(ProductVariant.declared_name, Product.name).label('declared_name'),
+            )
+            .outerjoin(Product, Product.id == CustomsDeclarationItem.product_id)
+            .outerjoin(ProductVariant, ProductVariant.sku == CustomsDeclarationItem.sku)
+            .where(CustomsDeclarationItem.declaration_id.in_(declaration_ids))
+            .order_by(CustomsDeclarationItem.declaration_id, CustomsDeclarationItem.item_no, CustomsDeclarationItem.id)
+        ).all()
+
+        items: Dict[int, List[Dict[str, Any]]] = {decl_id: [] for decl_id in declaration_ids}
+        seen = set()
+        for row in rows:
+            # 同一 SKU 多条变体记录时只取第一条
+            if row.id in seen:
+                continue
+            seen.add(row.id)
+            items[row.declaration_id].append({
+                'id': row.id,
+                'qty': row.qty or Decimal(0),
+                'product_id': row.product_id,
+                'declared_name': row.declared_name,
+            })
+        return items
+
+    def _load_candidates(self, names: Iterable[str], lock: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        单次查询加载仍有余量的候选发票明细，按品名分组、按发票时间正序 (FIFO)
+        lock=True 时先按 id 顺序锁定这些发票明细，避免并发确认重复占用
+        """
+        names = [n for n in set(names) if n]
+        if not names:
+            return {}
+
+        base_filter = (
+            TaxInvoiceItem.name.in_(names),
+            TaxInvoiceItem.remaining_qty > EPSILON,
+            TaxInvoice.status != TaxInvoiceStatus.LOCKED.value,
+        )
+        if lock:
+            db.session.execute(
+                select(TaxInvoiceItem.id)
+                .join(TaxInvoice, TaxInvoice.id == TaxInvoiceItem.invoice_id)
+                .where(*base_filter)
+                .order_by(TaxInvoiceItem.id)
+                .with_for_update(of=TaxInvoiceItem)
+            ).all()
+
+        rows = db.session.execute(
+            select(
+                TaxInvoiceItem.id,
+                TaxInvoiceItem.name,
+                TaxInvoiceItem.remaining_qty,
+                TaxInvoice.invoice_no,
+            )
+            .join(TaxInvoice, TaxInvoice.id == TaxInvoiceItem.invoice_id)
+            .where(*base_filter)
+            .order_by(TaxInvoice.created_at.asc(), TaxInvoiceItem.id.asc())
+        ).all()
+
+        candidates: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            available = Decimal(str(row.remaining_qty or 0))
+            candidates.setdefault(row.name, []).append({
+                'invoice_item_id': row.id,
+                'invoice_no': row.invoice_no,
+                'available': available,
+            })
+        return candidates
+
+    def _plan(self, declaration_ids: List[int], lock: bool = False) -> Dict[int, Dict[str, Any]]:
+        """
+        为一个或多个报关单规划匹配 (按传入顺序依次占用额度)
+        返回 {declaration_id: {'success': bool, 'results': [...]}}
+        """
+        items_by_decl = self._load_declaration_items(declaration_ids)
+        candidates = self._load_candidates(
+            (item['declared_name'] for items in items_by_decl.values() for item in items), lock=lock
+        )
+
+        plans: Dict[int, Dict[str, Any]] = {}
+        for decl_id in declaration_ids:
+            results = []
+            all_matched = True
+            taken: List[Tuple[Dict[str, Any], Decimal]] = []
+
+            for item in items_by_decl.get(decl_id, []):
+                if not item['product_id']:
+                    results.append({"item_id": item['id'], "status": "fail", "reason": "商品关联缺失"})
+                    all_matched = False
+                    continue
+
+                declared_name = item['declared_name']
+                needed_qty = item['qty']
+                selected_plan = []
+                collected = Decimal(0)
+
+                for candidate in candidates.get(declared_name, []):
+                    if collected >= needed_qty:
+                        break
+                    if candidate['available'] <= EPSILON:
+                        continue
+                    take = min(candidate['available'], needed_qty - collected)
+                    candidate['available'] -= take
+                    taken.append((candidate, take))
+                    selected_plan.append({
+                        "invoice_item_id": candidate['invoice_item_id'],
+                        "invoice_no": candidate['invoice_no'],
+                        "take_qty": take
+                    })
+                    collected += take
+
+                if collected >= needed_qty:
+                    results.append({
+                        "item_id": item['id'],
+                        "product_name": declared_name,
+                        "status": "success",
+                        "plan": selected_plan
+                    })
+                else:
+                    all_matched = False
+                    results.append({
+                        "item_id": item['id'],
+                        "product_name": declared_name,
+                        "status": "fail",
+                        "reason": f"发票库存不足: 需 {needed_qty}, 仅有 {collected}"
+                    })
+
+            # 整单失败时释放本单在内存中占用的额度，留给后续报关单
+            if not all_matched:
+                for candidate, take in taken:
+                    candidate['available'] += take
+
+            plans[decl_id] = {"success": all_matched, "results": results}
+        return plans
+
+    # ==================== 对外接口 ====================
+
     def match_declaration(self, declaration_id: int) -> Dict[str, Any]:
         """
         尝试为报关单匹配发票 (Item-Level Fitting Algorithm)
@@ -16,128 +176,99 @@ class TaxRefundService:
         decl = db.session.get(CustomsDeclaration, declaration_id)
         if not decl:
             return {"success": False, "message": "Declaration not found"}
-            
-        results = []
-        all_matched = True
-        
-        # 预加载商品信息
-        for item in decl.items:
-            product = item.product
-            if not product:
-                results.append({
-                    "item_id": item.id, 
-                    "status": "fail", 
-                    "reason": "商品关联缺失"
-                })
-                all_matched = False
-                continue
-                
-            declared_name = product.declared_name or product.name
-            needed_qty = item.qty
-            
-            # 查找该商品名称下的所有发票明细 (按时间正序)
-            # 注意：不限制 status='free'，因为可能存在部分使用的发票
-            # 但要排除已经 status='locked' (已归档) 的发票? 
-            # 假设只要还有余额就可以用。
-            candidates = db.session.query(TaxInvoiceItem).join(TaxInvoice).filter(
-                TaxInvoiceItem.name == declared_name,
-                TaxInvoice.status != TaxInvoiceStatus.LOCKED.value 
-            ).order_by(TaxInvoice.created_at.asc()).all()
-            
-            selected_plan = []
-            current_collected_qty = Decimal(0)
-            
-            # 尝试凑数
-            for inv_item in candidates:
-                if current_collected_qty >= needed_qty:
-                    break
-                    
-                # 计算该发票项的剩余可用数量
-                # used = sum(matches)
-                used_qty = db.session.query(func.sum(TaxRefundMatch.matched_qty))\
-                    .filter(TaxRefundMatch.invoice_item_id == inv_item.id).scalar() or Decimal(0)
-                
-                available = inv_item.qty - used_qty
-                
-                if available <= Decimal('0.0001'):
-                    continue
-                    
-                # 需要多少
-                remaining_needed = needed_qty - current_collected_qty
-                
-                # 取多少
-                take = min(available, remaining_needed)
-                
-                selected_plan.append({
-                    "invoice_item_id": inv_item.id,
-                    "invoice_no": inv_item.invoice.invoice_no,
-                    "take_qty": take
-                })
-                current_collected_qty += take
-                
-            # 判定该项是否匹配成功
-            if current_collected_qty >= needed_qty:
-                # 允许微小误差? 报关单要求数量严格一致。
-                # 实际上如果发票有富余是允许的，但必须涵盖报关数量。
-                results.append({
-                    "item_id": item.id,
-                    "product_name": declared_name,
-                    "status": "success",
-                    "plan": selected_plan
-                })
-            else:
-                all_matched = False
-                results.append({
-                    "item_id": item.id,
-                    "product_name": declared_name,
-                    "status": "fail",
-                    "reason": f"发票库存不足: 需 {needed_qty}, 仅有 {current_collected_qty}"
-                })
-                
-        return {
-            "success": all_matched,
-            "results": results
-        }
+
+        return self._plan([declaration_id])[declaration_id]
 
     def confirm_match(self, declaration_id: int) -> bool:
         """
         确认匹配结果并持久化
-        此方法会重新运行匹配算法以确保并发安全性
+        在锁定候选发票明细后重新规划，保证并发安全
         """
-        match_result = self.match_declaration(declaration_id)
-        if not match_result.get('success'):
+        if not db.session.get(CustomsDeclaration, declaration_id):
             return False
-        
-        results = match_result['results']
-        
+        return declaration_id in self.confirm_matches([declaration_id])['confirmed']
+
+    def confirm_matches(self, declaration_ids: List[int]) -> Dict[str, Any]:
+        """
+        批量确认: 锁定 -> 规划 -> 批量插入匹配记录 -> 刷新发票状态 -> 更新报关单状态
+        匹配失败的报关单不占用额度，也不影响其他报关单
+        """
         try:
-            for res in results:
-                customs_item_id = res['item_id']
-                for plan_item in res['plan']:
-                    invoice_item_id = plan_item['invoice_item_id']
-                    take_qty = Decimal(str(plan_item['take_qty']))
-                    
-                    # 1. Create Match Record
-                    match = TaxRefundMatch(
-                        customs_item_id=customs_item_id,
-                        invoice_item_id=invoice_item_id,
-                        matched_qty=take_qty
-                    )
-                    db.session.add(match)
-                    
-                    # 2. Check and Update Invoice Status
-                    self._update_invoice_status(invoice_item_id)
-            
-            # 3. Update Declaration Status
-            decl = db.session.get(CustomsDeclaration, declaration_id)
-            decl.status = CustomsStatus.PRE_DECLARED.value # 预申报状态
-            
+            plans = self._plan(declaration_ids, lock=True)
+            confirmed = [decl_id for decl_id in declaration_ids if plans[decl_id]['success']]
+
+            rows = [
+                {
+                    'customs_item_id': res['item_id'],
+                    'invoice_item_id': plan_item['invoice_item_id'],
+                    'matched_qty': plan_item['take_qty'],
+                }
+                for decl_id in confirmed
+                for res in plans[decl_id]['results']
+                for plan_item in res['plan']
+            ]
+            if rows:
+                db.session.execute(insert(TaxRefundMatch), rows)
+                self._apply_remaining_delta(rows, sign=-1)
+                self._refresh_invoice_statuses({row['invoice_item_id'] for row in rows})
+
+            if confirmed:
+                for decl in db.session.scalars(
+                    select(CustomsDeclaration).where(CustomsDeclaration.id.in_(confirmed))
+                ):
+                    decl.status = CustomsStatus.PRE_DECLARED.value  # 预申报状态
+
             db.session.commit()
-            return True
         except Exception as e:
             db.session.rollback()
             raise e
-    
+
+        return {
+            "confirmed": confirmed,
+            "failed": [
+                {"declaration_id": decl_id, "results": plans[decl_id]['results']}
+                for decl_id in declaration_ids if not plans[decl_id]['success']
+            ],
+            "match_count": len(rows),
+        }
+
+    def match_month(self, year: int, month: int, confirm: bool = False) -> Dict[str, Any]:
+        """
+        按月批量匹配: 当月 (按申报日期，缺失时按出口日期) 的草稿报关单按日期先后依次占用发票额度
+        confirm=False 仅返回规划结果
+        """
+        start = date(year, month, 1)
+        end = date(year + (month // 12), month % 12 + 1, 1)
+        biz_date = func.coalesce(CustomsDeclaration.declare_date, CustomsDeclaration.export_date)
+        declaration_ids = list(db.session.scalars(
+            select(CustomsDeclaration.id)
+            .where(
+                CustomsDeclaration.status == CustomsStatus.DRAFT.value,
+                biz_date >= start,
+                biz_date < end,
+            )
+            .order_by(biz_date.asc(), CustomsDeclaration.id.asc())
+        ))
+        if not declaration_ids:
+            return {"total": 0, "confirmed": [], "failed": [], "match_count": 0}
+
+        if confirm:
+            result = self.confirm_matches(declaration_ids)
+        else:
+            plans = self._plan(declaration_ids)
+            result = {
+                "confirmed": [d for d in declaration_ids if plans[d]['success']],
+                "failed": [
+                    {"declaration_id": d, "results": plans[d]['results']}
+                    for d in declaration_ids if not plans[d]['success']
+                ],
+                "match_count": sum(
+                    len(res['plan']) for d in declaration_ids if plans[d]['success'] for res in plans[d]['results']
+                ),
+            }
+        result["total"] = len(declaration_ids)
+        return result
+
     def cancel_match(self, declaration_id: int) -> bool:
         """
         解除匹配 (释放发票)
@@ -146,82 +277,125 @@ class TaxRefundService:
         decl = db.session.get(CustomsDeclaration, declaration_id)
         if not decl:
             return False
-            
+
         # 只能撤销预申报状态或正式申报状态(需特批)的单据
         # 暂定: 只有 PRE_DECLARED 可撤销
         if decl.status != CustomsStatus.PRE_DECLARED.value:
             return False
-            
+
         try:
-            # 1. 查找所有关联的匹配记录
-            matches = db.session.query(TaxRefundMatch).join(CustomsDeclarationItem)\
-                .filter(CustomsDeclarationItem.declaration_id == declaration_id).all()
-            
-            affected_invoice_item_ids = set()
-            
-            # 2. 删除匹配记录
-            for match in matches:
-                affected_invoice_item_ids.add(match.invoice_item_id)
-                db.session.delete(match)
-            
-            # 3. 重新计算发票状态
-            # Flush first to ensure deletions are visible to query in _update_invoice_status
-            db.session.flush() 
-            
-            for inv_item_id in affected_invoice_item_ids:
-                self._update_invoice_status(inv_item_id)
-                
-            # 4. 回滚报关单状态
+            item_ids = select(CustomsDeclarationItem.id).where(
+                CustomsDeclarationItem.declaration_id == declaration_id
+            )
+            released = [
+                {'invoice_item_id': row.invoice_item_id, 'matched_qty': row.matched_qty}
+                for row in db.session.execute(
+                    select(TaxRefundMatch.invoice_item_id, TaxRefundMatch.matched_qty)
+                    .where(TaxRefundMatch.customs_item_id.in_(item_ids))
+                )
+            ]
+
+            # 1. 删除匹配记录并归还发票余量
+            db.session.execute(
+                delete(TaxRefundMatch).where(TaxRefundMatch.customs_item_id.in_(item_ids)),
+                execution_options={'synchronize_session': False}
+            )
+            self._apply_remaining_delta(released, sign=1)
+
+            # 2. 重新计算发票状态
+            self._refresh_invoice_statuses({row['invoice_item_id'] for row in released})
+
+            # 3. 回滚报关单状态
             decl.status = CustomsStatus.DRAFT.value
-            
+
             db.session.commit()
             return True
-            
+
         except Exception as e:
             db.session.rollback()
             raise e
 
-    def _update_invoice_status(self, invoice_item_id: int):
+    def _apply_remaining_delta(self, rows: List[Dict[str, Any]], sign: int):
+        """按发票明细汇总数量后批量调整 remaining_qty (sign=-1 占用, 1 释放)"""
+        deltas: Dict[int, Decimal] = {}
+        for row in rows:
+            deltas[row['invoice_item_id']] = deltas.get(row['invoice_item_id'], Decimal(0)) + Decimal(str(row['matched_qty']))
+
+        table = TaxInvoiceItem.__table__
+        db.session.connection().execute(
+            update(table)
+            .where(table.c.id == bindparam('item_id'))
+            .values(remaining_qty=table.c.remaining_qty + bindparam('delta')),
+            [{'item_id': item_id, 'delta': sign * qty} for item_id, qty in deltas.items()]
+        )
+        # 会话中已加载的发票明细以数据库为准
+        for item_id in deltas:
+            item = db.session.identity_map.get(db.session.identity_key(TaxInvoiceItem, item_id))
+            if item is not None:
+                db.session.expire(item, ['remaining_qty'])
+
+    def _refresh_invoice_statuses(self, invoice_item_ids: Iterable[int]):
         """
-        更新发票项及发票主表的状态
-        逻辑: 如果发票项用完了，检查主表所有项是否用完
+        按发票明细剩余数量刷新发票主表状态 (一次查询)
+        全部用完 -> LOCKED; 部分使用 -> RESERVED; 未使用 -> FREE
         """
-        inv_item = db.session.get(TaxInvoiceItem, invoice_item_id)
-        if not inv_item:
+        invoice_item_ids = list(invoice_item_ids)
+        if not invoice_item_ids:
             return
-            
-        # Calculate used quantity for this item
-        used_qty = db.session.query(func.sum(TaxRefundMatch.matched_qty))\
-            .filter(TaxRefundMatch.invoice_item_id == invoice_item_id).scalar() or Decimal(0)
-            
-        # Check if item is fully used
-        # Use a small epsilon for float comparison
-        # item_fully_used = (inv_item.qty - used_qty) <= Decimal('0.0001')
-        
-        # We don't have status on Item level, only on Header level
-        # Check all items in this invoice
-        invoice = inv_item.invoice
-        all_items_used = True
-        any_item_used = False
-        
-        for item in invoice.items:
-            # We need to query used_qty for each item
-            i_used = db.session.query(func.sum(TaxRefundMatch.matched_qty))\
-                .filter(TaxRefundMatch.invoice_item_id == item.id).scalar() or Decimal(0)
-            
-            if i_used > Decimal('0.0001'):
-                any_item_used = True
-                
-            if (item.qty - i_used) > Decimal('0.0001'):
-                all_items_used = False
-                # If we found an unused part, we know it's not LOCKED.
-                # But we still need to check if ANY used to decide between FREE and RESERVED.
-        
-        if all_items_used:
-            invoice.status = TaxInvoiceStatus.LOCKED.value # Fully used
-        elif any_item_used:
-            invoice.status = TaxInvoiceStatus.RESERVED.value # Partially used
-        else:
-            invoice.status = TaxInvoiceStatus.FREE.value # Not used at all
+
+        invoice_ids = select(TaxInvoiceItem.invoice_id).where(TaxInvoiceItem.id.in_(invoice_item_ids))
+        rows = db.session.execute(
+            select(TaxInvoiceItem.invoice_id, TaxInvoiceItem.qty, TaxInvoiceItem.remaining_qty)
+            .where(TaxInvoiceItem.invoice_id.in_(invoice_ids))
+        ).all()
+
+        flags: Dict[int, List[bool]] = {}  # invoice_id -> [all_items_used, any_item_used]
+        for row in rows:
+            qty = row.qty or Decimal(0)
+            remaining = Decimal(str(row.remaining_qty or 0))
+            state = flags.setdefault(row.invoice_id, [True, False])
+            if qty - remaining > EPSILON:
+                state[1] = True
+            if remaining > EPSILON:
+                state[0] = False
+
+        for invoice in db.session.scalars(select(TaxInvoice).where(TaxInvoice.id.in_(list(flags)))):
+            all_items_used, any_item_used = flags[invoice.id]
+            if all_items_used:
+                invoice.status = TaxInvoiceStatus.LOCKED.value  # Fully used
+            elif any_item_used:
+                invoice.status = TaxInvoiceStatus.RESERVED.value  # Partially used
+            else:
+                invoice.status = TaxInvoiceStatus.FREE.value  # Not used at all
+
+    def repair_remaining_qty(self) -> int:
+        """
+        一致性修复: remaining_qty = qty - SUM(matched_qty)，返回修正的明细数
+        """
+        used = (
+            select(TaxRefundMatch.invoice_item_id, func.sum(TaxRefundMatch.matched_qty).label('used_qty'))
+            .group_by(TaxRefundMatch.invoice_item_id)
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(TaxInvoiceItem.id, TaxInvoiceItem.qty, TaxInvoiceItem.remaining_qty, used.c.used_qty)
+            .outerjoin(used, used.c.invoice_item_id == TaxInvoiceItem.id)
+        ).all()
+
+        fixes = []
+        for row in rows:
+            expected = (row.qty or Decimal(0)) - Decimal(str(row.used_qty or 0))
+            if row.remaining_qty is None or abs(Decimal(str(row.remaining_qty)) - expected) > EPSILON:
+                fixes.append({'item_id': row.id, 'remaining': expected})
+
+        if fixes:
+            table = TaxInvoiceItem.__table__
+            db.session.connection().execute(
+                update(table).where(table.c.id == bindparam('item_id')).values(remaining_qty=bindparam('remaining')),
+                fixes
+            )
+            self._refresh_invoice_statuses([fix['item_id'] for fix in fixes])
+        db.session.commit()
+        return len(fixes)
 
 tax_refund_service = TaxRefundService()
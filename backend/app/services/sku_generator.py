@@ -1,36 +1,223 @@
 import re
-from sqlalchemy import select
+import logging
+from typing import List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import select, update, func, or_
 from app.extensions import db
-from app.models.product import Product, ProductVariant
+from app.errors import BusinessError
+from app.models.product import Category, ProductVariant, SkuSerialCounter
+
+logger = logging.getLogger(__name__)
+
+# 发现计数器落后于实际 SKU 时的最大修复重试次数
+MAX_ALLOCATE_RETRIES = 3
+
+
+def _redis_enabled() -> bool:
+    return current_app.config.get('SKU_SERIAL_BACKEND', 'db') == 'redis'
+
+
+def _redis_key(prefix: str, width: int) -> str:
+    return f"sku:serial:{prefix}:{width}"
+
+
+def _get_redis():
+    from app.redis_client import get_redis
+    return get_redis()
+
+
+def scan_max_serial(prefix: str, width: int = 4) -> int:
+    """
+    扫描现有 SKU，返回 {prefix}{width 位数字} 中最大的流水号 (无则 0)
+    仅用于计数器首次播种和修复，常规分配不再走扫描
+    """
+    serial = func.substr(ProductVariant.sku, len(prefix) + 1, width)
+    result = db.session.execute(
+        select(func.max(serial)).where(
+            ProductVariant.sku.startswith(prefix, autoescape=True),
+            ProductVariant.sku.regexp_match(f"^{re.escape(prefix)}\\d{{{width}}}")
+        )
+    ).scalar_one_or_none()
+    return int(result) if result and result.isdigit() else 0
+
+
+def _upsert_counter(prefix: str, width: int, seed: int, count: int) -> int:
+    """插入计数器 (并发插入时退化为自增)，返回分配后的 last_value"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(SkuSerialCounter).values(prefix=prefix, width=width, last_value=seed + count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['prefix', 'width'],
+        set_={'last_value': SkuSerialCounter.last_value + count, 'updated_at': func.now()}
+    ).returning(SkuSerialCounter.last_value)
+    return db.session.execute(stmt).scalar_one()
+
+
+def _reserve_db(prefix: str, width: int, count: int) -> int:
+    """
+    计数器表原子自增 (UPDATE ... RETURNING)
+    行锁持有到事务提交，同前缀的并发创建串行化；事务回滚时流水号随之回滚，不留空号
+    """
+    end = db.session.execute(
+        update(SkuSerialCounter)
+        .where(SkuSerialCounter.prefix == prefix, SkuSerialCounter.width == width)
+        .values(last_value=SkuSerialCounter.last_value + count, updated_at=func.now())
+        .returning(SkuSerialCounter.last_value)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if end is None:
+        end = _upsert_counter(prefix, width, scan_max_serial(prefix, width), count)
+    return end
+
+
+def _reserve_redis(client, prefix: str, width: int, count: int) -> int:
+    """Redis INCRBY 快速路径，key 不存在时先以 DB 计数器/现有 SKU 播种"""
+    key = _redis_key(prefix, width)
+    if not client.exists(key):
+        counter = db.session.get(SkuSerialCounter, (prefix, width))
+        seed = max(counter.last_value if counter else 0, scan_max_serial(prefix, width))
+        client.set(key, seed, nx=True)
+    return int(client.incrby(key, count))
+
+
+def reserve_serials(prefix: str, count: int = 1, width: int = 4) -> List[int]:
+    """
+    为前缀预留 count 个连续流水号 (多 SKU 商品一次预留)
+    """
+    if count <= 0:
+        return []
+
+    end = None
+    if _redis_enabled():
+        try:
+            client = _get_redis()
+            if client:
+                end = _reserve_redis(client, prefix, width, count)
+        except Exception as e:
+            logger.warning(f"Redis SKU serial allocation failed, falling back to DB: {e}")
+    if end is None:
+        end = _reserve_db(prefix, width, count)
+
+    return list(range(end - count + 1, end + 1))
+
+
+def peek_next_serial(prefix: str, width: int = 4) -> int:
+    """预览下一个流水号 (只读，不占号)"""
+    if _redis_enabled():
+        try:
+            client = _get_redis()
+            value = client.get(_redis_key(prefix, width)) if client else None
+            if value is not None:
+                return int(value) + 1
+        except Exception as e:
+            logger.warning(f"Redis SKU serial peek failed, falling back to DB: {e}")
+
+    last_value = db.session.scalar(
+        select(SkuSerialCounter.last_value)
+        .where(SkuSerialCounter.prefix == prefix, SkuSerialCounter.width == width)
+    )
+    if last_value is None:
+        last_value = scan_max_serial(prefix, width)
+    return last_value + 1
+
+
+def repair_counter(prefix: str, width: int = 4) -> int:
+    """
+    按现有 SKU 修复计数器: last_value = max(当前值, 现有最大流水号)
+    只前进不后退，避免与已预留但未落库的流水号冲突
+    """
+    scanned = scan_max_serial(prefix, width)
+    counter = db.session.get(SkuSerialCounter, (prefix, width))
+    if counter is None:
+        counter = SkuSerialCounter(prefix=prefix, width=width, last_value=scanned)
+        db.session.add(counter)
+    else:
+        counter.last_value = max(counter.last_value or 0, scanned)
+    db.session.flush()
+
+    if _redis_enabled():
+        try:
+            client = _get_redis()
+            if client:
+                key = _redis_key(prefix, width)
+                current = int(client.get(key) or 0)
+                if current < counter.last_value:
+                    client.set(key, counter.last_value)
+                counter.last_value = max(counter.last_value, current)
+        except Exception as e:
+            logger.warning(f"Redis SKU serial repair failed: {e}")
+
+    return counter.last_value
+
+
+def allocate_skus(prefix: str, suffixes: List[Optional[str]], width: int = 4) -> List[str]:
+    """
+    批量分配 SKU: {prefix}{serial}{suffix}，每个后缀占用一个流水号
+
+    计数器与实际数据不一致 (如手工导入 SKU、Redis 数据丢失) 时，
+    候选流水号可能已被占用: 一次查询检出冲突后修复计数器并重新预留
+    """
+    skus: List[Optional[str]] = [None] * len(suffixes)
+    pending = list(range(len(suffixes)))
+
+    for _ in range(MAX_ALLOCATE_RETRIES + 1):
+        serials = reserve_serials(prefix, len(pending), width)
+        bases = {idx: f"{prefix}{serial:0{width}d}" for idx, serial in zip(pending, serials)}
+        # 流水号已被任意 SKU (不论后缀) 使用即视为冲突
+        used = set(db.session.scalars(
+            select(func.substr(ProductVariant.sku, 1, len(prefix) + width))
+            .where(or_(*[ProductVariant.sku.startswith(base, autoescape=True) for base in bases.values()]))
+        ).all())
+
+        pending = []
+        for idx, base in bases.items():
+            if base in used:
+                pending.append(idx)
+            else:
+                skus[idx] = f"{base}{suffixes[idx] or ''}"
+        if not pending:
+            return skus
+
+        logger.warning(f"SKU serial counter {prefix}/{width} behind existing SKUs, repairing")
+        repair_counter(prefix, width)
+
+    raise BusinessError(f"SKU 流水号分配失败 (前缀 {prefix})，请执行 flask product seed-sku-serials 修复")
+
+
+def seed_serial_counters(targets: Optional[List[Tuple[str, int]]] = None) -> List[Tuple[str, int, int]]:
+    """
+    按现有 SKU 播种/修复计数器
+    默认范围: 已有计数器 + 各类目编码 (SKU 短码 类目码+5位流水号)
+    返回 [(prefix, width, last_value)]
+    """
+    if targets is None:
+        targets = {
+            (row.prefix, row.width)
+            for row in db.session.execute(select(SkuSerialCounter.prefix, SkuSerialCounter.width))
+        }
+        for code in db.session.scalars(select(Category.code).where(Category.code.isnot(None))).all():
+            if code:
+                targets.add((code, 5))
+        targets = sorted(targets)
+
+    result = [(prefix, width, repair_counter(prefix, width)) for prefix, width in targets]
+    db.session.commit()
+    return result
+
 
 def get_next_serial_preview(prefix: str) -> str:
     """
-    Returns the next 4-digit serial string (e.g. '0052') for the given prefix
-    by looking at the max existing SKU in the DB.
+    Returns the next 4-digit serial string (e.g. '0052') for the given prefix.
+    Read-only peek at the serial counter; the actual serial is reserved at creation time.
     """
     if not prefix:
         return '0001'
 
-    # Regex: ^prefix\d{4}
-    # We want to find SKUs that start with this prefix and have digits immediately after.
-    # Note: DB lookup might be slow if table is huge without index on SKU (which we have).
-    query = select(ProductVariant.sku).where(
-        ProductVariant.sku.regexp_match(f"^{prefix}\\d{{4}}")
-    ).order_by(ProductVariant.sku.desc()).limit(1)
-    
-    result = db.session.execute(query).scalar_one_or_none()
-    
-    next_serial = 1
-    if result:
-        try:
-            # Extract the 4 digits after prefix
-            serial_part = result[len(prefix):len(prefix)+4]
-            if serial_part.isdigit():
-                next_serial = int(serial_part) + 1
-        except:
-            pass 
-            
-    return f"{next_serial:04d}"
+    return f"{peek_next_serial(prefix, 4):04d}"
+
 
 def generate_sku(category_code: str, make_code: str, suffix: str = None) -> str:
     """
@@ -43,24 +230,4 @@ def generate_sku(category_code: str, make_code: str, suffix: str = None) -> str:
         make_code = "00" # Fallback / Universal
 
     prefix = f"{category_code}{make_code}"
-    
-    # 1. Get initial guess based on max serial
-    next_serial_str = get_next_serial_preview(prefix)
-    next_serial = int(next_serial_str)
-    
-    # 2. Generate Candidate & Check Collision
-    while True:
-        serial_str = f"{next_serial:04d}"
-        candidate_sku = f"{prefix}{serial_str}"
-        if suffix:
-            candidate_sku += suffix
-            
-        # Check if exists
-        exists = db.session.execute(
-            select(ProductVariant.id).where(ProductVariant.sku == candidate_sku)
-        ).scalar_one_or_none()
-        
-        if not exists:
-            return candidate_sku
-        
-        next_serial += 1
+    return allocate_skus(prefix, [suffix], width=4)[0]
@@ -123,7 +123,7 @@ class SupplyContractService:
         品名、数量、单位完全一致，仅添加税率信息
         """
         # 生成合同号
-        contract_no = generate_seq_no('SC', db)
+        contract_no = generate_seq_no('SC')
         
         # 计算含税金额
         tax_rate = Decimal(str(data.get('tax_rate', 0.13)))  # 默认13%
@@ -210,7 +210,7 @@ class SupplyContractService:
             )
         
         # 生成合同号
-        contract_no = generate_seq_no('SC', db)
+        contract_no = generate_seq_no('SC')
         
         # 计算含税金额
         tax_rate = Decimal(str(data.get('tax_rate', 0.13)))
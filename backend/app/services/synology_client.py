@@ -3,6 +3,7 @@ import os
 import time
 from flask import current_app
 from werkzeug.datastructures import FileStorage
+from app.metrics import track_external
 
 class SynologyClient:
     """
@@ -35,6 +36,7 @@ class SynologyClient:
         # 实际开发中，auth.cgi 和 entry.cgi 通常是固定的入口
         pass
 
+    @track_external('synology')
     def login(self):
         """
         执行登录获取 SID
@@ -79,6 +81,7 @@ class SynologyClient:
             self.login()
         return self._sid
 
+    @track_external('synology')
     def upload_file(self, file_obj: FileStorage, target_folder_rel: str, filename: str = None):
         """
         上传文件到 NAS
@@ -133,6 +136,7 @@ class SynologyClient:
             current_app.logger.error(f"NAS Upload Error: {str(e)}")
             raise
 
+    @track_external('synology')
     def get_file_stream(self, file_path_rel: str):
         """
         获取文件下载流 (用于透传给前端)
@@ -204,6 +208,7 @@ class SynologyClient:
             current_app.logger.error(f"下载文件到缓冲区失败 {file_path_rel}: {str(e)}")
             return None
 
+    @track_external('synology')
     def create_folder(self, folder_path_rel: str):
         """
         创建文件夹 (主要用于初始化业务目录结构)
@@ -249,6 +254,7 @@ class SynologyClient:
             current_app.logger.error(f"NAS Create Folder Error: {str(e)}")
             raise
 
+    @track_external('synology')
     def list_files(self, folder_path_rel: str, override_root: str = None):
         """
         列出指定目录下的文件
@@ -305,6 +311,7 @@ class SynologyClient:
             current_app.logger.error(f"NAS List Error: {str(e)}")
             raise
 
+    @track_external('synology')
     def delete_file(self, file_path_rel: str):
         """
         删除文件
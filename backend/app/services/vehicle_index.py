@@ -0,0 +1,481 @@
+import csv
+import io
+import re
+import threading
+import time
+import logging
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, IO
+from flask import current_app
+from sqlalchemy import select
+from app.extensions import db
+from app.http_cache import resource_versions
+from app.models.product import ProductVehicle
+
+logger = logging.getLogger(__name__)
+
+PATH_SEPARATOR = ' > '
+
+# eBay Master Vehicle List 列名映射 (大小写不敏感)
+MVL_COLUMNS = {
+    'make': ('make',),
+    'model': ('model',),
+    'year': ('year', 'years'),
+}
+
+
+class VehicleIndex:
+    """
+    车型层级内存索引 (Make -> Model -> Year)
+
+    一次性加载 product_vehicles 全表，构建:
+    1. 节点表: id -> 扁平化节点 (含完整路径 path / path_abbreviation)
+    2. 子节点表: parent_id -> [child_id] (已按 sort_order, name 排序)
+    3. 缩写/编码映射: (parent_id, ABBR) -> id, CODE -> [id]
+    4. 前缀检索表: 有序 (token, id) 列表，bisect 实现前缀查找
+
+    新增/删除节点后通过 add_node / remove_node 增量刷新；
+    其他进程或脚本写入的数据依赖 VEHICLE_INDEX_TTL 过期后全量重建，
+    或由 sync_version() 发现资源版本 (app.http_cache) 变化后立即重建。
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        self._version: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        self._nodes: Dict[int, Dict[str, Any]] = {}
+        self._children: Dict[Optional[int], List[int]] = defaultdict(list)
+        self._abbr_map: Dict[tuple, int] = {}
+        self._code_map: Dict[str, List[int]] = defaultdict(list)
+        self._prefix_keys: List[tuple] = []
+
+    # ------------------------------------------------------------------
+    # 加载与刷新
+    # ------------------------------------------------------------------
+
+    def ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl):
+                self.reload()
+
+    def reload(self):
+        """全量重建索引 (单次查询，只取标量列)"""
+        # 先读版本再读数据: 期间有写入时版本偏旧，下次 sync_version 会再重建，不会漏掉变更
+        version = resource_versions(['vehicles'])['vehicles']
+        rows = db.session.execute(
+            select(
+                ProductVehicle.id, ProductVehicle.parent_id, ProductVehicle.name,
+                ProductVehicle.abbreviation, ProductVehicle.code, ProductVehicle.level_type,
+                ProductVehicle.sort_order, ProductVehicle.is_active
+            )
+        ).all()
+
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._nodes[row.id] = {
+                    'id': row.id,
+                    'parent_id': row.parent_id,
+                    'name': row.name,
+                    'abbreviation': row.abbreviation,
+                    'code': row.code,
+                    'level_type': row.level_type,
+                    'sort_order': row.sort_order or 0,
+                    'is_active': row.is_active,
+                }
+            for node in self._nodes.values():
+                self._children[node['parent_id']].append(node['id'])
+            for child_ids in self._children.values():
+                child_ids.sort(key=self._sort_key)
+
+            # 自顶向下计算路径，保证父节点先于子节点
+            stack = list(reversed(self._children.get(None, [])))
+            while stack:
+                node_id = stack.pop()
+                self._index_node(self._nodes[node_id])
+                stack.extend(reversed(self._children.get(node_id, [])))
+
+            self._prefix_keys.sort()
+            self._loaded_at = time.monotonic()
+            self._version = version
+
+        logger.info(f"Vehicle index loaded: {len(self._nodes)} nodes")
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def sync_version(self, version: Optional[int] = None):
+        """资源版本与加载时不一致 (本进程或其他进程写入过) 时标记重建；ETag 接口在读取前调用"""
+        if version is None:
+            version = resource_versions(['vehicles'])['vehicles']
+        with self._lock:
+            if self._loaded_at is not None and version != self._version:
+                self._loaded_at = None
+
+    def _sort_key(self, node_id: int):
+        node = self._nodes[node_id]
+        return (node['sort_order'], node['name'])
+
+    def _index_node(self, node: Dict[str, Any], keep_sorted: bool = False):
+        """计算节点路径并写入各映射表"""
+        parent = self._nodes.get(node['parent_id'])
+        if parent:
+            node['path'] = parent['path'] + PATH_SEPARATOR + node['name']
+            node['path_ids'] = parent['path_ids'] + [node['id']]
+            node['path_abbreviation'] = f"{parent['path_abbreviation']}-{node['abbreviation']}"
+        else:
+            node['path'] = node['name']
+            node['path_ids'] = [node['id']]
+            node['path_abbreviation'] = node['abbreviation']
+        node['depth'] = len(node['path_ids'])
+
+        self._abbr_map[(node['parent_id'], node['abbreviation'].upper())] = node['id']
+        if node['code']:
+            self._code_map[node['code'].upper()].append(node['id'])
+
+        for token in self._node_tokens(node):
+            if keep_sorted:
+                insort(self._prefix_keys, (token, node['id']))
+            else:
+                self._prefix_keys.append((token, node['id']))
+
+    @staticmethod
+    def _node_tokens(node: Dict[str, Any]) -> set:
+        tokens = set(_tokenize(node['name']))
+        tokens.add(node['name'].lower())
+        tokens.add(node['abbreviation'].lower())
+        if node['code']:
+            tokens.add(node['code'].lower())
+        return tokens
+
+    def add_node(self, node: ProductVehicle):
+        """增量新增节点 (调用方需已 commit)"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if node.parent_id is not None and node.parent_id not in self._nodes:
+                # 父节点不在索引中，说明索引已过期
+                self.invalidate()
+                return
+            entry = {
+                'id': node.id,
+                'parent_id': node.parent_id,
+                'name': node.name,
+                'abbreviation': node.abbreviation,
+                'code': node.code,
+                'level_type': node.level_type,
+                'sort_order': node.sort_order or 0,
+                'is_active': node.is_active if node.is_active is not None else True,
+            }
+            self._nodes[node.id] = entry
+            siblings = self._children[node.parent_id]
+            siblings.append(node.id)
+            siblings.sort(key=self._sort_key)
+            self._index_node(entry, keep_sorted=True)
+
+    def remove_node(self, node_id: int):
+        """增量删除叶子节点 (调用方需已 commit)"""
+        with self._lock:
+            entry = self._nodes.pop(node_id, None)
+            if entry is None:
+                return
+            siblings = self._children.get(entry['parent_id'], [])
+            if node_id in siblings:
+                siblings.remove(node_id)
+            self._children.pop(node_id, None)
+
+            self._abbr_map.pop((entry['parent_id'], entry['abbreviation'].upper()), None)
+            if entry['code']:
+                ids = self._code_map.get(entry['code'].upper(), [])
+                if node_id in ids:
+                    ids.remove(node_id)
+            for token in self._node_tokens(entry):
+                pos = bisect_left(self._prefix_keys, (token, node_id))
+                if pos < len(self._prefix_keys) and self._prefix_keys[pos] == (token, node_id):
+                    del self._prefix_keys[pos]
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def get(self, node_id: int) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        return self._nodes.get(node_id)
+
+    def children(self, parent_id: Optional[int]) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            return [self._nodes[i] for i in self._children.get(parent_id, [])]
+
+    def by_level(self, level_type: str) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            nodes = [n for n in self._nodes.values() if n['level_type'] == level_type]
+        return sorted(nodes, key=lambda n: (n['sort_order'], n['name']))
+
+    def find_by_abbreviation(self, abbreviation: str, parent_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        node_id = self._abbr_map.get((parent_id, abbreviation.upper()))
+        return self._nodes.get(node_id) if node_id else None
+
+    def find_by_code(self, code: str) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            return [self._nodes[i] for i in self._code_map.get(code.upper(), [])]
+
+    def tree(self, parent_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """构建嵌套树 (供 ProductVehicleTreeSchema 序列化)"""
+        self.ensure_loaded()
+        with self._lock:
+            return self._build_tree(parent_id)
+
+    def _build_tree(self, parent_id: Optional[int]) -> List[Dict[str, Any]]:
+        return [
+            dict(self._nodes[i], children=self._build_tree(i))
+            for i in self._children.get(parent_id, [])
+        ]
+
+    def search(self, q: str, level_type: Optional[str] = None, parent_id: Optional[int] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        前缀检索 (Typeahead)
+        - 首个关键词走有序表前缀查找，其余关键词需命中路径上任一 token 的前缀
+        - 例: "chev sil 2010" -> Chevrolet > Silverado > 2010
+        - 排序: 完全匹配优先，其次层级由浅到深
+        """
+        tokens = _tokenize(q or '')
+        if not tokens:
+            return []
+        self.ensure_loaded()
+
+        head, rest = tokens[0], tokens[1:]
+        with self._lock:
+            candidates = set()
+            pos = bisect_left(self._prefix_keys, (head,))
+            while pos < len(self._prefix_keys) and self._prefix_keys[pos][0].startswith(head):
+                candidates.add(self._prefix_keys[pos][1])
+                pos += 1
+
+            # 首词命中祖先时，后续关键词可落在子孙节点上 (如 "chev sil")
+            if rest:
+                expanded = set()
+                for node_id in candidates:
+                    expanded.update(self._descendants(node_id))
+                candidates |= expanded
+
+            results = []
+            for node_id in candidates:
+                node = self._nodes[node_id]
+                if level_type and node['level_type'] != level_type:
+                    continue
+                if parent_id is not None and parent_id not in node['path_ids'][:-1]:
+                    continue
+                if rest:
+                    path_tokens = self._path_tokens(node)
+                    if not all(any(t.startswith(r) for t in path_tokens) for r in rest):
+                        continue
+                results.append(node)
+
+        query_text = ' '.join(tokens)
+        results.sort(key=lambda n: (
+            0 if n['name'].lower() == query_text or n['abbreviation'].lower() == query_text else 1,
+            n['depth'],
+            n['sort_order'],
+            n['path'],
+        ))
+        return results[:limit]
+
+    def _descendants(self, node_id: int) -> List[int]:
+        result = []
+        stack = list(self._children.get(node_id, []))
+        while stack:
+            child_id = stack.pop()
+            result.append(child_id)
+            stack.extend(self._children.get(child_id, []))
+        return result
+
+    def _path_tokens(self, node: Dict[str, Any]) -> set:
+        tokens = set()
+        for node_id in node['path_ids']:
+            tokens |= self._node_tokens(self._nodes[node_id])
+        return tokens
+
+    def name_lookup(self) -> Dict[tuple, int]:
+        """(parent_id, 小写名称) -> id，供批量导入去重"""
+        self.ensure_loaded()
+        with self._lock:
+            return {(n['parent_id'], n['name'].lower()): n['id'] for n in self._nodes.values()}
+
+    def used_abbreviations(self) -> Dict[Optional[int], set]:
+        self.ensure_loaded()
+        with self._lock:
+            used = defaultdict(set)
+            for parent_id, abbr in self._abbr_map:
+                used[parent_id].add(abbr)
+            return used
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+def _tokenize(text: str) -> List[str]:
+    return [t for t in re.split(r'[\s/>,]+', text.lower()) if t]
+
+
+def get_vehicle_index() -> VehicleIndex:
+    """获取当前应用的车型索引 (每个 app / 进程一份)"""
+    index = current_app.extensions.get('vehicle_index')
+    if index is None:
+        index = VehicleIndex(ttl=current_app.config.get('VEHICLE_INDEX_TTL', 300))
+        current_app.extensions['vehicle_index'] = index
+    return index
+
+
+# ----------------------------------------------------------------------
+# eBay Master Vehicle List 批量导入
+# ----------------------------------------------------------------------
+
+def make_abbreviation(name: str, level_type: str) -> str:
+    """生成节点缩写，规则与 seed-vehicles 保持一致"""
+    name_upper = name.upper()
+    if level_type == 'year':
+        return name.strip()[-2:]
+    if 'SERIES' in name_upper:
+        return re.sub(r'[\s\-,]', '', name_upper.replace('SERIES', 'SER'))[:20]
+    if 'CLASS' in name_upper:
+        return re.sub(r'[\s\-,]', '', name_upper.replace('CLASS', 'CL'))[:20]
+    clean_name = re.sub(r'[^0-9A-Z]', '', name_upper)
+    return clean_name[:3] or 'UNK'
+
+
+def _unique_abbreviation(abbr: str, used: set) -> str:
+    if abbr.upper() not in used:
+        used.add(abbr.upper())
+        return abbr
+    n = 2
+    while f"{abbr}{n}".upper() in used:
+        n += 1
+    candidate = f"{abbr}{n}"[:20]
+    used.add(candidate.upper())
+    return candidate
+
+
+def _resolve_columns(fieldnames: List[str]) -> Dict[str, str]:
+    lowered = {f.strip().lower(): f for f in fieldnames if f}
+    columns = {}
+    for key, aliases in MVL_COLUMNS.items():
+        for alias in aliases:
+            if alias in lowered:
+                columns[key] = lowered[alias]
+                break
+        else:
+            raise ValueError(f"Missing column '{key}' in vehicle list header")
+    return columns
+
+
+def import_vehicle_master_list(stream: IO, batch_size: int = 2000) -> Dict[str, Any]:
+    """
+    单次流式导入 eBay Master Vehicle List (CSV / TSV)
+
+    - 逐行读取，不整体载入文件；Make/Model/Year 三级按名称去重
+    - 已存在节点从车型索引中查找，不逐行查询数据库
+    - 新节点每 batch_size 个 flush 一次 (批量 INSERT)，最后统一提交并重建索引
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    header = stream.readline()
+    if not header:
+        raise ValueError('Vehicle list is empty')
+    delimiter = '\t' if header.count('\t') > header.count(',') else ','
+    fieldnames = next(csv.reader([header], delimiter=delimiter))
+    columns = _resolve_columns(fieldnames)
+    reader = csv.DictReader(stream, fieldnames=fieldnames, delimiter=delimiter)
+
+    index = get_vehicle_index()
+    # key: (parent_key, 小写名称)，parent_key 为已入库 id 或待入库节点对象
+    known: Dict[tuple, Any] = dict(index.name_lookup())
+    used_abbr = index.used_abbreviations()
+    child_count: Dict[Any, int] = defaultdict(int)
+    for parent_id, _ in known:
+        child_count[parent_id] += 1
+
+    stats = {'rows': 0, 'skipped': 0, 'make': 0, 'model': 0, 'year': 0}
+    pending: List[ProductVehicle] = []
+
+    def resolve(parent, name: str, level_type: str):
+        key = (parent, name.lower())
+        found = known.get(key)
+        if found is not None:
+            return found
+
+        child_count[parent] += 1
+        node = ProductVehicle(
+            name=name,
+            abbreviation=_unique_abbreviation(make_abbreviation(name, level_type), used_abbr[parent]),
+            level_type=level_type,
+            sort_order=child_count[parent] * 10,
+            is_active=True,
+        )
+        if isinstance(parent, ProductVehicle):
+            node.parent = parent
+        else:
+            node.parent_id = parent
+        db.session.add(node)
+        pending.append(node)
+        known[key] = node
+        stats[level_type] += 1
+        return node
+
+    def flush_pending():
+        if not pending:
+            return
+        db.session.flush()
+
+        # 已入库节点改为以 id 引用，释放 ORM 对象
+        def ref(value):
+            return value.id if isinstance(value, ProductVehicle) else value
+
+        for key in [k for k, v in known.items() if isinstance(k[0], ProductVehicle) or isinstance(v, ProductVehicle)]:
+            value = known.pop(key)
+            known[(ref(key[0]), key[1])] = ref(value)
+        for mapping in (used_abbr, child_count):
+            for key in [k for k in mapping if isinstance(k, ProductVehicle)]:
+                mapping[key.id] = mapping.pop(key)
+        pending.clear()
+
+    try:
+        for row in reader:
+            stats['rows'] += 1
+            make = (row.get(columns['make']) or '').strip()
+            model = (row.get(columns['model']) or '').strip()
+            year = (row.get(columns['year']) or '').strip()
+            if not make or not model or not year:
+                stats['skipped'] += 1
+                continue
+
+            make_node = resolve(None, make, 'make')
+            model_node = resolve(make_node, model, 'model')
+            resolve(model_node, year, 'year')
+
+            if len(pending) >= batch_size:
+                flush_pending()
+
+        flush_pending()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    index.reload()
+    stats['created'] = stats['make'] + stats['model'] + stats['year']
+    logger.info(f"Vehicle master list imported: {stats}")
+    return stats
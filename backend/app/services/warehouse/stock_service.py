@@ -4,11 +4,37 @@ from sqlalchemy.orm import selectinload, joinedload
 from app.extensions import db
 from app.models.warehouse import WarehouseStock, WarehouseStockMovement, Warehouse
 from app.errors import BusinessError
+from app.services.excel_export import ExcelColumn, StreamingWorkbook, iter_rows, write_rows
 import logging
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+STOCK_EXPORT_COLUMNS = [
+    ExcelColumn('SKU', 22),
+    ExcelColumn('仓库', 20),
+    ExcelColumn('批次号', 16),
+    ExcelColumn('物理库存', 12, 'integer'),
+    ExcelColumn('可用库存', 12, 'integer'),
+    ExcelColumn('已分配', 12, 'integer'),
+    ExcelColumn('在途', 12, 'integer'),
+    ExcelColumn('残次', 12, 'integer'),
+]
+
+MOVEMENT_EXPORT_COLUMNS = [
+    ExcelColumn('业务时间', 20, 'datetime'),
+    ExcelColumn('SKU', 22),
+    ExcelColumn('仓库', 20),
+    ExcelColumn('单据类型', 12),
+    ExcelColumn('单据号', 22),
+    ExcelColumn('变动数量', 12, 'integer'),
+    ExcelColumn('批次号', 16),
+    ExcelColumn('单位成本', 12, 'number'),
+    ExcelColumn('币种', 8),
+    ExcelColumn('状态', 10),
+    ExcelColumn('创建时间', 20, 'datetime'),
+]
+
 
 class StockService:
     """库存服务"""
@@ -20,25 +46,13 @@ class StockService:
     def get_stock_list(self, page: int = 1, per_page: int = 20, 
                       sku: Optional[str] = None, warehouse_id: Optional[int] = None,
                       batch_no: Optional[str] = None, min_quantity: Optional[int] = None,
-                      max_quantity: Optional[int] = None) -> Dict[str, Any]:
-        """获取库存列表"""
-        query = select(WarehouseStock).options(joinedload(WarehouseStock.warehouse))
-        
-        # 搜索条件
-        if sku:
-            query = query.where(WarehouseStock.sku.ilike(f'%{sku}%'))
-        
-        if warehouse_id:
-            query = query.where(WarehouseStock.warehouse_id == warehouse_id)
-        
-        if batch_no:
-            query = query.where(WarehouseStock.batch_no.ilike(f'%{batch_no}%'))
-        
-        if min_quantity is not None:
-            query = query.where(WarehouseStock.available_quantity >= min_quantity)
-        
-        if max_quantity is not None:
-            query = query.where(WarehouseStock.available_quantity <= max_quantity)
+                      max_quantity: Optional[int] = None, columns: Optional[list] = None) -> Dict[str, Any]:
+        """获取库存列表 (传入 columns 时按列查询，items 为 Row，不实例化 ORM 对象)"""
+        if columns:
+            query = select(*columns)
+        else:
+            query = select(WarehouseStock).options(joinedload(WarehouseStock.warehouse))
+        query = self._filter_stocks(query, sku, warehouse_id, batch_no, min_quantity, max_quantity)
         
         # 分页
         total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
@@ -46,7 +60,8 @@ class StockService:
         query = query.offset(offset).limit(per_page)
         
         # 执行查询
-        stocks = db.session.execute(query).scalars().all()
+        result = db.session.execute(query)
+        stocks = result.all() if columns else result.scalars().all()
         
         return {
             'items': stocks,
@@ -138,13 +153,53 @@ class StockService:
     def get_movement_list(self, page: int = 1, per_page: int = 20,
                          sku: Optional[str] = None, warehouse_id: Optional[int] = None,
                          order_type: Optional[str] = None, order_no: Optional[str] = None,
-                         start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict[str, Any]:
-        """获取库存流水列表"""
-        query = select(WarehouseStockMovement).options(
-            joinedload(WarehouseStockMovement.warehouse),
-            joinedload(WarehouseStockMovement.location)
-        )
+                         start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                         columns: Optional[list] = None) -> Dict[str, Any]:
+        """获取库存流水列表 (传入 columns 时按列查询，items 为 Row，不实例化 ORM 对象)"""
+        # 流水模型没有 warehouse / location 关系，无需预加载
+        query = select(*columns) if columns else select(WarehouseStockMovement)
+        query = self._filter_movements(query, sku, warehouse_id, order_type, order_no, start_date, end_date)
+        query = query.order_by(WarehouseStockMovement.created_at.desc())
+        
+        # 分页
+        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
+        offset = (page - 1) * per_page
+        query = query.offset(offset).limit(per_page)
+        
+        result = db.session.execute(query)
+        movements = result.all() if columns else result.scalars().all()
+        
+        return {
+            'items': movements,
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        }
+
+    @staticmethod
+    def _filter_stocks(query, sku=None, warehouse_id=None, batch_no=None,
+                       min_quantity=None, max_quantity=None):
+        """库存列表/导出共用的筛选条件"""
+        if sku:
+            query = query.where(WarehouseStock.sku.ilike(f'%{sku}%'))
+        
+        if warehouse_id:
+            query = query.where(WarehouseStock.warehouse_id == warehouse_id)
+        
+        if batch_no:
+            query = query.where(WarehouseStock.batch_no.ilike(f'%{batch_no}%'))
         
+        if min_quantity is not None:
+            query = query.where(WarehouseStock.available_quantity >= min_quantity)
+        
+        if max_quantity is not None:
+            query = query.where(WarehouseStock.available_quantity <= max_quantity)
+        return query
+
+    @staticmethod
+    def _filter_movements(query, sku=None, warehouse_id=None, order_type=None,
+                          order_no=None, start_date=None, end_date=None):
+        """库存流水列表/导出共用的筛选条件"""
         if sku:
             query = query.where(WarehouseStockMovement.sku == sku)
         
@@ -162,22 +217,49 @@ class StockService:
             
         if end_date:
             query = query.where(WarehouseStockMovement.created_at <= end_date)
-            
-        query = query.order_by(WarehouseStockMovement.created_at.desc())
-        
-        # 分页
-        total = db.session.execute(select(func.count()).select_from(query.subquery())).scalar()
-        offset = (page - 1) * per_page
-        query = query.offset(offset).limit(per_page)
-        
-        movements = db.session.execute(query).scalars().all()
-        
-        return {
-            'items': movements,
-            'total': total,
-            'page': page,
-            'per_page': per_page
-        }
+        return query
+
+    def export_stock_excel(self, **filters) -> Optional[str]:
+        """
+        流式导出库存 (筛选条件同 get_stock_list)
+
+        Returns:
+            临时 xlsx 文件路径；无数据时返回 None
+        """
+        query = select(
+            WarehouseStock.sku, Warehouse.name.label('warehouse_name'), WarehouseStock.batch_no,
+            WarehouseStock.physical_quantity, WarehouseStock.available_quantity,
+            WarehouseStock.allocated_quantity, WarehouseStock.in_transit_quantity,
+            WarehouseStock.damaged_quantity
+        ).join(Warehouse, Warehouse.id == WarehouseStock.warehouse_id)
+        query = self._filter_stocks(query, **filters).order_by(WarehouseStock.sku, WarehouseStock.id)
+
+        workbook = StreamingWorkbook()
+        sheet = write_rows(workbook, '库存', STOCK_EXPORT_COLUMNS, iter_rows(query))
+        return workbook.save() if sheet else None
+
+    def export_movement_excel(self, **filters) -> Optional[str]:
+        """
+        流式导出库存流水 (筛选条件同 get_movement_list)
+
+        Returns:
+            临时 xlsx 文件路径；无数据时返回 None
+        """
+        query = select(
+            WarehouseStockMovement.biz_time, WarehouseStockMovement.sku,
+            Warehouse.name.label('warehouse_name'), WarehouseStockMovement.order_type,
+            WarehouseStockMovement.order_no, WarehouseStockMovement.quantity_delta,
+            WarehouseStockMovement.batch_no, WarehouseStockMovement.unit_cost,
+            WarehouseStockMovement.currency, WarehouseStockMovement.status,
+            WarehouseStockMovement.created_at
+        ).join(Warehouse, Warehouse.id == WarehouseStockMovement.warehouse_id)
+        query = self._filter_movements(query, **filters).order_by(
+            WarehouseStockMovement.created_at.desc(), WarehouseStockMovement.id.desc()
+        )
+
+        workbook = StreamingWorkbook()
+        sheet = write_rows(workbook, '库存流水', MOVEMENT_EXPORT_COLUMNS, iter_rows(query))
+        return workbook.save() if sheet else None
 
     def get_summary(self, warehouse_id: Optional[int] = None) -> Dict[str, Any]:
         """获取库存汇总"""
@@ -204,6 +286,41 @@ class StockService:
             'sku_count': result.sku_count or 0
         }
 
+    @staticmethod
+    def sku_stock_subquery(skus: Optional[List[str]] = None):
+        """
+        按 SKU 汇总各仓库存的分组子查询 (physical / available / in_transit)
+        由 stocks(sku) INCLUDE (...) 覆盖索引支撑
+        """
+        query = select(
+            WarehouseStock.sku.label('sku'),
+            func.sum(WarehouseStock.physical_quantity).label('physical_quantity'),
+            func.sum(WarehouseStock.available_quantity).label('available_quantity'),
+            func.sum(WarehouseStock.in_transit_quantity).label('in_transit_quantity')
+        ).group_by(WarehouseStock.sku)
+        
+        if skus is not None:
+            query = query.where(WarehouseStock.sku.in_(skus))
+            
+        return query.subquery('sku_stock')
+
+    def get_sku_stock_levels(self, skus: List[str]) -> Dict[str, Dict[str, int]]:
+        """批量获取 SKU 汇总库存 (一次分组查询)"""
+        if not skus:
+            return {}
+        
+        sq = self.sku_stock_subquery(list(set(skus)))
+        rows = db.session.execute(select(sq)).all()
+        
+        return {
+            row.sku: {
+                'physical_quantity': int(row.physical_quantity or 0),
+                'available_quantity': int(row.available_quantity or 0),
+                'in_transit_quantity': int(row.in_transit_quantity or 0)
+            }
+            for row in rows
+        }
+
     def allocate_stock(self, sku: str, warehouse_id: int, quantity: int) -> WarehouseStock:
         """分配/锁定库存"""
         # 1. 检查库存是否充足
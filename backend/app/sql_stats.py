@@ -0,0 +1,200 @@
+"""
+请求级 SQL 统计与 N+1 检测
+
+通过 SQLAlchemy Engine 事件 (before/after_cursor_execute) 统计每个请求的:
+- 语句数、数据库耗时、影响/返回行数 (DBAPI rowcount 可用时)
+- 语句指纹: 去掉字面量/绑定参数并折叠 IN 列表后的 SQL，
+  同一指纹执行超过 SQL_NPLUS1_THRESHOLD 次即视为疑似 N+1
+
+输出:
+- 响应头 X-SQL-Count / X-SQL-Time / X-SQL-Rows / X-SQL-NPlus1 (SQL_STATS_HEADERS，开发环境默认开启)
+- 结构化日志: 发现 N+1 或语句数超过 SQL_STATS_LOG_MIN_QUERIES 时记录
+- 测试辅助: assert_query_budget() 断言某段代码/某个接口的查询预算
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from flask import Flask, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# 当前上下文中处于统计状态的收集器 (请求 + 可能嵌套的测试断言)
+_active: ContextVar[Tuple['QueryStats', ...]] = ContextVar('sql_stats_active', default=())
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL 归一化: 字面量/参数 -> ?，IN (?, ?, ...) -> IN (?+)"""
+    sql = _STRING.sub('?', statement)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?+)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+class QueryStats:
+    """一次请求 (或一段代码) 内的 SQL 统计"""
+
+    def __init__(self, n_plus_one_threshold: int = 5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.statements: Counter = Counter()
+        self.statements_list: List[str] = []
+
+    def record(self, statement: str, duration: float, rowcount: int):
+        self.count += 1
+        self.duration += duration
+        if rowcount and rowcount > 0:
+            self.rows += rowcount
+        normalized = normalize_sql(statement)
+        self.statements[normalized] += 1
+        self.statements_list.append(normalized)
+
+    def n_plus_one(self) -> List[Dict[str, Any]]:
+        """同一指纹执行次数超过阈值的语句，按次数降序"""
+        return [
+            {'fingerprint': fingerprint(sql), 'count': n, 'sql': sql}
+            for sql, n in self.statements.most_common()
+            if n > self.n_plus_one_threshold
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'duration_ms': round(self.duration * 1000, 2),
+            'rows': self.rows,
+            'n_plus_one': self.n_plus_one(),
+        }
+
+
+@contextmanager
+def track_queries(n_plus_one_threshold: int = 5) -> Iterator[QueryStats]:
+    """在当前上下文中统计 SQL，可嵌套"""
+    stats = QueryStats(n_plus_one_threshold)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_queries: Optional[int] = None, n_plus_one_threshold: int = 5,
+                        allow_n_plus_one: bool = False) -> Iterator[QueryStats]:
+    """
+    测试辅助: 断言代码块/接口调用的查询预算
+
+        with assert_query_budget(max_queries=5):
+            client.get('/api/v1/categories/tree', headers=token_headers)
+    """
+    with track_queries(n_plus_one_threshold) as stats:
+        yield stats
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f'{stats.count} queries executed, budget is {max_queries}')
+    if not allow_n_plus_one:
+        problems.extend(
+            f"N+1 suspected: {item['count']}x {item['sql']}" for item in stats.n_plus_one()
+        )
+    if problems:
+        raise AssertionError('\n'.join(problems + ['Executed:'] + stats.statements_list))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间放在本次执行的 context 上: 语句出错时 after_cursor_execute 不触发，
+    # 放在连接 (池化复用) 上会残留并被后续语句误取
+    if _active.get() and context is not None:
+        context._sql_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    active = _active.get()
+    if not active:
+        return
+    started = getattr(context, '_sql_stats_start', None)
+    duration = time.perf_counter() - started if started is not None else 0.0
+    rowcount = getattr(cursor, 'rowcount', -1)
+    for stats in active:
+        stats.record(statement, duration, rowcount)
+
+
+_listening = False
+
+
+def _listen_engines():
+    """进程内只注册一次 (Engine 类级事件，覆盖所有引擎/绑定)"""
+    global _listening
+    if _listening:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _listening = True
+
+
+class SQLStatsExtension:
+    """Flask 扩展: sql_stats_ext.init_app(app)"""
+
+    def init_app(self, app: Flask):
+        if not app.config.get('SQL_STATS_ENABLED', True):
+            return
+        _listen_engines()
+        threshold = app.config.get('SQL_NPLUS1_THRESHOLD', 5)
+        send_headers = app.config.get('SQL_STATS_HEADERS', app.debug)
+        log_min_queries = app.config.get('SQL_STATS_LOG_MIN_QUERIES', 50)
+
+        @app.before_request
+        def start_sql_stats():
+            stats = QueryStats(threshold)
+            g.sql_stats = stats
+            g.sql_stats_token = _active.set(_active.get() + (stats,))
+
+        @app.after_request
+        def report_sql_stats(response):
+            stats = g.get('sql_stats')
+            if stats is None:
+                return response
+            suspects = stats.n_plus_one()
+            if send_headers:
+                response.headers['X-SQL-Count'] = str(stats.count)
+                response.headers['X-SQL-Time'] = f'{stats.duration:.3f}s'
+                response.headers['X-SQL-Rows'] = str(stats.rows)
+                response.headers['X-SQL-NPlus1'] = ','.join(
+                    f"{item['fingerprint']}x{item['count']}" for item in suspects
+                )
+            if suspects or stats.count >= log_min_queries:
+                log = logger.warning if suspects else logger.info
+                log('SQL stats', extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'endpoint': request.endpoint,
+                    'sql': stats.to_dict(),
+                })
+            return response
+
+        @app.teardown_request
+        def stop_sql_stats(exc=None):
+            token = g.pop('sql_stats_token', None)
+            if token is not None:
+                try:
+                    _active.reset(token)
+                except ValueError:
+                    # 不同上下文中创建的 token (如流式响应)，直接清空
+                    _active.set(())
@@ -13,6 +13,46 @@ def send_email_task(email, subject, body):
 def add_task(x, y):
     return x + y
 
+@shared_task(ignore_result=False)
+def import_declaration_task(file_path, source_data=None, created_by=None, skip_errors=False):
+    """报关单/装箱单 Excel 后台导入 (大文件)，完成后删除暂存文件"""
+    import os
+    from app.services.customs_service import customs_service
+    try:
+        result = customs_service.import_declaration_from_excel(file_path, source_data, created_by, skip_errors)
+        result['fob_total'] = str(result['fob_total'])
+        return result
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+@shared_task(bind=True, ignore_result=False)
+def render_contract_pdfs_task(self, ids, output='zip'):
+    """合同批量打印 (后台)，进度通过 PROGRESS 状态的 meta {done, total} 上报"""
+    import os
+    from flask import current_app
+    from app.services.serc.pdf_service import pdf_service, OUTPUT_ZIP
+
+    groups = pdf_service.build_print_groups(ids)
+    if not groups:
+        raise ValueError('No contracts found')
+
+    export_dir = current_app.config.get('PDF_EXPORT_DIR', '/tmp/contract_pdfs')
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"{self.request.id}.{'zip' if output == OUTPUT_ZIP else 'pdf'}")
+
+    def report(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    report(0, len(groups))
+    with open(path, 'wb') as out:
+        pdf_service.render_batch(
+            groups, out, output=output,
+            max_workers=current_app.config.get('PDF_RENDER_WORKERS', 1),
+            progress=report
+        )
+    return {'path': path, 'filename': pdf_service.batch_filename(groups, output), 'total': len(groups)}
+
 # 导入仓库同步任务
 from app.services.warehouse.sync_service import sync_all_third_party_warehouses
 
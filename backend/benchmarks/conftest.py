@@ -0,0 +1,81 @@
+"""
+性能基准 (pytest-benchmark)
+
+默认在内存 SQLite 上用 `ci` 量级数据跑通 (冒烟 + 粗略趋势)；真实量级需指向预先生成数据的 PostgreSQL:
+
+    flask bench seed --scale large                      # 20 万 SKU / 500 万流水 / 5 万报关单
+    BENCH_DATABASE_URL=postgresql://... python -m pytest benchmarks
+
+基线 (benchmarks/.baselines，按机器/Python 版本分目录):
+
+    python -m pytest benchmarks --benchmark-storage=benchmarks/.baselines --benchmark-save=main
+    python -m pytest benchmarks --benchmark-storage=benchmarks/.baselines \\
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+
+环境变量 BENCH_ROUNDS 控制每项轮数 (默认 10)。
+
+应用上下文只在单个基准 (run) 或单个模块 (数据夹具) 内推入，与 tests/ 同一次运行时互不干扰。
+"""
+import os
+import pytest
+from sqlalchemy import select
+from app import create_app
+from app.extensions import db
+from app.commands.bench import seed_benchmark_data
+from app.models.customs import CustomsDeclaration
+from app.models.product import Category
+from app.models.warehouse import Warehouse
+
+# SQLite 下 JSONB / ARRAY 的编译补丁与单元测试共用
+import tests.conftest  # noqa: F401
+
+ROUNDS = int(os.getenv('BENCH_ROUNDS', '10'))
+
+
+@pytest.fixture(scope='session')
+def bench_app():
+    database_url = os.getenv('BENCH_DATABASE_URL')
+    app = create_app(test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': database_url or 'sqlite:///:memory:',
+        'SQL_STATS_ENABLED': False,
+        'METRICS_ENABLED': False,
+    })
+    if not database_url:
+        with app.app_context():
+            db.create_all()
+            seed_benchmark_data('ci')
+    return app
+
+
+@pytest.fixture(scope='session')
+def bench_ids(bench_app):
+    """基准数据中的样本 id (第三方仓 / 叶子类目 / 最近的报关单)"""
+    with bench_app.app_context():
+        return {
+            'leaf_category_id': db.session.scalar(select(Category.id).where(Category.is_leaf.is_(True)).limit(1)),
+            'third_party_warehouse_id': db.session.scalar(
+                select(Warehouse.id).where(Warehouse.ownership_type == 'third_party').limit(1)
+            ),
+            'warehouse_id': db.session.scalar(select(Warehouse.id).limit(1)),
+            'declaration_ids': db.session.scalars(
+                select(CustomsDeclaration.id).order_by(CustomsDeclaration.id.desc()).limit(ROUNDS)
+            ).all(),
+        }
+
+
+@pytest.fixture
+def run(benchmark, bench_app):
+    """
+    每轮前清空 Session 身份映射，避免后几轮命中已加载对象而偏快；应用上下文随本基准推入/弹出
+
+        run(service.list_skus, page=1, per_page=20)
+    """
+    def _run(func, *args, **kwargs):
+        def setup():
+            db.session.rollback()
+            db.session.expunge_all()
+        return benchmark.pedantic(func, args=args, kwargs=kwargs, setup=setup, rounds=ROUNDS, warmup_rounds=1)
+
+    with bench_app.app_context():
+        yield _run
@@ -0,0 +1,66 @@
+"""
+核心接口/服务热路径基准
+"""
+import itertools
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.models.customs import CustomsDeclaration
+from app.models.product import Category
+from app.schemas.product.category import CategoryTreeSchema
+from app.services.product_service import ProductService
+from app.services.serc.tax_refund_service import TaxRefundService
+from app.services.warehouse.stock_service import StockService
+from app.services.warehouse.sync_service import SyncService
+
+pytest.importorskip('pytest_benchmark')
+
+
+def test_list_skus(run):
+    result = run(ProductService().list_skus, page=1, per_page=50)
+    assert result['items']
+
+
+def test_list_skus_by_category(run, bench_ids):
+    run(ProductService().list_skus, page=1, per_page=50, filters={'category_id': bench_ids['leaf_category_id']})
+
+
+def test_get_stock_list(run):
+    result = run(StockService().get_stock_list, page=1, per_page=50)
+    assert result['total'] > 0
+
+
+def test_get_stock_list_by_warehouse(run, bench_ids):
+    run(StockService().get_stock_list, page=5, per_page=50, warehouse_id=bench_ids['warehouse_id'])
+
+
+def test_match_declaration(run, bench_ids):
+    ids = itertools.cycle(bench_ids['declaration_ids'])
+    service = TaxRefundService()
+    result = run(lambda: service.match_declaration(next(ids)))
+    assert result['success']
+
+
+def test_sync_inventory(run, bench_ids):
+    run(SyncService().sync_inventory, bench_ids['third_party_warehouse_id'])
+
+
+def test_category_tree(run):
+    def tree():
+        roots = db.session.scalars(
+            select(Category).where(Category.parent_id.is_(None)).order_by(Category.sort_order)
+        ).all()
+        return CategoryTreeSchema(many=True).dump(roots)
+
+    assert run(tree)
+
+
+def test_generate_declaration_pdf(run, bench_ids):
+    try:
+        import weasyprint  # noqa: F401  (pdf_service 在生成时才导入)
+    except (ImportError, OSError) as e:  # WeasyPrint 或其系统库 (pango) 缺失
+        pytest.skip(f'WeasyPrint unavailable: {e}')
+    from app.services.customs.pdf_service import generate_declaration_pdf
+
+    declaration_id = bench_ids['declaration_ids'][0]
+    run(lambda: generate_declaration_pdf(db.session.get(CustomsDeclaration, declaration_id), ['declaration']))
@@ -0,0 +1,71 @@
+"""
+列表序列化基准: schema.dump (ORM 对象) 对比编译序列化器 (ORM 对象 / 按列查询的 Row)
+
+    python -m pytest benchmarks/test_serialization.py --benchmark-group-by=param:page
+
+每组断言两条路径输出一致，保证提速不改变 JSON 契约。
+"""
+import pytest
+from sqlalchemy.orm import selectinload
+from app.api.customs.routes import DeclarationPaginationSchema
+from app.api.logistics.routes import ShipmentPaginationSchema
+from app.api.warehouse.stock import (
+    STOCK_LIST_COLUMNS, STOCK_MOVEMENT_LIST_COLUMNS, StockMovementPaginationSchema, StockPaginationSchema
+)
+from app.models.logistics.shipment import ShipmentOrder
+from app.schemas.compiled import compile_schema
+from app.schemas.product.product import SkuListResponseSchema
+from app.services.customs_service import customs_service
+from app.services.product_service import ProductService
+from app.services.warehouse.stock_service import StockService
+
+pytest.importorskip('pytest_benchmark')
+
+PAGE_SIZE = 500
+
+
+@pytest.fixture(scope='module')
+def pages(bench_app):
+    """各列表一页数据 (只查询一次，基准只计序列化耗时；本模块内保持应用上下文)"""
+    with bench_app.app_context():
+        service = StockService()
+        yield {
+            'stock': (StockPaginationSchema, service.get_stock_list(page=1, per_page=PAGE_SIZE),
+                      service.get_stock_list(page=1, per_page=PAGE_SIZE, columns=STOCK_LIST_COLUMNS)),
+            'movement': (StockMovementPaginationSchema, service.get_movement_list(page=1, per_page=PAGE_SIZE),
+                         service.get_movement_list(page=1, per_page=PAGE_SIZE, columns=STOCK_MOVEMENT_LIST_COLUMNS)),
+            'sku': (SkuListResponseSchema, ProductService().list_skus(page=1, per_page=PAGE_SIZE), None),
+            'declaration': (DeclarationPaginationSchema, customs_service.get_declarations(1, 100, filters={}), None),
+            'shipment': (ShipmentPaginationSchema, _shipment_page(), None),
+        }
+
+
+def _shipment_page():
+    """与发货单列表接口相同的查询 (明细预加载)"""
+    page = ShipmentOrder.query.options(selectinload(ShipmentOrder.items)) \
+        .order_by(ShipmentOrder.created_at.desc()).paginate(page=1, per_page=PAGE_SIZE, error_out=False)
+    return {'items': page.items, 'total': page.total, 'page': 1, 'per_page': PAGE_SIZE}
+
+
+def _bench(benchmark, func, data):
+    return benchmark.pedantic(func, args=(data,), rounds=20, warmup_rounds=2)
+
+
+@pytest.mark.parametrize('page', ['stock', 'movement', 'sku', 'declaration', 'shipment'])
+def test_schema_dump(benchmark, pages, page):
+    schema, data, _ = pages[page]
+    _bench(benchmark, schema().dump, data)
+
+
+@pytest.mark.parametrize('page', ['stock', 'movement', 'sku', 'declaration', 'shipment'])
+def test_compiled(benchmark, pages, page):
+    schema, data, _ = pages[page]
+    result = _bench(benchmark, compile_schema(schema), data)
+    assert result == schema().dump(data)
+
+
+@pytest.mark.parametrize('page', ['stock', 'movement'])
+def test_compiled_rows(benchmark, pages, page):
+    schema, data, rows = pages[page]
+    result = _bench(benchmark, compile_schema(schema), rows)
+    assert result == schema().dump(data)
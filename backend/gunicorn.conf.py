@@ -0,0 +1,26 @@
+"""
+Gunicorn 配置 (生产)
+
+Prometheus 多进程模式: PROMETHEUS_MULTIPROC_DIR 为所有 worker 共享的目录，
+主进程启动时清空，worker 退出时标记其 gauge 数据失效。
+"""
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
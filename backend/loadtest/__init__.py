@@ -0,0 +1,16 @@
+"""
+HTTP 压测工具 (脚本化用户旅程)
+
+本地整套环境:
+1. 启动假 NAS / 假领星 (同一端口，/webapi/* 为 Synology FileStation，/api/v1/* 为领星):
+       python -m loadtest fake-services --port 5055 --latency-ms 30
+2. 后端指向假服务后按生产方式启动 (gunicorn -c gunicorn.conf.py run:app):
+       SYNOLOGY_NAS_HOST=http://127.0.0.1:5055 LINGXING_API_BASE_URL=http://127.0.0.1:5055
+       LINGXING_APP_KEY=fake LINGXING_APP_SECRET=fake
+   数据可用 `flask bench seed --scale small` 生成
+3. 逐级加压，输出每个并发档位各步骤的吞吐与延迟分位:
+       python -m loadtest run --base-url http://127.0.0.1:8000 --username admin --password ... \\
+           --stages 5,10,20,40,80 --stage-seconds 60 --max-error-rate 0.01 --max-p95-ms 2000
+
+旅程: 登录 -> SKU 搜索 -> 库存列表 -> 打开报关单 -> 文件页签 (列表 + 打开首个文件) -> 下载 PDF
+"""
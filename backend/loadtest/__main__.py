@@ -0,0 +1,55 @@
+import argparse
+from .fake_services import run_fake_services
+from .journeys import JOURNEYS
+from .runner import run_load_test
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='HTTP 压测 (脚本化用户旅程)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='逐级加压执行旅程')
+    run.add_argument('--base-url', default='http://127.0.0.1:8000')
+    run.add_argument('--username', default='admin')
+    run.add_argument('--password', required=True)
+    run.add_argument('--journey', default='customs_clerk', choices=list(JOURNEYS))
+    run.add_argument('--stages', default='5,10,20,40', help='各档并发用户数 (逗号分隔)')
+    run.add_argument('--stage-seconds', type=float, default=60)
+    run.add_argument('--ramp-seconds', type=float, default=5, help='每档内用户启动的爬坡时长')
+    run.add_argument('--think-min', type=float, default=0.5, help='步骤间思考时间下限 (秒)')
+    run.add_argument('--think-max', type=float, default=2.0, help='步骤间思考时间上限 (秒)')
+    run.add_argument('--timeout', type=float, default=60)
+    run.add_argument('--max-error-rate', type=float, default=0.01, help='任一步骤错误率超过即判定打满')
+    run.add_argument('--max-p95-ms', type=float, default=2000, help='任一步骤 p95 超过即判定打满')
+    run.add_argument('-o', '--output', default=None, help='JSON 报告输出路径')
+
+    fake = sub.add_parser('fake-services', help='启动假 NAS / 假领星')
+    fake.add_argument('--host', default='127.0.0.1')
+    fake.add_argument('--port', type=int, default=5055)
+    fake.add_argument('--latency-ms', type=int, default=0)
+    fake.add_argument('--file-size', type=int, default=256 * 1024, help='NAS 下载文件大小 (字节)')
+    fake.add_argument('--error-rate', type=float, default=0.0, help='领星返回 code=5000 的比例')
+
+    args = parser.parse_args()
+    if args.command == 'fake-services':
+        run_fake_services(args.host, args.port, latency_ms=args.latency_ms,
+                          file_size=args.file_size, error_rate=args.error_rate)
+        return
+
+    run_load_test({
+        'base_url': args.base_url,
+        'username': args.username,
+        'password': args.password,
+        'stages': [int(n) for n in args.stages.split(',') if n.strip()],
+        'stage_seconds': args.stage_seconds,
+        'ramp_seconds': args.ramp_seconds,
+        'think_time': (args.think_min, args.think_max),
+        'timeout': args.timeout,
+        'max_error_rate': args.max_error_rate,
+        'max_p95_ms': args.max_p95_ms,
+        'output': args.output,
+    }, JOURNEYS[args.journey])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+假 Synology NAS + 假领星 API
+
+- NAS: 实现 SynologyClient 用到的 auth.cgi (登录) 与 entry.cgi (List/Download/Upload/CreateFolder/Delete)，
+  文件保存在内存中；任意目录首次列出时生成若干示例文件，下载返回固定大小的内容
+- 领星: 任意 POST /api/v1/* 返回 code=0 的示例数据，error_rate 控制返回 code=5000 (系统异常) 的比例
+- latency_ms: 每个请求附加的固定延迟 (模拟 NAS/外网耗时)
+"""
+import random
+import threading
+import time
+import uuid
+from flask import Flask, Response, jsonify, request
+
+SAMPLE_FILES = ['报关单.pdf', '装箱单.pdf', '发票.pdf', '合同.pdf']
+
+
+def create_fake_app(latency_ms: int = 0, file_size: int = 256 * 1024, error_rate: float = 0.0) -> Flask:
+    app = Flask('fake_services')
+    files = {}  # {folder: {name: bytes}}
+    lock = threading.Lock()
+    payload = (b'%PDF-1.4\n' + b'0' * file_size)[:file_size]
+
+    def folder_files(folder: str) -> dict:
+        with lock:
+            if folder not in files:
+                files[folder] = {name: payload for name in SAMPLE_FILES}
+            return files[folder]
+
+    def split(path: str):
+        folder, _, name = path.rstrip('/').rpartition('/')
+        return folder, name
+
+    @app.before_request
+    def delay():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    @app.get('/webapi/auth.cgi')
+    def nas_auth():
+        return jsonify({'success': True, 'data': {'sid': uuid.uuid4().hex}})
+
+    @app.route('/webapi/entry.cgi', methods=['GET', 'POST'])
+    def nas_entry():
+        params = request.values
+        api = params.get('api')
+        if api == 'SYNO.FileStation.List':
+            folder = params.get('folder_path', '')
+            now = int(time.time())
+            return jsonify({'success': True, 'data': {'files': [
+                {'name': name, 'isdir': False, 'path': f'{folder}/{name}',
+                 'additional': {'size': len(content), 'time': {'mtime': now}}}
+                for name, content in folder_files(folder).items()
+            ]}})
+        if api == 'SYNO.FileStation.Download':
+            folder, name = split(params.get('path', ''))
+            content = folder_files(folder).get(name)
+            if content is None:
+                return jsonify({'success': False, 'error': {'code': 408}}), 404
+            return Response(content, mimetype='application/octet-stream')
+        if api == 'SYNO.FileStation.Upload':
+            upload = request.files.get('file')
+            if upload is not None:
+                with lock:
+                    files.setdefault(params.get('path', ''), {})[upload.filename] = upload.read()
+            return jsonify({'success': True, 'data': {}})
+        if api == 'SYNO.FileStation.CreateFolder':
+            return jsonify({'success': True, 'data': {'folders': []}})
+        if api == 'SYNO.FileStation.Delete':
+            folder, name = split(params.get('path', ''))
+            with lock:
+                files.get(folder, {}).pop(name, None)
+            return jsonify({'success': True, 'data': {}})
+        return jsonify({'success': False, 'error': {'code': 102}})
+
+    @app.post('/api/v1/<path:endpoint>')
+    def lingxing(endpoint):
+        if error_rate and random.random() < error_rate:
+            return jsonify({'code': 5000, 'message': 'fake system error'})
+        body = request.get_json(silent=True) or {}
+        return jsonify({'code': 0, 'message': 'success', 'data': {
+            'request': body,
+            'list': [{'sku': f'FAKE{i:04d}', 'quantity': random.randint(0, 500)} for i in range(20)],
+        }})
+
+    return app
+
+
+def run_fake_services(host: str = '127.0.0.1', port: int = 5055, **options):
+    app = create_fake_app(**options)
+    app.run(host=host, port=port, threaded=True)
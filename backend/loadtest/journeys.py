@@ -0,0 +1,69 @@
+"""
+脚本化用户旅程
+
+每个旅程是一组按顺序执行的步骤 (name, func)；func(user) 发起一次或多次请求，
+通过 user.request(...) 计时，失败时抛出 StepError 终止本次旅程 (后续步骤不计入)。
+"""
+import random
+from typing import Callable, List, Tuple
+
+SEARCH_TERMS = ['前大灯', '尾灯', '雾灯', '后视镜', '保险杠', 'TOYOTA', 'HONDA', 'BK0']
+
+Step = Tuple[str, Callable]
+
+
+class StepError(Exception):
+    pass
+
+
+def login(user):
+    response = user.request('POST', '/api/v1/auth/login', json={
+        'username': user.username, 'password': user.password
+    })
+    user.token = response.json()['data']['access_token']
+
+
+def sku_search(user):
+    user.request('GET', '/api/v1/products/variants', params={
+        'q': random.choice(SEARCH_TERMS), 'page': 1, 'per_page': 20
+    })
+
+
+def stock_list(user):
+    user.request('GET', '/api/v1/stocks', params={'page': random.randint(1, 5), 'per_page': 20})
+
+
+def declaration_open(user):
+    listing = user.request('GET', '/api/v1/customs/declarations', params={'page': 1, 'per_page': 20})
+    items = listing.json()['data']['items']
+    if not items:
+        raise StepError('no declarations')
+    user.declaration_id = random.choice(items)['id']
+    user.request('GET', f'/api/v1/customs/declarations/{user.declaration_id}')
+
+
+def file_tab(user):
+    """文件页签: 归档文件列表 (触发 NAS 同步) + 预览首个文件 (NAS 流式透传)"""
+    files = user.request('GET', f'/api/v1/customs/declarations/{user.declaration_id}/files').json()['data']
+    if files:
+        user.request('GET', f"/api/v1/customs/declarations/{user.declaration_id}/files/{files[0]['id']}")
+
+
+def pdf_download(user):
+    user.request('POST', f'/api/v1/customs/declarations/{user.declaration_id}/download-pdf', json={
+        'includes': ['declaration']
+    })
+
+
+CUSTOMS_CLERK: List[Step] = [
+    ('login', login),
+    ('sku_search', sku_search),
+    ('stock_list', stock_list),
+    ('declaration_open', declaration_open),
+    ('file_tab', file_tab),
+    ('pdf_download', pdf_download),
+]
+
+JOURNEYS = {
+    'customs_clerk': CUSTOMS_CLERK,
+}
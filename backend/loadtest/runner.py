@@ -0,0 +1,157 @@
+"""
+压测执行与报告
+
+按档位 (stages) 逐级增加并发虚拟用户，每档持续 stage_seconds；每个虚拟用户为一个线程，
+循环执行旅程 (步骤间随机思考时间)。每档结束后输出各步骤吞吐、错误率与延迟分位，
+错误率或 p95 超过阈值时判定该并发下已"打满"并停止加压。
+"""
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import requests
+from .journeys import StepError
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # nearest-rank
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class StepStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, seconds: float) -> Dict:
+        ms = [v * 1000 for v in self.latencies]
+        total = len(ms) + self.errors
+        return {
+            'requests': total,
+            'errors': self.errors,
+            'error_rate': round(self.errors / total, 4) if total else 0.0,
+            'rps': round(total / seconds, 2) if seconds else 0.0,
+            'p50_ms': round(percentile(ms, 50), 1),
+            'p95_ms': round(percentile(ms, 95), 1),
+            'p99_ms': round(percentile(ms, 99), 1),
+            'max_ms': round(max(ms), 1) if ms else 0.0,
+        }
+
+
+class Recorder:
+    """线程安全的按步骤计时收集"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.steps: Dict[str, StepStats] = {}
+
+    def record(self, step: str, latency: Optional[float]):
+        with self.lock:
+            stats = self.steps.setdefault(step, StepStats())
+            if latency is None:
+                stats.errors += 1
+            else:
+                stats.latencies.append(latency)
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, username: str, password: str, recorder: Recorder, timeout: float = 60):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.recorder = recorder
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.token: Optional[str] = None
+        self.declaration_id: Optional[int] = None
+        self.step = ''
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """单次请求计时 (含读取完整响应体)，非 2xx 记为错误并终止本次旅程"""
+        headers = kwargs.pop('headers', {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, headers=headers,
+                                            timeout=self.timeout, **kwargs)
+            response.content
+        except requests.RequestException as e:
+            self.recorder.record(self.step, None)
+            raise StepError(str(e))
+        if response.status_code >= 400:
+            self.recorder.record(self.step, None)
+            raise StepError(f'{method} {path} -> {response.status_code}')
+        self.recorder.record(self.step, time.perf_counter() - started)
+        return response
+
+
+def _user_loop(user: VirtualUser, journey, stop: threading.Event, think_time: tuple):
+    while not stop.is_set():
+        user.token = None
+        for name, func in journey:
+            if stop.is_set():
+                return
+            user.step = name
+            try:
+                func(user)
+            except (StepError, KeyError, ValueError):
+                break
+            stop.wait(random.uniform(*think_time))
+
+
+def run_stage(options: Dict, journey, users: int) -> Dict[str, Dict]:
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = []
+    for _ in range(users):
+        user = VirtualUser(options['base_url'], options['username'], options['password'], recorder,
+                           timeout=options.get('timeout', 60))
+        thread = threading.Thread(target=_user_loop, args=(user, journey, stop, options['think_time']), daemon=True)
+        thread.start()
+        threads.append(thread)
+        # 平滑爬坡，避免同一瞬间全部登录
+        time.sleep(options.get('ramp_seconds', 0) / max(users, 1))
+
+    started = time.perf_counter()
+    time.sleep(options['stage_seconds'])
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join(timeout=options.get('timeout', 60))
+    return {name: recorder.steps[name].summary(elapsed) for name, _ in journey if name in recorder.steps}
+
+
+def print_stage(users: int, steps: Dict[str, Dict]):
+    print(f'\n== {users} 并发用户 ==')
+    print(f"{'step':<18}{'req':>8}{'err%':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in steps.items():
+        print(f"{name:<18}{s['requests']:>8}{s['error_rate'] * 100:>7.1f}%{s['rps']:>9}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}")
+
+
+def run_load_test(options: Dict, journey) -> List[Dict]:
+    """逐档执行，返回 [{'users': n, 'steps': {...}, 'saturated': bool}]"""
+    results = []
+    for users in options['stages']:
+        steps = run_stage(options, journey, users)
+        print_stage(users, steps)
+        saturated = any(
+            s['error_rate'] > options['max_error_rate'] or s['p95_ms'] > options['max_p95_ms']
+            for s in steps.values()
+        )
+        results.append({'users': users, 'steps': steps, 'saturated': saturated})
+        if saturated:
+            print(f'\n⚠️  {users} 并发时错误率或 p95 超过阈值，停止加压')
+            break
+    if options.get('output'):
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
@@ -97,6 +97,11 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # 大表建索引/回填可能远超接口的默认语句超时，迁移连接不限时
+        if connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SET statement_timeout = 0')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,33 @@
+"""add_sys_sequences
+
+Revision ID: 3f9d2e6b8c17
+Revises: e41b7a2c6f08
+Create Date: 2026-01-10 09:47:12.615830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9d2e6b8c17'
+down_revision = 'e41b7a2c6f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    业务单号计数器表
+    计数器按 key 首次取号时由现有单号播种，无需回填
+    """
+    op.create_table('sys_sequences',
+        sa.Column('key', sa.String(length=100), nullable=False, comment='计数器键'),
+        sa.Column('last_value', sa.BigInteger(), nullable=False, comment='已分配的最大序号'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('sys_sequences')
@@ -0,0 +1,37 @@
+"""add_sku_safety_stock
+
+Revision ID: 5c3e7d1a9b24
+Revises: 91cf26ee98ec
+Create Date: 2026-01-08 11:26:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e7d1a9b24'
+down_revision = '91cf26ee98ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    SKU 安全库存 + 库存按 SKU 汇总的覆盖索引
+    """
+    with op.batch_alter_table('product_variants', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('safety_stock', sa.Integer(), server_default='0', nullable=False,
+                                      comment='安全库存 (驱动补货预警)'))
+
+    # SKU 列表按页汇总库存 (GROUP BY sku)，仅走索引即可完成
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stocks_sku_qty ON stocks (sku) "
+        "INCLUDE (physical_quantity, available_quantity, in_transit_quantity);"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_stocks_sku_qty;")
+    with op.batch_alter_table('product_variants', schema=None) as batch_op:
+        batch_op.drop_column('safety_stock')
@@ -0,0 +1,38 @@
+"""add_sku_facet_indexes
+
+Revision ID: 91cf26ee98ec
+Revises: a8b4a16489dc
+Create Date: 2026-01-07 15:40:02.553716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '91cf26ee98ec'
+down_revision = 'a8b4a16489dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    SKU 分面筛选索引
+    规格属性的 specs ->> key 表达式索引随属性定义动态增加，
+    由 `flask product ensure-facet-indexes` 创建 (筛选为 specs ->> key 等值比较，不使用 GIN 包含索引)
+    """
+    # 1. 车型筛选 (spu_coding_metadata ->> 'model')
+    op.execute("CREATE INDEX IF NOT EXISTS idx_products_meta_model ON products ((spu_coding_metadata ->> 'model'));")
+
+    # 2. 品牌/分类筛选
+    op.execute("CREATE INDEX IF NOT EXISTS idx_products_brand ON products (brand);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_id);")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_pv_product_created ON product_variants (product_id, created_at DESC);")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_pv_product_created;")
+    op.execute("DROP INDEX IF EXISTS idx_products_category;")
+    op.execute("DROP INDEX IF EXISTS idx_products_brand;")
+    op.execute("DROP INDEX IF EXISTS idx_products_meta_model;")
@@ -0,0 +1,88 @@
+"""add_product_search_documents
+
+Revision ID: a8b4a16489dc
+Revises: 8a2f32b22696
+Create Date: 2026-01-05 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8b4a16489dc'
+down_revision = '8a2f32b22696'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    商品搜索文档表 + pg_trgm GIN 索引，并回填现有数据
+    """
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    op.create_table('product_search_documents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('variant_id', sa.Integer(), nullable=True, comment='SKU ID (SPU 无 SKU 时为空)'),
+        sa.Column('sku', sa.String(length=50), nullable=True, comment='SKU短码 (小写)'),
+        sa.Column('feature_code', sa.String(length=200), nullable=True, comment='SKU特征码 (小写)'),
+        sa.Column('spu_code', sa.String(length=100), nullable=False, comment='SPU特征码 (小写)'),
+        sa.Column('ref_codes', sa.Text(), nullable=True, comment='参考编码，空格分隔且首尾带空格，含去符号形式'),
+        sa.Column('search_text', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['variant_id'], ['product_variants.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('variant_id')
+    )
+    with op.batch_alter_table('product_search_documents', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_search_documents_product_id'), ['product_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_product_search_documents_sku'), ['sku'], unique=False)
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_psd_search_text_trgm "
+        "ON product_search_documents USING gin (search_text gin_trgm_ops);"
+    )
+
+    # 回填: 与 ProductSearchService.build_documents 的规则保持一致
+    op.execute("""
+        INSERT INTO product_search_documents
+            (product_id, variant_id, sku, feature_code, spu_code, ref_codes, search_text, updated_at)
+        SELECT
+            p.id,
+            v.id,
+            lower(v.sku),
+            lower(v.feature_code),
+            lower(p.spu_code),
+            rc.ref_codes,
+            concat_ws(' ',
+                lower(v.sku), lower(v.feature_code), lower(p.spu_code), rc.codes, lower(trim(p.name)),
+                regexp_replace(lower(v.sku), '[^0-9a-z]', '', 'g'),
+                regexp_replace(lower(v.feature_code), '[^0-9a-z]', '', 'g'),
+                regexp_replace(lower(p.spu_code), '[^0-9a-z]', '', 'g'),
+                rc.compact_codes
+            ),
+            now()
+        FROM products p
+        LEFT JOIN product_variants v ON v.product_id = p.id
+        LEFT JOIN (
+            SELECT
+                product_id,
+                ' ' || string_agg(lower(trim(code)) || ' ' || regexp_replace(lower(code), '[^0-9a-z]', '', 'g'), ' ') || ' ' AS ref_codes,
+                string_agg(lower(trim(code)), ' ') AS codes,
+                string_agg(regexp_replace(lower(code), '[^0-9a-z]', '', 'g'), ' ') AS compact_codes
+            FROM product_reference_codes
+            GROUP BY product_id
+        ) rc ON rc.product_id = p.id;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_psd_search_text_trgm;")
+    with op.batch_alter_table('product_search_documents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_search_documents_sku'))
+        batch_op.drop_index(batch_op.f('ix_product_search_documents_product_id'))
+
+    op.drop_table('product_search_documents')
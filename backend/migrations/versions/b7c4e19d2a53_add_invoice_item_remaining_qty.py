@@ -0,0 +1,48 @@
+"""add_invoice_item_remaining_qty
+
+Revision ID: b7c4e19d2a53
+Revises: 3f9d2e6b8c17
+Create Date: 2026-01-12 16:21:08.374159
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c4e19d2a53'
+down_revision = '3f9d2e6b8c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    发票明细剩余可匹配数量 (物化)，按现有匹配记录回填，并建仍有余量明细的部分索引
+    """
+    with op.batch_alter_table('tax_invoice_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('remaining_qty', sa.DECIMAL(precision=12, scale=4), nullable=True,
+                                      comment='剩余可匹配数量'))
+
+    op.execute("""
+        UPDATE tax_invoice_items i
+        SET remaining_qty = i.qty - COALESCE(m.used_qty, 0)
+        FROM (
+            SELECT i2.id, SUM(m2.matched_qty) AS used_qty
+            FROM tax_invoice_items i2
+            LEFT JOIN tax_refund_matches m2 ON m2.invoice_item_id = i2.id
+            GROUP BY i2.id
+        ) m
+        WHERE m.id = i.id;
+    """)
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tax_invoice_items_available "
+        "ON tax_invoice_items (name, id) WHERE remaining_qty > 0;"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_tax_invoice_items_available;")
+    with op.batch_alter_table('tax_invoice_items', schema=None) as batch_op:
+        batch_op.drop_column('remaining_qty')
@@ -0,0 +1,45 @@
+"""add_sku_serial_counters
+
+Revision ID: e41b7a2c6f08
+Revises: 5c3e7d1a9b24
+Create Date: 2026-01-09 14:02:51.227403
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7a2c6f08'
+down_revision = '5c3e7d1a9b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    SKU 流水号计数器表，并按现有 SKU 短码 (类目码 + 5 位流水号) 播种
+    其他前缀在首次分配时自动播种，或执行 `flask product seed-sku-serials`
+    """
+    op.create_table('sku_serial_counters',
+        sa.Column('prefix', sa.String(length=32), nullable=False, comment='SKU 前缀 (如 类目码+品牌码)'),
+        sa.Column('width', sa.Integer(), nullable=False, comment='流水号位数'),
+        sa.Column('last_value', sa.Integer(), nullable=False, comment='已分配的最大流水号'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('prefix', 'width')
+    )
+
+    op.execute("""
+        INSERT INTO sku_serial_counters (prefix, width, last_value, updated_at)
+        SELECT c.code, 5, COALESCE(MAX(substr(v.sku, length(c.code) + 1, 5)::int), 0), now()
+        FROM categories c
+        LEFT JOIN product_variants v
+            ON v.sku LIKE c.code || '%'
+           AND substr(v.sku, length(c.code) + 1, 5) ~ '^\\d{5}$'
+        WHERE c.code IS NOT NULL AND c.code <> ''
+        GROUP BY c.code;
+    """)
+
+
+def downgrade():
+    op.drop_table('sku_serial_counters')
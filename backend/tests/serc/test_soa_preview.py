@@ -0,0 +1,90 @@
+"""
+L2 结算单预览 / L1.5 开票聚合测试
+"""
+from decimal import Decimal
+from sqlalchemy import event
+from app.extensions import db
+from app.models.product import Product, ProductVariant
+from app.models.supply import ScmDeliveryContractItem
+from app.services.serc.finance_service import FinanceService
+from tests.factories import CategoryFactory, SysSupplierFactory, ScmDeliveryContractFactory
+
+
+def _product(name, sku, declared_name=None):
+    product = Product(spu_code=f'SPU-{sku}', name=name, category_id=CategoryFactory().id, spu_coding_metadata={})
+    product.variants.append(ProductVariant(sku=sku, declared_name=declared_name, declared_unit='个'))
+    db.session.add(product)
+    db.session.flush()
+    return product
+
+
+def _contract(supplier, lines):
+    total = sum(Decimal(amount) for _, _, amount in lines)
+    contract = ScmDeliveryContractFactory(supplier=supplier, total_amount=total)
+    for product, qty, amount in lines:
+        db.session.add(ScmDeliveryContractItem(
+            l1_contract_id=contract.id, product_id=product.id,
+            confirmed_qty=Decimal(qty), unit_price=Decimal(amount) / Decimal(qty), total_price=Decimal(amount)
+        ))
+    db.session.commit()
+    return contract
+
+
+class TestSOAPreview:
+    """测试批量预加载后的分组聚合"""
+
+    def test_preview_groups_by_supplier_and_invoice_name(self, app):
+        with app.app_context():
+            supplier_a = SysSupplierFactory(default_vat_rate=Decimal('0.01'))
+            supplier_b = SysSupplierFactory()
+            lamp = _product('Headlamp', 'SKU-L', declared_name='车灯')
+            lamp2 = _product('Headlamp RH', 'SKU-R', declared_name='车灯')
+            mirror = _product('后视镜', 'SKU-M')
+
+            c1 = _contract(supplier_a, [(lamp, '10', '100'), (mirror, '2', '50')])
+            c2 = _contract(supplier_a, [(lamp2, '5', '60')])
+            c3 = _contract(supplier_b, [(mirror, '4', '80')])
+
+            result = FinanceService().preview_soa([c1.id, c2.id, c3.id])['data']
+            assert result['contract_count'] == 3
+            assert result['total_amount'] == Decimal('290')
+
+            group_a, group_b = result['suppliers']
+            assert group_a['l1_contract_ids'] == [c1.id, c2.id]
+            assert group_a['is_balanced'] is True
+            lines = {line['invoice_name']: line for line in group_a['items']}
+            assert lines['车灯']['quantity'] == Decimal('15')
+            assert lines['车灯']['amount'] == Decimal('160')
+            assert lines['车灯']['skus'] == ['SKU-L', 'SKU-R']
+            assert lines['车灯']['invoice_unit'] == '个'
+            assert lines['车灯']['tax_rate'] == Decimal('0.01')
+            assert lines['后视镜']['quantity'] == Decimal('2')
+
+            assert group_b['supplier_id'] == supplier_b.id
+            assert group_b['items'][0]['tax_rate'] == Decimal('0.13')
+            assert group_b['warnings']
+
+    def test_query_count_independent_of_contract_count(self, app):
+        with app.app_context():
+            supplier = SysSupplierFactory()
+            products = [_product(f'P{i}', f'SKU-{i}') for i in range(5)]
+            few = [_contract(supplier, [(products[0], '1', '10')]).id for _ in range(2)]
+            many = [_contract(supplier, [(p, '1', '10') for p in products]).id for _ in range(20)]
+            db.session.expire_all()
+
+            statements = []
+
+            def count(*args):
+                statements.append(args[2])
+
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                FinanceService().preview_soa(few)
+                few_count = len(statements)
+                statements.clear()
+                FinanceService().preview_soa(many)
+                many_count = len(statements)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+            assert many_count == few_count
@@ -0,0 +1,117 @@
+"""
+退税 报关单-发票 匹配测试
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from app.extensions import db
+from app.models.customs import CustomsDeclaration, CustomsDeclarationItem
+from app.models.serc.tax import TaxInvoice, TaxInvoiceItem, TaxRefundMatch
+from app.models.serc.enums import TaxInvoiceStatus, CustomsStatus
+from app.services.serc.tax_refund_service import TaxRefundService
+from app.models.product import Product
+from tests.factories import CategoryFactory
+
+
+def _product(name):
+    product = Product(spu_code=f'SPU-{name}', name=name, category_id=CategoryFactory().id, spu_coding_metadata={})
+    db.session.add(product)
+    db.session.flush()
+    return product
+
+
+def _invoice(no, name, qty, days_ago):
+    invoice = TaxInvoice(
+        invoice_code='4400', invoice_no=no, amount_total=Decimal('100'), tax_amount=Decimal('13'),
+        created_at=datetime.now() - timedelta(days=days_ago)
+    )
+    invoice.items.append(TaxInvoiceItem(
+        name=name, unit='个', qty=Decimal(qty), price=Decimal('10'), total=Decimal('100')
+    ))
+    db.session.add(invoice)
+    return invoice
+
+
+def _declaration(product, qtys, declare_date=date(2026, 1, 15)):
+    decl = CustomsDeclaration(declare_date=declare_date, fob_total=Decimal('0'), exchange_rate=Decimal('7'))
+    db.session.add(decl)
+    db.session.flush()
+    for i, qty in enumerate(qtys, start=1):
+        db.session.add(CustomsDeclarationItem(
+            declaration_id=decl.id, product_id=product.id, item_no=i, qty=Decimal(qty), unit='个',
+            usd_unit_price=Decimal('1'), usd_total=Decimal(qty)
+        ))
+    return decl
+
+
+class TestTaxRefundMatch:
+    """测试 FIFO 匹配与批量确认"""
+
+    def test_fifo_across_items_and_confirm(self, app):
+        """测试同单多项共享额度、FIFO 顺序及确认后的发票状态"""
+        with app.app_context():
+            product = _product('车灯')
+            inv_old = _invoice('INV-1', '车灯', '10', days_ago=5)
+            inv_new = _invoice('INV-2', '车灯', '10', days_ago=1)
+            decl = _declaration(product, ['6', '8'])
+            db.session.commit()
+
+            service = TaxRefundService()
+            result = service.match_declaration(decl.id)
+            assert result['success'] is True
+            plans = [r['plan'] for r in result['results']]
+            assert [(p['invoice_no'], p['take_qty']) for p in plans[0]] == [('INV-1', Decimal('6'))]
+            assert [(p['invoice_no'], p['take_qty']) for p in plans[1]] == [
+                ('INV-1', Decimal('4')), ('INV-2', Decimal('4'))
+            ]
+
+            assert service.confirm_match(decl.id) is True
+            assert db.session.query(TaxRefundMatch).count() == 3
+            assert db.session.get(TaxInvoice, inv_old.id).status == TaxInvoiceStatus.LOCKED.value
+            assert db.session.get(TaxInvoice, inv_new.id).status == TaxInvoiceStatus.RESERVED.value
+            assert db.session.get(CustomsDeclaration, decl.id).status == CustomsStatus.PRE_DECLARED.value
+            assert inv_old.items[0].remaining_qty == Decimal('0')
+            assert inv_new.items[0].remaining_qty == Decimal('6')
+
+            assert service.cancel_match(decl.id) is True
+            assert db.session.query(TaxRefundMatch).count() == 0
+            assert db.session.get(TaxInvoice, inv_old.id).status == TaxInvoiceStatus.FREE.value
+            assert inv_new.items[0].remaining_qty == Decimal('10')
+
+    def test_month_batch_skips_failed_declaration(self, app):
+        """测试按月批量: 失败的报关单不占用额度"""
+        with app.app_context():
+            product = _product('尾灯')
+            _invoice('INV-3', '尾灯', '10', days_ago=3)
+            first = _declaration(product, ['4', '20'], declare_date=date(2026, 1, 3))
+            second = _declaration(product, ['10'], declare_date=date(2026, 1, 9))
+            _declaration(product, ['1'], declare_date=date(2026, 2, 1))
+            db.session.commit()
+
+            result = TaxRefundService().match_month(2026, 1, confirm=True)
+            assert result['total'] == 2
+            assert result['confirmed'] == [second.id]
+            assert [f['declaration_id'] for f in result['failed']] == [first.id]
+            assert result['match_count'] == 1
+
+    def test_match_month_rejects_invalid_period(self, client, token_headers):
+        """测试非法年月返回校验错误而非 500"""
+        for payload in ({'year': 2026, 'month': 13}, {'year': 2026, 'month': 0}, {'year': 99, 'month': 1}):
+            resp = client.post('/api/v1/serc/tax/match-month', json=payload, headers=token_headers)
+            assert resp.status_code in (400, 422)
+
+    def test_repair_remaining_qty(self, app):
+        """测试剩余数量一致性修复"""
+        with app.app_context():
+            product = _product('雾灯')
+            invoice = _invoice('INV-4', '雾灯', '10', days_ago=2)
+            decl = _declaration(product, ['3'])
+            db.session.commit()
+            service = TaxRefundService()
+            service.confirm_match(decl.id)
+
+            item = invoice.items[0]
+            item.remaining_qty = Decimal('10')
+            db.session.commit()
+            assert service.repair_remaining_qty() == 1
+            assert item.remaining_qty == Decimal('7')
+            assert service.repair_remaining_qty() == 0
@@ -0,0 +1,121 @@
+"""
+合同批量打印 (分组快照 / ZIP / 合并 PDF / 进度) 测试
+"""
+import os
+import pickle
+import zipfile
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+import pytest
+from pypdf import PdfReader, PdfWriter
+from app.extensions import db
+from app.models.product import Product, ProductVariant
+from app.models.serc.foundation import SysCompany
+from app.models.supply import ScmDeliveryContractItem
+from app.services.serc import pdf_service as pdf_module
+from app.services.serc.pdf_service import PDFService, OUTPUT_MERGED, render_contract_html
+from tests.factories import CategoryFactory, SysSupplierFactory, ScmDeliveryContractFactory
+
+
+def _fake_pdf(pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=100, height=100)
+    writer.add_metadata({'/Producer': str(os.getpid())})
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class TestContractPdfBatch:
+    """WeasyPrint 排版 (除真实渲染用例外) 由假实现代替，验证分组、快照、进程池与输出组装"""
+
+    def _seed(self):
+        company = SysCompany(legal_name='Acme Trading Ltd', short_name='ACME')
+        db.session.add(company)
+        db.session.flush()
+        product = Product(spu_code='SPU-L', name='车灯', category_id=CategoryFactory().id, spu_coding_metadata={})
+        product.variants.append(ProductVariant(sku='SKU-L', declared_unit='个'))
+        db.session.add(product)
+        db.session.flush()
+
+        supplier_a, supplier_b = SysSupplierFactory(name='供应商A'), SysSupplierFactory(name='供应商B')
+        contracts = [
+            ScmDeliveryContractFactory(supplier=supplier_a, company_id=company.id, total_amount=Decimal('10')),
+            ScmDeliveryContractFactory(supplier=supplier_b, total_amount=Decimal('20')),
+            ScmDeliveryContractFactory(supplier=supplier_a, company_id=company.id, total_amount=Decimal('30')),
+        ]
+        db.session.add(ScmDeliveryContractItem(
+            l1_contract_id=contracts[0].id, product_id=product.id,
+            confirmed_qty=Decimal('2'), unit_price=Decimal('5'), total_price=Decimal('10')
+        ))
+        db.session.commit()
+        return [c.id for c in contracts]
+
+    def test_groups_hold_picklable_snapshots(self, app):
+        with app.app_context():
+            ids = self._seed()
+            groups = PDFService().build_print_groups(ids)
+
+            assert [g.supplier_name for g in groups] == ['供应商A', '供应商B']
+            assert groups[0].filename.startswith('ACME_供应商A_采购合同_')
+            assert groups[0].filename.endswith('_2份.pdf')
+            assert groups[1].filename.startswith('未指定主体_供应商B_')
+
+            first = groups[0].contracts[0]
+            assert first.company.legal_name == 'Acme Trading Ltd'
+            assert first.items[0].product.sku == 'SKU-L'
+            assert first.items[0].product.declared_unit == '个'
+            assert groups[1].contracts[0].company is None
+
+    def test_render_batch_zip_and_merged_with_progress(self, app, monkeypatch):
+        with app.app_context():
+            groups = PDFService().build_print_groups(self._seed())
+            monkeypatch.setattr(pdf_module, 'render_contract_pdf',
+                                lambda supplier_name, contracts: _fake_pdf(len(contracts)))
+
+            progress = []
+            buffer = BytesIO()
+            PDFService().render_batch(groups, buffer, progress=lambda done, total: progress.append((done, total)))
+            assert progress == [(1, 2), (2, 2)]
+            with zipfile.ZipFile(buffer) as zf:
+                assert zf.namelist() == [g.filename for g in groups]
+
+            merged = BytesIO()
+            PDFService().render_batch(groups, merged, output=OUTPUT_MERGED)
+            merged.seek(0)
+            assert len(PdfReader(merged).pages) == 3
+
+    def test_snapshots_pickle_and_render(self, app):
+        """快照经 pickle 往返后仍可渲染模板；WeasyPrint 可用时在真实进程池中生成 PDF"""
+        with app.app_context():
+            groups = PDFService().build_print_groups(self._seed())
+            contracts = pickle.loads(pickle.dumps(groups[0].contracts))
+
+            html = render_contract_html(groups[0].supplier_name, contracts)
+            assert contracts[0].contract_no in html and 'SKU-L' in html and '车灯' in html
+
+            try:
+                import weasyprint  # noqa: F401
+                pdf_module._get_render_state()
+            except (ImportError, OSError) as e:  # WeasyPrint 或其系统库 (pango) 缺失
+                pytest.skip(f'WeasyPrint unavailable: {e}')
+            buffer = BytesIO()
+            PDFService().render_batch(groups, buffer, max_workers=2)
+            with zipfile.ZipFile(buffer) as zf:
+                assert all(zf.read(name).startswith(b'%PDF') for name in zf.namelist())
+
+    def test_daemon_process_uses_billiard_pool(self, app, monkeypatch):
+        """Celery prefork 子进程 (守护进程) 内同样并行渲染"""
+        with app.app_context():
+            groups = PDFService().build_print_groups(self._seed())
+            monkeypatch.setattr(pdf_module, 'render_contract_pdf',
+                                lambda supplier_name, contracts: _fake_pdf(len(contracts)))
+            monkeypatch.setattr(pdf_module.multiprocessing, 'current_process', lambda: SimpleNamespace(daemon=True))
+
+            buffer = BytesIO()
+            PDFService().render_batch(groups, buffer, max_workers=2)
+            with zipfile.ZipFile(buffer) as zf:
+                producers = {PdfReader(BytesIO(zf.read(g.filename))).metadata['/Producer'] for g in groups}
+            assert str(os.getpid()) not in producers
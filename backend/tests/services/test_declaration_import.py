@@ -0,0 +1,87 @@
+"""
+报关单 Excel 导入测试
+"""
+from decimal import Decimal
+import pandas as pd
+from app.extensions import db
+from app.models.customs import CustomsDeclaration, CustomsDeclarationItem
+from app.models.product import Product, ProductVariant
+from app.services.customs_service import CustomsService
+from tests.factories import CategoryFactory, SysSupplierFactory
+
+
+def _variant(sku, customs_name=None):
+    product = Product(spu_code=f'SPU-{sku}', name=sku, category_id=CategoryFactory().id, spu_coding_metadata={})
+    product.variants.append(ProductVariant(sku=sku, customs_name_cn=customs_name))
+    db.session.add(product)
+    db.session.flush()
+    return product.variants[0]
+
+
+def _excel(tmp_path, rows):
+    path = tmp_path / 'packing.xlsx'
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return str(path)
+
+
+class TestDeclarationImport:
+    """测试向量化校验、批量解析与行级错误"""
+
+    def test_import_resolves_products_and_suppliers(self, app, tmp_path):
+        with app.app_context():
+            supplier = SysSupplierFactory(name='供应商A')
+            lamp = _variant('00123', customs_name='车灯')
+            mirror = _variant('M-1')
+            db.session.commit()
+
+            path = _excel(tmp_path, [
+                {'SKU': '00123', 'Quantity': 10, 'Price(USD)': 1.5, 'Supplier': '供应商A', 'BoxNo': '1', 'NetWeight': 2.5},
+                {'SKU': ' M-1 ', 'Quantity': 3, 'Price(USD)': None, 'Supplier': '未知供应商', 'BoxNo': None, 'NetWeight': None},
+            ])
+            result = CustomsService().import_declaration_from_excel(path, {'shipping_no': 'BL-1'})
+
+            assert result['error_count'] == 0
+            assert result['imported_rows'] == 2
+            assert result['fob_total'] == Decimal('15.00')
+            assert [w['row'] for w in result['warnings']] == [3]
+
+            decl = db.session.get(CustomsDeclaration, result['declaration_id'])
+            assert decl.bill_of_lading_no == 'BL-1'
+            items = db.session.scalars(
+                db.select(CustomsDeclarationItem)
+                .where(CustomsDeclarationItem.declaration_id == decl.id)
+                .order_by(CustomsDeclarationItem.item_no)
+            ).all()
+            assert [i.item_no for i in items] == [1, 2]
+            assert items[0].product_id == lamp.product_id
+            assert items[0].product_name_spec == '车灯'
+            assert items[0].supplier_id == supplier.id
+            assert items[0].usd_total == Decimal('15.00')
+            assert items[0].box_no == '1'
+            assert items[1].product_id == mirror.product_id
+            assert items[1].supplier_id is None
+            assert items[1].usd_unit_price == Decimal('0')
+
+    def test_row_errors_block_import_unless_skipped(self, app, tmp_path):
+        with app.app_context():
+            _variant('OK-1')
+            db.session.commit()
+
+            path = _excel(tmp_path, [
+                {'SKU': 'OK-1', 'Quantity': 2, 'Price(USD)': 1},
+                {'SKU': 'NOPE', 'Quantity': 1, 'Price(USD)': 1},
+                {'SKU': 'OK-1', 'Quantity': 'abc', 'Price(USD)': 1},
+                {'SKU': None, 'Quantity': 1, 'Price(USD)': -1},
+            ])
+            service = CustomsService()
+
+            result = service.import_declaration_from_excel(path)
+            assert result['declaration_id'] is None
+            assert result['imported_rows'] == 0
+            errors = {(e['row'], e['column']) for e in result['errors']}
+            assert errors == {(3, 'sku'), (4, 'qty'), (5, 'sku'), (5, 'usd_unit_price')}
+            assert db.session.query(CustomsDeclaration).count() == 0
+
+            result = service.import_declaration_from_excel(path, skip_errors=True)
+            assert result['imported_rows'] == 1
+            assert db.session.query(CustomsDeclarationItem).count() == 1
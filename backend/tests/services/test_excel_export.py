@@ -0,0 +1,102 @@
+"""
+流式 Excel 导出测试
+"""
+import os
+from decimal import Decimal
+from io import BytesIO
+from openpyxl import load_workbook
+from app.extensions import db
+from app.models.product import Product, ProductVariant
+from app.models.serc.foundation import SysCompany
+from app.models.supply import ScmDeliveryContractItem
+from app.models.warehouse import Warehouse, WarehouseStock
+from app.services.excel_export import xlsx_response
+from app.services.serc.excel_service import ExcelService
+from app.services.warehouse import StockService
+from tests.factories import CategoryFactory, SysSupplierFactory, ScmDeliveryContractFactory
+
+
+def _product(name, sku):
+    product = Product(spu_code=f'SPU-{sku}', name=name, category_id=CategoryFactory().id, spu_coding_metadata={})
+    product.variants.append(ProductVariant(sku=sku))
+    db.session.add(product)
+    db.session.flush()
+    return product
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return load_workbook(BytesIO(f.read()))
+
+
+class TestExcelExport:
+    """测试 write_only 导出的分表、内容与分块下发"""
+
+    def test_contracts_export_one_sheet_per_company(self, app):
+        with app.app_context():
+            acme = SysCompany(legal_name='Acme Trading Ltd', short_name='ACME')
+            other = SysCompany(legal_name='Other Co')
+            db.session.add_all([acme, other])
+            db.session.flush()
+            supplier = SysSupplierFactory(name='供应商A')
+            lamp = _product('车灯', 'SKU-L')
+
+            c1 = ScmDeliveryContractFactory(supplier=supplier, company_id=acme.id, total_amount=Decimal('100'),
+                                            paid_amount=Decimal('40'), supplier_snapshot={'name': '供应商A(快照)'})
+            db.session.add_all([
+                ScmDeliveryContractItem(l1_contract_id=c1.id, product_id=lamp.id, confirmed_qty=Decimal('2'),
+                                        unit_price=Decimal('30'), total_price=Decimal('60')),
+                ScmDeliveryContractItem(l1_contract_id=c1.id, product_id=lamp.id, confirmed_qty=Decimal('1'),
+                                        unit_price=Decimal('40'), total_price=Decimal('40')),
+            ])
+            ScmDeliveryContractFactory(supplier=supplier, company_id=other.id, total_amount=Decimal('5'),
+                                       currency='USD')
+            db.session.commit()
+
+            service = ExcelService()
+            path = service.generate_contracts_excel(service.contract_export_statement())
+            try:
+                wb = _read(path)
+            finally:
+                os.remove(path)
+
+            assert wb.sheetnames == ['ACME', 'Other Co']
+            rows = list(wb['ACME'].iter_rows(values_only=True))
+            assert rows[0][:5] == ('供应商', '合同编号', '创建日期', '业务状态', 'SKU')
+            assert rows[1][0] == '供应商A(快照)'
+            assert rows[1][4:9] == ('SKU-L', '车灯', 2, 30, 60)
+            assert rows[2][1] == c1.contract_no  # 合同级字段逐行重复，不再合并单元格
+            assert rows[2][9:12] == (100, 40, 60)
+            assert ('CNY', 100) in [r[:2] for r in rows]
+
+            other_rows = list(wb['Other Co'].iter_rows(values_only=True))
+            assert other_rows[1][4] is None  # 无明细的合同也输出一行
+            assert ('USD', 5) in [r[:2] for r in other_rows]
+
+            assert service.generate_contracts_excel(service.contract_export_statement(ids=[-1])) is None
+
+    def test_stock_export_streams_and_removes_temp_file(self, app):
+        with app.app_context():
+            warehouse = Warehouse(code='WH-1', name='深圳仓')
+            db.session.add(warehouse)
+            db.session.flush()
+            db.session.add_all([
+                WarehouseStock(sku=f'SKU-{i:03d}', warehouse_id=warehouse.id,
+                               physical_quantity=i, available_quantity=i)
+                for i in range(30)
+            ])
+            db.session.commit()
+
+            service = StockService()
+            path = service.export_stock_excel(min_quantity=10)
+            with app.test_request_context():
+                response = xlsx_response(path, '库存报表.xlsx')
+                assert "filename*=UTF-8''" in response.headers['Content-Disposition']
+                body = b''.join(response.response)
+            assert not os.path.exists(path)
+
+            rows = list(load_workbook(BytesIO(body))['库存'].iter_rows(values_only=True))
+            assert len(rows) == 21
+            assert rows[1][:5] == ('SKU-010', '深圳仓', None, 10, 10)
+
+            assert service.export_stock_excel(sku='NOPE') is None
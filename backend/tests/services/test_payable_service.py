@@ -7,6 +7,7 @@ from datetime import date, datetime
 from app.services.serc.payable_service import PayableService
 from app.models.serc.payable import FinPayable, PayableStatus, FinPaymentPool, PaymentPoolStatus
 from app.errors import BusinessError
+from app.extensions import db
 from tests.factories import (
     FinPayableFactory,
     FinPaymentPoolFactory,
@@ -331,3 +332,145 @@ class TestPayableService:
             assert retrieved.id == payable.id
             assert retrieved.payable_no == payable.payable_no
 
+
+
+class TestPayableBatch:
+    """测试应付单批量操作"""
+
+    def _row(self, source_id, amount='1000.00'):
+        return {
+            'source_type': 'supply_contract',
+            'source_id': source_id,
+            'source_no': f'SC-{source_id}',
+            'payee_type': 'supplier',
+            'payee_id': 1,
+            'payee_name': '测试供应商',
+            'payable_amount': Decimal(amount),
+        }
+
+    def test_batch_create_payables(self, app):
+        """测试批量创建: 连续单号、逐行结果、来源查重"""
+        with app.app_context():
+            FinPayableFactory(source_type='supply_contract', source_id=3)
+            rows = [self._row(1), self._row(2), self._row(3), self._row(1), self._row(4, '0')]
+
+            results = PayableService.batch_create_payables(rows, created_by=None)
+
+            assert [r['success'] for r in results] == [True, True, False, False, False]
+            assert '已存在' in results[2]['error']
+            assert '金额' in results[4]['error']
+            first, second = int(results[0]['payable_no'][-4:]), int(results[1]['payable_no'][-4:])
+            assert second == first + 1
+            payable = db.session.get(FinPayable, results[0]['payable_id'])
+            assert payable.status == PayableStatus.PENDING.value
+            assert payable.payable_amount == Decimal('1000.00')
+
+    def test_batch_approve_into_pool(self, app):
+        """测试批量批准并入池，非待审批行失败"""
+        with app.app_context():
+            user = UserFactory()
+            pool = FinPaymentPoolFactory()
+            pending = [FinPayableFactory(payable_amount=Decimal('100.00')) for _ in range(3)]
+            paid = FinPayableFactory(status=PayableStatus.PAID.value)
+
+            results = PayableService.batch_approve_payables(
+                [p.id for p in pending] + [paid.id, 999999],
+                action='approve', approved_by=user.id, add_to_pool=True, pool_id=pool.id
+            )
+
+            assert [r['success'] for r in results] == [True, True, True, False, False]
+            for p in pending:
+                db.session.refresh(p)
+                assert p.status == PayableStatus.IN_POOL.value
+                assert p.payment_pool_id == pool.id
+                assert p.approved_by_id == user.id
+            db.session.refresh(pool)
+            assert pool.total_count == 3
+            assert pool.total_amount == Decimal('300.00')
+
+    @pytest.mark.parametrize('pool_status', [None, PaymentPoolStatus.COMPLETED.value])
+    def test_batch_approve_rejects_invalid_pool_before_update(self, app, pool_status):
+        """测试目标付款池不存在或已关闭时不写入审批状态"""
+        with app.app_context():
+            user = UserFactory()
+            pool_id = FinPaymentPoolFactory(status=pool_status).id if pool_status else 999999
+            payable = FinPayableFactory()
+
+            with pytest.raises(BusinessError):
+                PayableService.batch_approve_payables(
+                    [payable.id], action='approve', approved_by=user.id, add_to_pool=True, pool_id=pool_id
+                )
+
+            # 校验失败时尚未执行批量 UPDATE，会话中的应付单保持原状态
+            assert payable.status == PayableStatus.PENDING.value
+            assert payable.approved_by_id is None
+
+    def test_batch_add_to_pool_requires_approved(self, app):
+        """测试批量入池只接受已批准的应付单"""
+        with app.app_context():
+            pool = FinPaymentPoolFactory()
+            approved = FinPayableFactory(status=PayableStatus.APPROVED.value)
+            pending = FinPayableFactory(status=PayableStatus.PENDING.value)
+
+            results = PayableService.batch_add_to_pool([approved.id, pending.id], pool.id)
+
+            assert [r['success'] for r in results] == [True, False]
+            db.session.refresh(pool)
+            assert pool.total_count == 1
+
+    def test_settle_pool_from_bank_statement(self, app):
+        """测试按银行流水结算付款池: 全额、部分、超付与池外单号"""
+        import io
+        with app.app_context():
+            pool = FinPaymentPoolFactory()
+            full = FinPayableFactory(status=PayableStatus.IN_POOL.value, payment_pool_id=pool.id,
+                                     payable_amount=Decimal('500.00'))
+            partial = FinPayableFactory(status=PayableStatus.IN_POOL.value, payment_pool_id=pool.id,
+                                        payable_amount=Decimal('800.00'))
+            outside = FinPayableFactory(status=PayableStatus.IN_POOL.value)
+
+            csv_text = (
+                "应付单号,金额,付款时间\n"
+                f"{full.payable_no},500.00,2026-01-10 10:00:00\n"
+                f"{partial.payable_no},\"300.00\",\n"
+                f"{partial.payable_no},600.00,\n"
+                f"{outside.payable_no},100.00,\n"
+            )
+            rows = PayableService.parse_bank_statement(io.BytesIO(csv_text.encode('utf-8-sig')), 'bank.csv')
+            result = PayableService.settle_pool(pool.id, rows)
+
+            assert [r['success'] for r in result['results']] == [True, True, False, False]
+            assert result['paid_count'] == 2
+            assert result['paid_amount'] == Decimal('800.00')
+            assert result['pool_status'] == PaymentPoolStatus.PROCESSING.value
+
+            db.session.refresh(full)
+            db.session.refresh(partial)
+            assert full.status == PayableStatus.PAID.value
+            assert full.paid_at == datetime(2026, 1, 10, 10, 0, 0)
+            assert partial.status == PayableStatus.IN_POOL.value
+            assert partial.paid_amount == Decimal('300.00')
+
+            result = PayableService.settle_pool(pool.id, [{'payable_no': partial.payable_no, 'amount': '500'}])
+            assert result['pool_status'] == PaymentPoolStatus.COMPLETED.value
+
+    def test_settle_pool_rejects_overpay_only_and_nan_rows(self, app):
+        """测试只有超付/非法金额流水的应付单不被登记为已付款，付款池状态不变"""
+        with app.app_context():
+            pool = FinPaymentPoolFactory()
+            payable = FinPayableFactory(status=PayableStatus.IN_POOL.value, payment_pool_id=pool.id,
+                                        payable_amount=Decimal('100.00'))
+            original_status = pool.status
+
+            result = PayableService.settle_pool(pool.id, [
+                {'payable_no': payable.payable_no, 'amount': '150'},
+                {'payable_no': payable.payable_no, 'amount': 'NaN'},
+                {'payable_no': payable.payable_no, 'amount': 'Infinity'},
+            ])
+
+            assert [r['success'] for r in result['results']] == [False, False, False]
+            assert result['paid_count'] == 0
+            assert result['pool_status'] == original_status
+            db.session.refresh(payable)
+            assert payable.status == PayableStatus.IN_POOL.value
+            assert payable.paid_at is None
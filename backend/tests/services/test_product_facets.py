@@ -0,0 +1,86 @@
+"""
+SKU 分面筛选测试
+"""
+from app.extensions import db
+from app.models.product import Product, ProductVariant, AttributeDefinition, CategoryAttribute
+from app.models.warehouse import Warehouse, WarehouseStock
+from app.services.product_facet_service import ProductFacetService
+from tests.factories import CategoryFactory
+
+
+def _seed():
+    category = CategoryFactory()
+    position = AttributeDefinition(key_name='position', label='位置', data_type='select')
+    color = AttributeDefinition(key_name='color', label='颜色', data_type='select')
+    db.session.add_all([position, color])
+    db.session.flush()
+    db.session.add_all([
+        CategoryAttribute(category_id=category.id, attribute_id=position.id, attribute_scope='sku'),
+        CategoryAttribute(category_id=category.id, attribute_id=color.id, attribute_scope='sku'),
+    ])
+
+    specs = [
+        ('CHE', 'SIL', {'position': 'Left', 'color': 'Chrome'}),
+        ('CHE', 'SIL', {'position': 'Right', 'color': 'Chrome'}),
+        ('CHE', 'TAH', {'position': 'Left', 'color': 'Black'}),
+        ('FOR', 'F15', {'position': 'Left'}),
+    ]
+    for i, (brand, model, spec) in enumerate(specs):
+        product = Product(
+            spu_code=f'HL-{brand}-{model}-{i}', name=f'Headlight {i}', category_id=category.id,
+            brand=brand, spu_coding_metadata={'model': model}
+        )
+        db.session.add(product)
+        db.session.flush()
+        db.session.add(ProductVariant(product_id=product.id, sku=f'11100{i}', specs=spec))
+    db.session.commit()
+    return category
+
+
+def _values(facets, key):
+    facet = next(f for f in facets if f['key'] == key)
+    return {v['value']: v['count'] for v in facet['values']}
+
+
+class TestProductFacets:
+    """测试分面计数"""
+
+    def test_facet_counts_without_filters(self, app):
+        with app.app_context():
+            category = _seed()
+            facets = ProductFacetService().facet_counts()
+
+            assert _values(facets, 'brand') == {'CHE': 3, 'FOR': 1}
+            assert _values(facets, 'model') == {'SIL': 2, 'TAH': 1, 'F15': 1}
+            assert _values(facets, 'category_id') == {str(category.id): 4}
+            assert _values(facets, 'attr_position') == {'Left': 3, 'Right': 1}
+            assert _values(facets, 'attr_color') == {'Chrome': 2, 'Black': 1}
+
+    def test_drill_down(self, app):
+        with app.app_context():
+            _seed()
+            result = ProductFacetService().list_skus_with_facets(
+                filters={'brand': 'CHE', 'attribute_filters': {'position': 'Left'}}
+            )
+
+            assert result['total'] == 2
+            assert _values(result['facets'], 'model') == {'SIL': 1, 'TAH': 1}
+            assert _values(result['facets'], 'attr_color') == {'Chrome': 1, 'Black': 1}
+
+    def test_counts_follow_stock_filters(self, app):
+        """测试库存筛选同样作用于分面计数，与列表总数一致"""
+        with app.app_context():
+            _seed()
+            warehouse = Warehouse(code='WH-CN', name='深圳仓')
+            db.session.add(warehouse)
+            db.session.flush()
+            db.session.add_all([
+                WarehouseStock(sku='111000', warehouse_id=warehouse.id, physical_quantity=10, available_quantity=10),
+                WarehouseStock(sku='111003', warehouse_id=warehouse.id, physical_quantity=5, available_quantity=5),
+            ])
+            db.session.commit()
+
+            result = ProductFacetService().list_skus_with_facets(filters={'stock_min': 1})
+            assert result['total'] == 2
+            assert _values(result['facets'], 'brand') == {'CHE': 1, 'FOR': 1}
+            assert _values(result['facets'], 'attr_position') == {'Left': 2}
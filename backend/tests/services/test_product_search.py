@@ -0,0 +1,94 @@
+"""
+商品搜索索引测试
+"""
+from app.extensions import db
+from app.models.product import Product, ProductVariant, ProductReferenceCode, ProductSearchDocument
+from app.services.product_service import ProductService
+from app.services.product_search_service import ProductSearchService
+from tests.factories import CategoryFactory
+
+
+def _create(category, spu_code, name, skus, ref_codes=()):
+    product = Product(spu_code=spu_code, name=name, category_id=category.id, spu_coding_metadata={})
+    db.session.add(product)
+    db.session.flush()
+    for i, sku in enumerate(skus):
+        db.session.add(ProductVariant(product_id=product.id, sku=sku, feature_code=f'{spu_code}-{i}', specs={}))
+    for code in ref_codes:
+        db.session.add(ProductReferenceCode(product_id=product.id, code=code, code_type='OE'))
+    ProductSearchService.reindex_products([product.id])
+    db.session.commit()
+    return product
+
+
+class TestProductSearch:
+    """测试搜索文档维护与排序"""
+
+    def test_documents_maintained_on_write(self, app):
+        """测试创建/删除 SKU 时增量维护文档"""
+        with app.app_context():
+            service = ProductService()
+            category = CategoryFactory()
+            _create(category, 'HL-CHE-SIL', 'Silverado Headlight', ['111000101', '111000102'], ['15-1234'])
+
+            docs = db.session.query(ProductSearchDocument).all()
+            assert len(docs) == 2
+            assert ' 15-1234 151234 ' == docs[0].ref_codes
+
+            service.delete_sku('111000101')
+            service.delete_sku('111000102')
+            docs = db.session.query(ProductSearchDocument).all()
+            # SPU 无 SKU 时仍保留一条文档，可按名称搜到
+            assert len(docs) == 1 and docs[0].variant_id is None
+
+    def test_sku_search_ranking(self, app):
+        """测试精确 SKU / OE 号命中优先"""
+        with app.app_context():
+            service = ProductService()
+            category = CategoryFactory()
+            _create(category, 'HL-CHE-SIL', 'Headlight 1110001', ['1110001X'])
+            _create(category, 'HL-FOR-F15', 'Tail Light', ['1110001'])
+            _create(category, 'FL-TOY-CAM', 'Fog Light', ['2220001'], ['1110-001'])
+
+            result = service.list_skus(filters={'q': '1110001'})
+            assert [item['sku'] for item in result['items']] == ['1110001', '2220001', '1110001X']
+
+            result = service.list_skus(filters={'q': 'fog'})
+            assert [item['sku'] for item in result['items']] == ['2220001']
+
+    def test_product_search_without_duplicates(self, app):
+        """测试 SPU 搜索每个 SPU 仅返回一行"""
+        with app.app_context():
+            service = ProductService()
+            category = CategoryFactory()
+            _create(category, 'HL-CHE-SIL', 'Silverado Headlight', ['3330001', '3330002', '3330003'])
+            _create(category, 'HL-CHE-TAH', 'Tahoe Headlight', ['4440001'])
+
+            pagination = service.list_products(q='headlight')
+            assert pagination.total == 2
+
+            pagination = service.list_products(q='4440001')
+            assert [p.spu_code for p in pagination.items] == ['HL-CHE-TAH']
+
+    def test_reindex_all(self, app):
+        """测试全量重建"""
+        with app.app_context():
+            service = ProductService()
+            category = CategoryFactory()
+            _create(category, 'HL-CHE-SIL', 'Silverado Headlight', ['5550001', '5550002'])
+            db.session.query(ProductSearchDocument).delete()
+            db.session.commit()
+
+            assert ProductSearchService.reindex_all(batch_size=1) == 2
+
+    def test_benchmark_seed_indexed(self, app):
+        """测试批量造数后搜索文档同步生成"""
+        from app.commands.bench import seed_benchmark_data
+
+        with app.app_context():
+            counts = seed_benchmark_data('ci')
+            assert counts['search_documents'] == counts['product_variants']
+
+            sku = db.session.query(ProductVariant.sku).first().sku
+            result = ProductService().list_skus(filters={'q': sku})
+            assert result['items'][0]['sku'] == sku
@@ -0,0 +1,136 @@
+"""
+发货单采购明细 -> 商品明细 同步测试
+"""
+from decimal import Decimal
+from app.extensions import db
+from app.models.logistics.purchase_item import ShipmentPurchaseItem
+from app.models.logistics.shipment import ShipmentOrderItem
+from app.models.product import Product, ProductVariant
+from app.services.logistics.purchase_item_service import ShipmentPurchaseItemService
+from tests.factories import CategoryFactory, ShipmentOrderFactory
+
+
+def _variant(sku):
+    product = Product(spu_code=f'SPU-{sku}', name=sku, category_id=CategoryFactory().id, spu_coding_metadata={})
+    product.variants.append(ProductVariant(sku=sku))
+    db.session.add(product)
+    db.session.flush()
+    return product.variants[0]
+
+
+def _purchase(shipment, variant, qty, supplier_id=None, supplier_name=None):
+    item = ShipmentPurchaseItem(
+        shipment_order_id=shipment.id, product_variant_id=variant.id, sku=variant.sku,
+        product_name=f'{variant.sku} 名称', quantity=qty, unit='PCS',
+        purchase_unit_price=Decimal('1'), purchase_total_price=Decimal(qty),
+        supplier_id=supplier_id, supplier_name=supplier_name
+    )
+    db.session.add(item)
+    return item
+
+
+def _order_items(shipment):
+    return {
+        i.sku: i for i in db.session.scalars(
+            db.select(ShipmentOrderItem).where(ShipmentOrderItem.shipment_id == shipment.id)
+        )
+    }
+
+
+class TestPurchaseItemSync:
+    """测试分组汇总、主供应商与批量同步"""
+
+    def test_recalculate_aggregates_and_picks_dominant_supplier(self, app):
+        with app.app_context():
+            shipment = ShipmentOrderFactory(status='draft')
+            a, b = _variant('SKU-A'), _variant('SKU-B')
+            _purchase(shipment, a, 5, 1, '供应商1')
+            _purchase(shipment, a, 4, 2, '供应商2')
+            _purchase(shipment, a, 3, 2, '供应商2')
+            # 数量相同取最早录入的供应商
+            _purchase(shipment, b, 2, 3, '供应商3')
+            _purchase(shipment, b, 2, 4, '供应商4')
+            db.session.commit()
+
+            diff = ShipmentPurchaseItemService.recalculate_all_items(shipment.id)
+            assert len(diff['insert']) == 2
+
+            items = _order_items(shipment)
+            assert items['SKU-A'].quantity == Decimal('12')
+            assert items['SKU-A'].supplier_id == 2
+            assert items['SKU-A'].supplier_name == '供应商2'
+            assert items['SKU-A'].product_id == a.product_id
+            assert items['SKU-B'].supplier_id == 3
+
+    def test_sync_preserves_enriched_fields_and_deletes_orphans(self, app):
+        with app.app_context():
+            shipment = ShipmentOrderFactory(status='draft')
+            a = _variant('SKU-A')
+            _purchase(shipment, a, 5, 1, '供应商1')
+            db.session.add_all([
+                ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-A', product_name='x', quantity=1,
+                                  unit='PCS', hs_code='8512201000'),
+                ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-A', product_name='dup', quantity=1, unit='PCS'),
+                ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-GONE', product_name='y', quantity=3, unit='PCS'),
+            ])
+            db.session.commit()
+
+            preview = ShipmentPurchaseItemService.recalculate_all_items(shipment.id, dry_run=True)
+            assert [d['sku'] for d in preview['delete']] == ['SKU-A', 'SKU-GONE']
+            assert preview['update'][0]['changes']['quantity'] == [Decimal('1'), Decimal('5')]
+            assert len(_order_items(shipment)) == 2  # dry-run 不落库
+
+            ShipmentPurchaseItemService.recalculate_all_items(shipment.id)
+            items = db.session.scalars(
+                db.select(ShipmentOrderItem).where(ShipmentOrderItem.shipment_id == shipment.id)
+            ).all()
+            assert len(items) == 1
+            assert items[0].quantity == Decimal('5')
+            assert items[0].hs_code == '8512201000'
+            assert items[0].product_name == 'SKU-A 名称'
+
+            again = ShipmentPurchaseItemService.recalculate_all_items(shipment.id, dry_run=True)
+            assert again == {'insert': [], 'update': [], 'delete': [], 'unchanged': 1}
+
+    def test_single_sku_update_only_touches_that_sku(self, app):
+        with app.app_context():
+            shipment = ShipmentOrderFactory(status='draft')
+            a, b = _variant('SKU-A'), _variant('SKU-B')
+            _purchase(shipment, a, 5)
+            item_b = _purchase(shipment, b, 7)
+            db.session.commit()
+            ShipmentPurchaseItemService.recalculate_all_items(shipment.id)
+
+            item_b.quantity = 9
+            db.session.add(ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-X', product_name='x',
+                                             quantity=1, unit='PCS'))
+            db.session.flush()
+            ShipmentPurchaseItemService._update_item_for_sku(shipment.id, 'SKU-B')
+            db.session.commit()
+
+            items = _order_items(shipment)
+            assert items['SKU-B'].quantity == Decimal('9')
+            assert 'SKU-X' in items  # 未指定的SKU不受影响
+            assert ShipmentPurchaseItemService.validate_shipment_consistency(shipment.id)['errors'] == [
+                'SKU SKU-X 的数量不一致：商品明细=1.0000，采购明细合计=0'
+            ]
+
+    def test_sync_skips_expired_items_whose_rows_are_gone(self, app):
+        """会话中已过期且行已被删除的明细不触发刷新 (ObjectDeletedError)"""
+        with app.app_context():
+            shipment = ShipmentOrderFactory(status='draft')
+            stale = ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-OLD', product_name='x', quantity=1, unit='PCS')
+            db.session.add(stale)
+            db.session.flush()
+            stale_id = stale.id
+            _purchase(shipment, _variant('SKU-A'), 5)
+            # SKU-A 明细的 id 在 stale 之后，被删除的 id 不会被新行复用
+            db.session.add(ShipmentOrderItem(shipment_id=shipment.id, sku='SKU-A', product_name='SKU-A 名称',
+                                             quantity=5, unit='PCS'))
+            db.session.commit()  # stale 随提交过期，仍留在身份映射中
+            db.session.execute(db.text('DELETE FROM shipment_order_items WHERE id = :id'), {'id': stale_id})
+            db.session.commit()
+
+            diff = ShipmentPurchaseItemService.recalculate_all_items(shipment.id)
+            assert diff['insert'] == [] and diff['delete'] == []
+            assert stale in db.session
@@ -0,0 +1,88 @@
+"""
+统一业务单号服务测试
+"""
+import app.redis_client as redis_client
+from app.extensions import db
+from app.models.system import SysDict, SysSequence
+from app.services.sequence_service import SequenceService
+from app.services.serc.common import generate_seq_no
+
+
+def _add_codes(*codes):
+    db.session.add_all([SysDict(code=code, name=code) for code in codes])
+    db.session.commit()
+
+
+class TestSequenceService:
+    """测试计数器取号与审计"""
+
+    def test_next_no_seeded_from_existing(self, app):
+        """测试首次按现有单号播种，之后原子自增"""
+        with app.app_context():
+            _add_codes('AP202601090001', 'AP202601090007', 'AP2026010900071')
+
+            assert SequenceService.next_no('AP20260109', column=SysDict.code) == 'AP202601090008'
+            assert SequenceService.next_no('AP20260109', column=SysDict.code) == 'AP202601090009'
+            assert SequenceService.reserve('AP20260109', 3) == [10, 11, 12]
+            assert db.session.get(SysSequence, 'AP20260109').last_value == 12
+
+    def test_block_preallocation(self, app):
+        """测试按进程预分配号段"""
+        with app.app_context():
+            app.config['SEQUENCE_BLOCK_SIZE'] = 10
+            values = [SequenceService.next_value('LS20260109') for _ in range(12)]
+
+            assert values == list(range(1, 13))
+            assert db.session.get(SysSequence, 'LS20260109').last_value == 20
+
+    def test_generate_seq_no_sequential(self, app):
+        """测试 generate_seq_no 不再随机兜底"""
+        with app.app_context():
+            app.config['REDIS_URL'] = 'redis://127.0.0.1:1/0'
+            first = generate_seq_no('L1', 'SZ')
+            second = generate_seq_no('L1', 'SZ')
+
+            assert first.startswith('SZ-L1-') and first.endswith('-0001')
+            assert second.endswith('-0002')
+
+    def test_redis_backend_keeps_db_counter(self, app, monkeypatch):
+        """测试 Redis 取号同步推进数据库计数器，Redis 故障回退时不重号"""
+        class FakeRedis:
+            def __init__(self):
+                self.data = {}
+
+            def exists(self, key):
+                return key in self.data
+
+            def set(self, key, value, nx=False):
+                self.data.setdefault(key, int(value))
+
+            def get(self, key):
+                return self.data.get(key)
+
+            def incrby(self, key, count):
+                self.data[key] += count
+                return self.data[key]
+
+        with app.app_context():
+            app.config['SEQUENCE_BACKEND'] = 'redis'
+            fake = FakeRedis()
+            monkeypatch.setattr(redis_client, 'get_redis', lambda: fake)
+            numbers = [generate_seq_no('L1', 'SZ') for _ in range(3)]
+            assert numbers[-1].endswith('-0003')
+
+            # Redis 宕机: 旧 Redis key 也读不到，回退数据库计数器继续递增
+            monkeypatch.setattr(redis_client, 'get_redis', lambda: None)
+            assert generate_seq_no('L1', 'SZ').endswith('-0004')
+
+    def test_audit_gaps_and_duplicates(self, app):
+        """测试断号/重号审计"""
+        with app.app_context():
+            _add_codes('SH-20260109-0001', 'SH-20260109-0004')
+            db.session.add(SysSequence(key='SH-20260109-', last_value=2))
+            db.session.commit()
+
+            result = SequenceService.audit(SysDict.code, 'SH-20260109-')
+            assert result['gaps'] == [2, 3]
+            assert result['duplicates'] == []
+            assert result['behind'] is True
@@ -0,0 +1,60 @@
+"""
+SKU 流水号分配测试
+"""
+from app.extensions import db
+from app.models.product import Product, ProductVariant, SkuSerialCounter
+from app.services.code_builder import CodeBuilderService
+from app.services.sku_generator import (
+    reserve_serials, allocate_skus, get_next_serial_preview, seed_serial_counters
+)
+from tests.factories import CategoryFactory
+
+
+def _add_skus(category, skus):
+    product = Product(spu_code=f'SPU-{skus[0]}', name='Headlight', category_id=category.id, spu_coding_metadata={})
+    db.session.add(product)
+    db.session.flush()
+    for sku in skus:
+        db.session.add(ProductVariant(product_id=product.id, sku=sku, specs={}))
+    db.session.commit()
+
+
+class TestSkuSerial:
+    """测试计数器分配"""
+
+    def test_counter_seeded_once_then_incremented(self, app):
+        """测试首次按现有 SKU 播种，之后批量连续预留"""
+        with app.app_context():
+            category = CategoryFactory()
+            _add_skus(category, ['188010051L', '188010007', '18801ABCD'])
+
+            assert get_next_serial_preview('18801') == '0052'
+            assert reserve_serials('18801', 3) == [52, 53, 54]
+            assert reserve_serials('18801') == [55]
+            assert get_next_serial_preview('18801') == '0056'
+            assert db.session.get(SkuSerialCounter, ('18801', 4)).last_value == 55
+
+    def test_allocate_skips_existing_and_repairs(self, app):
+        """测试计数器落后于实际数据时自动修复"""
+        with app.app_context():
+            category = CategoryFactory()
+            db.session.add(SkuSerialCounter(prefix='18802', width=4, last_value=0))
+            db.session.commit()
+            _add_skus(category, ['188020001L', '188020002L'])
+
+            skus = allocate_skus('18802', ['L', 'R'])
+            assert skus == ['188020003L', '188020004R']
+
+    def test_batch_short_codes_and_seed_command(self, app):
+        """测试多 SKU 一次预留 + 修复命令"""
+        with app.app_context():
+            category = CategoryFactory(code='777')
+            _add_skus(category, ['77700009'])
+
+            skus = CodeBuilderService.generate_sku_short_codes(category.id, ['l', None, 'bk'])
+            assert skus == ['77700010L', '77700011', '77700012BK']
+
+            _add_skus(category, skus)
+            db.session.get(SkuSerialCounter, ('777', 5)).last_value = 3
+            db.session.commit()
+            assert ('777', 5, 12) in seed_serial_counters()
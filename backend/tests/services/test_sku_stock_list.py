@@ -0,0 +1,72 @@
+"""
+SKU 列表库存汇总测试
+"""
+from app.extensions import db
+from app.models.product import Product, ProductVariant
+from app.models.warehouse import Warehouse, WarehouseStock
+from app.services.product_service import ProductService
+from tests.factories import CategoryFactory
+
+
+def _seed():
+    category = CategoryFactory()
+    product = Product(spu_code='HL-CHE-SIL', name='Silverado Headlight', category_id=category.id, spu_coding_metadata={})
+    db.session.add(product)
+    wh1 = Warehouse(code='WH-CN', name='深圳仓')
+    wh2 = Warehouse(code='WH-US', name='美国仓')
+    db.session.add_all([wh1, wh2])
+    db.session.flush()
+
+    # (sku, safety_stock, [(warehouse, physical, available, in_transit)])
+    rows = [
+        ('1110001', 0, [(wh1, 10, 8, 0), (wh2, 5, 5, 2)]),
+        ('1110002', 20, [(wh1, 12, 10, 15)]),
+        ('1110003', 20, [(wh2, 3, 3, 0)]),
+        ('1110004', 5, []),
+    ]
+    for sku, safety_stock, stocks in rows:
+        db.session.add(ProductVariant(product_id=product.id, sku=sku, specs={}, safety_stock=safety_stock))
+        for wh, physical, available, in_transit in stocks:
+            db.session.add(WarehouseStock(
+                sku=sku, warehouse_id=wh.id, physical_quantity=physical,
+                available_quantity=available, in_transit_quantity=in_transit
+            ))
+    db.session.commit()
+
+
+class TestSkuStockList:
+    """测试 SKU 列表库存字段"""
+
+    def test_stock_fields_aggregated(self, app):
+        """测试按 SKU 跨仓汇总及预警状态"""
+        with app.app_context():
+            _seed()
+            result = ProductService().list_skus(per_page=10)
+            items = {item['sku']: item for item in result['items']}
+
+            assert items['1110001']['stock_quantity'] == 15
+            assert items['1110001']['available_quantity'] == 13
+            assert items['1110001']['in_transit'] == 2
+            assert items['1110001']['warning_status'] == 'normal'
+            assert items['1110002']['warning_status'] == 'warning'
+            assert items['1110003']['warning_status'] == 'danger'
+            assert items['1110004']['stock_quantity'] == 0
+            assert items['1110004']['warning_status'] == 'danger'
+
+            detail = ProductService().get_sku_detail('1110002')
+            assert detail['safety_stock'] == 20 and detail['in_transit'] == 15
+
+    def test_stock_filters_and_sort(self, app):
+        """测试库存区间/预警状态筛选与库存排序"""
+        with app.app_context():
+            _seed()
+            service = ProductService()
+
+            result = service.list_skus(filters={'stock_min': 5, 'stock_max': 13})
+            assert sorted(item['sku'] for item in result['items']) == ['1110001', '1110002']
+
+            result = service.list_skus(filters={'warning_status': 'danger'})
+            assert sorted(item['sku'] for item in result['items']) == ['1110003', '1110004']
+
+            result = service.list_skus(filters={'sort': '-stock_quantity'})
+            assert [item['sku'] for item in result['items']] == ['1110001', '1110002', '1110003', '1110004']
@@ -0,0 +1,78 @@
+"""
+车型层级索引测试
+"""
+import io
+from app.extensions import db
+from app.models.product import ProductVehicle
+from app.services.vehicle_index import get_vehicle_index, import_vehicle_master_list
+
+
+MVL_CSV = (
+    "ePID,Make,Model,Submodel,Year\n"
+    "1,Chevrolet,Silverado 1500,LT,2010\n"
+    "2,Chevrolet,Silverado 1500,LTZ,2010\n"
+    "3,Chevrolet,Silverado 1500,LT,2011\n"
+    "4,Chevrolet,Tahoe,LS,2010\n"
+    "5,Ford,F-150,XL,2015\n"
+    "6,,Broken,,2015\n"
+)
+
+
+class TestVehicleIndex:
+    """测试车型索引与批量导入"""
+
+    def test_import_master_list(self, app):
+        """测试流式导入去重"""
+        with app.app_context():
+            stats = import_vehicle_master_list(io.BytesIO(MVL_CSV.encode('utf-8')), batch_size=2)
+
+            assert stats['rows'] == 6
+            assert stats['skipped'] == 1
+            assert stats['make'] == 2
+            assert stats['model'] == 3
+            assert stats['year'] == 4
+            assert db.session.query(ProductVehicle).count() == 9
+
+            # 重复导入不产生新节点
+            again = import_vehicle_master_list(io.BytesIO(MVL_CSV.encode('utf-8')))
+            assert again['created'] == 0
+
+    def test_prefix_search_and_tree(self, app):
+        """测试前缀检索、扁平路径与树"""
+        with app.app_context():
+            import_vehicle_master_list(io.BytesIO(MVL_CSV.encode('utf-8')))
+            index = get_vehicle_index()
+
+            results = index.search('chev sil 2011')
+            assert [r['path'] for r in results] == ['Chevrolet > Silverado 1500 > 2011']
+            assert results[0]['path_abbreviation'] == 'CHE-SIL-11'
+
+            makes = index.search('f', level_type='make')
+            assert [m['name'] for m in makes] == ['Ford']
+
+            tree = index.tree()
+            assert [n['name'] for n in tree] == ['Chevrolet', 'Ford']
+            assert len(tree[0]['children']) == 2
+
+    def test_incremental_refresh(self, app):
+        """测试节点新增/删除后的增量刷新"""
+        with app.app_context():
+            index = get_vehicle_index()
+            assert index.search('toy') == []
+
+            node = ProductVehicle(name='Toyota', abbreviation='TOY', code='05', level_type='make')
+            db.session.add(node)
+            db.session.commit()
+            index.add_node(node)
+
+            assert index.search('toy')[0]['id'] == node.id
+            assert index.find_by_abbreviation('toy')['name'] == 'Toyota'
+            assert index.find_by_code('05')[0]['id'] == node.id
+
+            node_id = node.id
+            db.session.delete(node)
+            db.session.commit()
+            index.remove_node(node_id)
+
+            assert index.search('toy') == []
+            assert index.find_by_code('05') == []
@@ -0,0 +1,130 @@
+"""
+编译序列化器: 输出须与 schema.dump / @output 完全一致
+"""
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from apiflask import Schema
+from apiflask.fields import Boolean, Date, DateTime, Dict, Float, Integer, List, Nested, String
+from apiflask.fields import Decimal as DecimalField
+from marshmallow import fields, post_dump
+from app.api.warehouse.stock import StockMovementPaginationSchema, StockPaginationSchema
+from app.models.user import Permission, Role
+from app.models.warehouse import Warehouse, WarehouseStock, WarehouseStockMovement
+from app.schemas.compiled import compile_schema, schema_columns
+from app.schemas.warehouse import StockMovementSchema, StockSchema
+from app.services.warehouse import StockService
+
+
+class LineSchema(Schema):
+    sku = String()
+    qty = DecimalField()
+    price = DecimalField(places=2)
+
+
+class OrderSchema(Schema):
+    id = Integer()
+    order_no = String(data_key='orderNo')
+    weight = Float()
+    amount = DecimalField(allow_none=True)
+    active = Boolean()
+    tags = List(String())
+    extra = Dict()
+    ship_date = Date()
+    created_at = DateTime()
+    created_day = DateTime(format='%Y-%m-%d')
+    supplier_name = String(attribute='supplier.name')
+    status = String(dump_default='draft')
+    label = fields.Method('get_label')
+    lines = List(Nested(LineSchema))
+    first_line = Nested(LineSchema, allow_none=True)
+
+    def get_label(self, obj):
+        return f"#{obj['id'] if isinstance(obj, dict) else obj.id}"
+
+
+class HookedSchema(Schema):
+    name = String()
+
+    @post_dump
+    def upper(self, data, **kwargs):
+        data['name'] = data['name'].upper()
+        return data
+
+
+def _orders():
+    full = {
+        'id': 1, 'order_no': 7, 'weight': Decimal('1.5'), 'amount': 3.1, 'active': True,
+        'tags': ['a', None, 2], 'extra': {'k': 1}, 'ship_date': date(2024, 1, 2),
+        'created_at': datetime(2024, 1, 2, 3, 4, 5), 'created_day': datetime(2024, 1, 2, 3, 4, 5),
+        'supplier': {'name': 'ACME'}, 'status': 'confirmed',
+        'lines': [{'sku': 'S1', 'qty': Decimal('2.50'), 'price': Decimal('9.999')}],
+        'first_line': {'sku': 'S1', 'qty': 1, 'price': 2},
+    }
+    # 缺失字段省略 / None 保留 / dump_default 生效
+    sparse = {'id': 2, 'amount': None, 'tags': None, 'supplier': None, 'first_line': None}
+    as_object = SimpleNamespace(**{**full, 'id': 3, 'supplier': SimpleNamespace(name='Obj')})
+    return [full, sparse, as_object]
+
+
+def test_compiled_matches_dump():
+    orders = _orders()
+    assert compile_schema(OrderSchema).many(orders) == OrderSchema(many=True).dump(orders)
+    assert compile_schema(OrderSchema(many=True))(orders) == OrderSchema(many=True).dump(orders)
+
+    hooked = [{'name': 'abc'}]
+    assert compile_schema(HookedSchema).many(hooked) == [{'name': 'ABC'}]
+
+
+def test_stock_rows_match_orm_dump(app, db_session):
+    warehouse = Warehouse(code='W1', name='W1', category='physical', location_type='domestic', ownership_type='self')
+    db_session.add(warehouse)
+    db_session.flush()
+    db_session.add_all([
+        WarehouseStock(sku='SKU-1', warehouse_id=warehouse.id, physical_quantity=5, weight=1.25),
+        WarehouseStock(sku='SKU-2', warehouse_id=warehouse.id, batch_no='B1'),
+        WarehouseStockMovement(sku='SKU-1', warehouse_id=warehouse.id, order_type='inbound', order_no='IN-1',
+                               quantity_delta=5, unit_cost=Decimal('1.2345'), currency='CNY'),
+    ])
+    db_session.commit()
+    service = StockService()
+
+    for schema, item_schema, list_method, model in (
+        (StockPaginationSchema, StockSchema, service.get_stock_list, WarehouseStock),
+        (StockMovementPaginationSchema, StockMovementSchema, service.get_movement_list, WarehouseStockMovement),
+    ):
+        expected = schema().dump(list_method(page=1, per_page=10))
+        db_session.expunge_all()
+        rows = list_method(page=1, per_page=10, columns=schema_columns(item_schema, model))
+        assert not isinstance(rows['items'][0], model)
+        assert compile_schema(schema)(rows) == expected
+
+
+def test_stock_list_endpoint_contract(client, token_headers, db_session):
+    permission = Permission(name='stock:view', description='stock:view', module='仓库', resource='库存', action='view')
+    role = db_session.query(Role).filter_by(name='admin').one()
+    role.permissions.append(permission)
+    warehouse = Warehouse(code='W1', name='W1', category='physical', location_type='domestic', ownership_type='self')
+    db_session.add(warehouse)
+    db_session.flush()
+    db_session.add(WarehouseStock(sku='SKU-1', warehouse_id=warehouse.id, available_quantity=3))
+    db_session.commit()
+
+    resp = client.get('/api/v1/stocks', headers=token_headers)
+    assert resp.status_code == 200, resp.data
+
+    expected = StockPaginationSchema().dump(StockService().get_stock_list(page=1, per_page=20))
+    assert resp.json == {'code': 0, 'message': 'success', 'data': json.loads(json.dumps(expected, default=str))}
+    assert resp.json['data']['items'][0]['available_quantity'] == 3
+
+
+def test_schema_columns_rejects_relationships():
+    class WithRelation(Schema):
+        sku = String()
+        warehouse = String()
+
+    with pytest.raises(ValueError):
+        schema_columns(WithRelation, WarehouseStock)
+    assert [c.key for c in schema_columns(StockSchema, WarehouseStock)][:2] == ['id', 'sku']
@@ -0,0 +1,83 @@
+"""
+数据库引擎参数 / 只读副本路由测试
+"""
+import pytest
+from sqlalchemy import select
+from app import create_app
+from app.db_routing import build_engine_options, detect_process_type, get_replica_engine, read_replica, using_replica
+from app.extensions import db
+from app.models.user import Role
+
+
+@pytest.fixture
+def replica_app():
+    app = create_app(test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'DATABASE_REPLICA_URL': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'REDIS_URL': None,
+    })
+
+    @app.get('/_replica_probe')
+    @read_replica
+    def replica_probe():
+        return {'roles': db.session.scalars(select(Role.name).order_by(Role.name)).all()}
+
+    @app.post('/_replica_write')
+    @read_replica
+    def replica_write():
+        db.session.add(Role(name='written'))
+        db.session.flush()
+        return {'roles': db.session.scalars(select(Role.name).order_by(Role.name)).all()}
+
+    with app.app_context():
+        db.create_all()
+        replica = get_replica_engine()
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(Role.__table__.insert(), [{'name': 'replica-only'}])
+        yield app
+        db.session.remove()
+
+
+def test_engine_options_per_process_type():
+    config = {
+        'DB_POOL_OPTIONS': {'web': {'pool_size': 10, 'max_overflow': 20},
+                            'celery': {'pool_size': 2, 'max_overflow': 4}},
+        'DB_POOL_RECYCLE': 600,
+        'DB_STATEMENT_TIMEOUT': {'web': 30000, 'celery': 600000, 'cli': 0},
+    }
+    web = build_engine_options('postgresql://u:p@db/app', config, 'web')
+    celery = build_engine_options('postgresql://u:p@db/app', config, 'celery')
+    cli = build_engine_options('postgresql://u:p@db/app', config, 'cli')
+
+    assert web['pool_size'] == 10 and web['pool_pre_ping'] and web['pool_recycle'] == 600
+    assert web['connect_args']['options'] == '-c statement_timeout=30000'
+    assert celery['pool_size'] == 2
+    assert celery['connect_args']['options'] == '-c statement_timeout=600000'
+    assert 'options' not in cli['connect_args'] and cli['pool_size'] == 10
+    assert build_engine_options('sqlite:///:memory:', config, 'web') == {}
+
+
+def test_detect_process_type(monkeypatch):
+    monkeypatch.delenv('APP_PROCESS_TYPE', raising=False)
+    assert detect_process_type(['/venv/bin/gunicorn', 'wsgi:app']) == 'web'
+    assert detect_process_type(['/venv/bin/flask', 'run']) == 'web'
+    assert detect_process_type(['/venv/bin/flask', '--app', 'wsgi', 'db', 'upgrade']) == 'cli'
+    assert detect_process_type(['/venv/bin/flask', 'reindex-search']) == 'cli'
+    assert detect_process_type(['/venv/bin/celery', '-A', 'celery_worker', 'worker']) == 'celery'
+
+
+def test_replica_routing_and_read_your_writes(replica_app):
+    # 未标记的查询走主库
+    assert db.session.scalars(select(Role.name)).all() == []
+    with using_replica():
+        assert db.session.scalars(select(Role.name)).all() == ['replica-only']
+    db.session.rollback()
+
+    client = replica_app.test_client()
+    assert client.get('/_replica_probe').get_json()['roles'] == ['replica-only']
+
+    # 写入后本请求内的读取回到主库
+    assert client.post('/_replica_write').get_json()['roles'] == ['written']
@@ -0,0 +1,106 @@
+"""
+条件请求 (资源版本 ETag -> 304) 与 JSON 响应压缩
+"""
+import gzip
+import pytest
+from app.compression import brotli
+from app.extensions import db
+from app.http_cache import resource_versions
+from app.models.product import ProductVehicle
+from app.models.system import SysDict
+
+
+def _add_dicts(count, prefix='d'):
+    db.session.add_all([
+        SysDict(code=f'{prefix}{i:03d}', name=f'字典 {i}', description='x' * 40) for i in range(count)
+    ])
+    db.session.commit()
+
+
+def test_version_bumped_with_transaction(app):
+    assert resource_versions(['dicts', 'vehicles']) == {'dicts': 0, 'vehicles': 0}
+
+    _add_dicts(2)
+    assert resource_versions(['dicts'])['dicts'] == 1
+
+    # 回滚的写入不改变版本
+    db.session.add(SysDict(code='rolled-back', name='x'))
+    db.session.flush()
+    db.session.rollback()
+    assert resource_versions(['dicts'])['dicts'] == 1
+
+    # ORM 批量更新同样递增
+    db.session.execute(db.update(SysDict).values(category='base'))
+    db.session.commit()
+    assert resource_versions(['dicts'])['dicts'] == 2
+    assert resource_versions(['vehicles'])['vehicles'] == 0
+
+
+def test_dict_list_conditional_get(client, token_headers):
+    _add_dicts(3)
+    first = client.get('/api/v1/system/dicts', headers=token_headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"') and first.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/api/v1/system/dicts', headers={**token_headers, 'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+    # 未登录时仍先校验身份
+    assert client.get('/api/v1/system/dicts', headers={'If-None-Match': etag}).status_code == 401
+
+    _add_dicts(1, prefix='new')
+    changed = client.get('/api/v1/system/dicts', headers={**token_headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.json['data']) == 4
+
+
+def test_vehicle_tree_follows_version(client, token_headers):
+    db.session.add(ProductVehicle(name='Audi', abbreviation='AUD', level_type='make'))
+    db.session.commit()
+    assert [n['name'] for n in client.get('/api/v1/vehicles/tree', headers=token_headers).json['data']] == ['Audi']
+
+    # 未经 add_node 的写入 (如其他进程): 版本变化后索引立即重建，不必等 TTL
+    db.session.add(ProductVehicle(name='BMW', abbreviation='BMW', level_type='make', sort_order=1))
+    db.session.commit()
+    names = [n['name'] for n in client.get('/api/v1/vehicles/tree', headers=token_headers).json['data']]
+    assert names == ['Audi', 'BMW']
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip;q=0.5', 'gzip'),
+    ('identity', None),
+])
+def test_json_compression_negotiated(client, token_headers, accept, encoding):
+    if encoding == 'br' and brotli is None:
+        pytest.skip('brotli not installed')
+    _add_dicts(40)
+    plain = client.get('/api/v1/system/dicts', headers=token_headers).get_data()
+
+    resp = client.get('/api/v1/system/dicts', headers={**token_headers, 'Accept-Encoding': accept})
+    assert resp.status_code == 200
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    assert resp.headers.get('Content-Encoding') == encoding
+    body = resp.get_data()
+    if encoding == 'br':
+        body = brotli.decompress(body)
+    elif encoding == 'gzip':
+        body = gzip.decompress(body)
+    assert body == plain
+    if encoding:
+        assert int(resp.headers['Content-Length']) < len(plain)
+
+
+def test_bump_resource_command(app, runner):
+    result = runner.invoke(args=['system', 'bump-resource', 'categories'])
+    assert result.exit_code == 0, result.output
+    assert resource_versions(['categories', 'dicts']) == {'categories': 1, 'dicts': 0}
+
+
+def test_small_json_not_compressed(client):
+    resp = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
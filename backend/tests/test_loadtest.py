@@ -0,0 +1,40 @@
+"""
+压测工具: 假 NAS 与 SynologyClient 协议兼容 / 报告统计
+"""
+import threading
+import pytest
+from werkzeug.serving import make_server
+from loadtest.fake_services import SAMPLE_FILES, create_fake_app
+from loadtest.runner import StepStats, percentile
+from app.services.synology_client import SynologyClient
+
+
+@pytest.fixture
+def fake_url():
+    server = make_server('127.0.0.1', 0, create_fake_app(file_size=1024), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_synology_client_against_fake_nas(app, fake_url):
+    with app.app_context():
+        client = SynologyClient({'host': fake_url, 'user': 'u', 'password': 'p', 'root_dir': '/serc/test'})
+        files = client.list_files('ACME/PRE001')
+        assert [f['name'] for f in files] == SAMPLE_FILES
+        assert files[0]['path'] == '/serc/test/ACME/PRE001/报关单.pdf'
+
+        content = client.get_file_stream('ACME/PRE001/报关单.pdf').content
+        assert len(content) == 1024 and content.startswith(b'%PDF')
+
+
+def test_step_summary():
+    assert percentile([], 95) == 0.0
+    assert percentile([float(i) for i in range(1, 101)], 95) == 95.0
+
+    stats = StepStats(latencies=[0.01] * 9, errors=1)
+    summary = stats.summary(seconds=2)
+    assert summary['requests'] == 10 and summary['rps'] == 5.0
+    assert summary['error_rate'] == 0.1
+    assert summary['p50_ms'] == 10.0
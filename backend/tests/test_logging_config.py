@@ -0,0 +1,66 @@
+"""
+异步日志管道 / 请求 ID 测试
+"""
+import logging
+import logging.handlers
+from app.logging_config import DroppingQueueHandler, RequestIdFilter, request_id_var
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler('test', maxsize=2, block_timeout=0.01)
+    logger = logging.getLogger('tests.logging.drop')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(5):
+            logger.warning('message %s', i)
+        logger.error('boom')
+    finally:
+        logger.removeHandler(handler)
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 4
+    assert handler.queue.get_nowait().msg == 'message 0'
+
+
+def test_queued_record_is_prepared_with_request_id():
+    sink = _Collect()
+    handler = DroppingQueueHandler('test')
+    handler.addFilter(RequestIdFilter())
+    listener = logging.handlers.QueueListener(handler.queue, sink)
+    logger = logging.getLogger('tests.logging.prepare')
+    logger.propagate = False
+    logger.addHandler(handler)
+    listener.start()
+    token = request_id_var.set('req-123')
+    try:
+        try:
+            raise ValueError('bad')
+        except ValueError:
+            logger.exception('failed %s', 'x')
+    finally:
+        request_id_var.reset(token)
+        logger.removeHandler(handler)
+        listener.stop()
+
+    record = sink.records[0]
+    assert record.getMessage() == 'failed x'
+    assert record.request_id == 'req-123'
+    assert record.exc_info is None and 'ValueError: bad' in record.exc_text
+
+
+def test_request_id_header(client):
+    assert client.get('/health', headers={'X-Request-ID': 'abc'}).headers['X-Request-ID'] == 'abc'
+    assert len(client.get('/health').headers['X-Request-ID']) == 32
+    for invalid in ('../../etc/passwd', 'a' * 65, 'id with space', 'id\tinjected'):
+        returned = client.get('/health', headers={'X-Request-ID': invalid}).headers['X-Request-ID']
+        assert returned != invalid and len(returned) == 32
@@ -0,0 +1,48 @@
+"""
+Prometheus 指标测试
+"""
+import pytest
+from app.metrics import external_call, track_external
+
+
+def test_external_call_reraises(app):
+    @track_external('synology')
+    def broken():
+        raise TimeoutError('nas down')
+
+    with pytest.raises(TimeoutError):
+        broken()
+    with external_call('lingxing', '/erp/ok'):
+        pass
+
+
+def test_metrics_endpoint(app, client):
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from prometheus_client import REGISTRY
+
+    with pytest.raises(ValueError):
+        with external_call('lingxing', '/erp/sc/routing/fba'):
+            raise ValueError('bad json')
+    assert REGISTRY.get_sample_value(
+        'external_request_errors_total',
+        {'service': 'lingxing', 'operation': '/erp/sc/routing/fba', 'error': 'ValueError'}
+    ) >= 1
+
+    client.get('/health')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket' in body
+    assert 'rule="/health"' in body
+    assert 'db_pool_checkouts_total' in body
+
+
+def test_metrics_token(app, client):
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 403
+    expected = 200
+    try:
+        import prometheus_client  # noqa: F401
+    except ImportError:
+        expected = 503
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == expected
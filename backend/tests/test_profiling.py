@@ -0,0 +1,88 @@
+"""
+按需采样分析测试
+"""
+import time
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.commands.profile import profile_cli
+from app.profiling import SamplingProfiler, get_profile_store, strip_line_numbers
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001).start()
+    _busy(0.05)
+    stacks = profiler.stop()
+
+    assert profiler.samples > 0
+    assert any(':_busy:' in stack for stack in stacks)
+    merged = strip_line_numbers(stacks)
+    assert all(frame.count(':') == 1 for stack in merged for frame in stack.split(';'))
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    app = create_app(test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'PROFILE_ENABLED': True,
+        'PROFILE_INTERVAL': 0.001,
+        'PROFILE_DIR': str(tmp_path),
+    })
+
+    @app.get('/_profile_probe')
+    def probe():
+        _busy(0.05)
+        return {'ok': True}
+
+    return app
+
+
+def _headers(app, roles):
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={'roles': roles, 'permissions': []})
+    return {'Authorization': f'Bearer {token}', 'X-Profile': '1'}
+
+
+def test_only_admin_can_request_profile(profiled_app):
+    client = profiled_app.test_client()
+    store = get_profile_store(profiled_app)
+
+    assert 'X-Profile-Id' not in client.get('/_profile_probe', headers={'X-Profile': '1'}).headers
+    assert 'X-Profile-Id' not in client.get('/_profile_probe', headers=_headers(profiled_app, ['user'])).headers
+    assert store.list() == []
+
+    response = client.get('/_profile_probe', headers=_headers(profiled_app, ['admin']))
+    profile_id = response.headers['X-Profile-Id']
+    meta = store.list()[0]
+    assert meta['id'] == profile_id
+    assert meta['path'] == '/_profile_probe' and meta['status'] == 200
+    assert meta['samples'] > 0
+    assert any('_busy' in stack for stack in store.load(profile_id))
+
+
+def test_cli_list_and_aggregate(profiled_app, tmp_path):
+    client = profiled_app.test_client()
+    for _ in range(2):
+        client.get('/_profile_probe?__profile=1', headers=_headers(profiled_app, ['admin']))
+
+    runner = profiled_app.test_cli_runner()
+    listed = runner.invoke(profile_cli, ['list', '--path', '_profile_probe'])
+    assert listed.exit_code == 0
+    assert listed.output.count('/_profile_probe') == 2
+
+    output = tmp_path / 'probe.folded'
+    result = runner.invoke(profile_cli, ['aggregate', '--path', '_profile_probe', '-o', str(output)])
+    assert result.exit_code == 0, result.output
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+    assert '已删除 2' in runner.invoke(profile_cli, ['clean']).output
+    assert get_profile_store(profiled_app).list() == []
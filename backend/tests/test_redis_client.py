@@ -0,0 +1,34 @@
+"""
+共享 Redis 客户端测试 (不依赖真实 Redis)
+"""
+from app.redis_client import ManagedRedis, CircuitBreaker
+
+
+def test_shared_client_and_breaker():
+    """同一进程复用一个客户端/连接池，连续失败后熔断"""
+    managed = ManagedRedis('redis://:secret@127.0.0.1:1/0', connect_timeout=0.2, breaker_threshold=2)
+
+    client = managed.get_client()
+    assert client is managed.get_client()
+    assert managed.stats()['url'] == 'redis://:***@127.0.0.1:1/0'
+
+    assert managed.ping() is False
+    assert managed.ping() is False
+    assert managed.stats()['breaker_state'] == 'open'
+    assert managed.get_client() is None
+
+
+def test_breaker_half_open_recovery():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == 'half_open' and breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_extension_registered(app):
+    """未配置 REDIS_URL 时扩展存在但返回 None，调用方走降级"""
+    managed = app.extensions['redis']
+    assert managed.get_client() is None
+    assert app.config['CELERY']['broker_pool_limit'] == 50
@@ -0,0 +1,85 @@
+"""
+请求级 SQL 统计 / N+1 检测测试
+"""
+import pytest
+from app.extensions import db
+from app.models.purchase.supplier import SysSupplier
+from app.sql_stats import normalize_sql, assert_query_budget, track_queries
+from tests.factories import SysSupplierFactory
+
+
+def test_normalize_sql_collapses_literals_and_in_lists():
+    a = normalize_sql("SELECT * FROM t WHERE id = %(id_1)s AND name = 'x''y' AND n IN (%(n_1_1)s, %(n_1_2)s)")
+    b = normalize_sql("SELECT *  FROM t\nWHERE id = 42 AND name = 'z' AND n IN (?, ?, ?, ?)")
+    assert a == b == 'SELECT * FROM t WHERE id = ? AND name = ? AND n IN (?+)'
+    assert normalize_sql("SELECT a::text FROM t WHERE b = :b") == 'SELECT a::text FROM t WHERE b = ?'
+
+
+def test_n_plus_one_is_flagged(app):
+    with app.app_context():
+        ids = [SysSupplierFactory().id for _ in range(8)]
+        db.session.expire_all()
+
+        with track_queries(n_plus_one_threshold=5) as stats:
+            for supplier_id in ids:
+                db.session.get(SysSupplier, supplier_id)
+        assert stats.count == 8
+        assert stats.n_plus_one()[0]['count'] == 8
+
+        db.session.expire_all()
+        with pytest.raises(AssertionError, match='N\\+1 suspected: 8x'):
+            with assert_query_budget():
+                for supplier_id in ids:
+                    db.session.get(SysSupplier, supplier_id)
+
+        db.session.expire_all()
+        with assert_query_budget(max_queries=1) as stats:
+            db.session.scalars(db.select(SysSupplier).where(SysSupplier.id.in_(ids))).all()
+        assert stats.rows in (0, 8)  # SQLite 对 SELECT 不返回 rowcount
+
+
+def test_failed_statement_leaves_no_start_time(app):
+    with app.app_context():
+        with track_queries() as stats:
+            with pytest.raises(Exception):
+                db.session.execute(db.text('SELECT * FROM no_such_table'))
+            db.session.rollback()
+            db.session.execute(db.text('SELECT 1'))
+            assert 'sql_stats_start' not in db.session.connection().info
+        assert stats.count == 1 and stats.duration < 1
+
+
+def test_endpoint_query_budget(app, client):
+    @app.get('/_sql_stats_probe')
+    def probe():
+        for supplier in db.session.scalars(db.select(SysSupplier)).all():
+            db.session.get(SysSupplier, supplier.id + 1000)
+        return {'ok': True}
+
+    with app.app_context():
+        for _ in range(7):
+            SysSupplierFactory()
+
+    with pytest.raises(AssertionError, match='budget is 3'):
+        with assert_query_budget(max_queries=3, allow_n_plus_one=True):
+            client.get('/_sql_stats_probe')
+
+
+def test_debug_headers():
+    from app import create_app
+    debug_app = create_app(test_config={
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SQL_STATS_HEADERS': True,
+        'SQL_NPLUS1_THRESHOLD': 2,
+    })
+
+    @debug_app.get('/_sql_stats_probe')
+    def probe():
+        for i in range(3):
+            db.session.execute(db.text('SELECT :i'), {'i': i})
+        return {'ok': True}
+
+    response = debug_app.test_client().get('/_sql_stats_probe')
+    assert response.headers['X-SQL-Count'] == '3'
+    assert response.headers['X-SQL-NPlus1'].endswith('x3')
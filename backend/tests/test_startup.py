@@ -0,0 +1,42 @@
+"""
+启动耗时: 重量级依赖延迟导入 / 按进程跳过路由模块 / importtime 解析
+"""
+import os
+from app import create_app
+from app.api import should_register_api
+from app.profiling import measure_startup, parse_importtime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parse_importtime():
+    output = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |     _io',
+        'import time:      1500 |      90000 | app',
+    ])
+    assert parse_importtime(output) == [
+        {'module': '_io', 'self_us': 120, 'cumulative_us': 120, 'depth': 2},
+        {'module': 'app', 'self_us': 1500, 'cumulative_us': 90000, 'depth': 0},
+    ]
+
+
+def test_should_register_api():
+    app = create_app(test_config={'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    assert should_register_api(app, argv=['gunicorn', 'wsgi:app'])
+    assert should_register_api(app, argv=['/usr/bin/flask', '--app', 'app', 'run'])
+    assert not should_register_api(app, argv=['/usr/bin/flask', '--app', 'app', 'customs', 'sync'])
+    assert '/api/v1/auth/login' in {rule.rule for rule in app.url_map.iter_rules()}
+
+    app.config['APP_PROCESS_TYPE'] = 'celery'
+    assert not should_register_api(app, argv=['celery'])
+    app.config['LOAD_API_BLUEPRINTS'] = 'true'
+    assert should_register_api(app, argv=['celery'])
+
+
+def test_create_app_does_not_import_heavy_modules():
+    measured = measure_startup(
+        env={'DATABASE_URL': 'sqlite://', 'LOAD_API_BLUEPRINTS': 'true'},
+        cwd=BACKEND_DIR,
+    )
+    assert measured['heavy'] == []